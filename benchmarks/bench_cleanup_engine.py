@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+from src.model.cleanup_model import cleanup_model
+from src.model.date_handler import date_handler
+from benchmarks.synthetic_mailbox import make_synthetic_backend, make_senders, MAILBOX
+
+"""
+Benchmarks of the matching and deletion engine of the cleanup_model on
+synthetic mailboxes (see synthetic_mailbox.py) of several sizes. Times
+get_emails_matching_search_conditions and delete_emails_with_matching_conditions
+for each scenario below, and the date_handler conversions, then compares the
+times against the baselines stored in baselines.json. Baselines depend on the
+machine, save your own with --save-baselines before changing the engine.
+
+Run from the root of the repository:
+	python -m benchmarks.bench_cleanup_engine [--sizes 10000 100000] [--save-baselines]
+The exit code is 1 if a benchmark is slower than its baseline by more than the tolerance.
+"""
+
+SIZES = (10000, 100000, 1000000)
+REPEAT = 3
+# above this amount of emails, deletions are timed once since the mailbox is generated again for each run
+SINGLE_DELETE_RUN_SIZE = 1000000
+# a benchmark taking more than TOLERANCE times its baseline is reported as a regression
+TOLERANCE = 1.25
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+def set_sender_and_dates(model: cleanup_model, seed: int) -> None:
+	"""
+	Emails of the second most frequent sender sent in 2023: restrict filter and date bounded scan.
+	"""
+	senders = make_senders(random.Random(seed))
+	model.set_target_sender_email(senders[1][0])
+	model.set_target_start_date("1/1/2023")
+	model.set_target_end_date("12/31/2023")
+
+
+def set_subject_phrases(model: cleanup_model, seed: int) -> None:
+	"""
+	Emails whose subject has one of several phrases: every email is read.
+	"""
+	model.set_target_subject_keyphrase(["weekly deals", "security alert", "digest"])
+
+
+# key: name of the scenario, value: function setting its deletion conditions on a model
+SCENARIOS = {'sender_and_dates': set_sender_and_dates,
+			 'subject_phrases': set_subject_phrases}
+
+
+def make_model(backend, set_conditions, seed: int) -> cleanup_model:
+	"""
+	Creates a model on a backend with the conditions of a scenario verified.
+	:return: (cleanup_model) the model
+	"""
+	model = cleanup_model(backend)
+	model.call_startup_methods()
+	model.select_target_mailbox_by_address(MAILBOX)
+	set_conditions(model, seed)
+	model.verify_deletion_conditions()
+	return model
+
+
+def best_time(function, repeat: int) -> float:
+	"""
+	:return: (float) best time in seconds of repeat runs of a function without arguments
+	"""
+	return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def time_deletion(amt_emails: int, set_conditions, seed: int) -> float:
+	"""
+	Times deleting the matching emails, each run on a newly generated mailbox (not timed).
+	:return: (float) best time in seconds
+	"""
+	times = []
+	for _ in range(1 if amt_emails >= SINGLE_DELETE_RUN_SIZE else REPEAT):
+		model = make_model(make_synthetic_backend(amt_emails, seed), set_conditions, seed)
+		times.append(timeit.timeit(model.delete_emails_with_matching_conditions, number=1))
+	return min(times)
+
+
+def run_benchmarks(amt_emails: int, seed: int) -> dict:
+	"""
+	Runs every benchmark on a synthetic mailbox of a given size.
+	:param amt_emails: (int) amount of emails of the mailbox
+	:param seed: (int) seed of the synthetic mailbox
+	:return: (dict) key: benchmark name followed by @ and the size, value: best time in seconds
+	"""
+	results = {}
+	backend = make_synthetic_backend(amt_emails, seed)
+	for name, set_conditions in SCENARIOS.items():
+		model = make_model(backend, set_conditions, seed)
+		results[f"match/{name}@{amt_emails}"] = best_time(model.get_emails_matching_search_conditions, REPEAT)
+		results[f"delete/{name}@{amt_emails}"] = time_deletion(amt_emails, set_conditions, seed)
+
+	handler = date_handler()
+	emails = [email for email in backend.get_items(backend.open_folder(MAILBOX)) if hasattr(email, 'SentOn')]
+	sent_on_column = [email.SentOn for email in emails]
+	lower_bound = handler.convert_list_into_datetime([1, 1, 2023])
+	upper_bound = handler.convert_list_into_datetime([12, 31, 2023], endtime=True)
+	lower_timestamp, upper_timestamp = handler.get_timestamp_bounds(lower_bound, upper_bound)
+	results[f"dates/convert_sent_on_datetime@{amt_emails}"] = best_time(
+		lambda: [handler.is_between_dates(lower_bound, upper_bound, handler.convert_sent_on_datetime(email))
+				 for email in emails], REPEAT)
+	results[f"dates/timestamp_batch@{amt_emails}"] = best_time(
+		lambda: handler.check_timestamps_between(lower_timestamp, upper_timestamp,
+												 handler.convert_dates_to_timestamps(sent_on_column)), REPEAT)
+	return results
+
+
+def compare_with_baselines(results: dict, baselines: dict, tolerance: float) -> list:
+	"""
+	:param results: (dict) times of the benchmarks, see run_benchmarks
+	:param baselines: (dict) stored times, in the same format
+	:param tolerance: (float) a time above tolerance times its baseline is a regression
+	:return: (list) names of the benchmarks slower than their baseline by more than the tolerance
+	"""
+	regressions = []
+	print(f"{'Benchmark':<45} {'Seconds':>10} {'Baseline':>10} {'Ratio':>7}")
+	for name, seconds in results.items():
+		baseline = baselines.get(name)
+		if baseline is None:
+			print(f"{name:<45} {seconds:10.4f} {'-':>10} {'-':>7}")
+			continue
+		ratio = seconds / baseline
+		flag = ""
+		if ratio > tolerance:
+			regressions.append(name)
+			flag = " SLOWER"
+		print(f"{name:<45} {seconds:10.4f} {baseline:10.4f} {ratio:7.2f}{flag}")
+	return regressions
+
+
+def parse_arguments(arguments=None):
+	parser = argparse.ArgumentParser(description="Benchmarks of the matching and deletion engine")
+	parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="amounts of emails of the mailboxes")
+	parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic mailboxes")
+	parser.add_argument("--baselines", default=BASELINES_PATH, help="JSON file of the baselines")
+	parser.add_argument("--save-baselines", action="store_true", help="store the times as the new baselines")
+	parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+						help="a benchmark slower than tolerance times its baseline is a regression")
+	return parser.parse_args(arguments)
+
+
+def main():
+	arguments = parse_arguments()
+	results = {}
+	for amt_emails in arguments.sizes:
+		results.update(run_benchmarks(amt_emails, arguments.seed))
+
+	baselines = {}
+	if os.path.exists(arguments.baselines):
+		with open(arguments.baselines, 'r', encoding='utf-8') as baselines_file:
+			baselines = json.load(baselines_file)
+	regressions = compare_with_baselines(results, baselines, arguments.tolerance)
+
+	if arguments.save_baselines:
+		baselines.update({name: round(seconds, 6) for name, seconds in results.items()})
+		with open(arguments.baselines, 'w', encoding='utf-8') as baselines_file:
+			json.dump(dict(sorted(baselines.items())), baselines_file, indent=2)
+			baselines_file.write("\n")
+		print(f"Baselines saved to {arguments.baselines}")
+	elif len(regressions) > 0:
+		print(f"{len(regressions)} benchmarks are slower than their baseline")
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
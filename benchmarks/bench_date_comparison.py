@@ -0,0 +1,81 @@
+import timeit
+from datetime import datetime, timedelta
+from src.model.date_handler import date_handler, LOCAL_TIMEZONE
+from src.model.memory_backend import memory_mail_item
+
+try:
+	import numpy
+except ImportError:  # numpy is optional
+	numpy = None
+
+"""
+Microbenchmark of the date range check of the cleanup_model, per email.
+Compares converting SentOn into a new datetime (convert_sent_on_datetime +
+is_between_dates) against comparing timestamps with precomputed bounds, one
+email at a time and as one batch call.
+
+Run from the root of the repository:
+	python -m benchmarks.bench_date_comparison
+"""
+
+AMT_EMAILS = 100000
+REPEAT = 5
+
+
+def make_emails(amt_emails: int) -> list:
+	"""
+	Creates emails sent one minute apart.
+	:param amt_emails: (int) amount of emails
+	:return: (list) list of memory_mail_item
+	"""
+	start = datetime(2020, 1, 1, tzinfo=LOCAL_TIMEZONE)
+	return [memory_mail_item(SentOn=start + timedelta(minutes=number)) for number in range(amt_emails)]
+
+
+def best_time_per_email(function, amt_emails: int) -> float:
+	"""
+	Runs a function REPEAT times and returns its best time divided by the amount of emails.
+	:param function: function without arguments checking all emails
+	:param amt_emails: (int) amount of emails checked by one call
+	:return: (float) nanoseconds per email
+	"""
+	return min(timeit.repeat(function, number=1, repeat=REPEAT)) / amt_emails * 1e9
+
+
+def main():
+	handler = date_handler()
+	emails = make_emails(AMT_EMAILS)
+	lower_bound = datetime(2020, 1, 15, tzinfo=LOCAL_TIMEZONE)
+	upper_bound = datetime(2020, 2, 15, tzinfo=LOCAL_TIMEZONE)
+	lower_timestamp, upper_timestamp = handler.get_timestamp_bounds(lower_bound, upper_bound)
+
+	def check_datetimes():
+		return [handler.is_between_dates(lower_bound, upper_bound, handler.convert_sent_on_datetime(email))
+				for email in emails]
+
+	def check_timestamps():
+		return [lower_timestamp <= email.SentOn.timestamp() <= upper_timestamp for email in emails]
+
+	sent_on_column = [email.SentOn for email in emails]
+
+	def check_column_batch():
+		timestamps = handler.convert_dates_to_timestamps(sent_on_column)
+		return handler.check_timestamps_between(lower_timestamp, upper_timestamp, timestamps)
+
+	assert check_datetimes() == check_timestamps() == check_column_batch()
+
+	results = [("datetime per email (before)", best_time_per_email(check_datetimes, AMT_EMAILS)),
+			   ("timestamp per email", best_time_per_email(check_timestamps, AMT_EMAILS)),
+			   ("timestamp batch of a column", best_time_per_email(check_column_batch, AMT_EMAILS))]
+	if numpy is not None:
+		timestamps = numpy.array(handler.convert_dates_to_timestamps(sent_on_column), dtype=float)
+		results.append(("numpy batch of timestamps", best_time_per_email(
+			lambda: handler.check_timestamps_between(lower_timestamp, upper_timestamp, timestamps), AMT_EMAILS)))
+
+	print(f"{AMT_EMAILS} emails, best of {REPEAT}")
+	for name, nanoseconds in results:
+		print(f"{name:<30} {nanoseconds:8.1f} ns per email")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,78 @@
+import argparse
+import os
+import subprocess
+import sys
+
+"""
+Measures the import time of the program, the startup cost of every command
+(see python -X importtime). Each module is imported in a new interpreter so
+nothing is cached, and the modules it loaded are checked against
+DEFERRED_MODULES: these are only imported by the code needing them (COM calls,
+the metadata index, parallel runs, TOML rules, profiling).
+
+Run from the root of the repository:
+	python -m benchmarks.bench_startup [--top 10]
+The exit code is 1 if a deferred module is imported at startup.
+"""
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules imported at startup, timed separately
+STARTUP_MODULES = ("email_cleanup", "src.model.cleanup_model", "src.controller.cleanup_controller")
+
+# modules startup must not import
+DEFERRED_MODULES = ("win32com", "pythoncom", "pywintypes", "sqlite3", "tomllib", "concurrent.futures", "cProfile",
+					"pstats", "tracemalloc", "numpy")
+
+CHECK_SNIPPET = "import sys, {module}; print(','.join(sorted(set(sys.modules) & set({deferred!r}))))"
+
+
+def measure_import(module: str) -> tuple:
+	"""
+	Imports a module in a new interpreter with -X importtime.
+	:param module: (str) name of the module
+	:return: (tuple) cumulative microseconds of the module, list of (cumulative microseconds, module name)
+	of every module it imported, and the list of DEFERRED_MODULES it imported
+	"""
+	completed = subprocess.run([sys.executable, "-X", "importtime", "-c",
+								CHECK_SNIPPET.format(module=module, deferred=DEFERRED_MODULES)],
+							   cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True)
+	imports = []
+	for line in completed.stderr.splitlines():
+		if not line.startswith("import time:") or "cumulative" in line:
+			continue
+		if line.endswith("| site"):
+			# the modules before are imported by the startup of the interpreter
+			imports = []
+			continue
+		# import time: self [us] | cumulative | imported package
+		_, cumulative, name = line[len("import time:"):].split("|")
+		imports.append((int(cumulative), name.strip()))
+	total = next(cumulative for cumulative, name in imports if name == module)
+	loaded_deferred = [name for name in completed.stdout.strip().split(",") if name]
+	return total, imports, loaded_deferred
+
+
+def parse_arguments(arguments=None):
+	parser = argparse.ArgumentParser(description="Import time of the program")
+	parser.add_argument("--top", type=int, default=10, help="amount of slowest imports listed per module")
+	return parser.parse_args(arguments)
+
+
+def main():
+	arguments = parse_arguments()
+	failed = False
+	for module in STARTUP_MODULES:
+		total, imports, loaded_deferred = measure_import(module)
+		print(f"{module}: {total / 1000:.1f} ms")
+		for cumulative, name in sorted(imports, reverse=True)[1:arguments.top + 1]:
+			print(f"    {cumulative / 1000:8.1f} ms  {name}")
+		if len(loaded_deferred) > 0:
+			print(f"    imports deferred modules: {', '.join(loaded_deferred)}")
+			failed = True
+	if failed:
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
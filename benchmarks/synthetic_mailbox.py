@@ -0,0 +1,100 @@
+import random
+from datetime import datetime, timedelta
+from src.model.date_handler import LOCAL_TIMEZONE
+from src.model.memory_backend import memory_backend
+
+"""
+Generates reproducible synthetic mailboxes in a memory_backend, for the
+benchmarks. The same seed always gives the same emails.
+
+Senders follow a Zipf-like distribution (a few senders send most of the
+emails, like newsletters and shops), each sender sends one kind of subject,
+emails are received over about three years with more of them recently, and a
+small share of emails miss their SentOn date (undeliverable reports, drafts)
+or their sender address (some no-reply emails), like in a real Inbox.
+"""
+
+MAILBOX = "bench@example.com"
+
+# first day emails are received on, the last one is about three years later
+FIRST_RECEIVED = datetime(2021, 1, 1, tzinfo=LOCAL_TIMEZONE)
+RECEIVED_SPAN_DAYS = 3 * 365
+
+AMT_SENDERS = 2000
+# exponent of the Zipf-like distribution of the senders, higher sends more emails from the top senders
+SENDER_SKEW = 1.1
+
+# share of emails without a SentOn date, and without a sender address
+MISSING_SENT_ON_RATE = 0.01
+MISSING_SENDER_EMAIL_RATE = 0.02
+
+DOMAINS = ("shop.com", "news.example.com", "mail.com", "bank.example", "social.example", "travel.example",
+		   "work.example.org", "school.edu")
+
+# subjects sent by each kind of sender, {n} is replaced by a number
+SUBJECT_TEMPLATES = {'shop': ("Weekly deals {n}", "Your order {n} has shipped", "Last chance: {n}% off"),
+					 'newsletter': ("Newsletter #{n}", "This week in tech {n}", "Digest {n}"),
+					 'person': ("Hello {n}", "Re: meeting notes {n}", "Lunch on day {n}?", "Fwd: photos {n}"),
+					 'service': ("Your statement {n} is ready", "Security alert {n}", "Password reset {n}")}
+SENDER_KINDS = tuple(SUBJECT_TEMPLATES)
+
+
+def make_senders(generator: random.Random, amt_senders: int = AMT_SENDERS) -> list:
+	"""
+	Creates the senders of a mailbox, the first ones send the most emails.
+	:param generator: (random.Random) seeded generator
+	:param amt_senders: (int) amount of senders
+	:return: (list) list of (sender address, sender name, kind of sender) tuples
+	"""
+	senders = []
+	for number in range(amt_senders):
+		kind = SENDER_KINDS[generator.randrange(len(SENDER_KINDS))]
+		domain = DOMAINS[generator.randrange(len(DOMAINS))]
+		senders.append((f"{kind}{number}@{domain}", f"{kind.capitalize()} {number}", kind))
+	return senders
+
+
+def add_synthetic_emails(backend: memory_backend, amt_emails: int, seed: int = 0, mailbox: str = MAILBOX,
+						 folder_name: str = 'Inbox') -> None:
+	"""
+	Adds reproducible synthetic emails to a folder of a backend, see the top of this file.
+	:param backend: (memory_backend) backend the emails are added to
+	:param amt_emails: (int) amount of emails
+	:param seed: (int) seed of the generator, the same seed gives the same emails
+	:param mailbox: (str) name of the mailbox
+	:param folder_name: (str) path of the folder
+	:return: None
+	"""
+	generator = random.Random(seed)
+	senders = make_senders(generator)
+	cumulative_weights = []
+	total_weight = 0.0
+	for rank in range(1, len(senders) + 1):
+		total_weight += 1 / rank ** SENDER_SKEW
+		cumulative_weights.append(total_weight)
+	chosen_senders = generator.choices(senders, cum_weights=cumulative_weights, k=amt_emails)
+
+	for sender_email, sender_name, kind in chosen_senders:
+		# more emails were received recently: the square root skews the days towards the end of the span
+		received = FIRST_RECEIVED + timedelta(days=RECEIVED_SPAN_DAYS * generator.random() ** 0.5)
+		properties = {'Subject': generator.choice(SUBJECT_TEMPLATES[kind]).format(n=generator.randrange(1000)),
+					  'SenderName': sender_name, 'ReceivedTime': received, 'LastModificationTime': received,
+					  'Size': int(generator.lognormvariate(10, 1))}
+		if generator.random() >= MISSING_SENT_ON_RATE:
+			properties['SentOn'] = received - timedelta(seconds=generator.randrange(1, 600))
+		if generator.random() >= MISSING_SENDER_EMAIL_RATE:
+			properties['SenderEmailAddress'] = sender_email
+		backend.add_email(mailbox, folder_name, **properties)
+
+
+def make_synthetic_backend(amt_emails: int, seed: int = 0) -> memory_backend:
+	"""
+	Creates a memory backend with a mailbox holding amt_emails synthetic emails in its Inbox.
+	:param amt_emails: (int) amount of emails
+	:param seed: (int) seed of the generator, see add_synthetic_emails
+	:return: (memory_backend) the backend
+	"""
+	backend = memory_backend()
+	backend.add_mailbox(MAILBOX)
+	add_synthetic_emails(backend, amt_emails, seed)
+	return backend
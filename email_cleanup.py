@@ -1,17 +1,104 @@
-from src.controller.cleanup_controller import cleanup_controller
-from src.model.cleanup_model import cleanup_model
-from src.view.simple_print_view import simple_print_view
+import argparse
+import sys
 
 """
 This is the file the should be called to run the email
 cleanup program
+The program is imported by main once the arguments are parsed, so --help and
+bad arguments answer right away.
 """
 
+# file the deletions of the interactive mode are journaled to, see deletion_journal
+DEFAULT_JOURNAL_PATH = "email_cleanup_journal.jsonl"
+
+def parse_arguments(arguments=None):
+	parser = argparse.ArgumentParser(description="Deletes Outlook emails matching conditions.")
+	parser.add_argument("--rules", help="JSON or TOML rules file, runs all of its rules without prompting")
+	parser.add_argument("--check", action="store_true",
+						help="only check the rules file given by --rules, without connecting to Outlook")
+	parser.add_argument("--mailbox", action="append",
+						help="email address of a mailbox to clean when running a rules file, "
+							 "can be given several times to clean mailboxes at the same time")
+	parser.add_argument("--all-mailboxes", action="store_true",
+						help="clean every mailbox at the same time when running a rules file")
+	parser.add_argument("--workers", type=int, help="maximum amount of mailboxes, or folders, cleaned at the same time")
+	parser.add_argument("--recursive", action="store_true",
+						help="clean every folder of the mailbox when running a rules file, instead of only the Inbox")
+	parser.add_argument("--root-folder",
+						help="with --recursive, only clean this folder and its sub folders (ex. Inbox or Archive/2023)")
+	parser.add_argument("--include-folder", action="append",
+						help="with --recursive, only clean folders matching this pattern (ex. 'Inbox/*'), "
+							 "can be given several times")
+	parser.add_argument("--exclude-folder", action="append",
+						help="with --recursive, do not clean folders matching this pattern, can be given several times")
+	parser.add_argument("--analyze", action="store_true",
+						help="only count the emails of the Inbox per sender and display who sends the most")
+	parser.add_argument("--top", type=int, default=20, help="amount of senders displayed by --analyze")
+	parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH,
+						help="file every deletion batch is journaled to, so an interrupted deletion can be resumed")
+	parser.add_argument("--no-journal", action="store_true", help="do not journal deletions")
+	parser.add_argument("--resume", action="store_true",
+						help="resume the last interrupted deletion of the journal instead of searching the whole folder again")
+	parser.add_argument("--stats", action="store_true",
+						help="display the calls made to Outlook and the time spent per stage after each deletion")
+	parser.add_argument("--stats-file", help="also write the statistics of --stats to this JSON file")
+	parser.add_argument("--profile", action="store_true", help="add a cProfile report to the statistics (slower)")
+	parser.add_argument("--trace-memory", action="store_true",
+						help="add a tracemalloc report to the statistics (slower)")
+	parser.add_argument("--resolve-exchange", action="store_true",
+						help="match Exchange senders by their SMTP address, each sender is looked up once per run")
+	parser.add_argument("--sender-cache",
+						help="with --resolve-exchange, JSON file resolved sender addresses are loaded from and saved to")
+	parser.add_argument("--sender-cache-size", type=int,
+						help="with --resolve-exchange, maximum amount of sender addresses kept in the cache")
+	parser.add_argument("--undo", metavar="RUN_ID",
+						help="move the emails deleted by a run of the journal back to their folder, \"last\" for the last run")
+	return parser.parse_args(arguments)
+
+
+def get_folder_tree(arguments) -> dict:
+	"""
+	Returns the folder tree to clean given on the command line.
+	:param arguments: the parsed arguments, see parse_arguments
+	:return: (dict) dict with the keys root, include and exclude, None if --recursive was not given
+	"""
+	if not arguments.recursive:
+		return None
+	return {'root': arguments.root_folder, 'include': arguments.include_folder, 'exclude': arguments.exclude_folder}
+
+
 def main():
+	arguments = parse_arguments()
+	from src.controller.cleanup_controller import cleanup_controller
+	from src.model.cleanup_model import cleanup_model
+	from src.view.simple_print_view import simple_print_view
+
 	m = cleanup_model()
 	v = simple_print_view()
 	controller = cleanup_controller(m, v)
-	controller.run()
+	if arguments.stats or arguments.stats_file or arguments.profile or arguments.trace_memory:
+		controller.enable_statistics(arguments.stats_file, arguments.profile, arguments.trace_memory)
+	if arguments.resolve_exchange and not controller.enable_sender_resolution(arguments.sender_cache,
+																			   arguments.sender_cache_size):
+		sys.exit(1)
+	if arguments.check:
+		if arguments.rules is None:
+			v.display_error("--check needs a rules file, see --rules")
+			sys.exit(1)
+		sys.exit(0 if controller.run_rules_check(arguments.rules) else 1)
+	if arguments.resume:
+		sys.exit(0 if controller.run_resume(arguments.journal) else 1)
+	if arguments.undo is not None:
+		run_id = None if arguments.undo == "last" else arguments.undo
+		sys.exit(0 if controller.run_undo(arguments.journal, run_id) else 1)
+	if arguments.analyze:
+		mailbox = None if arguments.mailbox is None else arguments.mailbox[0]
+		sys.exit(0 if controller.run_analysis(mailbox, arguments.top) else 1)
+	if arguments.rules is not None:
+		succeeded = controller.run_batch(arguments.rules, arguments.mailbox, arguments.all_mailboxes, arguments.workers,
+										 get_folder_tree(arguments), None if arguments.no_journal else arguments.journal)
+		sys.exit(0 if succeeded else 1)
+	controller.run(None if arguments.no_journal else arguments.journal)
 
 
 if __name__ == "__main__":
@@ -2,6 +2,10 @@ from src.model.cleanup_model import cleanup_model
 from src.view.cleanup_view_interface import cleanup_view_interface
 from src.model.cleanup_custom_exceptions import NoEmailsError, OutlookNotOpenError, DateConversionError, \
 	MissingStartDate, EmptyConditionsError
+from src.model.rule_batch import load_rules_file
+
+# amount of matching emails displayed per page of a preview
+PREVIEW_PAGE_SIZE = 20
 
 class cleanup_controller:
 	"""
@@ -11,6 +15,9 @@ class cleanup_controller:
 	def __init__(self, model: cleanup_model, view: cleanup_view_interface):
 		self.c_model = model
 		self.c_view = view
+		# the view shows the progress of every deletion on its own
+		self.c_model.progress_callback = self.c_view.display_progress
+		self.statistics_path = None  # file the statistics are written to, see enable_statistics
 
 	def coordinate_set_email(self):
 		"""
@@ -48,6 +55,15 @@ class cleanup_controller:
 		sender_name = self.c_view.get_target_sender_name()
 		self.c_model.set_target_sender_name(sender_name)
 
+		correct_domain_processing = False
+		while correct_domain_processing == False:
+			try:
+				sender_domain = self.c_view.get_target_sender_domain()
+				self.c_model.set_target_sender_domain(sender_domain)
+				correct_domain_processing = True
+			except ValueError:
+				self.c_view.display_error("Sender domain is incorrect, please enter a domain like x.com or *.x.com")
+
 		full_date_processing_correct = False
 		while full_date_processing_correct == False:
 			correct_start_date_processing = False
@@ -78,6 +94,24 @@ class cleanup_controller:
 		keyword = self.c_view.get_target_subject_keyword()
 		self.c_model.set_target_subject_keyphrase(keyword)
 
+		correct_expression_processing = False
+		while correct_expression_processing == False:
+			try:
+				expression = self.c_view.get_target_rule_expression()
+				self.c_model.set_target_rule_expression(expression)
+				correct_expression_processing = True
+			except ValueError as error:
+				self.c_view.display_error(f"Rule expression is incorrect: {error}")
+
+		correct_missing_property_processing = False
+		while correct_missing_property_processing == False:
+			try:
+				missing_property = self.c_view.get_target_missing_property()
+				self.c_model.set_target_missing_property(missing_property.split(","))
+				correct_missing_property_processing = True
+			except ValueError as error:
+				self.c_view.display_error(f"Missing property is incorrect: {error}")
+
 	def coordinate_verify_deletion_params(self):
 		"""
 		Coordinates obtaining verification of deletion parameters from the user input
@@ -98,6 +132,9 @@ class cleanup_controller:
 				self.c_view.display_error("Missing a start or end date")
 				continue
 
+			if self.c_view.ask_dry_run():
+				self.coordinate_dry_run()
+
 			self.c_view.display_message("\n############### Please Confirm Deletion Parameters... ###############",exit_after_msg=False)
 			confirmation = self.c_view.confirm_deletion_parameters(self.c_model.deletion_confirmation_str, self.c_model.selected_email)
 
@@ -106,17 +143,118 @@ class cleanup_controller:
 			else:
 				self.c_view.display_message("\n############### Resetting Deletion Parameters... ###############", exit_after_msg=False)
 
+	def coordinate_dry_run(self):
+		"""
+		Coordinates counting the emails matching the verified deletion conditions, then
+		previewing them page by page. Nothing is deleted.
+		:return:
+		"""
+		self.c_view.display_message("\n############### Counting MATCHING emails... PLEASE WAIT ###############",
+									exit_after_msg=False)
+		counts = self.c_model.count_emails_matching_search_conditions()
+		self.c_view.display_message(f"{counts['matched']} emails match the deletion conditions", exit_after_msg=False)
+		if counts['unprocessed']:
+			missing = ", ".join(f"{amount} missing {property_name}" for property_name, amount in counts['missing'].items())
+			self.c_view.display_message(f"{counts['unprocessed']} could NOT be processed ({missing})",
+										exit_after_msg=False)
+		if counts['matched'] == 0:
+			return
+
+		pages = self.c_model.iter_match_preview_pages(PREVIEW_PAGE_SIZE)
+		try:
+			for page_number, page in enumerate(pages, start=1):
+				if not self.c_view.display_match_preview(page, page_number):
+					break
+		finally:
+			pages.close()
+
 	def coordinate_deletion(self):
 		"""
 		Coordinates deletion of emails.
 		:return:
 		"""
 		self.c_model.delete_emails_with_matching_conditions()
-		self.c_view.display_deletion_summary(self.c_model.delete_counter, self.c_model.emails_with_missing_attributes_count)
+		self.c_view.display_deletion_summary(self.c_model.delete_counter, self.c_model.emails_with_missing_attributes_count,
+											self.c_model.missing_property_counts)
+		self.coordinate_undo_hint()
+		self.coordinate_sender_resolution()
+		self.coordinate_statistics()
 
-	def run(self):
+	def enable_statistics(self, statistics_path: str = None, profile: bool = False, trace_memory: bool = False):
+		"""
+		Measures what the run spends its time on, the statistics are displayed after every
+		deletion. Must be called before running the program.
+		:param statistics_path: (str) if given, the statistics are also written to this JSON file
+		:param profile: (bool) if true, cProfile also runs
+		:param trace_memory: (bool) if true, tracemalloc also runs
+		:return:
+		"""
+		self.statistics_path = statistics_path
+		self.c_model.enable_instrumentation(profile, trace_memory)
+
+	def coordinate_statistics(self):
+		"""
+		Displays the statistics of the run, and writes them to the statistics_path if there is one.
+		:return:
+		"""
+		stats = self.c_model.get_run_statistics()
+		if stats is None:
+			return
+		self.c_view.display_statistics(stats)
+		if self.statistics_path is not None:
+			try:
+				self.c_model.write_run_statistics(self.statistics_path)
+			except OSError as error:
+				self.c_view.display_error(f"Could not write the statistics: {error}")
+
+	def enable_sender_resolution(self, cache_path: str = None, capacity: int = None) -> bool:
+		"""
+		Resolves the addresses of Exchange senders to SMTP addresses before they are matched,
+		see cleanup_model.enable_sender_resolution. Must be called before running the program.
+		:param cache_path: (str) if given, resolved addresses are loaded from and saved to this JSON file
+		:param capacity: (int) maximum amount of sender addresses kept in the cache, the default if None
+		:return: (bool) False if an error was displayed
+		"""
+		try:
+			if capacity is None:
+				self.c_model.enable_sender_resolution(cache_path=cache_path)
+			else:
+				self.c_model.enable_sender_resolution(capacity, cache_path)
+		except ValueError as error:
+			self.c_view.display_error(str(error))
+			return False
+		return True
+
+	def coordinate_sender_resolution(self):
+		"""
+		Displays how many Exchange sender addresses were looked up or found in the cache,
+		and saves the cache to its file if it has one.
+		:return:
+		"""
+		stats = self.c_model.get_sender_resolution_stats()
+		if stats is None:
+			return
+		self.c_view.display_sender_resolution(stats)
+		try:
+			self.c_model.save_sender_resolution_cache()
+		except OSError as error:
+			self.c_view.display_error(f"Could not save the sender address cache: {error}")
+
+	def coordinate_undo_hint(self):
+		"""
+		Displays the id of the journaled run that just finished, and how to undo it.
+		:return:
+		"""
+		if self.c_model.last_run_id is not None:
+			self.c_view.display_message(f"Run id: {self.c_model.last_run_id} "
+										f"(to move its emails back: --undo {self.c_model.last_run_id[:8]})",
+										exit_after_msg=False)
+
+	def run(self, journal_path: str = None):
 		"""
 		Runs the whole program.
+		:param journal_path: (str) if given, every deletion batch is journaled to this file so
+							an interrupted deletion can be resumed, see run_resume
 		:return:
 		"""
 		try:
@@ -129,6 +267,8 @@ class cleanup_controller:
 			self.c_view.display_message(error, exit_after_msg=True)
 
 		self.c_view.display_welcome()
+		if journal_path is not None:
+			self.c_model.open_deletion_journal(journal_path)
 
 		self.coordinate_set_email()
 		self.c_view.print_hash_divider()
@@ -145,7 +285,225 @@ class cleanup_controller:
 		self.c_view.display_message(
 			"\n############### Disconnecting from Outlook Application... ###############",
 			exit_after_msg=False)
+		self.c_model.disconnect_from_outlook()
+		self.c_model.close_deletion_journal()
 
 		self.c_view.display_message(
 			"\n############### EXITING PROGRAM ############### ",
 			exit_after_msg=True)
+
+	def run_batch(self, rules_path: str, mailboxes: list = None, all_mailboxes: bool = False,
+				  max_workers: int = None, folder_tree: dict = None, journal_path: str = None) -> bool:
+		"""
+		Runs the program without prompting the user: deletes the emails matching
+		any rule of a rules file in a single pass, then displays a summary per rule.
+		When several mailboxes are given, they are cleaned at the same time.
+		:param rules_path: (str) path of the JSON or TOML rules file, see rule_batch
+		:param mailboxes: (list) email addresses of the mailboxes to clean, overrides the mailboxes
+						of the rules file. The first mailbox is used if neither gives any.
+		:param all_mailboxes: (bool) if true, every mailbox is cleaned
+		:param max_workers: (int) maximum amount of mailboxes, or folders, cleaned at the same time
+		:param folder_tree: (dict) if given, a whole folder tree of a single mailbox is cleaned instead
+						of its Inbox, dict with the keys root, include and exclude (see
+						cleanup_model.delete_emails_in_folder_tree)
+		:param journal_path: (str) if given, the deleted emails are journaled to this file so the
+						run can be undone, see run_undo
+		:return: (bool) True if the rules were run, False if an error was displayed
+		"""
+		try:
+			rules_file = load_rules_file(rules_path)
+		except (OSError, ValueError) as error:
+			self.c_view.display_error(f"Could not read rules file: {error}")
+			return False
+
+		try:
+			self.c_model.call_startup_methods()
+		except (NoEmailsError, OutlookNotOpenError) as error:
+			self.c_view.display_error(error.message)
+			return False
+
+		if all_mailboxes:
+			mailboxes = list(self.c_model.mailbox_options.values())
+		else:
+			mailboxes = mailboxes or rules_file['mailboxes']
+		if folder_tree is not None and len(mailboxes) > 1:
+			self.c_view.display_error("A folder tree can only be cleaned in one mailbox at a time")
+			return False
+		try:
+			if len(mailboxes) <= 1:
+				if len(mailboxes) == 0:
+					self.c_model.select_target_mailbox(min(self.c_model.mailbox_options))
+				else:
+					self.c_model.select_target_mailbox_by_address(mailboxes[0])
+			rules = self.c_model.compile_rules(rules_file['rules'])
+		except ValueError as error:
+			self.c_view.display_error(str(error))
+			return False
+
+		if journal_path is not None:
+			try:
+				self.c_model.open_deletion_journal(journal_path)
+			except OSError as error:
+				self.c_view.display_error(f"Could not open the journal: {error}")
+				return False
+		try:
+			rule_summaries = self.coordinate_batch_deletion(rules, mailboxes, max_workers, folder_tree)
+		finally:
+			self.c_model.close_deletion_journal()
+		if rule_summaries is None:
+			return False
+		self.c_view.display_rule_summary(rule_summaries)
+		self.c_view.display_deletion_summary(self.c_model.delete_counter, self.c_model.emails_with_missing_attributes_count,
+											self.c_model.missing_property_counts)
+		self.coordinate_undo_hint()
+		self.coordinate_sender_resolution()
+		self.coordinate_statistics()
+
+		self.c_model.disconnect_from_outlook()
+		return True
+
+	def coordinate_batch_deletion(self, rules: list, mailboxes: list, max_workers: int, folder_tree: dict) -> list:
+		"""
+		Coordinates running the rules of a batch run, see run_batch.
+		:return: (list) the summary of each rule, None if an error was displayed
+		"""
+		if folder_tree is not None:
+			self.c_view.display_message(
+				f"\n############### Running {len(rules)} rules on the folders of {self.c_model.selected_email}... PLEASE WAIT ###############",
+				exit_after_msg=False)
+			try:
+				summary = self.c_model.delete_emails_in_folder_tree(folder_tree.get('root'), folder_tree.get('include'),
+																	folder_tree.get('exclude'), rules, max_workers)
+			except ValueError as error:
+				self.c_view.display_error(str(error))
+				return None
+			self.c_view.display_folder_summary(summary['folders'])
+			rule_summaries = summary['rules']
+		elif len(mailboxes) <= 1:
+			self.c_view.display_message(
+				f"\n############### Running {len(rules)} rules on {self.c_model.selected_email}... PLEASE WAIT ###############",
+				exit_after_msg=False)
+			rule_summaries = self.c_model.delete_emails_matching_rules(rules)
+		else:
+			self.c_view.display_message(
+				f"\n############### Running {len(rules)} rules on {len(mailboxes)} mailboxes... PLEASE WAIT ###############",
+				exit_after_msg=False)
+			try:
+				summary = self.c_model.delete_emails_in_mailboxes(mailboxes, rules, max_workers)
+			except ValueError as error:
+				self.c_view.display_error(str(error))
+				return None
+			self.c_view.display_mailbox_summary(summary['mailboxes'])
+			rule_summaries = summary['rules']
+		return rule_summaries
+
+	def run_rules_check(self, rules_path: str) -> bool:
+		"""
+		Checks a rules file without connecting to Outlook: every rule is compiled like
+		run_batch would, then the conditions of each rule are displayed. Nothing is deleted.
+		:param rules_path: (str) path of the JSON or TOML rules file, see rule_batch
+		:return: (bool) True if every rule is valid, False if an error was displayed
+		"""
+		try:
+			rules_file = load_rules_file(rules_path)
+			rules = self.c_model.compile_rules(rules_file['rules'])
+		except OSError as error:
+			self.c_view.display_error(f"Could not read rules file: {error}")
+			return False
+		except ValueError as error:
+			self.c_view.display_error(str(error))
+			return False
+
+		for rule in rules:
+			self.c_view.display_message(f"{rule.name} : {rule.confirmation_str}", exit_after_msg=False)
+		self.c_view.display_message(f"{len(rules)} rules are valid", exit_after_msg=False)
+		return True
+
+	def run_analysis(self, mailbox: str = None, top_n: int = 20) -> bool:
+		"""
+		Runs the program without prompting the user: counts the emails of the Inbox per
+		sender, then displays the senders sending the most emails. Nothing is deleted.
+		:param mailbox: (str) email address of the mailbox to analyze, the first mailbox if None
+		:param top_n: (int) amount of senders displayed per sender address, name and domain
+		:return: (bool) True if the report was displayed, False if an error was displayed
+		"""
+		try:
+			self.c_model.call_startup_methods()
+			if mailbox is None:
+				self.c_model.select_target_mailbox(min(self.c_model.mailbox_options))
+			else:
+				self.c_model.select_target_mailbox_by_address(mailbox)
+		except (NoEmailsError, OutlookNotOpenError) as error:
+			self.c_view.display_error(error.message)
+			return False
+		except ValueError as error:
+			self.c_view.display_error(str(error))
+			return False
+
+		self.c_view.display_message(
+			f"\n############### Counting the emails of {self.c_model.selected_email} per sender... PLEASE WAIT ###############",
+			exit_after_msg=False)
+		self.c_view.display_sender_report(self.c_model.analyze_senders(top_n))
+		self.coordinate_sender_resolution()
+		self.coordinate_statistics()
+
+		self.c_model.disconnect_from_outlook()
+		return True
+
+	def run_resume(self, journal_path: str) -> bool:
+		"""
+		Resumes the last interrupted deletion of a journal: the emails it already went
+		through are not searched again. The deletion conditions of the interrupted
+		deletion are confirmed by the user first.
+		:param journal_path: (str) path of the journal file
+		:return: (bool) True if the deletion was resumed, False if an error was displayed or
+				the user did not confirm
+		"""
+		try:
+			self.c_model.call_startup_methods()
+			self.c_model.resume_from_journal(journal_path)
+		except (NoEmailsError, OutlookNotOpenError) as error:
+			self.c_view.display_error(error.message)
+			return False
+		except (OSError, ValueError, KeyError) as error:
+			self.c_view.display_error(f"Could not resume from the journal: {error}")
+			return False
+
+		self.c_view.display_message("\n############### Please Confirm Deletion Parameters... ###############",
+									exit_after_msg=False)
+		if not self.c_view.confirm_deletion_parameters(self.c_model.deletion_confirmation_str,
+													   self.c_model.selected_email):
+			self.c_model.close_deletion_journal()
+			return False
+
+		self.c_view.display_message(
+			"\n############### Resuming the deletion... PLEASE WAIT ###############", exit_after_msg=False)
+		self.coordinate_deletion()
+		self.c_model.disconnect_from_outlook()
+		self.c_model.close_deletion_journal()
+		return True
+
+	def run_undo(self, journal_path: str, run_id: str = None) -> bool:
+		"""
+		Undoes a journaled run: the emails it deleted are moved back from the trash folder
+		to the folder they were deleted from.
+		:param journal_path: (str) path of the journal file
+		:param run_id: (str) id of the run, or its first characters, the last run of the journal if None
+		:return: (bool) True if the run was undone, False if an error was displayed
+		"""
+		try:
+			self.c_model.call_startup_methods()
+			self.c_view.display_message(
+				"\n############### Moving the emails of the run back... PLEASE WAIT ###############",
+				exit_after_msg=False)
+			summary = self.c_model.undo_run(journal_path, run_id)
+		except (NoEmailsError, OutlookNotOpenError) as error:
+			self.c_view.display_error(error.message)
+			return False
+		except (OSError, ValueError, KeyError, RuntimeError) as error:
+			self.c_view.display_error(f"Could not undo the run: {error}")
+			return False
+
+		self.c_view.display_restore_summary(summary)
+		self.c_model.disconnect_from_outlook()
+		return True
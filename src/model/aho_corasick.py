@@ -0,0 +1,95 @@
+from collections import deque
+
+"""
+This file contains an Aho-Corasick automaton used to look for many subject
+keywords/keyphrases at once. Building it costs time proportional to the total
+length of the phrases, after that one scan over a subject finds every phrase
+it contains in time proportional to the length of the subject.
+"""
+
+
+class aho_corasick_automaton():
+	"""
+	Case insensitive multi phrase matcher.
+	"""
+
+	def __init__(self, phrases):
+		"""
+		:param phrases: iterable of str phrases to look for, empty phrases are ignored
+		"""
+		# state 0 is the root, each state has its transitions, its failure link
+		# and the phrases ending at it (including those of its failure chain)
+		self.transitions = [{}]
+		self.failure = [0]
+		self.outputs = [()]
+		self.phrases = []
+
+		for phrase in phrases:
+			phrase = phrase.lower()
+			if phrase == "" or phrase in self.phrases:
+				continue
+			self.phrases.append(phrase)
+			self.add_phrase(phrase)
+		self.build_failure_links()
+
+	def add_phrase(self, phrase: str) -> None:
+		state = 0
+		for character in phrase:
+			next_state = self.transitions[state].get(character)
+			if next_state is None:
+				next_state = len(self.transitions)
+				self.transitions.append({})
+				self.failure.append(0)
+				self.outputs.append(())
+				self.transitions[state][character] = next_state
+			state = next_state
+		self.outputs[state] = self.outputs[state] + (phrase,)
+
+	def build_failure_links(self) -> None:
+		# breadth first so the failure state of a state is always done before it
+		queue = deque(self.transitions[0].values())
+		while queue:
+			state = queue.popleft()
+			for character, next_state in self.transitions[state].items():
+				queue.append(next_state)
+				fallback = self.failure[state]
+				while fallback != 0 and character not in self.transitions[fallback]:
+					fallback = self.failure[fallback]
+				target = self.transitions[fallback].get(character, 0)
+				self.failure[next_state] = target if target != next_state else 0
+				self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.failure[next_state]]
+
+	def iter_matches(self, text: str):
+		"""
+		Yields every phrase found in the text, in the order their ends appear.
+		:param text: (str) the text to scan
+		:return: generator of str phrases (lower case)
+		"""
+		transitions = self.transitions
+		failure = self.failure
+		outputs = self.outputs
+		state = 0
+		for character in text.lower():
+			while state != 0 and character not in transitions[state]:
+				state = failure[state]
+			state = transitions[state].get(character, 0)
+			if outputs[state]:
+				yield from outputs[state]
+
+	def find_first(self, text: str):
+		"""
+		Returns the first phrase found in the text.
+		:param text: (str) the text to scan
+		:return: (str) the phrase (lower case) or None if the text contains no phrase
+		"""
+		for phrase in self.iter_matches(text):
+			return phrase
+		return None
+
+	def find_all(self, text: str) -> set:
+		"""
+		Returns all phrases found in the text.
+		:param text: (str) the text to scan
+		:return: (set) set of phrases (lower case)
+		"""
+		return set(self.iter_matches(text))
@@ -1,6 +1,26 @@
-import win32com.client as client
+from datetime import datetime, timezone
 from src.model.cleanup_custom_exceptions import *
 from src.model.date_handler import date_handler
+from src.model.mailbox_backend_interface import mailbox_backend_interface
+from src.model.restrict_filter import compile_restrict_filter, include_missing_properties, as_list, \
+  MAX_FILTER_ALTERNATIVES
+from src.model.metadata_table import SNAPSHOT_COLUMNS
+from src.model.metadata_index import metadata_index
+from src.model.rule_expression import parse_rule_expression
+from src.model.rule_batch import deletion_rule, rule_pass, combine_restrict_filters, RULE_CONDITION_KEYS
+from src.model.parallel_cleanup import clean_mailboxes_in_parallel, clean_folders_in_parallel, merge_mailbox_results
+from src.model.folder_traversal import select_folders
+from src.model.sender_analytics import sender_statistics, DEFAULT_CAPACITY
+from src.model.deletion_journal import deletion_journal, find_unfinished_run, find_run_to_undo
+from src.model.progress_tracker import progress_tracker
+from src.model.instrumentation import run_statistics, instrumented_backend
+from src.model.aho_corasick import aho_corasick_automaton
+from src.model.domain_suffix_trie import domain_suffix_trie
+from src.model.predicate_plan import compiled_predicate, predicate_plan
+from src.model.property_probe import probe_property, is_missing, normalize_missing_property
+from src.model.sender_resolver import sender_address_resolver, read_sender_address, DEFAULT_CACHE_CAPACITY
+from src.model.deletion_pipeline import iter_items_reversed, iter_in_batches, delete_emails_by_entry_id, \
+  find_sorted_range, read_sort_key
 
 """
 This class is meant to have code that connects to outlook, pick
@@ -10,23 +30,53 @@ singleton pattern. This model will contain all functionality of actual e-mail
 deletion.
 """
 
+# deletion conditions whose restrict filter clause matches exactly the emails the condition matches
+EXACT_FILTER_CONDITIONS = {0, 3}
+
+# methods of the date_handler measured in the dates stage when instrumentation is enabled
+INSTRUMENTED_DATE_METHODS = ('convert_sent_on_datetime', 'convert_sent_on_timestamp', 'convert_dates_to_timestamps',
+                             'check_timestamps_between')
+
+# lower bound of the scan when a journaled run is resumed, see iter_candidate_emails
+OLDEST_DATE = datetime.min.replace(tzinfo=timezone.utc)
+
+# email property read by each deletion condition, keys are the indexes of all_matching_functions
+CONDITION_PROPERTIES = {0: 'SenderEmailAddress',
+                        1: 'SentOn',
+                        2: 'Subject',
+                        3: 'SenderName',
+                        4: 'SenderEmailAddress'}
+
 
 class cleanup_model():
 
-  def __init__(self):
+  def __init__(self, backend: mailbox_backend_interface = None):
     """
-		Constructor for the model. Does not require any parameters.
-		It sets up empty attributes for the class.
+		Constructor for the model. It sets up empty attributes for the class.
+		:param backend: (mailbox_backend_interface) where the emails are read from and
+		deleted. Defaults to the Outlook Application (outlook_backend).
 		"""
 
     self.date_utility = date_handler()
 
+    if backend is None:
+      # imported here so other backends can be used on systems without pywin32
+      from src.model.outlook_backend import outlook_backend
+      backend = outlook_backend()
+    self.backend = backend
+
     ################ variables relating to deleting conditions ################
-    self.target_sender_email = None  # string
+    self.target_sender_email = None  # string, or list of strings when targeting multiple senders
     self.target_start_date = None  # datetime obj
     self.target_end_date = None  # datetime obj
-    self.target_subject_keyphrase = None  # string
-    self.target_sender_name = None  # string
+    self.target_subject_keyphrase = None  # string, or list of strings when targeting multiple phrases
+    self.target_sender_name = None  # string, or list of strings when targeting multiple senders
+    self.target_sender_domain = None  # string, or list of strings, domain/wildcard rules (see domain_suffix_trie)
+    self.matched_sender_domain_rules = {}  # key: domain rule, value: amount of matching emails
+    self.last_matched_domain_rule = None  # rule found by the last sender domain check
+    self.target_rule_expression = None  # tree of conditions combined with AND/OR/NOT (see rule_expression)
+    self.target_rule_expression_text = None  # the expression as it was entered
+    self.target_missing_property = None  # string, or list of strings, property names (see property_probe)
 
     """
 		NOTE*: target_sender_name and target_sender_email are not the same. For example,
@@ -40,9 +90,17 @@ class cleanup_model():
     self.all_matching_functions = [self.is_match_for_sender_email_address,
                                    self.is_within_date_range,
                                    self.is_match_for_subject,
-                                   self.is_match_for_sender_name]
+                                   self.is_match_for_sender_name,
+                                   self.is_match_for_sender_domain,
+                                   self.is_match_for_rule_expression,
+                                   self.is_missing_property]
     self.delete_counter = 0
     self.emails_with_missing_attributes_count = 0
+    # key: property name, value: amount of emails counted in emails_with_missing_attributes_count for missing it
+    self.missing_property_counts = {}
+    self.matched_subject_phrases = {}  # key: EntryID of a matching email, value: subject phrase it matched
+    self.subject_phrase_hit_counts = {}  # key: subject phrase, value: amount of matching emails
+    self.last_matched_subject_phrase = None  # phrase found by the last subject check
 
     ###################### Verification Related Varibales ######################
     # dictionary used to hold information for confirmation string question
@@ -50,6 +108,9 @@ class cleanup_model():
     # key: 1, value : target_start_date to target_end_date
     # key: 2, value : target_subject_key_phrase
     # key: 3, value : target_sender_name
+    # key: 4, value : target_sender_domain
+    # key: 5, value : description of target_rule_expression
+    # key: 6, value : target_missing_property
     self.verification_add_on = {}
 
     self.accepted_deletions_conditions = []  # contains indexes corresponding to conditions to check
@@ -58,20 +119,60 @@ class cleanup_model():
     self.verification_phrase_prefixes = {0: "sender email:",
                                          1: "was sent between the dates (inclusive):",
                                          2: "has the keyword/keyphrase in the subject:",
-                                         3: "sender name:"}
+                                         3: "sender name:",
+                                         4: "sender domain:",
+                                         5: "matches the rule:",
+                                         6: "is missing the property:"}
     self.deletion_confirmation_str = ""
     self.verified_conditions = False  # Must be set to true before being able to look for matching emails
+    self.predicate_plan = None  # accepted conditions compiled by verify_deletion_conditions
+
+    ###################### Search Related Variables ######################
+    # if true, conditions are compiled into a filter so the backend only returns candidate emails
+    self.use_restrict_filter = True
+    # if true, the filter also passes the emails missing a property the conditions need, so they are
+    # counted in missing_property_counts instead of being left out by the backend (see build_restrict_filter)
+    self.count_missing_with_restrict_filter = True
+    # if true, properties of all emails are fetched in bulk and matched locally (see metadata_table)
+    self.use_snapshot = False
+    # if true and a date range is set, only the emails sent within the range are read (see find_sorted_range)
+    self.use_date_bounded_scan = True
+    # amount of matching emails collected (as EntryIDs) before they are deleted
+    self.deletion_batch_size = 100
+    # if set, conditions are run as queries against this local index of the folder (see open_metadata_index)
+    self.metadata_index = None
+    # if set, every deletion batch is journaled so an interrupted deletion can be resumed (see open_deletion_journal)
+    self.deletion_journal = None
+    # run of the deletion_journal continued by the next deletion (see resume_from_journal)
+    self.unfinished_run = None
+    # if set, only the emails at or before this position of the scan are searched (see iter_candidate_emails)
+    self.resume_position = None
+    # id of the last run written to the deletion_journal, the run an undo_run would undo
+    self.last_run_id = None
+    # if set, Exchange sender addresses are resolved to SMTP addresses before being matched (see enable_sender_resolution)
+    self.sender_resolver = None
+    # if set, called with the progress of each deletion (see progress_tracker.get_progress)
+    self.progress_callback = None
+    # progress_tracker of the deletion running, None if no deletion is running or there is no progress_callback
+    self.progress = None
+    # if set, backend calls, property reads and stages are measured (see enable_instrumentation)
+    if getattr(self, 'statistics', None) is not None:
+      # the date_handler is shared, it must not keep measuring for a model constructed again
+      self.statistics.stop_profiling()
+      self.statistics.unwrap_methods()
+    self.statistics = None
 
     ###################### Outlook Application Related Variables ######################
-    self.com_obj = None  # stores COM
-    self.outlook_connection = None  # stores namespace
+    self.com_obj = None  # stores COM, stays None for backends that are not COM based
+    self.outlook_connection = None  # stores namespace (connection object of the backend)
     self.all_mailboxes = None  # helper variable to mailbox_options attribute
     self.mailbox_options = {}  # all available emails signed in on in outlook application
     self.selected_email = None  # email whose inbox items will be deleted
     self.selected_directory = None  # access to the inbox folder
+    self.selected_folder_path = None  # path of the selected_directory in the mailbox, see folder_traversal
     self.chosen_mailbox_option = None
 
-  def __new__(cls):
+  def __new__(cls, backend: mailbox_backend_interface = None):
     """
 		This is used to enforce the singleton pattern. If a cleanup_model instance
 		has already been created, then it will return the instance and not
@@ -81,26 +182,55 @@ class cleanup_model():
       cls.instance = super(cleanup_model, cls).__new__(cls)
     return cls.instance
 
-  def set_target_sender_email(self, email: str) -> None:
+  def set_target_sender_email(self, email) -> None:
     '''
-		Set target_sender_email attribute if input is not empty. This should
-		only be 1 specific sender.
-		:param email: (str) sender email target
+		Set target_sender_email attribute if input is not empty. This can be
+		1 specific sender, or a collection of senders in which case emails from
+		any of them are targeted.
+		:param email: (str) sender email target, or a collection of str sender email targets
 		:return: None
 		'''
+    if not isinstance(email, str):
+      addresses = self.normalize_targets(email)
+      if len(addresses) == 0:
+        return
+      elif len(addresses) > 1:
+        self.target_sender_email = addresses
+        self.verification_add_on[0] = self.join_targets_for_confirmation(addresses)
+        return
+      email = addresses[0]
+
     if email.isspace() or email == "":
       return
     else:
       self.target_sender_email = email
       self.verification_add_on[0] = email
 
-  def set_target_sender_name(self, name: str) -> None:
+  def set_target_sender_emails_from_file(self, file_path: str) -> None:
     '''
-    Set target_sender_name attribute if input is not empty. This should
-		only be 1 specific sender.
-    :param name: (str) sender email name
+		Sets the target sender email addresses from a text file containing one address per line.
+		:param file_path: (str) path of the file
+		:return: None
+		'''
+    self.set_target_sender_email(self.read_targets_from_file(file_path))
+
+  def set_target_sender_name(self, name) -> None:
+    '''
+    Set target_sender_name attribute if input is not empty. This can be
+		1 specific sender, or a collection of sender names in which case emails
+		from any of them are targeted.
+    :param name: (str) sender email name, or a collection of str sender names
     :return:  None
     '''
+    if not isinstance(name, str):
+      names = self.normalize_targets(name)
+      if len(names) == 0:
+        return
+      elif len(names) > 1:
+        self.target_sender_name = names
+        self.verification_add_on[3] = self.join_targets_for_confirmation(names)
+        return
+      name = names[0]
 
     if name.isspace() or name == "":
       return
@@ -108,18 +238,135 @@ class cleanup_model():
       self.target_sender_name = name
       self.verification_add_on[3] = name
 
-  def set_target_subject_keyphrase(self, subject_key: str) -> None:
+  def set_target_sender_names_from_file(self, file_path: str) -> None:
+    '''
+		Sets the target sender names from a text file containing one name per line.
+		:param file_path: (str) path of the file
+		:return: None
+		'''
+    self.set_target_sender_name(self.read_targets_from_file(file_path))
+
+  def set_target_sender_domain(self, domain) -> None:
+    '''
+		Sets the target sender domain rule(s) if input is not empty. A rule is a domain
+		(x.com), a domain with sub domains (*.x.com or *@*.x.com) or a sender of such
+		domains (name@x.com). Invalid rules raise a ValueError.
+		:param domain: (str) domain rule, or a collection of str domain rules
+		:return: None
+		'''
+    rules = self.normalize_targets([domain] if isinstance(domain, str) else domain)
+    if len(rules) == 0:
+      return
+    # raises ValueError if one of the rules is not valid
+    domain_suffix_trie(rules)
+
+    self.target_sender_domain = rules[0] if len(rules) == 1 else rules
+    self.verification_add_on[4] = self.join_targets_for_confirmation(rules)
+
+  def set_target_rule_expression(self, expression: str) -> None:
+    '''
+		Sets the target rule expression if input is not empty. The expression combines
+		conditions with AND, OR, NOT and parentheses, for ex.
+		(sender:a@x.com OR sender:b@x.com) AND NOT subject:invoice
+		Invalid expressions raise a ValueError.
+		:param expression: (str) the expression, see rule_expression
+		:return: None
+		'''
+    if expression.isspace() or expression == "":
+      return
+    self.target_rule_expression = parse_rule_expression(expression, self.sender_resolver)
+    self.target_rule_expression_text = expression
+    # in parentheses so it is not mixed up with the AND joining it to the other conditions
+    self.verification_add_on[5] = f"({self.target_rule_expression.describe()})"
+
+  def set_target_missing_property(self, property_name) -> None:
+    '''
+		Sets the target missing property(ies) if input is not empty: emails that do not have
+		the property (or any of the properties) are targeted, for ex. SentOn for the reports of
+		emails that failed to send. Unknown properties raise a ValueError.
+		:param property_name: (str) property name (see property_probe.MISSING_PROPERTY_TARGETS),
+		or a collection of str property names
+		:return: None
+		'''
+    names = self.normalize_targets([property_name] if isinstance(property_name, str) else property_name)
+    if len(names) == 0:
+      return
+    names = list(dict.fromkeys(normalize_missing_property(each) for each in names))
+
+    self.target_missing_property = names[0] if len(names) == 1 else names
+    self.verification_add_on[6] = self.join_targets_for_confirmation(names)
+
+  def set_target_sender_domains_from_file(self, file_path: str) -> None:
+    '''
+		Sets the target sender domain rules from a text file containing one rule per line.
+		:param file_path: (str) path of the file
+		:return: None
+		'''
+    self.set_target_sender_domain(self.read_targets_from_file(file_path))
+
+  def set_target_subject_keyphrase(self, subject_key) -> None:
     '''
 		Sets the target subject key if input is not empty
-		:param subject_key: {str} representation of a word or phrase to target
+		:param subject_key: {str} representation of a word or phrase to target, or
+		a list of words/phrases, emails with a subject containing any of them are targeted
 		:return:None
 		'''
+    if not isinstance(subject_key, str):
+      phrases = self.normalize_targets(subject_key)
+      if len(phrases) == 0:
+        return
+      elif len(phrases) > 1:
+        self.target_subject_keyphrase = phrases
+        self.verification_add_on[2] = self.join_targets_for_confirmation(phrases)
+        return
+      subject_key = phrases[0]
+
     if subject_key.isspace() or subject_key == "":
       return
     else:
       self.target_subject_keyphrase = subject_key
       self.verification_add_on[2] = subject_key
 
+  def set_target_subject_keyphrases_from_file(self, file_path: str) -> None:
+    '''
+		Sets the target subject keywords/phrases from a text file containing one
+		word or phrase per line.
+		:param file_path: (str) path of the file
+		:return: None
+		'''
+    self.set_target_subject_keyphrase(self.read_targets_from_file(file_path))
+
+  def read_targets_from_file(self, file_path: str) -> list:
+    '''
+		Reads condition targets from a text file containing one target per line.
+		:param file_path: (str) path of the file
+		:return: (list) list of str, one per line
+		'''
+    with open(file_path, "r", encoding="utf-8") as file:
+      return file.read().splitlines()
+
+  def normalize_targets(self, targets) -> list:
+    '''
+		Strips the targets of a condition and removes empty and duplicate targets,
+		keeping the order in which they were given.
+		:param targets: collection of str targets
+		:return: (list) the normalized targets
+		'''
+    return list(dict.fromkeys(each.strip() for each in targets if not each.isspace() and each != ""))
+
+  def join_targets_for_confirmation(self, targets: list, max_listed: int = 5) -> str:
+    '''
+		Joins multiple targets of a condition for the confirmation string, only listing
+		the first max_listed targets.
+		:param targets: (list) the targets
+		:param max_listed: (int) maximum amount of targets written out
+		:return: (str) the targets joined by OR
+		'''
+    joined = " OR ".join(targets[:max_listed])
+    if len(targets) > max_listed:
+      joined += f" OR ... ({len(targets) - max_listed} more)"
+    return joined
+
   def set_target_start_date(self, date: str):
     '''
 		Sets the target start date, with time at 00:00:00
@@ -178,13 +425,25 @@ class cleanup_model():
 
     self.target_sender_email = None
     self.target_sender_name = None
+    self.target_sender_domain = None
+    self.target_rule_expression = None
+    self.target_rule_expression_text = None
+    self.target_missing_property = None
+    self.unfinished_run = None
+    self.resume_position = None
+    self.matched_sender_domain_rules = {}
+    self.last_matched_domain_rule = None
     self.target_start_date = None
     self.target_end_date = None
     self.target_subject_keyphrase = None
+    self.matched_subject_phrases = {}
+    self.subject_phrase_hit_counts = {}
+    self.last_matched_subject_phrase = None
     self.verification_add_on = {}
     self.accepted_deletions_conditions = []
     self.deletion_confirmation_str = ""
     self.verified_conditions = False
+    self.predicate_plan = None
     self.delete_counter = 0
 
   def verify_deletion_conditions(self):
@@ -198,7 +457,8 @@ class cleanup_model():
     # Check that at least one of the three conditions have been set
     if self.target_sender_email is None and self.target_start_date is None \
       and self.target_end_date is None and self.target_subject_keyphrase is None\
-      and self.target_sender_name is None:
+      and self.target_sender_name is None and self.target_sender_domain is None\
+      and self.target_rule_expression is None and self.target_missing_property is None:
       raise EmptyConditionsError
 
     # Apply All matching conditions
@@ -210,6 +470,12 @@ class cleanup_model():
       self.accepted_deletions_conditions.append(2)  # represents condition index in self.all_matching_functions
     if self.target_sender_name is not None:
       self.accepted_deletions_conditions.append(3)  # represents condition index in self.all_matching_functions
+    if self.target_sender_domain is not None:
+      self.accepted_deletions_conditions.append(4)  # represents condition index in self.all_matching_functions
+    if self.target_rule_expression is not None:
+      self.accepted_deletions_conditions.append(5)  # represents condition index in self.all_matching_functions
+    if self.target_missing_property is not None:
+      self.accepted_deletions_conditions.append(6)  # represents condition index in self.all_matching_functions
 
     # Check that if start date is set, that end date is also set
     if self.target_start_date is not None and self.target_end_date is None:
@@ -217,31 +483,292 @@ class cleanup_model():
     elif self.target_start_date is None and self.target_end_date is not None:
       raise RuntimeError("Missing target start date")
 
-    # string to ask for confirmation of settings
-    for each_index in self.accepted_deletions_conditions:
-      self.deletion_confirmation_str += self.verification_phrase_prefixes[each_index] + " " + \
-                                        self.verification_add_on[each_index]
-      self.deletion_confirmation_str += " AND "
-
-    self.deletion_confirmation_str = self.deletion_confirmation_str.rstrip(" AND")
+    # string to ask for confirmation of settings, joined instead of stripped from the end
+    # since rstrip(" AND") would also strip descriptions ending with A, N or D
+    self.deletion_confirmation_str = " AND ".join(
+      self.verification_phrase_prefixes[each_index] + " " + self.verification_add_on[each_index]
+      for each_index in self.accepted_deletions_conditions)
+    self.predicate_plan = self.compile_predicate_plan()
     self.verified_conditions = True
 
+  def compile_condition(self, condition_index: int) -> compiled_predicate:
+    '''
+		Compiles one deletion condition into a compiled_predicate. Targets are normalized
+		here once instead of once per email. Properties are read with probe_property, a
+		check on an email missing its property returns the missing_value of the property.
+		:param condition_index: (int) index of the condition in all_matching_functions
+		:return: (compiled_predicate) the compiled condition
+		'''
+    if condition_index == 0:
+      read_address = self.get_sender_address_reader()
+      if isinstance(self.target_sender_email, str):
+        target_email = self.target_sender_email.lower()
+
+        def check_sender_email(email_item):
+          address = read_address(email_item)
+          return address if is_missing(address) else address.lower() == target_email
+
+        return compiled_predicate("sender email", 0, check_sender_email)
+      # hashed set, the cost per email does not depend on the amount of targets
+      target_emails = frozenset(each.lower() for each in self.target_sender_email)
+
+      def check_sender_emails(email_item):
+        address = read_address(email_item)
+        return address if is_missing(address) else address.lower() in target_emails
+
+      return compiled_predicate("sender emails", 0, check_sender_emails)
+    if condition_index == 1:
+      # bounds are compared as timestamps, no datetime is built per email
+      lower_timestamp, upper_timestamp = self.date_utility.get_timestamp_bounds(self.target_start_date,
+                                                                               self.target_end_date)
+
+      def check_date_range(email_item):
+        sent_on = probe_property(email_item, 'SentOn')
+        return sent_on if is_missing(sent_on) else lower_timestamp <= sent_on.timestamp() <= upper_timestamp
+
+      return compiled_predicate("date range", 1, check_date_range)
+    if condition_index == 2:
+      return self.compile_subject_condition()
+    if condition_index == 3:
+      if isinstance(self.target_sender_name, str):
+        target_name = self.target_sender_name.lower()
+
+        def check_sender_name(email_item):
+          name = probe_property(email_item, 'SenderName')
+          return name if is_missing(name) else name.lower() == target_name
+
+        return compiled_predicate("sender name", 3, check_sender_name)
+      target_names = frozenset(each.lower() for each in self.target_sender_name)
+
+      def check_sender_names(email_item):
+        name = probe_property(email_item, 'SenderName')
+        return name if is_missing(name) else name.lower() in target_names
+
+      return compiled_predicate("sender names", 3, check_sender_names)
+    if condition_index == 4:
+      return self.compile_sender_domain_condition()
+    if condition_index == 5:
+      # the tree already orders its own branches, its cost is passed on so it is ranked among the other conditions
+      return compiled_predicate("rule expression", 5, self.target_rule_expression.evaluate, property_reads=0,
+                                compute_cost=self.target_rule_expression.cost)
+    if condition_index == 6:
+      property_names = tuple(as_list(self.target_missing_property))
+      return compiled_predicate("missing property", 6,
+                                lambda email_item: any(is_missing(probe_property(email_item, name))
+                                                       for name in property_names),
+                                property_reads=len(property_names))
+    raise ValueError(f"Unknown deletion condition {condition_index}")
+
+  def compile_subject_condition(self) -> compiled_predicate:
+    '''
+		Compiles the subject condition. Multiple phrases are all looked for in a single
+		scan of the subject with an Aho-Corasick automaton. The phrase found is kept in
+		last_matched_subject_phrase so it can be reported for matching emails.
+		:return: (compiled_predicate) the compiled condition
+		'''
+    if isinstance(self.target_subject_keyphrase, str):
+      target_phrase = self.target_subject_keyphrase.lower()
+
+      def check(email_item):
+        subject = probe_property(email_item, 'Subject')
+        if is_missing(subject):
+          return subject
+        if target_phrase in subject.lower():
+          self.last_matched_subject_phrase = target_phrase
+          return True
+        return False
+
+      return compiled_predicate("subject keyphrase", 2, check, compute_cost=2.0)
+
+    automaton = aho_corasick_automaton(self.target_subject_keyphrase)
+
+    def check_all_phrases(email_item):
+      subject = probe_property(email_item, 'Subject')
+      if is_missing(subject):
+        return subject
+      phrase = automaton.find_first(subject)
+      self.last_matched_subject_phrase = phrase
+      return phrase is not None
+
+    return compiled_predicate("subject keyphrases", 2, check_all_phrases, compute_cost=4.0)
+
+  def compile_sender_domain_condition(self) -> compiled_predicate:
+    '''
+		Compiles the sender domain condition into a lookup in a domain_suffix_trie, whose
+		cost only depends on the length of the sender address. The matching rule is kept
+		in last_matched_domain_rule so it can be reported for matching emails.
+		:return: (compiled_predicate) the compiled condition
+		'''
+    rules = [self.target_sender_domain] if isinstance(self.target_sender_domain, str) else self.target_sender_domain
+    trie = domain_suffix_trie(rules)
+    read_address = self.get_sender_address_reader()
+
+    def check(email_item):
+      address = read_address(email_item)
+      if is_missing(address):
+        return address
+      rule = trie.match(address)
+      self.last_matched_domain_rule = rule
+      return rule is not None
+
+    return compiled_predicate("sender domain", 4, check, compute_cost=2.0)
+
+  def get_sender_address_reader(self):
+    '''
+		:return: function taking an email and returning its sender address, or the missing_value
+		of SenderEmailAddress. Exchange addresses are resolved if sender resolution is enabled.
+		'''
+    if self.sender_resolver is None:
+      return read_sender_address
+    return self.sender_resolver.read_sender_address
+
+  def record_subject_phrase_hit(self, entry_id: str) -> None:
+    '''
+		Records which subject phrase a matching email matched.
+		:param entry_id: (str) EntryID of the matching email
+		:return: None
+		'''
+    phrase = self.last_matched_subject_phrase
+    self.matched_subject_phrases[entry_id] = phrase
+    self.subject_phrase_hit_counts[phrase] = self.subject_phrase_hit_counts.get(phrase, 0) + 1
+
+  def compile_predicate_plan(self) -> predicate_plan:
+    '''
+		Compiles all accepted deletion conditions into a predicate_plan. The plan evaluates
+		cheap and selective conditions first and counts evaluations and hits per condition.
+		:return: (predicate_plan) the plan
+		'''
+    return predicate_plan([self.compile_condition(each_index) for each_index in self.accepted_deletions_conditions])
+
   def connect_to_outlook(self) -> None:
     """
-		Sets com_obj and outlook_connection attributes. MUST be run before
-		set_all_mailboxes.
+		Sets com_obj and outlook_connection attributes by connecting the backend.
+		MUST be run before set_all_mailboxes.
 		:return: None
 		"""
-    # create an instance of COM object
-    # COM object allows us to interact with other programs
-    self.com_obj = client.Dispatch("Outlook.Application")
+    self.outlook_connection = self.backend.connect()
+    self.com_obj = getattr(self.backend, 'com_obj', None)
 
-    # need to make an object that can interact with folders in the outlook
-    # MAPI means Message Application Program Interface, this only works for windows
-    try:
-      self.outlook_connection = self.com_obj.GetNameSpace('MAPI')
-    except AttributeError:
-      raise OutlookNotOpenError()
+  def disconnect_from_outlook(self) -> None:
+    """
+		Disconnects the backend, flushing any pending deletions.
+		:return: None
+		"""
+    self.backend.disconnect()
+    self.outlook_connection = None
+    self.com_obj = None
+
+  def enable_instrumentation(self, profile: bool = False, trace_memory: bool = False) -> None:
+    '''
+		Starts measuring the run: the backend is wrapped so its calls and the property reads
+		of its emails are counted and timed, and so are the matching of emails and the date
+		conversions of the date_handler (see instrumentation). Call it before
+		call_startup_methods for the connection to be measured.
+		:param profile: (bool) if true, cProfile also runs, see run_statistics.start_profiling
+		:param trace_memory: (bool) if true, tracemalloc also runs, see run_statistics.start_profiling
+		:return: None
+		'''
+    if self.statistics is None:
+      self.statistics = run_statistics()
+      self.backend = instrumented_backend(self.backend, self.statistics)
+      if self.sender_resolver is not None:
+        self.sender_resolver.backend = self.backend
+      self.statistics.wrap_method(self, 'is_email_matching_conditions', 'match')
+      for method_name in INSTRUMENTED_DATE_METHODS:
+        self.statistics.wrap_method(self.date_utility, method_name, 'dates')
+    self.statistics.start_profiling(profile, trace_memory)
+
+  def disable_instrumentation(self) -> dict:
+    '''
+		Stops measuring the run and gives back the measured backend.
+		:return: (dict) the statistics of the run, see run_statistics.get_stats. None if
+		instrumentation was not enabled.
+		'''
+    if self.statistics is None:
+      return None
+    self.record_predicate_statistics()
+    self.statistics.stop_profiling()
+    self.statistics.unwrap_methods()
+    self.backend = self.backend.backend
+    if self.sender_resolver is not None:
+      self.sender_resolver.backend = self.backend
+    stats = self.statistics.get_stats()
+    self.statistics = None
+    return stats
+
+  def get_run_statistics(self) -> dict:
+    '''
+		:return: (dict) the statistics measured so far, see run_statistics.get_stats. None if
+		instrumentation is not enabled.
+		'''
+    if self.statistics is None:
+      return None
+    self.record_predicate_statistics()
+    return self.statistics.get_stats()
+
+  def record_predicate_statistics(self) -> None:
+    '''
+		Adds the counters of the verified deletion conditions (see predicate_plan.get_statistics)
+		to the statistics of the run, under the name conditions.
+		Helper method to get_run_statistics, write_run_statistics and disable_instrumentation
+		:return: None
+		'''
+    if self.predicate_plan is not None:
+      self.statistics.record_predicates('conditions', self.predicate_plan.get_statistics())
+
+  def write_run_statistics(self, path: str) -> None:
+    '''
+		Writes the statistics measured so far to a JSON file, see run_statistics.write_json.
+		:param path: (str) path of the file, overwritten if it exists
+		:return: None
+		'''
+    if self.statistics is None:
+      raise RuntimeError('enable_instrumentation must be called before calling write_run_statistics in model')
+    self.record_predicate_statistics()
+    self.statistics.write_json(path)
+
+  def enable_sender_resolution(self, capacity: int = DEFAULT_CACHE_CAPACITY, cache_path: str = None) -> None:
+    '''
+		Makes the sender email and sender domain conditions (and the sender analysis) check
+		the SMTP address of Exchange senders, each sender being looked up once per run (see
+		sender_resolver). Must be called before the deletion conditions are set. Raises a
+		ValueError if the cache file cannot be read.
+		:param capacity: (int) maximum amount of sender addresses kept in the cache
+		:param cache_path: (str) JSON file the cache is loaded from, and saved to by disable_sender_resolution
+		:return: None
+		'''
+    self.sender_resolver = sender_address_resolver(self.backend, capacity, cache_path)
+
+  def disable_sender_resolution(self) -> dict:
+    '''
+		Stops resolving Exchange sender addresses, the cache is saved to its file if it has one.
+		:return: (dict) the hits and misses of the cache, see sender_address_resolver.get_stats.
+		None if sender resolution was not enabled.
+		'''
+    if self.sender_resolver is None:
+      return None
+    self.save_sender_resolution_cache()
+    stats = self.sender_resolver.get_stats()
+    self.sender_resolver = None
+    return stats
+
+  def save_sender_resolution_cache(self) -> None:
+    '''
+		Saves the resolved sender addresses to the cache file given to enable_sender_resolution,
+		if there is one, so the next run does not look them up again.
+		:return: None
+		'''
+    if self.sender_resolver is not None and self.sender_resolver.cache_path is not None:
+      self.sender_resolver.save()
+
+  def get_sender_resolution_stats(self) -> dict:
+    '''
+		:return: (dict) the hits and misses of the sender address cache so far, see
+		sender_address_resolver.get_stats. None if sender resolution is not enabled.
+		'''
+    if self.sender_resolver is None:
+      return None
+    return self.sender_resolver.get_stats()
 
   def set_all_mailboxes_options(self):
     '''
@@ -252,10 +779,10 @@ class cleanup_model():
     # mailboxes include email addresses, some folders, calendars etc.
     list_mailboxes = []
 
-    for mailbox in self.outlook_connection.Folders:
+    for mailbox_name in self.backend.list_mailboxes():
       # filter out non-emails
-      if '@' in mailbox.Name:
-        list_mailboxes.append(mailbox.Name)
+      if '@' in mailbox_name:
+        list_mailboxes.append(mailbox_name)
 
     self.all_mailboxes = list_mailboxes
 
@@ -273,8 +800,11 @@ class cleanup_model():
 		"""
     try:
       self.connect_to_outlook()
-    except:
-      raise RuntimeError("Could not connect to outlook, make sure Outlook is Open")
+    except OutlookNotOpenError:
+      raise
+    except Exception:
+      # any other failure of the connection (COM errors, pywin32 missing...) is reported the same way
+      raise OutlookNotOpenError("Could not connect to outlook, make sure Outlook is Open")
     self.set_all_mailboxes_options()
 
   def select_target_mailbox(self, input: int):
@@ -292,7 +822,8 @@ class cleanup_model():
     self.selected_email = self.mailbox_options[input]
 
     # by default we will pick only the 'Inbox' folder
-    self.selected_directory = self.outlook_connection.Folders(self.selected_email).Folders('Inbox')
+    self.selected_folder_path = 'Inbox'
+    self.selected_directory = self.backend.open_folder(self.selected_email, self.selected_folder_path)
 
   def get_all_emails_from_directory(self):
     '''
@@ -302,21 +833,24 @@ class cleanup_model():
     if self.selected_directory == None:
       raise RuntimeError(
         'select_target_mailbox must be called before calling get_all_emails_from_directory in model')
-    return self.selected_directory.Items
+    return self.backend.get_items(self.selected_directory)
 
-  def is_match_for_subject(self, email_item: client.CDispatch):
+  def is_match_for_subject(self, email_item):
     """
 		Checks if a an email's subject contains the keyword/phrase
-		:param email_item: (win32com.client.CDispatch) an email item from outlook
+		:param email_item: (win32com.client.CDispatch) an email item from outlook or the model's backend
 		:return:
 		"""
-    # check if target keyphrase is in the email's subject
-    return self.target_subject_keyphrase.lower() in email_item.Subject.lower()
+    # check if target keyphrase (or any of the target keyphrases) is in the email's subject
+    subject = email_item.Subject.lower()
+    if isinstance(self.target_subject_keyphrase, str):
+      return self.target_subject_keyphrase.lower() in subject
+    return any(phrase.lower() in subject for phrase in self.target_subject_keyphrase)
 
-  def is_within_date_range(self, email_item: client.CDispatch):
+  def is_within_date_range(self, email_item):
     """
 		Check's if an email's sent date is within the date range deletion condition
-		:param email_item: (win32com.client.CDispatch) an email item from outlook
+		:param email_item: (win32com.client.CDispatch) an email item from outlook or the model's backend
 		:return:
 		"""
     # check if email date is in between target start and end dates
@@ -325,77 +859,802 @@ class cleanup_model():
                                               upper_bound=self.target_end_date,
                                               target_date=email_date)
 
-  def is_match_for_sender_email_address(self, email_item: client.CDispatch):
+  def is_match_for_sender_email_address(self, email_item):
     """
 		Check's if an email's sender email address matches the sender email address deletion condition
 		This will not match for an email that was sent by multiple people.
 		It can only be 1 sender.
-		:param email_item: (win32com.client.CDispatch) an email item from outlook
+		:param email_item: (win32com.client.CDispatch) an email item from outlook or the model's backend
 		:return:
 		"""
     # check if sender email address matches
 
     sender_address = email_item.SenderEmailAddress
 
+    if not isinstance(self.target_sender_email, str):
+      return sender_address.lower() in {each.lower() for each in self.target_sender_email}
     return self.target_sender_email.lower().__eq__(sender_address.lower())
 
-  def is_match_for_sender_name(self, email_item: client.CDispatch):
+  def is_match_for_sender_name(self, email_item):
     """
 		Checks if the name of the sender (DIFFERENT FROM THE ADDRESS) matches the sender name
 		deletion condition. This will not match for an email that was sent by multiple people.
-		:param email_item:  (win32xom.client.CDispatch) an email item from outlook
+		:param email_item:  (win32xom.client.CDispatch) an email item from outlook or the model's backend
 		:return:
 		"""
     sender_name = email_item.SenderName
 
+    if not isinstance(self.target_sender_name, str):
+      return sender_name.lower() in {each.lower() for each in self.target_sender_name}
     return self.target_sender_name.lower().__eq__(sender_name.lower())
 
+  def is_match_for_sender_domain(self, email_item):
+    """
+		Checks if an email's sender email address matches one of the sender domain rules.
+		:param email_item: (win32com.client.CDispatch) an email item from outlook or the model's backend
+		:return:
+		"""
+    rules = [self.target_sender_domain] if isinstance(self.target_sender_domain, str) else self.target_sender_domain
+    return domain_suffix_trie(rules).match(email_item.SenderEmailAddress) is not None
+
+  def is_match_for_rule_expression(self, email_item):
+    """
+		Checks if an email matches the rule expression deletion condition.
+		:param email_item: (win32com.client.CDispatch) an email item from outlook or the model's backend
+		:return:
+		"""
+    return self.target_rule_expression.evaluate(email_item)
+
+  def is_missing_property(self, email_item):
+    """
+		Checks if an email does not have the property (or one of the properties) of the missing
+		property deletion condition.
+		:param email_item: (win32com.client.CDispatch) an email item from outlook or the model's backend
+		:return:
+		"""
+    return any(is_missing(probe_property(email_item, name)) for name in as_list(self.target_missing_property))
+
+  def build_restrict_filter(self, count_missing: bool = None):
+    """
+		Compiles the accepted deletion conditions into a DASL filter string for
+		Items.Restrict. Can only run after verify_deletion_conditions has been run.
+		Outlook leaves out the emails missing a property compared by the filter, so
+		when count_missing is true the filter also passes the emails missing a property
+		needed by the conditions, and they are counted like without the filter. These
+		emails are read and checked (usually a few reports and drafts), when count_missing
+		is false they are neither read nor counted in missing_property_counts.
+		:param count_missing: (bool) overrides the count_missing_with_restrict_filter attribute if not None
+		:return: (str) the filter or None if there are no accepted conditions
+		"""
+    if count_missing is None:
+      count_missing = self.count_missing_with_restrict_filter
+    accepted = self.accepted_deletions_conditions
+    restrict_filter = compile_restrict_filter(
+      sender_email=self.target_sender_email if 0 in accepted else None,
+      start_date=self.target_start_date if 1 in accepted else None,
+      end_date=self.target_end_date if 1 in accepted else None,
+      subject_keyphrase=self.target_subject_keyphrase if 2 in accepted else None,
+      sender_name=self.target_sender_name if 3 in accepted else None,
+      sender_domain=self.target_sender_domain if 4 in accepted else None,
+      exchange_senders=self.sender_resolver is not None)
+
+    expression_clause = self.target_rule_expression.restrict_clause() if 5 in accepted else None
+    if expression_clause is not None:
+      if restrict_filter is None:
+        restrict_filter = f"@SQL=({expression_clause})"
+      else:
+        restrict_filter = f"{restrict_filter} AND ({expression_clause})"
+    if not count_missing:
+      return restrict_filter
+    # properties read by a rule expression depend on its branches, all of them are passed
+    required_properties = set(CONDITION_PROPERTIES.values()) if 5 in accepted else \
+      {CONDITION_PROPERTIES[each_index] for each_index in accepted if each_index in CONDITION_PROPERTIES}
+    return include_missing_properties(restrict_filter, sorted(required_properties))
+
+  def is_email_matching_conditions(self, email_item) -> bool:
+    """
+		Checks an email against all accepted deletion conditions using the compiled
+		predicate_plan. Emails missing a property needed by a condition do not match
+		and are counted in emails_with_missing_attributes_count and missing_property_counts.
+		:param email_item: an email item from the backend or a row of a metadata_table
+		:return: (bool) True if the email matches all accepted conditions
+		"""
+    # Some emails do NOT have 1 of 2 properties (see property_probe), the check needing
+    # the property then gives its missing_value instead of raising
+    result = self.predicate_plan.matches(email_item)
+    if result:
+      return True
+    if is_missing(result):
+      self.count_missing_property(result.property_name)
+    return False
+
+  def count_missing_property(self, property_name: str, amount: int = 1) -> None:
+    '''
+		Counts emails that could not be processed because they are missing a property.
+		:param property_name: (str) name of the property
+		:param amount: (int) amount of emails
+		:return: None
+		'''
+    self.emails_with_missing_attributes_count += amount
+    self.missing_property_counts[property_name] = self.missing_property_counts.get(property_name, 0) + amount
+
+  def iter_matching_candidates(self, use_snapshot: bool = None):
+    """
+		Yields every email (or snapshot row) matching the deletion conditions, newest
+		emails first (snapshot rows come in folder order). Emails are visited from the
+		last index of the sorted collection to the first, so already yielded emails can
+		safely be deleted while iterating.
+		Helper method to iter_emails_matching_search_conditions and
+		iter_entry_ids_matching_search_conditions
+		:param use_snapshot: (bool) overrides the use_snapshot attribute if not None
+		:return: generator of items, or of table_row if use_snapshot is true
+		"""
+    if use_snapshot is None:
+      use_snapshot = self.use_snapshot
+    if self.verified_conditions == False:
+      raise RuntimeError("Conditions Must Be Verified before Searching For Emails")
+
+    # let the backend (Outlook) filter out non candidates, every candidate is still
+    # checked by the matching functions below
+    restrict_filter = self.build_restrict_filter() if self.use_restrict_filter else None
+
+    if self.metadata_index is not None:
+      candidates = self.query_metadata_index()
+      if self.progress is not None:
+        self.progress.set_total(candidates.Count)
+    elif use_snapshot:
+      if self.selected_directory == None:
+        raise RuntimeError(
+          'select_target_mailbox must be called before searching a snapshot of the inbox in model')
+      # properties of all emails are fetched in bulk and matched locally
+      candidates = self.backend.get_table(self.selected_directory, SNAPSHOT_COLUMNS, restrict_filter)
+      if self.progress is not None:
+        self.progress.set_total(candidates.Count)
+      if 1 in self.accepted_deletions_conditions:
+        candidates = self.iter_rows_within_date_range(candidates)
+    else:
+      all_emails = self.get_all_emails_from_directory()
+      if restrict_filter is not None:
+        all_emails = self.backend.restrict_items(all_emails, restrict_filter)
+      if self.progress is not None:
+        self.progress.set_total(all_emails.Count)
+      candidates = self.iter_candidate_emails(all_emails)
+
+    if self.progress is not None:
+      candidates = self.progress.iter_scanned(candidates)
+    for each_candidate in candidates:
+      # don't yield email if condition did not match or has missing attribute
+      if self.is_email_matching_conditions(each_candidate):
+        if 2 in self.accepted_deletions_conditions:
+          self.record_subject_phrase_hit(each_candidate.EntryID)
+        if 4 in self.accepted_deletions_conditions:
+          rule = self.last_matched_domain_rule
+          self.matched_sender_domain_rules[rule] = self.matched_sender_domain_rules.get(rule, 0) + 1
+        if self.progress is not None:
+          self.progress.add_matched()
+        yield each_candidate
+
+  def analyze_senders(self, top_n: int = 20, capacity: int = DEFAULT_CAPACITY) -> dict:
+    '''
+		Counts the emails of the selected folder per sender address, sender name and sender
+		domain, in a single pass reading each email once. If deletion conditions were verified,
+		only the emails matching them are counted (see iter_matching_candidates). Memory use
+		does not depend on the amount of emails, see sender_analytics.
+		:param top_n: (int) amount of senders listed per aggregation
+		:param capacity: (int) maximum amount of senders kept per aggregation
+		:return: (dict) the report, see sender_statistics.get_report
+		'''
+    if self.selected_directory == None:
+      raise RuntimeError('select_target_mailbox must be called before calling analyze_senders in model')
+    statistics = sender_statistics(capacity, self.sender_resolver)
+    # emails missing a property are reported by the analysis, not as emails that could not be deleted
+    missing_attributes_count = self.emails_with_missing_attributes_count
+    missing_property_counts = dict(self.missing_property_counts)
+    if self.verified_conditions:
+      emails = self.iter_matching_candidates()
+    elif self.use_snapshot:
+      emails = self.backend.get_table(self.selected_directory, SNAPSHOT_COLUMNS)
+    else:
+      emails = iter_items_reversed(self.get_all_emails_from_directory())
+    statistics.add_emails(emails)
+    self.emails_with_missing_attributes_count = missing_attributes_count
+    self.missing_property_counts = missing_property_counts
+    return statistics.get_report(top_n)
+
+  def open_metadata_index(self, database_path: str = ':memory:') -> None:
+    '''
+		Opens the local index searches will run against, see metadata_index. Closes
+		the index that was open before.
+		:param database_path: (str) path of the SQLite database file, created if needed
+		:return: None
+		'''
+    self.close_metadata_index()
+    self.metadata_index = metadata_index(database_path)
+
+  def close_metadata_index(self) -> None:
+    '''
+		Closes the local index, searches then read the folder again.
+		:return: None
+		'''
+    if self.metadata_index is not None:
+      self.metadata_index.close()
+      self.metadata_index = None
+
+  def query_metadata_index(self):
+    """
+		Syncs the local index with the selected folder, then runs the accepted deletion
+		conditions as one query against it. Emails missing a property needed by a
+		condition are counted in emails_with_missing_attributes_count and missing_property_counts.
+		Helper method to iter_matching_candidates
+		:return: (metadata_table) the matching emails
+		"""
+    if self.selected_directory == None:
+      raise RuntimeError('select_target_mailbox must be called before searching the index in model')
+    folder_path = self.selected_folder_path
+    self.metadata_index.sync(self.backend, self.selected_email, self.selected_directory, folder_path)
+
+    accepted = self.accepted_deletions_conditions
+    # the index holds the raw addresses, resolved addresses are only checked when the rows are rechecked
+    match_addresses = self.sender_resolver is None
+    # properties read by a rule expression depend on its branches, rows missing them are counted when rechecked
+    required_properties = [CONDITION_PROPERTIES[each_index] for each_index in accepted
+                           if each_index in CONDITION_PROPERTIES]
+    if not match_addresses:
+      # rows missing the sender address are not left out by the query, they are counted when rechecked
+      required_properties = [name for name in required_properties if name != 'SenderEmailAddress']
+    missing_counts = self.metadata_index.count_missing_per_property(self.selected_email, folder_path,
+                                                                    required_properties)
+    for property_name, amount in missing_counts.items():
+      self.count_missing_property(property_name, amount)
+    return self.metadata_index.query(
+      self.selected_email, folder_path,
+      sender_emails=as_list(self.target_sender_email) if 0 in accepted and match_addresses else None,
+      sent_on_range=(self.target_start_date, self.target_end_date) if 1 in accepted else None,
+      subject_phrases=as_list(self.target_subject_keyphrase) if 2 in accepted else None,
+      sender_names=as_list(self.target_sender_name) if 3 in accepted else None,
+      domain_rules=as_list(self.target_sender_domain) if 4 in accepted and match_addresses else None)
+
+  def iter_rows_within_date_range(self, table):
+    """
+		Yields the rows of a snapshot sent within the date range. The whole SentOn
+		column is checked in one batch call of the date_handler. Rows without a
+		SentOn date are counted in emails_with_missing_attributes_count.
+		Helper method to iter_matching_candidates
+		:param table: (metadata_table) snapshot of the selected folder
+		:return: generator of table_row
+		"""
+    lower_timestamp, upper_timestamp = self.date_utility.get_timestamp_bounds(self.target_start_date,
+                                                                             self.target_end_date)
+    timestamps = self.date_utility.convert_dates_to_timestamps(table.columns['SentOn'])
+    in_range = self.date_utility.check_timestamps_between(lower_timestamp, upper_timestamp, timestamps)
+    if self.progress is not None:
+      self.progress.set_total(sum(1 for each_in_range in in_range if each_in_range))
+    for index, each_in_range in enumerate(in_range):
+      if each_in_range is None:
+        self.count_missing_property('SentOn')
+      elif each_in_range:
+        yield table.row(index)
+
+  def iter_candidate_emails(self, all_emails):
+    """
+		Sorts the emails and yields them newest first. When a date range is set and
+		use_date_bounded_scan is true, emails are sorted by their SentOn date and the
+		range is located by binary search, so only the emails sent within the range are
+		read. Emails missing a SentOn date are then counted without being read.
+		When resume_position is set, emails after it (see get_scan_sort_property) are not read.
+		Helper method to iter_matching_candidates
+		:param all_emails: item collection from the backend
+		:return: generator of items
+		"""
+    if self.use_date_bounded_scan and 1 in self.accepted_deletions_conditions:
+      upper_bound = self.target_end_date
+      if self.resume_position is not None:
+        upper_bound = min(upper_bound, self.resume_position)
+      # oldest first, since the collection is read from its last index to its first
+      all_emails.Sort("[SentOn]", False)
+      first_index, last_index, amt_missing = find_sorted_range(all_emails, "SentOn", self.target_start_date,
+                                                               upper_bound)
+      if amt_missing > 0:
+        self.count_missing_property('SentOn', amt_missing)
+      if self.progress is not None:
+        self.progress.set_total(max(last_index - first_index + 1, 0))
+      return iter_items_reversed(all_emails, first_index, last_index)
+
+    all_emails.Sort("[ReceivedTime]", False)
+    if self.resume_position is not None:
+      # emails received after the position were searched before the run was interrupted
+      first_index, last_index, _ = find_sorted_range(all_emails, "ReceivedTime", OLDEST_DATE, self.resume_position)
+      if self.progress is not None:
+        self.progress.set_total(max(last_index - first_index + 1, 0))
+      return iter_items_reversed(all_emails, first_index, last_index)
+    return iter_items_reversed(all_emails)
+
+  def iter_emails_matching_search_conditions(self):
+    """
+		Yields items from the inbox with properties matching the deletion conditions.
+		:return: generator of items
+		"""
+    candidates_are_rows = self.use_snapshot or self.metadata_index is not None
+    for each_candidate in self.iter_matching_candidates():
+      if not candidates_are_rows:
+        yield each_candidate
+        continue
+      # only matching snapshot (or index) rows are looked up as items
+      try:
+        yield self.backend.get_item_by_entry_id(each_candidate.EntryID)
+      except KeyError:
+        # email was removed after the snapshot was taken
+        continue
+
+  def iter_entry_ids_matching_search_conditions(self):
+    """
+		Yields the EntryID of every email from the inbox matching the deletion conditions.
+		:return: generator of str
+		"""
+    for each_candidate in self.iter_matching_candidates():
+      yield each_candidate.EntryID
+
   def get_emails_matching_search_conditions(self):
     """
 		Returns a list of items from the inbox with properties
 		matching the deletion conditions.
-		Helper method to delete_emails_with_matching_conditions
 		:return:
 		"""
+    return list(self.iter_emails_matching_search_conditions())
+
+  def can_count_with_restrict_filter(self) -> bool:
+    '''
+		Checks if the restrict filter matches exactly the emails the deletion conditions match,
+		so the backend can count the emails passing it without any email being read. Only the
+		sender email and sender name conditions compile into exact filters, subject and domain
+		clauses use LIKE and dates are rounded to the minute (see restrict_filter.py).
+		:return: (bool) True if the restrict filter is exact
+		'''
+    accepted = self.accepted_deletions_conditions
+    if not self.use_restrict_filter or len(accepted) == 0 or not set(accepted) <= EXACT_FILTER_CONDITIONS:
+      return False
+    if self.sender_resolver is not None and 0 in accepted:
+      # the filter passes every Exchange sender, see restrict_filter.include_exchange_senders
+      return False
+    targets = {0: self.target_sender_email, 3: self.target_sender_name}
+    # conditions with too many targets are left out of the filter
+    return all(len(as_list(targets[each_index])) <= MAX_FILTER_ALTERNATIVES for each_index in accepted)
+
+  def count_emails_matching_search_conditions(self) -> dict:
+    '''
+		Counts the emails matching the deletion conditions without deleting them (dry run). No
+		item is kept: if the restrict filter is exact, the backend counts the emails passing it,
+		otherwise the metadata_index or a snapshot of the folder is searched. Does not change
+		emails_with_missing_attributes_count or missing_property_counts.
+		:return: (dict) dict with the keys matched (amount of matching emails), unprocessed (amount
+		of emails missing a property needed by a condition, None if the backend counted) and missing
+		(the unprocessed emails per missing property, see missing_property_counts, None if the backend counted)
+		'''
     if self.verified_conditions == False:
       raise RuntimeError("Conditions Must Be Verified before Searching For Emails")
+    if self.metadata_index is None and self.can_count_with_restrict_filter():
+      matching_emails = self.backend.restrict_items(self.get_all_emails_from_directory(),
+                                                    self.build_restrict_filter(count_missing=False))
+      return {'matched': matching_emails.Count, 'unprocessed': None, 'missing': None}
 
-    all_emails = self.get_all_emails_from_directory()
-    all_emails.Sort("[ReceivedTime]", True)
-    emails_to_delete = []
-
-    for each_email in all_emails:
-      skip_flag = False
-      for each_index in self.accepted_deletions_conditions:
-        try:
-          is_matching_condition = self.all_matching_functions[each_index](each_email)
-        # Some emails do NOT have 1 of 2 properties:
-        #  1.) SentOn property ( ex. emails about emails that failed to send)
-        #  2.) SenderEmailAddress property (ex. some but NOT all no reply emails, these have a sender but
-        #  		outlook does not see an address associated with the sender)
-        except AttributeError:
-          # self.emails_with_missing_attributes.append(each_email)
-          self.emails_with_missing_attributes_count += 1
-          skip_flag = True
-          break
-
-        if is_matching_condition is False:
-          skip_flag = True
-          break
-
-      if skip_flag == True:  # don't collect email if condition did not match or has missing attribute
-        continue
-      else:
-        emails_to_delete.append(each_email)
+    missing_attributes_count = self.emails_with_missing_attributes_count
+    missing_property_counts = self.missing_property_counts
+    self.missing_property_counts = {}
+    try:
+      amt_matched = sum(1 for _ in self.iter_matching_candidates(use_snapshot=True))
+      return {'matched': amt_matched, 'unprocessed': self.emails_with_missing_attributes_count - missing_attributes_count,
+              'missing': self.missing_property_counts}
+    finally:
+      self.emails_with_missing_attributes_count = missing_attributes_count
+      self.missing_property_counts = missing_property_counts
 
-    return emails_to_delete
+  def iter_match_preview_pages(self, page_size: int = 20):
+    '''
+		Yields the emails matching the deletion conditions page by page, newest first, without
+		deleting them. The folder is only searched as far as the pages asked for. Does not change
+		emails_with_missing_attributes_count or missing_property_counts.
+		:param page_size: (int) amount of emails per page
+		:return: generator of lists of dicts with the keys subject, sender_email, sender_name and sent_on
+		(None if the email does not have the property)
+		'''
+    missing_attributes_count = self.emails_with_missing_attributes_count
+    missing_property_counts = dict(self.missing_property_counts)
+    try:
+      page = []
+      for each_candidate in self.iter_matching_candidates():
+        page.append({'subject': getattr(each_candidate, 'Subject', None),
+                     'sender_email': getattr(each_candidate, 'SenderEmailAddress', None),
+                     'sender_name': getattr(each_candidate, 'SenderName', None),
+                     'sent_on': getattr(each_candidate, 'SentOn', None)})
+        if len(page) == page_size:
+          yield page
+          page = []
+      if len(page) > 0:
+        yield page
+    finally:
+      self.emails_with_missing_attributes_count = missing_attributes_count
+      self.missing_property_counts = missing_property_counts
 
   def delete_emails_with_matching_conditions(self):
     '''
-		Delete emails that match a certain condition
+		Delete emails that match a certain condition. Matching emails are streamed
+		into deletion in batches of deletion_batch_size EntryIDs, so memory use does
+		not depend on the amount of matching emails. If there is a progress_callback, the
+		progress is reported to it while the folder is scanned (see progress_tracker).
 		:return:
 		'''
-    matching_emails = self.get_emails_matching_search_conditions()
-    for email in matching_emails:
-      email.Delete()
-      self.delete_counter += 1
+    if self.progress_callback is not None:
+      self.progress = progress_tracker(self.progress_callback)
+    try:
+      if self.deletion_journal is not None:
+        self.delete_emails_with_journal()
+        return
+      matching_entry_ids = self.iter_entry_ids_matching_search_conditions()
+      for batch in iter_in_batches(matching_entry_ids, self.deletion_batch_size):
+        amt_batch_deleted = delete_emails_by_entry_id(self.backend, batch)
+        self.delete_counter += amt_batch_deleted
+        if self.progress is not None:
+          self.progress.add_deleted(amt_batch_deleted)
+        if self.metadata_index is not None:
+          self.metadata_index.remove_entries(self.selected_email, self.selected_folder_path, batch)
+    finally:
+      if self.progress is not None:
+        self.progress.finish()
+        self.progress = None
+
+  def get_scan_sort_property(self) -> str:
+    '''
+		Returns the property the emails are searched by, from the newest to the oldest.
+		:return: (str) SentOn or ReceivedTime, None if snapshot rows or index rows are searched (not in order)
+		'''
+    if self.metadata_index is not None or self.use_snapshot:
+      return None
+    if self.use_date_bounded_scan and 1 in self.accepted_deletions_conditions:
+      return "SentOn"
+    return "ReceivedTime"
+
+  def open_deletion_journal(self, journal_path: str) -> None:
+    '''
+		Opens the journal deletions are written to, see deletion_journal. Closes the journal
+		that was open before.
+		:param journal_path: (str) path of the journal file, created if needed
+		:return: None
+		'''
+    self.close_deletion_journal()
+    self.deletion_journal = deletion_journal(journal_path)
+
+  def close_deletion_journal(self) -> None:
+    '''
+		Closes the journal, deletions are then no longer journaled.
+		:return: None
+		'''
+    if self.deletion_journal is not None:
+      self.deletion_journal.close()
+      self.deletion_journal = None
+
+  def resume_from_journal(self, journal_path: str) -> None:
+    '''
+		Prepares resuming the last unfinished run of a journal: opens the journal, selects the
+		mailbox and folder of the run and sets and verifies its deletion conditions. The next
+		delete_emails_with_matching_conditions continues the run. Raises a ValueError if every
+		run of the journal finished.
+		:param journal_path: (str) path of the journal file
+		:return: None
+		'''
+    unfinished_run = find_unfinished_run(journal_path)
+    if unfinished_run is None:
+      raise ValueError(f"There is no unfinished deletion to resume in {journal_path}")
+    self.select_target_mailbox_by_address(unfinished_run['mailbox'])
+    self.selected_folder_path = unfinished_run['folder']
+    self.selected_directory = self.backend.open_folder(self.selected_email, self.selected_folder_path)
+    self.clear_deleting_conditions()
+    self.set_conditions_from_rule(unfinished_run['conditions'])
+    self.verify_deletion_conditions()
+    self.open_deletion_journal(journal_path)
+
+    self.unfinished_run = unfinished_run
+    # a position is only meaningful if the folder is searched in the same order as before
+    if unfinished_run['sort_property'] == self.get_scan_sort_property():
+      self.resume_position = unfinished_run['position']
+
+  def delete_emails_with_journal(self) -> None:
+    '''
+		Deletes the emails matching the conditions like delete_emails_with_matching_conditions,
+		journaling every batch. Continues the unfinished_run if there is one: the EntryIDs it
+		already deleted are skipped.
+		Helper method to delete_emails_with_matching_conditions
+		:return: None
+		'''
+    sort_property = self.get_scan_sort_property()
+    if self.unfinished_run is None:
+      self.last_run_id = self.deletion_journal.start_run(self.selected_email, self.selected_folder_path,
+                                                         self.get_conditions_as_dict(), sort_property)
+      processed_entry_ids = set()
+      amt_deleted = 0
+    else:
+      self.deletion_journal.resume_run(self.unfinished_run)
+      self.last_run_id = self.unfinished_run['run_id']
+      processed_entry_ids = self.unfinished_run['processed_entry_ids']
+      amt_deleted = self.unfinished_run['deleted']
+
+    def iter_entry_ids_and_positions():
+      for each_candidate in self.iter_matching_candidates():
+        if each_candidate.EntryID not in processed_entry_ids:
+          # emails missing the sort property (ex. drafts) are journaled without a position
+          position = None if sort_property is None else read_sort_key(each_candidate, sort_property)
+          yield each_candidate.EntryID, position
+
+    for batch in iter_in_batches(iter_entry_ids_and_positions(), self.deletion_batch_size):
+      entry_ids = [entry_id for entry_id, _ in batch]
+      trash_entry_ids = {}
+      amt_batch_deleted = delete_emails_by_entry_id(self.backend, entry_ids, trash_entry_ids)
+      self.deletion_journal.record_batch(entry_ids, amt_batch_deleted, batch[-1][1], trash_entry_ids)
+      self.delete_counter += amt_batch_deleted
+      amt_deleted += amt_batch_deleted
+      if self.progress is not None:
+        self.progress.add_deleted(amt_batch_deleted)
+      if self.metadata_index is not None:
+        self.metadata_index.remove_entries(self.selected_email, self.selected_folder_path, entry_ids)
+
+    self.deletion_journal.finish_run(amt_deleted)
+    self.unfinished_run = None
+    self.resume_position = None
+
+  def undo_run(self, journal_path: str, run_id: str = None) -> dict:
+    '''
+		Undoes a journaled run: moves the emails it deleted back from the trash folder to the
+		folder they were deleted from, in batches of deletion_batch_size. The emails are looked
+		up by the EntryID they got in the trash folder, the trash folder is not searched. Emails
+		deleted for good, or no longer in the trash folder, cannot be moved back. Raises a
+		ValueError if the journal has no such run.
+		:param journal_path: (str) path of the journal file
+		:param run_id: (str) id of the run, or a prefix of it matching a single run, the last run if None
+		:return: (dict) dict with the keys run_id, restored (amount of emails moved back) and
+		missing (amount of emails that could not be moved back)
+		'''
+    run = find_run_to_undo(journal_path, run_id)
+    journal = self.deletion_journal
+    if journal is None or journal.path != journal_path:
+      journal = deletion_journal(journal_path)
+
+    items_by_folder = {}
+    for item in run['items']:
+      items_by_folder.setdefault((item['mailbox'], item['folder']), []).append(item)
+    summary = {'run_id': run['run_id'], 'restored': 0, 'missing': 0}
+    try:
+      for (mailbox, folder_path), items in items_by_folder.items():
+        folder = self.backend.open_folder(mailbox, folder_path)
+        for batch in iter_in_batches(items, self.deletion_batch_size):
+          entry_ids = []
+          restored_entry_ids = []
+          for item in batch:
+            if item['trash_entry_id'] is None:
+              summary['missing'] += 1
+              continue
+            try:
+              email = self.backend.get_item_by_entry_id(item['trash_entry_id'])
+            except KeyError:
+              summary['missing'] += 1
+              continue
+            restored_entry_ids.append(self.backend.restore_item(email, folder))
+            entry_ids.append(item['entry_id'])
+          if len(entry_ids) > 0:
+            journal.record_restore(run['run_id'], entry_ids, restored_entry_ids)
+          summary['restored'] += len(entry_ids)
+    finally:
+      if journal is not self.deletion_journal:
+        journal.close()
+    return summary
+
+  def select_target_mailbox_by_address(self, email: str) -> None:
+    '''
+		Selects a mailbox by its email address instead of its option number.
+		:param email: (str) email address of the mailbox, one of the values of mailbox_options
+		:return: None
+		'''
+    mailbox_email = self.find_mailbox(email)
+    for option, each_email in self.mailbox_options.items():
+      if each_email == mailbox_email:
+        self.select_target_mailbox(option)
+
+  def find_mailbox(self, email: str) -> str:
+    '''
+		Returns the name of a mailbox from its email address, ignoring case.
+		:param email: (str) email address of the mailbox
+		:return: (str) the mailbox, one of the values of mailbox_options
+		'''
+    for mailbox_email in self.mailbox_options.values():
+      if mailbox_email.lower() == email.lower():
+        return mailbox_email
+    raise ValueError(f"Mailbox {email} is not signed in")
+
+  def set_conditions_from_rule(self, rule: dict) -> None:
+    '''
+		Sets the deletion conditions of a rule, each condition goes through the same setter
+		as a condition entered by the user.
+		:param rule: (dict) the rule, see load_rules_file
+		:return: None
+		'''
+    setters = {'sender_email': self.set_target_sender_email,
+               'sender_name': self.set_target_sender_name,
+               'sender_domain': self.set_target_sender_domain,
+               'start_date': self.set_target_start_date,
+               'end_date': self.set_target_end_date,
+               'subject_keyphrase': self.set_target_subject_keyphrase,
+               'expression': self.set_target_rule_expression,
+               'missing_property': self.set_target_missing_property}
+    for key in RULE_CONDITION_KEYS:
+      if key in rule:
+        setters[key](rule[key])
+
+  def get_conditions_as_dict(self) -> dict:
+    '''
+		Returns the deletion conditions in the format of a rule of a rules file, so they can be
+		set again with set_conditions_from_rule.
+		:return: (dict) the conditions, see load_rules_file
+		'''
+    conditions = {'sender_email': self.target_sender_email,
+                  'sender_name': self.target_sender_name,
+                  'sender_domain': self.target_sender_domain,
+                  'subject_keyphrase': self.target_subject_keyphrase,
+                  'expression': self.target_rule_expression_text,
+                  'missing_property': self.target_missing_property}
+    if self.target_start_date is not None:
+      conditions['start_date'] = self.target_start_date.strftime("%m/%d/%Y")
+    if self.target_end_date is not None:
+      conditions['end_date'] = self.target_end_date.strftime("%m/%d/%Y")
+    return {key: value for key, value in conditions.items() if value is not None}
+
+  def compile_rules(self, rules: list) -> list:
+    '''
+		Compiles the rules of a batch run, each rule goes through the same setters and
+		verification as conditions entered by the user. The deletion conditions of the
+		model are cleared afterwards. Raises a ValueError naming the rule if a rule is invalid.
+		:param rules: (list) list of dicts, see load_rules_file
+		:return: (list) list of deletion_rule, in the order of the rules
+		'''
+    compiled_rules = []
+    for each_rule in rules:
+      self.clear_deleting_conditions()
+      try:
+        self.set_conditions_from_rule(each_rule)
+        self.verify_deletion_conditions()
+      except (EmptyConditionsError, DateConversionError, MissingStartDate, RuntimeError, ValueError, TypeError,
+              AttributeError) as error:
+        raise ValueError(f"Rule '{each_rule['name']}' is invalid: {error}")
+      compiled_rules.append(deletion_rule(each_rule['name'], self.predicate_plan, self.build_restrict_filter(),
+                                          self.deletion_confirmation_str))
+    self.clear_deleting_conditions()
+    return compiled_rules
+
+  def delete_emails_matching_rules(self, rules: list) -> list:
+    '''
+		Deletes the emails matching any of the rules, in a single pass over the selected
+		folder. Each email is deleted at most once. The progress is reported to the
+		progress_callback, if there is one.
+		:param rules: (list) list of deletion_rule, see compile_rules
+		:return: (list) summary of each rule, see deletion_rule.get_summary
+		'''
+    all_emails = self.get_all_emails_from_directory()
+    restrict_filter = combine_restrict_filters(rules) if self.use_restrict_filter else None
+    if restrict_filter is not None:
+      all_emails = self.backend.restrict_items(all_emails, restrict_filter)
+
+    if self.deletion_journal is not None:
+      self.last_run_id = self.deletion_journal.start_run(self.selected_email, self.selected_folder_path, None, None)
+    amt_deleted = 0
+    progress = None if self.progress_callback is None else progress_tracker(self.progress_callback)
+    single_pass = rule_pass(rules)
+    matching_entry_ids = single_pass.iter_matching_entry_ids(all_emails, progress)
+    for batch in iter_in_batches(matching_entry_ids, self.deletion_batch_size):
+      trash_entry_ids = {}
+      amt_batch_deleted = delete_emails_by_entry_id(self.backend, batch, trash_entry_ids)
+      if self.deletion_journal is not None:
+        self.deletion_journal.record_batch(batch, amt_batch_deleted, trash_entry_ids=trash_entry_ids)
+      amt_deleted += amt_batch_deleted
+      if progress is not None:
+        progress.add_deleted(amt_batch_deleted)
+      if self.metadata_index is not None:
+        self.metadata_index.remove_entries(self.selected_email, self.selected_folder_path, batch)
+    if progress is not None:
+      progress.finish()
+    self.delete_counter += amt_deleted
+    if self.deletion_journal is not None:
+      self.deletion_journal.finish_run(amt_deleted)
+    for property_name, amount in single_pass.missing_property_counts.items():
+      self.count_missing_property(property_name, amount)
+    if self.statistics is not None:
+      for rule in rules:
+        self.statistics.record_predicates(rule.name, rule.predicate_plan.get_statistics())
+    return [rule.get_summary() for rule in rules]
+
+  def get_conditions_as_rule(self) -> deletion_rule:
+    '''
+		Returns the verified deletion conditions as a rule, so they can be run like the
+		rules of a rules file. Can only run after verify_deletion_conditions has been run.
+		:return: (deletion_rule) the rule
+		'''
+    if self.verified_conditions == False:
+      raise RuntimeError("Conditions Must Be Verified before Searching For Emails")
+    return deletion_rule("conditions", self.predicate_plan, self.build_restrict_filter(),
+                         self.deletion_confirmation_str)
+
+  def delete_emails_in_mailboxes(self, mailboxes: list = None, rules: list = None, max_workers: int = None) -> dict:
+    '''
+		Deletes the emails matching the rules from the Inbox of several mailboxes at the same
+		time, each mailbox is cleaned by its own worker with its own backend session. The
+		metadata_index is not used by the workers.
+		:param mailboxes: (list) email addresses of the mailboxes, all mailbox_options if None
+		:param rules: (list) list of deletion_rule (see compile_rules), the verified deletion
+		conditions if None
+		:param max_workers: (int) maximum amount of mailboxes cleaned at the same time, all if None
+		:return: (dict) the merged summary (see merge_mailbox_results) with the result of
+		each mailbox under the key mailboxes, and the statistics of the run under the key
+		statistics when instrumentation is enabled (see enable_instrumentation)
+		'''
+    if rules is None:
+      rules = [self.get_conditions_as_rule()]
+    if mailboxes is None:
+      mailboxes = list(self.mailbox_options.values())
+    else:
+      mailboxes = list(dict.fromkeys(self.find_mailbox(each_email) for each_email in mailboxes))
+
+    if self.deletion_journal is not None:
+      self.last_run_id = self.deletion_journal.start_run(None, 'Inbox', None, None)
+    results = clean_mailboxes_in_parallel(self.backend, mailboxes, rules, max_workers, self.use_restrict_filter,
+                                          self.deletion_batch_size, self.deletion_journal, self.sender_resolver)
+    summary = merge_mailbox_results(results)
+    if self.deletion_journal is not None:
+      self.deletion_journal.finish_run(summary['deleted'])
+    summary['mailboxes'] = results
+    if self.statistics is not None:
+      summary['statistics'] = self.statistics.get_stats()
+    self.delete_counter += summary['deleted']
+    for property_name, amount in summary['missing'].items():
+      self.count_missing_property(property_name, amount)
+    return summary
+
+  def delete_emails_in_folder_tree(self, root_folder: str = None, include_patterns: list = None,
+                                   exclude_patterns: list = None, rules: list = None, max_workers: int = None) -> dict:
+    '''
+		Deletes the emails matching the rules from a folder and all of its sub folders in the
+		selected mailbox. The folders are put in a work queue cleaned by a pool of workers, each
+		with its own backend session. The metadata_index is not used by the workers.
+		:param root_folder: (str) path of the top folder of the tree (ex. Inbox), every folder
+		of the mailbox if None
+		:param include_patterns: (list) only folders matching one of these patterns are cleaned,
+		see folder_traversal.select_folders
+		:param exclude_patterns: (list) folders matching one of these patterns are not cleaned,
+		see folder_traversal.select_folders
+		:param rules: (list) list of deletion_rule (see compile_rules), the verified deletion
+		conditions if None
+		:param max_workers: (int) amount of folders cleaned at the same time, see clean_folders_in_parallel
+		:return: (dict) the merged summary (see merge_mailbox_results) with the result of
+		each folder under the key folders, and the statistics of the run under the key
+		statistics when instrumentation is enabled (see enable_instrumentation)
+		'''
+    if self.selected_email == None:
+      raise RuntimeError('select_target_mailbox must be called before calling delete_emails_in_folder_tree in model')
+    if rules is None:
+      rules = [self.get_conditions_as_rule()]
+
+    folder_paths = select_folders(self.backend.list_folders(self.selected_email), root_folder, include_patterns,
+                                  exclude_patterns)
+    if len(folder_paths) == 0:
+      raise ValueError("No folder of the mailbox matches the given folders")
+
+    if self.deletion_journal is not None:
+      self.last_run_id = self.deletion_journal.start_run(self.selected_email, None, None, None)
+    results = clean_folders_in_parallel(self.backend, self.selected_email, folder_paths, rules, max_workers,
+                                        self.use_restrict_filter, self.deletion_batch_size, self.deletion_journal,
+                                        self.sender_resolver)
+    summary = merge_mailbox_results(results)
+    if self.deletion_journal is not None:
+      self.deletion_journal.finish_run(summary['deleted'])
+    summary['folders'] = results
+    if self.statistics is not None:
+      summary['statistics'] = self.statistics.get_stats()
+    self.delete_counter += summary['deleted']
+    for property_name, amount in summary['missing'].items():
+      self.count_missing_property(property_name, amount)
+    return summary
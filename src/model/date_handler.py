@@ -1,3 +1,4 @@
+import sys
 from datetime import datetime, timezone
 
 LOCAL_TIMEZONE = datetime.now(timezone.utc).astimezone().tzinfo
@@ -111,4 +112,51 @@ class date_handler():
 		:return: (datetime) the datetime representation of the date an email was sent
 		"""
 
-		return datetime.fromtimestamp(msg.SentOn.timestamp(), msg.SentOn.tzinfo)
\ No newline at end of file
+		return datetime.fromtimestamp(msg.SentOn.timestamp(), msg.SentOn.tzinfo)
+
+	def convert_sent_on_timestamp(self, msg) -> float:
+		"""
+		Returns the SentOn property of an email item as a POSIX timestamp, without
+		building a new datetime object.
+		:param msg: (win32com.client.CDispatch) the email item whose sentOn property we want to extract
+		the timestamp from
+		:return: (float) seconds since the epoch
+		"""
+		return msg.SentOn.timestamp()
+
+	def get_timestamp_bounds(self, lower_bound: datetime, upper_bound: datetime) -> tuple:
+		"""
+		Converts the bounds of a date range into POSIX timestamps once, so emails
+		can be compared against them as plain numbers.
+		:param lower_bound: (datetime) lower boundary date
+		:param upper_bound: (datetime) upper boundary date
+		:return: (tuple) (lower timestamp, upper timestamp)
+		"""
+		return lower_bound.timestamp(), upper_bound.timestamp()
+
+	def convert_dates_to_timestamps(self, dates) -> list:
+		"""
+		Converts a sequence of datetimes into POSIX timestamps. None values
+		(emails without a SentOn date) are kept as None.
+		:param dates: iterable of datetime or None
+		:return: (list) list of float or None
+		"""
+		return [None if date is None else date.timestamp() for date in dates]
+
+	def check_timestamps_between(self, lower_timestamp: float, upper_timestamp: float, timestamps):
+		"""
+		Checks a whole sequence of timestamps against a date range in one call.
+		:param lower_timestamp: (float) lower boundary, see get_timestamp_bounds
+		:param upper_timestamp: (float) upper boundary, see get_timestamp_bounds
+		:param timestamps: list of float or None, or a numpy array of float with NaN
+		for missing dates
+		:return: (list) True or False per timestamp, None where the timestamp is missing.
+		For a numpy array, a numpy array of bool where missing dates are False.
+		"""
+		# numpy is optional and slow to import: a numpy array can only be given if the caller imported it
+		numpy = sys.modules.get('numpy')
+		if numpy is not None and isinstance(timestamps, numpy.ndarray):
+			# comparisons with NaN are False
+			return (timestamps >= lower_timestamp) & (timestamps <= upper_timestamp)
+		return [None if timestamp is None else lower_timestamp <= timestamp <= upper_timestamp
+				for timestamp in timestamps]
@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+"""
+This file keeps a journal of deletions in an append-only JSON lines file, so
+an interrupted deletion (Outlook hanging, COM errors...) can be resumed instead
+of searching the whole folder again.
+
+Each line is one record:
+ - run: a deletion started, with the mailbox, folder and deletion conditions
+   (None for runs of rules, or of several mailboxes or folders, which cannot
+   be resumed)
+ - batch: a batch of emails was deleted, with their EntryIDs, the mailbox and
+   folder they were deleted from, the EntryIDs they got in the trash folder
+   and the position of the scan (see below)
+ - checkpoint: written every checkpoint_interval batches, the file is then
+   synced to disk
+ - resume: an unfinished run was resumed
+ - end: the run finished
+ - restore: emails of a run were moved back from the trash folder (undo)
+
+The folder is scanned from its newest to its oldest email according to a sort
+property (ReceivedTime, or SentOn when a date range is searched). The position
+of a batch is the sort property of its last email: every email with a greater
+value has been checked. A resumed run only checks the emails at or before the
+position of the last checkpoint, and skips the EntryIDs journaled since.
+Emails of a batch interrupted before it was journaled are deleted, but not
+counted in the deleted amount of the run.
+
+A run is undone by looking up its emails in the trash folder by the EntryIDs
+journaled with its batches, there is no need to search the trash folder.
+"""
+
+# amount of batches between two checkpoints
+CHECKPOINT_INTERVAL = 10
+
+
+def format_journal_date(date: datetime) -> str:
+	"""
+	:param date: (datetime) a timezone aware datetime
+	:return: (str) the date in ISO 8601 format
+	"""
+	return date.isoformat()
+
+
+def read_journal(path: str) -> list:
+	"""
+	Reads the records of a journal. Lines cut short by an interruption are ignored.
+	:param path: (str) path of the journal file
+	:return: (list) list of dict records, in the order they were written
+	"""
+	records = []
+	with open(path, 'r', encoding='utf-8') as journal_file:
+		for line in journal_file:
+			if line.strip() == "":
+				continue
+			try:
+				records.append(json.loads(line))
+			except json.JSONDecodeError:
+				continue
+	return records
+
+
+def find_unfinished_run(path: str) -> dict:
+	"""
+	Finds the last run of a journal that did not finish.
+	:param path: (str) path of the journal file
+	:return: (dict) None if every run finished, otherwise a dict with the keys run_id, mailbox, folder,
+	conditions, sort_property, position (datetime of the last checkpoint, None to scan the whole folder),
+	deleted (amount of emails deleted so far) and processed_entry_ids (set of the EntryIDs deleted so far)
+	"""
+	runs = {}
+	for record in read_journal(path):
+		if record['type'] == 'run' and record['conditions'] is None:
+			continue
+		elif record['type'] == 'run':
+			runs[record['run_id']] = {'run_id': record['run_id'], 'mailbox': record['mailbox'],
+									  'folder': record['folder'], 'conditions': record['conditions'],
+									  'sort_property': record['sort_property'], 'position': None, 'deleted': 0,
+									  'processed_entry_ids': set()}
+		elif record['run_id'] not in runs:
+			continue
+		elif record['type'] == 'batch':
+			runs[record['run_id']]['processed_entry_ids'].update(record['entry_ids'])
+			runs[record['run_id']]['deleted'] += record['deleted']
+		elif record['type'] == 'checkpoint':
+			if record['position'] is not None:
+				runs[record['run_id']]['position'] = datetime.fromisoformat(record['position'])
+		elif record['type'] == 'end':
+			del runs[record['run_id']]
+	if len(runs) == 0:
+		return None
+	return list(runs.values())[-1]
+
+
+def find_run_to_undo(path: str, run_id: str = None) -> dict:
+	"""
+	Finds the emails of a run that can be moved back from the trash folder.
+	:param path: (str) path of the journal file
+	:param run_id: (str) id of the run, or a prefix of it matching a single run, the last run if None
+	:return: (dict) dict with the keys run_id, items (list of dicts with the keys mailbox, folder,
+	entry_id and trash_entry_id, None if the email was deleted for good) and restored (amount of
+	emails already moved back, which are not in items). Raises a ValueError if no run, or several
+	runs, match run_id.
+	"""
+	records = read_journal(path)
+	run_ids = [record['run_id'] for record in records if record['type'] == 'run']
+	if run_id is None:
+		matching_run_ids = run_ids[-1:]
+	else:
+		matching_run_ids = [each_run_id for each_run_id in run_ids if each_run_id.startswith(run_id)]
+	if len(matching_run_ids) == 0:
+		raise ValueError(f"There is no run to undo in {path}" if run_id is None
+						 else f"There is no run {run_id} in {path}")
+	if len(matching_run_ids) > 1:
+		raise ValueError(f"Several runs start with {run_id}, give more of the run id")
+
+	items = {}
+	amt_restored = 0
+	for record in records:
+		if record.get('run_id') != matching_run_ids[0]:
+			continue
+		if record['type'] == 'batch':
+			trash_entry_ids = record.get('trash_entry_ids', {})
+			for entry_id in record['entry_ids']:
+				# EntryIDs of a batch that could not be found were not deleted
+				if entry_id in trash_entry_ids:
+					items[entry_id] = {'mailbox': record['mailbox'], 'folder': record['folder'], 'entry_id': entry_id,
+									   'trash_entry_id': trash_entry_ids[entry_id]}
+		elif record['type'] == 'restore':
+			for entry_id in record['entry_ids']:
+				if items.pop(entry_id, None) is not None:
+					amt_restored += 1
+	return {'run_id': matching_run_ids[0], 'items': list(items.values()), 'restored': amt_restored}
+
+
+class deletion_journal():
+	"""
+	Append-only journal of the deletions of a run, see the top of this file. Batches
+	can be journaled from several threads.
+	"""
+
+	def __init__(self, path: str, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+		"""
+		:param path: (str) path of the journal file, created if needed
+		:param checkpoint_interval: (int) amount of batches between two checkpoints
+		"""
+		self.path = path
+		self.checkpoint_interval = checkpoint_interval
+		self.journal_file = open(path, 'a+', encoding='utf-8')
+		# the last line is cut short if the program was killed while writing it
+		if self.journal_file.tell() > 0:
+			self.journal_file.seek(self.journal_file.tell() - 1)
+			if self.journal_file.read(1) != "\n":
+				self.journal_file.write("\n")
+		self.run_id = None
+		self.mailbox = None
+		self.folder = None
+		self.amt_batches = 0
+		self.position = None
+		self.lock = threading.Lock()
+
+	def _write(self, record: dict, sync: bool = False) -> None:
+		record['timestamp'] = format_journal_date(datetime.now(timezone.utc))
+		with self.lock:
+			self.journal_file.write(json.dumps(record) + "\n")
+			self.journal_file.flush()
+			if sync:
+				os.fsync(self.journal_file.fileno())
+
+	def start_run(self, mailbox: str, folder: str, conditions: dict, sort_property: str) -> str:
+		"""
+		Journals the start of a run.
+		:param mailbox: (str) name of the mailbox, None if several mailboxes are cleaned
+		:param folder: (str) name of the folder, None if several folders are cleaned
+		:param conditions: (dict) the deletion conditions, in the format of a rule of a rules file,
+		None if the run cannot be resumed
+		:param sort_property: (str) property the folder is scanned by, None if the scan is not
+		ordered (the run can then only be resumed by searching the whole folder again)
+		:return: (str) the id of the run
+		"""
+		self.run_id = uuid.uuid4().hex
+		self.mailbox = mailbox
+		self.folder = folder
+		self.amt_batches = 0
+		self.position = None
+		self._write({'type': 'run', 'run_id': self.run_id, 'mailbox': mailbox, 'folder': folder,
+					 'conditions': conditions, 'sort_property': sort_property}, sync=True)
+		return self.run_id
+
+	def resume_run(self, unfinished_run: dict) -> None:
+		"""
+		Journals that an unfinished run is continued, the following batches belong to it.
+		:param unfinished_run: (dict) the run, see find_unfinished_run
+		:return: None
+		"""
+		self.run_id = unfinished_run['run_id']
+		self.mailbox = unfinished_run['mailbox']
+		self.folder = unfinished_run['folder']
+		self.amt_batches = 0
+		self.position = unfinished_run['position']
+		self._write({'type': 'resume', 'run_id': self.run_id}, sync=True)
+
+	def record_batch(self, entry_ids: list, deleted: int, position: datetime = None, trash_entry_ids: dict = None,
+					 mailbox: str = None, folder: str = None) -> None:
+		"""
+		Journals a batch of deleted emails, a checkpoint is written every checkpoint_interval batches.
+		:param entry_ids: (list) EntryIDs of the emails of the batch
+		:param deleted: (int) amount of emails of the batch actually deleted
+		:param position: (datetime) sort property of the last email of the batch, None if the scan is not ordered
+		:param trash_entry_ids: (dict) EntryID in the trash folder of each deleted email, by its EntryID
+		(see deletion_pipeline.delete_emails_by_entry_id)
+		:param mailbox: (str) mailbox the emails were deleted from, the mailbox of the run if None
+		:param folder: (str) folder the emails were deleted from, the folder of the run if None
+		:return: None
+		"""
+		self._write({'type': 'batch', 'run_id': self.run_id, 'mailbox': mailbox or self.mailbox,
+					 'folder': folder or self.folder, 'entry_ids': list(entry_ids), 'deleted': deleted,
+					 'trash_entry_ids': trash_entry_ids or {},
+					 'position': None if position is None else format_journal_date(position)})
+		with self.lock:
+			self.position = position
+			self.amt_batches += 1
+			write_checkpoint = self.amt_batches % self.checkpoint_interval == 0
+		if write_checkpoint:
+			self.checkpoint()
+
+	def checkpoint(self) -> None:
+		"""
+		Journals a checkpoint at the position of the last batch and syncs the journal to disk.
+		:return: None
+		"""
+		self._write({'type': 'checkpoint', 'run_id': self.run_id,
+					 'position': None if self.position is None else format_journal_date(self.position)}, sync=True)
+
+	def finish_run(self, deleted: int) -> None:
+		"""
+		Journals the end of the run.
+		:param deleted: (int) amount of emails deleted by the run
+		:return: None
+		"""
+		self._write({'type': 'end', 'run_id': self.run_id, 'deleted': deleted}, sync=True)
+		self.run_id = None
+
+	def record_restore(self, run_id: str, entry_ids: list, restored_entry_ids: list) -> None:
+		"""
+		Journals emails of a run moved back from the trash folder, they are not moved back again.
+		:param run_id: (str) id of the run the emails were deleted by
+		:param entry_ids: (list) EntryIDs the emails had when they were deleted
+		:param restored_entry_ids: (list) EntryIDs of the emails once moved back, in the same order
+		:return: None
+		"""
+		self._write({'type': 'restore', 'run_id': run_id, 'entry_ids': list(entry_ids),
+					 'restored_entry_ids': list(restored_entry_ids)}, sync=True)
+
+	def close(self) -> None:
+		"""
+		Closes the journal file.
+		:return: None
+		"""
+		self.journal_file.close()
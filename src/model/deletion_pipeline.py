@@ -0,0 +1,126 @@
+from src.model.property_probe import probe_property, is_missing
+
+"""
+This file contains the helpers used by the cleanup_model to stream matching
+emails into deletion. Emails are visited from the last index to the first, so
+deleting an email only shifts the indexes of emails already visited, and
+deletions are done in batches of EntryIDs so no item handles are held on to.
+"""
+
+
+def iter_items_reversed(items, first_index: int = 1, last_index: int = None):
+	"""
+	Yields the items of a collection from the last (1-based) index to the first.
+	Deleting an already yielded item does not make the iteration skip any item.
+	:param items: item collection supporting Count and Item(index)
+	:param first_index: (int) index of the last item yielded
+	:param last_index: (int) index of the first item yielded, defaults to the last item
+	:return: generator of items
+	"""
+	if last_index is None:
+		last_index = items.Count
+	for index in range(last_index, first_index - 1, -1):
+		try:
+			yield items.Item(index)
+		except IndexError:
+			# collection shrank, i.e. items were removed from outside of the program
+			continue
+
+
+def read_sort_key(item, property_name: str):
+	"""
+	Reads the property a collection is sorted by.
+	:return: the value, or None if the item does not have the property (see property_probe)
+	"""
+	value = probe_property(item, property_name)
+	return None if is_missing(value) else value
+
+
+def bisect_items(items, low: int, high: int, predicate) -> int:
+	"""
+	Binary search over the (1-based) indexes low to high of a sorted collection.
+	predicate must be false for a first part of the items and true for the rest.
+	:return: (int) the first index for which predicate is true, or high + 1 if there is none
+	"""
+	while low <= high:
+		middle = (low + high) // 2
+		if predicate(items.Item(middle)):
+			high = middle - 1
+		else:
+			low = middle + 1
+	return low
+
+
+def find_sorted_range(items, property_name: str, lower_bound, upper_bound) -> tuple:
+	"""
+	Finds the indexes of the items whose property is between two bounds (inclusive)
+	in a collection sorted by that property in ascending order, reading only
+	about log2(Count) items. Items missing the property must be grouped at the
+	start or at the end of the collection.
+	:param items: item collection supporting Count and Item(index)
+	:param property_name: (str) the property the collection is sorted by
+	:param lower_bound: lower bound of the property (inclusive)
+	:param upper_bound: upper bound of the property (inclusive)
+	:return: (tuple) (first index, last index, amount of items missing the property).
+	If no item is between the bounds, the last index is lower than the first index.
+	"""
+	count = items.Count
+	if count == 0:
+		return 1, 0, 0
+	first_present = 1
+	last_present = count
+	if read_sort_key(items.Item(1), property_name) is None:
+		first_present = bisect_items(items, 1, count,
+									 lambda item: read_sort_key(item, property_name) is not None)
+	elif read_sort_key(items.Item(count), property_name) is None:
+		last_present = bisect_items(items, 1, count,
+									lambda item: read_sort_key(item, property_name) is None) - 1
+	amt_missing = count - (last_present - first_present + 1)
+
+	first_index = bisect_items(items, first_present, last_present,
+							   lambda item: getattr(item, property_name) >= lower_bound)
+	last_index = bisect_items(items, first_present, last_present,
+							  lambda item: getattr(item, property_name) > upper_bound) - 1
+	return first_index, last_index, amt_missing
+
+
+def iter_in_batches(iterable, batch_size: int):
+	"""
+	Groups the values of an iterable into lists of at most batch_size values.
+	:param iterable: the values to group
+	:param batch_size: (int) maximum amount of values per batch, must be at least 1
+	:return: generator of lists
+	"""
+	if batch_size < 1:
+		raise ValueError("Batch size must be at least 1")
+	batch = []
+	for value in iterable:
+		batch.append(value)
+		if len(batch) >= batch_size:
+			yield batch
+			batch = []
+	if len(batch) > 0:
+		yield batch
+
+
+def delete_emails_by_entry_id(backend, entry_ids: list, trash_entry_ids: dict = None) -> int:
+	"""
+	Deletes the emails with the given EntryIDs. Emails that can no longer be
+	found are skipped.
+	:param backend: (mailbox_backend_interface) backend holding the emails
+	:param entry_ids: (list) EntryIDs of the emails to delete
+	:param trash_entry_ids: (dict) if given, the EntryID each deleted email has in the trash
+	folder is added to it by its EntryID (None if it was deleted for good), see delete_item
+	:return: (int) the amount of emails deleted
+	"""
+	amt_deleted = 0
+	for entry_id in entry_ids:
+		try:
+			email = backend.get_item_by_entry_id(entry_id)
+		except KeyError:
+			continue
+		trash_entry_id = backend.delete_item(email)
+		if trash_entry_ids is not None:
+			trash_entry_ids[entry_id] = trash_entry_id
+		amt_deleted += 1
+	return amt_deleted
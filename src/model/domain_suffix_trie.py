@@ -0,0 +1,110 @@
+"""
+This file contains the suffix trie used to match sender addresses against
+domain rules. The trie is keyed by the labels of the domains in reverse order
+(com -> x -> news), so checking an address against thousands of rules only
+walks the labels of that address.
+
+Supported rules:
+ - x.com, @x.com or *@x.com : any sender from the domain x.com
+ - *.x.com or *@*.x.com     : any sender from a sub domain of x.com (news.x.com, mail.news.x.com, ...)
+ - name@x.com, name@*.x.com : only the sender name@ from those domains
+"""
+
+ANY_LOCAL_PART = "*"
+
+
+def parse_domain_rule(rule: str) -> tuple:
+	"""
+	Splits a domain rule into its parts.
+	:param rule: (str) the rule, see the supported rules above
+	:return: (tuple) (local part or "*", domain, True if the rule targets sub domains)
+	"""
+	rule = rule.strip().lower()
+	if "@" in rule:
+		local_part, domain = rule.rsplit("@", 1)
+		if local_part == "":
+			local_part = ANY_LOCAL_PART
+	else:
+		local_part, domain = ANY_LOCAL_PART, rule
+
+	include_subdomains = domain.startswith("*.")
+	if include_subdomains:
+		domain = domain[2:]
+	if domain == "" or "*" in domain or (local_part != ANY_LOCAL_PART and "*" in local_part):
+		raise ValueError(f"Invalid sender domain rule {rule}")
+	return local_part, domain, include_subdomains
+
+
+class domain_trie_node():
+	"""
+	Node of the domain_suffix_trie. exact_rules and subdomain_rules map the
+	local parts allowed for the domain ending at this node (or its sub domains)
+	to the rule that added them.
+	"""
+	__slots__ = ('children', 'exact_rules', 'subdomain_rules')
+
+	def __init__(self):
+		self.children = {}
+		self.exact_rules = None
+		self.subdomain_rules = None
+
+
+class domain_suffix_trie():
+	"""
+	Matches email addresses against domain rules in time proportional to the
+	amount of labels in the address domain.
+	"""
+
+	def __init__(self, rules=()):
+		"""
+		:param rules: iterable of str rules, see parse_domain_rule
+		"""
+		self.root = domain_trie_node()
+		self.rules = []
+		for rule in rules:
+			self.add_rule(rule)
+
+	def add_rule(self, rule: str) -> None:
+		"""
+		Adds a rule to the trie.
+		:param rule: (str) the rule, see parse_domain_rule
+		:return: None
+		"""
+		local_part, domain, include_subdomains = parse_domain_rule(rule)
+		node = self.root
+		for label in reversed(domain.split(".")):
+			node = node.children.setdefault(label, domain_trie_node())
+
+		if include_subdomains:
+			if node.subdomain_rules is None:
+				node.subdomain_rules = {}
+			node.subdomain_rules.setdefault(local_part, rule)
+		else:
+			if node.exact_rules is None:
+				node.exact_rules = {}
+			node.exact_rules.setdefault(local_part, rule)
+		self.rules.append(rule)
+
+	def match(self, address: str):
+		"""
+		Returns the rule matching an email address.
+		:param address: (str) the email address
+		:return: (str) the first rule matching the address, or None if no rule matches
+		"""
+		local_part, separator, domain = address.lower().rpartition("@")
+		if separator == "":
+			return None
+		labels = domain.split(".")
+		node = self.root
+		for position in range(len(labels) - 1, -1, -1):
+			node = node.children.get(labels[position])
+			if node is None:
+				return None
+			# sub domain rules only apply if there are labels left
+			if node.subdomain_rules is not None and position > 0:
+				rule = node.subdomain_rules.get(local_part) or node.subdomain_rules.get(ANY_LOCAL_PART)
+				if rule is not None:
+					return rule
+		if node.exact_rules is not None:
+			return node.exact_rules.get(local_part) or node.exact_rules.get(ANY_LOCAL_PART)
+		return None
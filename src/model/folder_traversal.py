@@ -0,0 +1,110 @@
+from fnmatch import fnmatchcase
+
+"""
+This file walks the folder tree of a mailbox. Folders are named by their path
+inside the mailbox, sub folders separated by '/' (ex. Inbox/Promotions). The
+folder objects only need a Name and a Folders collection that can be iterated
+over and called with a sub folder name, like the Outlook Folder object.
+"""
+
+FOLDER_PATH_SEPARATOR = '/'
+
+# folders never cleaned when walking a folder tree, along with their sub folders:
+# deleting from the trash deletes for good and the others are managed by Outlook
+DEFAULT_EXCLUDED_FOLDERS = ('Deleted Items', 'Trash', 'Outbox', 'Sync Issues')
+
+
+def join_folder_path(parent_path: str, folder_name: str) -> str:
+	"""
+	Returns the path of a sub folder.
+	:param parent_path: (str) path of the parent folder, '' for the top of the mailbox
+	:param folder_name: (str) name of the sub folder
+	:return: (str) the path of the sub folder
+	"""
+	if parent_path == '':
+		return folder_name
+	return parent_path + FOLDER_PATH_SEPARATOR + folder_name
+
+
+def open_folder_path(root_folder, folder_path: str):
+	"""
+	Returns the folder at a path, starting from the top folder of a mailbox.
+	:param root_folder: the top folder of the mailbox
+	:param folder_path: (str) path of the folder, ex. Inbox/Promotions
+	:return: the folder, raises a KeyError if there is no such folder
+	"""
+	folder = root_folder
+	for folder_name in folder_path.split(FOLDER_PATH_SEPARATOR):
+		folder = folder.Folders(folder_name)
+	return folder
+
+
+def iter_folder_paths(root_folder, folder_filter=None, parent_path: str = ''):
+	"""
+	Yields the path of every folder below a folder, each folder before its sub folders.
+	:param root_folder: the folder whose sub folders are walked
+	:param folder_filter: function taking a folder and returning False for folders that
+	are skipped along with their sub folders, all folders are walked if None
+	:param parent_path: (str) path of root_folder, '' for the top folder of a mailbox
+	:return: generator of str folder paths
+	"""
+	for folder in root_folder.Folders:
+		if folder_filter is not None and not folder_filter(folder):
+			continue
+		folder_path = join_folder_path(parent_path, folder.Name)
+		yield folder_path
+		yield from iter_folder_paths(folder, folder_filter, folder_path)
+
+
+def iter_path_and_ancestors(folder_path: str):
+	"""
+	Yields a folder path followed by the paths of the folders it is in, ex. Inbox/A/B,
+	Inbox/A and Inbox.
+	:param folder_path: (str) path of the folder
+	:return: generator of str folder paths
+	"""
+	folder_names = folder_path.split(FOLDER_PATH_SEPARATOR)
+	for amt_names in range(len(folder_names), 0, -1):
+		yield FOLDER_PATH_SEPARATOR.join(folder_names[:amt_names])
+
+
+def matches_folder_pattern(folder_path: str, patterns: list) -> bool:
+	"""
+	Checks if a folder or one of the folders it is in matches any of the shell style
+	patterns (see fnmatch), ignoring case. A pattern thus matches a whole sub tree.
+	:param folder_path: (str) path of the folder
+	:param patterns: (list) list of str patterns, ex. Archive or Inbox/*
+	:return: (bool) True if a pattern matches
+	"""
+	lowered_patterns = [pattern.lower().strip(FOLDER_PATH_SEPARATOR) for pattern in patterns]
+	for path in iter_path_and_ancestors(folder_path.lower()):
+		if any(fnmatchcase(path, pattern) for pattern in lowered_patterns):
+			return True
+	return False
+
+
+def select_folders(folder_paths: list, root_folder: str = None, include_patterns: list = None,
+				   exclude_patterns: list = None) -> list:
+	"""
+	Selects the folders of a folder tree to clean.
+	:param folder_paths: (list) paths of all folders of the mailbox, see iter_folder_paths
+	:param root_folder: (str) only this folder and its sub folders are selected, all folders if None
+	:param include_patterns: (list) only folders matching one of these patterns (see
+	matches_folder_pattern) are selected, all folders if None or empty
+	:param exclude_patterns: (list) folders matching one of these patterns are not selected,
+	the DEFAULT_EXCLUDED_FOLDERS are always excluded
+	:return: (list) the selected str folder paths, in the order of folder_paths
+	"""
+	exclude_patterns = list(DEFAULT_EXCLUDED_FOLDERS) + list(exclude_patterns or [])
+	if root_folder is not None:
+		root_folder = root_folder.strip(FOLDER_PATH_SEPARATOR).lower()
+	selected_paths = []
+	for folder_path in folder_paths:
+		if root_folder is not None and root_folder not in iter_path_and_ancestors(folder_path.lower()):
+			continue
+		if include_patterns and not matches_folder_pattern(folder_path, include_patterns):
+			continue
+		if matches_folder_pattern(folder_path, exclude_patterns):
+			continue
+		selected_paths.append(folder_path)
+	return selected_paths
@@ -0,0 +1,374 @@
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+from src.model.mailbox_backend_interface import mailbox_backend_interface
+from src.model.property_probe import read_property, register_property_reader
+
+"""
+This file measures where the time of a run goes. run_statistics holds counters
+(calls to the backend, to item collections and reads of each email property)
+and cumulative timers per stage:
+ - connect: connecting the backend
+ - enumerate: getting emails out of item collections (Item(index), iteration)
+ - sort: sorting item collections
+ - restrict: restricting item collections and fetching snapshot tables
+ - match: checking emails against the deletion conditions
+ - dates: date conversions of the date_handler
+ - delete: deleting emails
+ - resolve: looking up the SMTP addresses of Exchange senders (see sender_resolver)
+Stages can nest (matching reads properties, which may take COM calls), so the
+timers do not add up to the time of the run.
+The backend is measured by wrapping it in an instrumented_backend, which wraps
+the collections and items it returns in turn, so nothing is measured (and
+nothing costs anything) unless instrumentation is enabled. Worker sessions made
+by create_session are not measured.
+cProfile and tracemalloc can also be run along, see start_profiling. They are
+imported when first used, so that runs without profiling do not load them.
+"""
+
+# amount of functions, and of allocation sites, listed by get_stats
+PROFILE_TOP = 20
+
+
+class run_statistics():
+	"""
+	Counters and stage timers of a run, see the top of this file.
+	"""
+
+	def __init__(self):
+		self.counters = {}  # key: name, value: amount of calls
+		self.timers = {}  # key: stage, value: cumulative seconds
+		self.wrapped_methods = []  # (object, method name) replaced by wrap_method
+		self.profiler = None  # cProfile.Profile, once start_profiling was asked to profile
+		self.profiling = False  # true while the profiler is enabled
+		self.trace_memory = False  # true while tracemalloc is tracing for this run
+		self.memory_stats = None  # last get_memory_stats, kept once tracemalloc is stopped
+		self.predicates = {}  # key: name of the conditions (or rule), value: predicate_plan.get_statistics
+
+	def count(self, name: str, amount: int = 1) -> None:
+		"""
+		:param name: (str) name of the counter
+		:param amount: (int) amount added to the counter
+		:return: None
+		"""
+		self.counters[name] = self.counters.get(name, 0) + amount
+
+	def add_time(self, stage: str, seconds: float) -> None:
+		"""
+		:param stage: (str) name of the stage
+		:param seconds: (float) seconds added to the timer of the stage
+		:return: None
+		"""
+		self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+
+	@contextmanager
+	def time_stage(self, stage: str):
+		"""
+		Adds the time spent in the with block to the timer of a stage.
+		:param stage: (str) name of the stage
+		"""
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.add_time(stage, time.perf_counter() - start)
+
+	def wrap_method(self, obj, method_name: str, stage: str) -> None:
+		"""
+		Replaces a method of an object (not of its class) by one counting its calls and timing them
+		in a stage, until unwrap_methods is called.
+		:param obj: the object, for ex. the date_handler
+		:param method_name: (str) name of the method
+		:param stage: (str) the stage the calls are timed in
+		:return: None
+		"""
+		method = getattr(obj, method_name)
+		counter_name = f"{type(obj).__name__}.{method_name}"
+
+		@wraps(method)
+		def measured_method(*args, **kwargs):
+			self.count(counter_name)
+			start = time.perf_counter()
+			try:
+				return method(*args, **kwargs)
+			finally:
+				self.add_time(stage, time.perf_counter() - start)
+
+		setattr(obj, method_name, measured_method)
+		self.wrapped_methods.append((obj, method_name))
+
+	def unwrap_methods(self) -> None:
+		"""
+		Gives back their own methods to the objects changed by wrap_method.
+		:return: None
+		"""
+		for obj, method_name in self.wrapped_methods:
+			obj.__dict__.pop(method_name, None)
+		self.wrapped_methods = []
+
+	def start_profiling(self, profile: bool = False, trace_memory: bool = False) -> None:
+		"""
+		Starts cProfile and/or tracemalloc, their results are added to get_stats.
+		:param profile: (bool) if true, every function call is profiled (slows the run down)
+		:param trace_memory: (bool) if true, memory allocations are traced (slows the run down)
+		:return: None
+		"""
+		if profile and not self.profiling:
+			if self.profiler is None:
+				import cProfile
+				self.profiler = cProfile.Profile()
+			self.profiler.enable()
+			self.profiling = True
+		if trace_memory and not self.trace_memory:
+			import tracemalloc
+			self.trace_memory = True
+			tracemalloc.start()
+
+	def stop_profiling(self) -> None:
+		"""
+		Stops cProfile and tracemalloc, their last results are kept.
+		:return: None
+		"""
+		if self.profiling:
+			self.profiler.disable()
+			self.profiling = False
+		if self.trace_memory:
+			import tracemalloc
+			self.memory_stats = self.get_memory_stats()
+			tracemalloc.stop()
+			self.trace_memory = False
+
+	def get_profile_stats(self) -> list:
+		"""
+		:return: (list) the PROFILE_TOP functions taking the most cumulative time, dicts with the
+		keys function, calls, total_seconds and cumulative_seconds
+		"""
+		import pstats
+
+		# the profiler is stopped while its stats are read
+		if self.profiling:
+			self.profiler.disable()
+		profile_stats = pstats.Stats(self.profiler)
+		if self.profiling:
+			self.profiler.enable()
+		rows = []
+		for (file_name, line, function), (_, calls, total_time, cumulative_time, _) in profile_stats.stats.items():
+			rows.append({'function': f"{file_name}:{line}({function})", 'calls': calls,
+						 'total_seconds': total_time, 'cumulative_seconds': cumulative_time})
+		rows.sort(key=lambda row: row['cumulative_seconds'], reverse=True)
+		return rows[:PROFILE_TOP]
+
+	def get_memory_stats(self) -> dict:
+		"""
+		:return: (dict) dict with the keys current_bytes, peak_bytes and top (the PROFILE_TOP lines
+		holding the most memory, dicts with the keys line, bytes and blocks)
+		"""
+		import tracemalloc
+
+		current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+		top = [{'line': str(statistic.traceback), 'bytes': statistic.size, 'blocks': statistic.count}
+			   for statistic in tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]]
+		return {'current_bytes': current_bytes, 'peak_bytes': peak_bytes, 'top': top}
+
+	def record_predicates(self, name: str, predicate_statistics: list) -> None:
+		"""
+		Keeps how many emails each deletion condition checked and pruned.
+		:param name: (str) name of the conditions, or of the rule they belong to
+		:param predicate_statistics: (list) see predicate_plan.get_statistics
+		:return: None
+		"""
+		self.predicates[name] = predicate_statistics
+
+	def get_stats(self) -> dict:
+		"""
+		:return: (dict) dict with the keys counters and timers (sorted by name), profile
+		(see get_profile_stats) and memory (see get_memory_stats) when they were started, and
+		predicates (see record_predicates) when conditions were recorded
+		"""
+		stats = {'counters': dict(sorted(self.counters.items())), 'timers': dict(sorted(self.timers.items()))}
+		if len(self.predicates) > 0:
+			stats['predicates'] = dict(self.predicates)
+		if self.profiler is not None:
+			stats['profile'] = self.get_profile_stats()
+		if self.trace_memory:
+			stats['memory'] = self.get_memory_stats()
+		elif self.memory_stats is not None:
+			stats['memory'] = self.memory_stats
+		return stats
+
+	def write_json(self, path: str) -> None:
+		"""
+		Writes get_stats to a JSON file, so runs can be compared.
+		:param path: (str) path of the file, overwritten if it exists
+		:return: None
+		"""
+		with open(path, 'w', encoding='utf-8') as stats_file:
+			json.dump(self.get_stats(), stats_file, indent=2)
+
+
+class instrumented_item():
+	"""
+	Wraps an email item, counting the reads of each of its properties. Missing
+	properties still raise an AttributeError.
+	"""
+	__slots__ = ('_item', '_statistics')
+
+	def __init__(self, item, statistics: run_statistics):
+		self._item = item
+		self._statistics = statistics
+
+	def __getattr__(self, name: str):
+		self._statistics.count(f"property.{name}")
+		return getattr(self._item, name)
+
+
+def read_instrumented_property(item: instrumented_item, property_name: str):
+	"""
+	Property reader of instrumented_item, counts the read and reads the property with
+	the property reader of the wrapped item, see register_property_reader.
+	:param item: (instrumented_item) the item
+	:param property_name: (str) name of the property
+	:return: the value of the property, or ABSENT if the item does not have it
+	"""
+	item._statistics.count(f"property.{property_name}")
+	return read_property(item._item, property_name)
+
+
+register_property_reader(instrumented_item, read_instrumented_property)
+
+
+class instrumented_items():
+	"""
+	Wraps an item collection, counting and timing Count, Item(index), Sort and
+	iteration. Items are returned wrapped in an instrumented_item.
+	"""
+
+	def __init__(self, items, statistics: run_statistics):
+		self._items = items
+		self._statistics = statistics
+
+	@property
+	def Count(self) -> int:
+		self._statistics.count("items.Count")
+		return self._items.Count
+
+	def Item(self, index: int):
+		self._statistics.count("items.Item")
+		with self._statistics.time_stage('enumerate'):
+			item = self._items.Item(index)
+		return instrumented_item(item, self._statistics)
+
+	def Sort(self, property_name: str, descending: bool = False) -> None:
+		self._statistics.count("items.Sort")
+		with self._statistics.time_stage('sort'):
+			self._items.Sort(property_name, descending)
+
+	def Restrict(self, filter_str: str):
+		self._statistics.count("items.Restrict")
+		with self._statistics.time_stage('restrict'):
+			return instrumented_items(self._items.Restrict(filter_str), self._statistics)
+
+	def __iter__(self):
+		items = iter(self._items)
+		while True:
+			start = time.perf_counter()
+			try:
+				item = next(items)
+			except StopIteration:
+				return
+			finally:
+				self._statistics.add_time('enumerate', time.perf_counter() - start)
+			self._statistics.count("items.next")
+			yield instrumented_item(item, self._statistics)
+
+
+def unwrap(wrapped):
+	"""
+	:param wrapped: an item or item collection, wrapped or not
+	:return: the item or item collection of the measured backend
+	"""
+	if isinstance(wrapped, instrumented_item):
+		return wrapped._item
+	if isinstance(wrapped, instrumented_items):
+		return wrapped._items
+	return wrapped
+
+
+class instrumented_backend(mailbox_backend_interface):
+	"""
+	Wraps a backend, counting and timing its calls, see the top of this file.
+	The mailbox_backend_interface provides method docs.
+	"""
+
+	def __init__(self, backend: mailbox_backend_interface, statistics: run_statistics):
+		self.backend = backend
+		self.statistics = statistics
+
+	def __getattr__(self, name: str):
+		# attributes of the measured backend (for ex. com_obj) are read through
+		return getattr(self.backend, name)
+
+	def connect(self):
+		self.statistics.count("backend.connect")
+		with self.statistics.time_stage('connect'):
+			return self.backend.connect()
+
+	def disconnect(self) -> None:
+		self.statistics.count("backend.disconnect")
+		self.backend.disconnect()
+
+	def create_session(self):
+		return self.backend.create_session()
+
+	def initialize_thread(self) -> None:
+		self.backend.initialize_thread()
+
+	def uninitialize_thread(self) -> None:
+		self.backend.uninitialize_thread()
+
+	def list_mailboxes(self) -> list:
+		self.statistics.count("backend.list_mailboxes")
+		return self.backend.list_mailboxes()
+
+	def list_folders(self, mailbox: str) -> list:
+		self.statistics.count("backend.list_folders")
+		return self.backend.list_folders(mailbox)
+
+	def open_folder(self, mailbox: str, folder_name: str = 'Inbox'):
+		self.statistics.count("backend.open_folder")
+		return self.backend.open_folder(mailbox, folder_name)
+
+	def get_items(self, folder):
+		self.statistics.count("backend.get_items")
+		with self.statistics.time_stage('enumerate'):
+			return instrumented_items(self.backend.get_items(folder), self.statistics)
+
+	def restrict_items(self, items, filter_str: str):
+		self.statistics.count("backend.restrict_items")
+		with self.statistics.time_stage('restrict'):
+			return instrumented_items(self.backend.restrict_items(unwrap(items), filter_str), self.statistics)
+
+	def get_table(self, folder, column_names: tuple, filter_str: str = None):
+		self.statistics.count("backend.get_table")
+		with self.statistics.time_stage('restrict'):
+			return self.backend.get_table(folder, column_names, filter_str)
+
+	def get_item_by_entry_id(self, entry_id: str):
+		self.statistics.count("backend.get_item_by_entry_id")
+		with self.statistics.time_stage('enumerate'):
+			return instrumented_item(self.backend.get_item_by_entry_id(entry_id), self.statistics)
+
+	def resolve_sender_address(self, address: str) -> str:
+		self.statistics.count("backend.resolve_sender_address")
+		with self.statistics.time_stage('resolve'):
+			return self.backend.resolve_sender_address(address)
+
+	def delete_item(self, item) -> str:
+		self.statistics.count("backend.delete_item")
+		with self.statistics.time_stage('delete'):
+			return self.backend.delete_item(unwrap(item))
+
+	def restore_item(self, item, folder) -> str:
+		self.statistics.count("backend.restore_item")
+		return self.backend.restore_item(unwrap(item), folder)
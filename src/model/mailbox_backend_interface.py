@@ -0,0 +1,136 @@
+class mailbox_backend_interface():
+	"""
+	This interface lays out all mandated methods for a mailbox backend to be
+	used in conjunction with the cleanup_model class. A backend hides where the
+	emails actually live (Outlook over COM, memory, Maildir/mbox files etc.).
+	Folders and items returned by a backend must behave like the Outlook object
+	model, i.e. items expose Subject, SenderEmailAddress, SenderName, SentOn,
+	ReceivedTime, EntryID and Delete(), and item collections expose Count,
+	Item(index), Sort(property, descending), Restrict(filter) and iteration.
+	"""
+
+	def connect(self):
+		"""
+		Connects to the mail source.
+		:return: the connection/namespace object for the backend
+		"""
+		raise NotImplementedError()
+
+	def disconnect(self) -> None:
+		"""
+		Releases the connection and flushes any pending changes.
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def create_session(self):
+		"""
+		Creates another backend reading the same mail source, used by a worker
+		thread so it does not share the connection of this backend.
+		:return: (mailbox_backend_interface) the new, not yet connected, backend
+		"""
+		raise NotImplementedError()
+
+	def initialize_thread(self) -> None:
+		"""
+		Prepares the calling thread to use this backend, must be called by a worker
+		thread before connect.
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def uninitialize_thread(self) -> None:
+		"""
+		Releases what initialize_thread set up, must be called by the worker thread
+		once it is done with this backend.
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def list_mailboxes(self) -> list:
+		"""
+		Returns the names of all top level mailboxes (accounts) available.
+		:return: (list) list of str mailbox names
+		"""
+		raise NotImplementedError()
+
+	def list_folders(self, mailbox: str) -> list:
+		"""
+		Returns the paths of all mail folders of a mailbox, each folder before its sub
+		folders. Sub folders are separated by '/' (see folder_traversal.py).
+		:param mailbox: (str) name of the mailbox, one of list_mailboxes()
+		:return: (list) list of str folder paths, ex. Inbox and Inbox/Promotions
+		"""
+		raise NotImplementedError()
+
+	def open_folder(self, mailbox: str, folder_name: str = 'Inbox'):
+		"""
+		Opens a folder of a mailbox.
+		:param mailbox: (str) name of the mailbox, one of list_mailboxes()
+		:param folder_name: (str) path of the folder inside the mailbox, one of list_folders(mailbox)
+		:return: the folder object
+		"""
+		raise NotImplementedError()
+
+	def get_items(self, folder):
+		"""
+		Returns the item collection of a folder.
+		:param folder: a folder returned by open_folder
+		:return: the item collection of the folder
+		"""
+		raise NotImplementedError()
+
+	def restrict_items(self, items, filter_str: str):
+		"""
+		Returns only the items of a collection passing a DASL filter, like the
+		Outlook Items.Restrict method.
+		:param items: an item collection returned by get_items
+		:param filter_str: (str) DASL filter starting with @SQL=
+		:return: the filtered item collection
+		"""
+		raise NotImplementedError()
+
+	def get_table(self, folder, column_names: tuple, filter_str: str = None):
+		"""
+		Fetches the given properties of every email of a folder in bulk, like the
+		Outlook Folder.GetTable method.
+		:param folder: a folder returned by open_folder
+		:param column_names: (tuple) names of the properties to fetch, must include EntryID
+		:param filter_str: (str) optional DASL filter, only emails passing it are fetched
+		:return: (metadata_table) column oriented table of the properties
+		"""
+		raise NotImplementedError()
+
+	def get_item_by_entry_id(self, entry_id: str):
+		"""
+		Returns the item with the given EntryID.
+		:param entry_id: (str) EntryID of the item
+		:return: the item, raises a KeyError if there is no such item
+		"""
+		raise NotImplementedError()
+
+	def resolve_sender_address(self, address: str) -> str:
+		"""
+		Looks up the SMTP address of an Exchange sender, whose SenderEmailAddress is an
+		X.500 address (see sender_resolver).
+		:param address: (str) the X.500 address
+		:return: (str) the SMTP address, None if it cannot be found
+		"""
+		raise NotImplementedError()
+
+	def delete_item(self, item) -> str:
+		"""
+		Deletes (moves to the trash folder) a single item.
+		:param item: an item taken from a collection returned by get_items
+		:return: (str) EntryID of the item in the trash folder, None if it was deleted for good
+		"""
+		raise NotImplementedError()
+
+	def restore_item(self, item, folder) -> str:
+		"""
+		Moves an item of the trash folder back to a folder.
+		:param item: an item returned by get_item_by_entry_id for an EntryID returned by delete_item
+		:param folder: the folder, see open_folder
+		:return: (str) EntryID of the item in the folder
+		"""
+		raise NotImplementedError()
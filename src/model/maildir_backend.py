@@ -0,0 +1,290 @@
+import os
+import mailbox
+from operator import attrgetter
+from datetime import datetime, timezone
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr, parsedate_to_datetime
+from src.model.mailbox_backend_interface import mailbox_backend_interface
+from src.model.memory_backend import memory_folder_collection
+from src.model.metadata_table import metadata_table
+from src.model.folder_traversal import FOLDER_PATH_SEPARATOR
+from src.model.property_probe import ABSENT, register_property_reader
+
+"""
+This file contains a mailbox backend reading emails from Maildir or mbox
+files on disk, so the cleanup_model can run on any system.
+
+Expected layout of the root directory:
+ - maildir: root/<mailbox name>/ is a Maildir holding the Inbox, other folders
+   are Maildir++ sub folders (root/<mailbox name>/.<folder name>/), the folder
+   Archive/2023 being root/<mailbox name>/.Archive.2023/
+ - mbox: root/<mailbox name>/<folder name>.mbox, the folder Archive/2023 being
+   root/<mailbox name>/Archive/2023.mbox
+"""
+
+HEADER_PARSER = BytesHeaderParser()
+
+
+def decode_header_value(value) -> str:
+	"""
+	Decodes a (possibly RFC 2047 encoded) header value into a str.
+	:param value: the raw header value
+	:return: (str) the decoded header value
+	"""
+	try:
+		return str(make_header(decode_header(value)))
+	except (UnicodeError, LookupError, ValueError):
+		return str(value)
+
+
+class mailbox_file_item():
+	"""
+	An email stored in a Maildir or mbox file. Its headers are only read
+	when one of its properties is first accessed. Like on an Outlook item,
+	reading a property the email does not have raises an AttributeError.
+	"""
+	__slots__ = ('_store', '_key', '_headers', 'Parent', '_deleted', 'EntryID')
+
+	def __init__(self, store, key: str, entry_id: str):
+		self._store = store
+		self._key = key
+		self._headers = None
+		self.Parent = None
+		self._deleted = False
+		self.EntryID = entry_id
+
+	def _get_headers(self):
+		if self._headers is None:
+			with self._store.get_file(self._key) as message_file:
+				self._headers = HEADER_PARSER.parse(message_file, headersonly=True)
+		return self._headers
+
+	def _read_sender(self):
+		sender = self._get_headers().get('From')
+		return ABSENT if sender is None else parseaddr(decode_header_value(sender))
+
+	def _read_sender_email_address(self):
+		sender = self._read_sender()
+		return ABSENT if sender is ABSENT or sender[1] == "" else sender[1]
+
+	def _read_sender_name(self):
+		sender = self._read_sender()
+		if sender is ABSENT:
+			return ABSENT
+		name, address = sender
+		return name if name != "" else address
+
+	def _read_sent_on(self):
+		date_header = self._get_headers().get('Date')
+		if date_header is None:
+			return ABSENT
+		try:
+			sent_on = parsedate_to_datetime(str(date_header))
+		except (TypeError, ValueError, IndexError):
+			# an unreadable date is as good as no date
+			return ABSENT
+		if sent_on.tzinfo is None:
+			sent_on = sent_on.replace(tzinfo=timezone.utc)
+		return sent_on
+
+	def _read_received_time(self):
+		# Maildir unique file names start with the delivery timestamp, mbox keys are
+		# ints holding no date
+		if isinstance(self._key, str):
+			try:
+				return datetime.fromtimestamp(float(self._key.split('.')[0]), timezone.utc)
+			except ValueError:
+				pass
+		return self._read_sent_on()
+
+	@staticmethod
+	def _present(value, description: str):
+		if value is ABSENT:
+			raise AttributeError(f"Email has no {description}")
+		return value
+
+	@property
+	def Subject(self) -> str:
+		subject = self._get_headers().get('Subject')
+		return "" if subject is None else decode_header_value(subject)
+
+	@property
+	def SenderEmailAddress(self) -> str:
+		return self._present(self._read_sender_email_address(), "sender email address")
+
+	@property
+	def SenderName(self) -> str:
+		return self._present(self._read_sender_name(), "sender")
+
+	@property
+	def SentOn(self) -> datetime:
+		return self._present(self._read_sent_on(), "readable SentOn date")
+
+	@property
+	def ReceivedTime(self) -> datetime:
+		return self._present(self._read_received_time(), "ReceivedTime")
+
+	@property
+	def LastModificationTime(self) -> datetime:
+		# emails on disk are never modified, only added or removed
+		return self.ReceivedTime
+
+	@property
+	def Size(self) -> int:
+		return len(self._store.get_bytes(self._key))
+
+	def Delete(self) -> None:
+		"""
+		Removes the email from its file store.
+		:return: None
+		"""
+		if self._deleted:
+			return
+		self._store.discard(self._key)
+		self.Parent._remove(self)
+
+
+# key: property name, value: function reading it from a mailbox_file_item, ABSENT if missing
+FILE_ITEM_PROPERTY_READERS = {'Subject': mailbox_file_item.Subject.fget,
+							  'SenderEmailAddress': mailbox_file_item._read_sender_email_address,
+							  'SenderName': mailbox_file_item._read_sender_name,
+							  'SentOn': mailbox_file_item._read_sent_on,
+							  'ReceivedTime': mailbox_file_item._read_received_time,
+							  'LastModificationTime': mailbox_file_item._read_received_time,
+							  'Size': mailbox_file_item.Size.fget,
+							  'EntryID': attrgetter('EntryID')}
+
+
+def read_mailbox_file_property(item: mailbox_file_item, property_name: str):
+	"""
+	Property reader of mailbox_file_item, see register_property_reader.
+	:param item: (mailbox_file_item) the email
+	:param property_name: (str) name of the property
+	:return: the value of the property, or ABSENT if the email does not have it
+	"""
+	read = FILE_ITEM_PROPERTY_READERS.get(property_name)
+	return ABSENT if read is None else read(item)
+
+
+register_property_reader(mailbox_file_item, read_mailbox_file_property)
+
+
+class maildir_backend(mailbox_backend_interface):
+	"""
+	Mailbox backend reading Maildir or mbox folders from a root directory.
+	The mailbox_backend_interface provides method docs.
+	"""
+
+	def __init__(self, root_dir: str, mailbox_format: str = 'maildir'):
+		"""
+		:param root_dir: (str) directory containing one directory per mailbox
+		:param mailbox_format: (str) either 'maildir' or 'mbox'
+		"""
+		if mailbox_format not in ('maildir', 'mbox'):
+			raise ValueError(f"Unsupported mailbox format {mailbox_format}")
+		self.root_dir = root_dir
+		self.mailbox_format = mailbox_format
+		self.Folders = memory_folder_collection()
+		self._open_stores = []
+		self._items_by_entry_id = {}
+
+	def connect(self):
+		if not os.path.isdir(self.root_dir):
+			raise RuntimeError(f"Mailbox directory {self.root_dir} does not exist")
+		return self
+
+	def disconnect(self) -> None:
+		# mbox removals are only written to disk on flush
+		for store in self._open_stores:
+			store.flush()
+			store.close()
+		self._open_stores = []
+
+	def create_session(self):
+		return maildir_backend(self.root_dir, self.mailbox_format)
+
+	def initialize_thread(self) -> None:
+		return
+
+	def uninitialize_thread(self) -> None:
+		return
+
+	def list_mailboxes(self) -> list:
+		return sorted(name for name in os.listdir(self.root_dir)
+					  if os.path.isdir(os.path.join(self.root_dir, name)))
+
+	def list_folders(self, mailbox_name: str) -> list:
+		mailbox_path = os.path.join(self.root_dir, mailbox_name)
+		if self.mailbox_format == 'mbox':
+			folder_paths = []
+			for directory, directory_names, file_names in os.walk(mailbox_path):
+				directory_names.sort()
+				relative_directory = os.path.relpath(directory, mailbox_path)
+				for file_name in sorted(file_names):
+					if file_name.endswith('.mbox'):
+						file_path = os.path.normpath(os.path.join(relative_directory, file_name[:-len('.mbox')]))
+						folder_paths.append(file_path.replace(os.sep, FOLDER_PATH_SEPARATOR))
+			return folder_paths
+
+		# Maildir++ sub folders are all stored next to each other, named by their dotted path
+		store = mailbox.Maildir(mailbox_path, factory=None, create=False)
+		return ['Inbox'] + sorted(folder_name.replace('.', FOLDER_PATH_SEPARATOR) for folder_name in store.list_folders())
+
+	def _open_store(self, mailbox_name: str, folder_name: str):
+		mailbox_path = os.path.join(self.root_dir, mailbox_name)
+		if self.mailbox_format == 'mbox':
+			return mailbox.mbox(os.path.join(mailbox_path, *folder_name.split(FOLDER_PATH_SEPARATOR)) + '.mbox',
+								create=False)
+
+		store = mailbox.Maildir(mailbox_path, factory=None, create=False)
+		if folder_name.lower() == 'inbox':
+			return store
+		return store.get_folder(folder_name.replace(FOLDER_PATH_SEPARATOR, '.'))
+
+	def open_folder(self, mailbox: str, folder_name: str = 'Inbox'):
+		root = self.Folders.Add(mailbox)
+		folder = root.Folders.Add(folder_name)
+
+		# load the folder only once, items then act like an in memory folder
+		if len(folder._items) == 0:
+			store = self._open_store(mailbox, folder_name)
+			self._open_stores.append(store)
+			for key in store.iterkeys():
+				item = mailbox_file_item(store, key, f"{mailbox}/{folder_name}/{key}")
+				self._items_by_entry_id[item.EntryID] = item
+				folder.add_item(item)
+		return folder
+
+	def get_items(self, folder):
+		return folder.Items
+
+	def restrict_items(self, items, filter_str: str):
+		return items.Restrict(filter_str)
+
+	def get_table(self, folder, column_names: tuple, filter_str: str = None):
+		items = folder.Items
+		if filter_str is not None:
+			items = items.Restrict(filter_str)
+		table = metadata_table(column_names)
+		for item in items:
+			table.add_row([getattr(item, name, None) for name in column_names])
+		return table
+
+	def get_item_by_entry_id(self, entry_id: str):
+		item = self._items_by_entry_id[entry_id]
+		if item._deleted:
+			raise KeyError(entry_id)
+		return item
+
+	def resolve_sender_address(self, address: str) -> str:
+		# the From header of a file is the address, there is no directory to look up
+		return None
+
+	def delete_item(self, item) -> str:
+		# files are removed for good, there is no trash folder
+		item.Delete()
+		return None
+
+	def restore_item(self, item, folder) -> str:
+		raise RuntimeError("Emails deleted from Maildir or mbox folders are removed for good")
@@ -0,0 +1,348 @@
+import threading
+from operator import attrgetter
+from datetime import datetime, timezone
+from src.model.mailbox_backend_interface import mailbox_backend_interface
+from src.model.restrict_filter import parse_restrict_filter
+from src.model.property_probe import ABSENT, register_property_reader
+from src.model.metadata_table import metadata_table
+from src.model.folder_traversal import FOLDER_PATH_SEPARATOR, open_folder_path, iter_folder_paths
+
+"""
+This file contains an in-memory stand-in for the Outlook object model.
+It lets the cleanup_model be run, tested and benchmarked without Outlook.
+Folders, item collections and items mimic the parts of the Outlook object
+model used by the cleanup_model, including the fact that the indexes of an
+item collection shift when an item is deleted.
+"""
+
+MAIL_PROPERTIES = ('Subject', 'SenderEmailAddress', 'SenderName', 'SentOn',
+				   'ReceivedTime', 'Size', 'LastModificationTime', 'SenderEmailType')
+
+# folder of a mailbox deleted emails are moved to, if the mailbox has one
+DELETED_ITEMS_FOLDER = 'Deleted Items'
+
+
+class memory_mail_item():
+	"""
+	An email item held in memory. Properties that were not given are
+	missing like on a real Outlook item, i.e. reading them raises an
+	AttributeError (for ex. emails with no SentOn property). The given
+	properties are kept in the __dict__ of the item, which tells probe_property
+	which ones it has without raising (see read_memory_property).
+	"""
+
+	def __init__(self, entry_id: str = None, **properties):
+		self.EntryID = entry_id
+		self.Parent = None
+		self._deleted = False
+		for name, value in properties.items():
+			if name not in MAIL_PROPERTIES:
+				raise AttributeError(f"{name} is not a supported mail property")
+			if value is not None:
+				setattr(self, name, value)
+
+	def Delete(self) -> None:
+		"""
+		Removes the item from the folder it is in.
+		:return: None
+		"""
+		self.Parent._remove(self)
+
+
+def read_memory_property(item: memory_mail_item, property_name: str):
+	"""
+	Property reader of memory_mail_item, see register_property_reader.
+	:param item: (memory_mail_item) the item
+	:param property_name: (str) name of the property
+	:return: the value of the property, or ABSENT if the item does not have it
+	"""
+	return item.__dict__.get(property_name, ABSENT)
+
+
+register_property_reader(memory_mail_item, read_memory_property)
+
+
+class memory_items():
+	"""
+	Item collection of a memory_folder, mimics the Outlook Items collection.
+	Indexes passed to Item are 1-based like in Outlook. A collection returned
+	by Restrict only holds the items that passed the filter, but like the
+	Outlook one it still drops items once they are deleted.
+	"""
+
+	def __init__(self, folder, restricted_items: list = None):
+		self._folder = folder
+		self._restricted_items = restricted_items
+		self._seen_delete_count = folder._delete_count
+
+	def _live_items(self) -> list:
+		if self._restricted_items is None:
+			return self._folder._live_items()
+		if self._seen_delete_count != self._folder._delete_count:
+			self._restricted_items = [item for item in self._restricted_items if not item._deleted]
+			self._seen_delete_count = self._folder._delete_count
+		return self._restricted_items
+
+	@property
+	def Count(self) -> int:
+		return len(self._live_items())
+
+	def Item(self, index: int):
+		"""
+		Returns the item at the 1-based index.
+		:param index: (int) 1-based index of the item
+		:return: the item
+		"""
+		items = self._live_items()
+		if index < 1 or index > len(items):
+			raise IndexError(f"Item index {index} out of range")
+		return items[index - 1]
+
+	def __iter__(self):
+		# Iterate by index like a COM enumerator does, so deleting the current
+		# item while iterating forward skips the next one just like in Outlook
+		index = 1
+		while index <= self.Count:
+			yield self.Item(index)
+			index += 1
+
+	def Sort(self, property_name: str, descending: bool = False) -> None:
+		"""
+		Sorts the items by a property. Items missing the property are placed at the end.
+		:param property_name: (str) property name in the format "[ReceivedTime]"
+		:param descending: (bool) sort in descending order if true
+		:return: None
+		"""
+		name = property_name.strip("[]")
+		present = []
+		missing = []
+		for item in self._live_items():
+			if hasattr(item, name):
+				present.append(item)
+			else:
+				missing.append(item)
+		present.sort(key=attrgetter(name), reverse=descending)
+		if self._restricted_items is None:
+			self._folder._items = present + missing
+		else:
+			self._restricted_items = present + missing
+
+	def Restrict(self, filter_str: str):
+		"""
+		Returns a new collection holding only the items passing the filter.
+		:param filter_str: (str) DASL filter, see restrict_filter.py
+		:return: (memory_items) the filtered collection
+		"""
+		passes_filter = parse_restrict_filter(filter_str)
+		return memory_items(self._folder, [item for item in self._live_items() if passes_filter(item)])
+
+
+class memory_folder_collection():
+	"""
+	Collection of folders, mimics the Outlook Folders collection. It can be
+	iterated over and called with a folder name to get that folder.
+	"""
+
+	def __init__(self, parent=None):
+		self._parent = parent
+		self._folders = {}
+
+	def __call__(self, name: str):
+		return self._folders[name]
+
+	def __iter__(self):
+		return iter(list(self._folders.values()))
+
+	@property
+	def Count(self) -> int:
+		return len(self._folders)
+
+	def Add(self, name: str):
+		"""
+		Creates a new sub folder.
+		:param name: (str) name of the new folder
+		:return: the new memory_folder
+		"""
+		if name not in self._folders:
+			self._folders[name] = memory_folder(name, self._parent)
+		return self._folders[name]
+
+
+class memory_folder():
+	"""
+	A folder held in memory, mimics the Outlook Folder object.
+	"""
+
+	def __init__(self, name: str, parent=None):
+		self.Name = name
+		self.Parent = parent
+		self.Folders = memory_folder_collection(self)
+		self._items = []
+		self._pending_deletes = 0
+		self._delete_count = 0
+
+	@property
+	def Items(self) -> memory_items:
+		return memory_items(self)
+
+	@property
+	def FolderPath(self) -> str:
+		if self.Parent is None:
+			return "\\\\" + self.Name
+		return self.Parent.FolderPath + "\\" + self.Name
+
+	def add_item(self, item: memory_mail_item) -> memory_mail_item:
+		"""
+		Adds an item to the folder.
+		:param item: (memory_mail_item) the item to add
+		:return: (memory_mail_item) the added item
+		"""
+		item.Parent = self
+		item._deleted = False
+		self._items.append(item)
+		return item
+
+	def _remove(self, item) -> None:
+		# Deleted items are only flagged here and dropped lazily the next time
+		# the items are accessed, so deleting in bulk stays linear
+		if item._deleted:
+			return
+		item._deleted = True
+		self._pending_deletes += 1
+		self._delete_count += 1
+
+	def _live_items(self) -> list:
+		if self._pending_deletes > 0:
+			self._items = [item for item in self._items if not item._deleted]
+			self._pending_deletes = 0
+		return self._items
+
+
+class memory_backend(mailbox_backend_interface):
+	"""
+	Mailbox backend holding mailboxes, folders and emails in memory.
+	The mailbox_backend_interface provides method docs.
+	"""
+
+	def __init__(self):
+		self.Folders = memory_folder_collection()
+		self._next_entry_id = 1
+		self._items_by_entry_id = {}
+		# sessions are shared by workers, which may move emails to the same Deleted Items folder
+		self._move_lock = threading.Lock()
+		self._exchange_users = {}  # key: lower case X.500 address, value: SMTP address, see add_exchange_user
+
+	def add_mailbox(self, name: str, folder_names: tuple = ('Inbox', 'Deleted Items')) -> memory_folder:
+		"""
+		Creates a mailbox (account) along with its default folders.
+		:param name: (str) name of the mailbox, usually an email address
+		:param folder_names: (tuple) names of the folders to create in the mailbox
+		:return: (memory_folder) the root folder of the mailbox
+		"""
+		root = self.Folders.Add(name)
+		for folder_name in folder_names:
+			root.Folders.Add(folder_name)
+		return root
+
+	def add_email(self, mailbox: str, folder_name: str = 'Inbox', **properties) -> memory_mail_item:
+		"""
+		Adds an email to a folder of a mailbox. The mailbox and folder are
+		created if needed.
+		:param mailbox: (str) name of the mailbox
+		:param folder_name: (str) path of the folder, ex. Inbox/Promotions
+		:param properties: mail properties of the email, see MAIL_PROPERTIES
+		:return: (memory_mail_item) the created email
+		"""
+		folder = self.Folders.Add(mailbox)
+		for each_folder_name in folder_name.split(FOLDER_PATH_SEPARATOR):
+			folder = folder.Folders.Add(each_folder_name)
+		# like in Outlook, every item has a modification time
+		properties.setdefault('LastModificationTime', datetime.now(timezone.utc))
+		item = memory_mail_item(entry_id=format(self._next_entry_id, '016X'), **properties)
+		self._next_entry_id += 1
+		self._items_by_entry_id[item.EntryID] = item
+		return folder.add_item(item)
+
+	def add_exchange_user(self, address: str, smtp_address: str) -> None:
+		"""
+		Adds a user to the Exchange directory resolve_sender_address looks up. Emails
+		sent by the user have the X.500 address as SenderEmailAddress and EX as SenderEmailType.
+		:param address: (str) X.500 address of the user
+		:param smtp_address: (str) SMTP address of the user
+		:return: None
+		"""
+		self._exchange_users[address.lower()] = smtp_address
+
+	def connect(self):
+		return self
+
+	def disconnect(self) -> None:
+		return
+
+	def create_session(self):
+		# nothing to connect to, all sessions share the emails held in memory
+		return self
+
+	def initialize_thread(self) -> None:
+		return
+
+	def uninitialize_thread(self) -> None:
+		return
+
+	def list_mailboxes(self) -> list:
+		return [mailbox.Name for mailbox in self.Folders]
+
+	def list_folders(self, mailbox: str) -> list:
+		return list(iter_folder_paths(self.Folders(mailbox)))
+
+	def open_folder(self, mailbox: str, folder_name: str = 'Inbox'):
+		return open_folder_path(self.Folders(mailbox), folder_name)
+
+	def get_items(self, folder):
+		return folder.Items
+
+	def restrict_items(self, items, filter_str: str):
+		return items.Restrict(filter_str)
+
+	def get_table(self, folder, column_names: tuple, filter_str: str = None):
+		items = folder.Items
+		if filter_str is not None:
+			items = items.Restrict(filter_str)
+		table = metadata_table(column_names)
+		for item in items:
+			table.add_row([getattr(item, name, None) for name in column_names])
+		return table
+
+	def get_item_by_entry_id(self, entry_id: str):
+		item = self._items_by_entry_id[entry_id]
+		if item._deleted:
+			raise KeyError(entry_id)
+		return item
+
+	def resolve_sender_address(self, address: str) -> str:
+		# like in Outlook, X.500 addresses are case insensitive
+		return self._exchange_users.get(address.lower())
+
+	def _move_item(self, item, folder) -> str:
+		# like in Outlook, the moved item is a new item with a new EntryID
+		item.Delete()
+		properties = {name: getattr(item, name) for name in MAIL_PROPERTIES if hasattr(item, name)}
+		with self._move_lock:
+			moved_item = memory_mail_item(entry_id=format(self._next_entry_id, '016X'), **properties)
+			self._next_entry_id += 1
+			self._items_by_entry_id[moved_item.EntryID] = moved_item
+			folder.add_item(moved_item)
+		return moved_item.EntryID
+
+	def delete_item(self, item) -> str:
+		mailbox_root = item.Parent
+		while mailbox_root.Parent is not None:
+			mailbox_root = mailbox_root.Parent
+		deleted_items = mailbox_root.Folders._folders.get(DELETED_ITEMS_FOLDER)
+		if deleted_items is None or item.Parent is deleted_items:
+			item.Delete()
+			return None
+		return self._move_item(item, deleted_items)
+
+	def restore_item(self, item, folder) -> str:
+		return self._move_item(item, folder)
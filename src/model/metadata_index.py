@@ -0,0 +1,288 @@
+from datetime import datetime, timezone
+from src.model.aho_corasick import aho_corasick_automaton
+from src.model.domain_suffix_trie import domain_suffix_trie
+from src.model.metadata_table import metadata_table, SNAPSHOT_COLUMNS
+from src.model.restrict_filter import compile_modified_since_filter
+
+"""
+This file contains the on-disk index of the email properties used by the
+deletion conditions, stored in SQLite. Instead of reading every email of a
+folder on every run, the index only fetches the emails modified since its last
+sync (its watermark) and the deletion conditions are run as indexed queries
+against it. Emails found by a query are then looked up by their EntryID.
+"""
+
+# columns fetched from the backend when syncing the index
+INDEX_COLUMNS = SNAPSHOT_COLUMNS + ('LastModificationTime',)
+
+# maps the email properties to the columns of the emails table
+PROPERTY_COLUMNS = {'EntryID': 'entry_id',
+					'Subject': 'subject',
+					'SenderEmailAddress': 'sender_email',
+					'SenderName': 'sender_name',
+					'SentOn': 'sent_on',
+					'ReceivedTime': 'received_time',
+					'Size': 'size',
+					'LastModificationTime': 'last_modification'}
+
+# properties stored as POSIX timestamps
+DATE_PROPERTIES = ('SentOn', 'ReceivedTime', 'LastModificationTime')
+
+# above this amount of targets, membership is checked by a python function instead of an IN (...) list
+MAX_QUERY_PARAMETERS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+	mailbox TEXT NOT NULL,
+	folder TEXT NOT NULL,
+	entry_id TEXT NOT NULL,
+	subject TEXT,
+	sender_email TEXT,
+	sender_name TEXT,
+	sent_on REAL,
+	received_time REAL,
+	size INTEGER,
+	last_modification REAL,
+	subject_key TEXT,
+	sender_email_key TEXT,
+	sender_name_key TEXT,
+	PRIMARY KEY (mailbox, folder, entry_id)
+);
+CREATE INDEX IF NOT EXISTS emails_sender_email ON emails (mailbox, folder, sender_email_key);
+CREATE INDEX IF NOT EXISTS emails_sender_name ON emails (mailbox, folder, sender_name_key);
+CREATE INDEX IF NOT EXISTS emails_sent_on ON emails (mailbox, folder, sent_on);
+CREATE TABLE IF NOT EXISTS sync_state (
+	mailbox TEXT NOT NULL,
+	folder TEXT NOT NULL,
+	watermark REAL NOT NULL,
+	PRIMARY KEY (mailbox, folder)
+);
+"""
+
+
+def to_timestamp(date):
+	"""
+	:param date: (datetime) a datetime or None
+	:return: (float) the POSIX timestamp of the date, or None
+	"""
+	return None if date is None else date.timestamp()
+
+
+def to_key(value):
+	"""
+	:param value: (str) a str or None
+	:return: (str) the lower case value used for case insensitive matching, or None
+	"""
+	return None if value is None else value.lower()
+
+
+class metadata_index():
+	"""
+	SQLite store of the properties of the emails of the synced folders,
+	one row per email keyed by mailbox, folder path and EntryID.
+	"""
+
+	def __init__(self, database_path: str = ':memory:'):
+		"""
+		:param database_path: (str) path of the SQLite database file, created if needed
+		"""
+		# imported here, so programs not using an index do not load sqlite
+		import sqlite3
+
+		self.database_path = database_path
+		self.connection = sqlite3.connect(database_path)
+		self.connection.executescript(SCHEMA)
+		self.rows_fetched = 0  # amount of emails fetched from the backend by the last sync
+		self.entry_id_syncs = 0  # amount of syncs that had to list the EntryIDs of the folder
+
+	def close(self) -> None:
+		self.connection.close()
+
+	def get_watermark(self, mailbox: str, folder_path: str):
+		"""
+		:return: (float) timestamp of the latest modification synced for the folder, or None if
+		the folder was never synced
+		"""
+		row = self.connection.execute("SELECT watermark FROM sync_state WHERE mailbox = ? AND folder = ?",
+									  (mailbox, folder_path)).fetchone()
+		return None if row is None else row[0]
+
+	def count(self, mailbox: str, folder_path: str) -> int:
+		"""
+		:return: (int) amount of emails of the folder in the index
+		"""
+		return self.connection.execute("SELECT COUNT(*) FROM emails WHERE mailbox = ? AND folder = ?",
+									   (mailbox, folder_path)).fetchone()[0]
+
+	def sync(self, backend, mailbox: str, folder, folder_path: str) -> int:
+		"""
+		Brings the index of a folder up to date. Only the emails modified since the
+		watermark are fetched. If the amount of indexed emails then differs from the
+		amount of emails in the folder (emails removed by another program), only the
+		EntryIDs of the folder are fetched, to drop the emails that are gone.
+		:param backend: (mailbox_backend_interface) backend the folder comes from
+		:param mailbox: (str) name of the mailbox
+		:param folder: folder returned by backend.open_folder
+		:param folder_path: (str) path of the folder in the mailbox (see folder_traversal), the emails
+		and the watermark of the folder are kept under it, folders can have the same name
+		:return: (int) amount of emails fetched from the backend
+		"""
+		watermark = self.get_watermark(mailbox, folder_path)
+		filter_str = None
+		if watermark is not None:
+			filter_str = compile_modified_since_filter(datetime.fromtimestamp(watermark, timezone.utc))
+		table = backend.get_table(folder, INDEX_COLUMNS, filter_str)
+		self.rows_fetched = table.Count
+		with self.connection:
+			self.store_table(mailbox, folder_path, table, watermark)
+
+		if self.count(mailbox, folder_path) != backend.get_items(folder).Count:
+			self.entry_id_syncs += 1
+			entry_ids = set(backend.get_table(folder, ('EntryID',)).columns['EntryID'])
+			indexed_entry_ids = self.connection.execute("SELECT entry_id FROM emails WHERE mailbox = ? AND folder = ?",
+														(mailbox, folder_path)).fetchall()
+			self.remove_entries(mailbox, folder_path,
+								[entry_id for (entry_id,) in indexed_entry_ids if entry_id not in entry_ids])
+		return self.rows_fetched
+
+	def store_table(self, mailbox: str, folder_path: str, table: metadata_table, watermark) -> None:
+		"""
+		Inserts or replaces the rows of a metadata_table fetched with INDEX_COLUMNS and
+		moves the watermark of the folder to the latest modification found.
+		Helper method to sync, must run inside a transaction.
+		:return: None
+		"""
+		columns = table.columns
+		subjects = columns['Subject']
+		sender_emails = columns['SenderEmailAddress']
+		sender_names = columns['SenderName']
+		last_modifications = [to_timestamp(date) for date in columns['LastModificationTime']]
+		rows = zip(columns['EntryID'], subjects, sender_emails, sender_names,
+				   [to_timestamp(date) for date in columns['SentOn']],
+				   [to_timestamp(date) for date in columns['ReceivedTime']],
+				   columns['Size'], last_modifications,
+				   [to_key(subject) for subject in subjects],
+				   [to_key(address) for address in sender_emails],
+				   [to_key(name) for name in sender_names])
+		self.connection.executemany(
+			"INSERT OR REPLACE INTO emails VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+			((mailbox, folder_path) + row for row in rows))
+
+		modifications = [timestamp for timestamp in last_modifications if timestamp is not None]
+		if watermark is not None:
+			modifications.append(watermark)
+		if len(modifications) > 0:
+			self.connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+									(mailbox, folder_path, max(modifications)))
+
+	def remove_entries(self, mailbox: str, folder_path: str, entry_ids) -> None:
+		"""
+		Removes deleted emails from the index.
+		:param entry_ids: iterable of str EntryIDs
+		:return: None
+		"""
+		with self.connection:
+			self.connection.executemany("DELETE FROM emails WHERE mailbox = ? AND folder = ? AND entry_id = ?",
+										((mailbox, folder_path, entry_id) for entry_id in entry_ids))
+
+	def count_missing(self, mailbox: str, folder_path: str, property_names) -> int:
+		"""
+		Counts the emails of a folder missing at least one of the properties.
+		:param property_names: iterable of str email properties, see PROPERTY_COLUMNS
+		:return: (int) the amount of emails
+		"""
+		columns = sorted({PROPERTY_COLUMNS[name] for name in property_names})
+		if len(columns) == 0:
+			return 0
+		missing = " OR ".join(f"{column} IS NULL" for column in columns)
+		return self.connection.execute(
+			f"SELECT COUNT(*) FROM emails WHERE mailbox = ? AND folder = ? AND ({missing})",
+			(mailbox, folder_path)).fetchone()[0]
+
+	def count_missing_per_property(self, mailbox: str, folder_path: str, property_names) -> dict:
+		"""
+		Counts the emails of a folder missing at least one of the properties, each email
+		being counted for the first property it misses in the order of property_names.
+		:param property_names: iterable of str email properties, see PROPERTY_COLUMNS
+		:return: (dict) key: property name, value: the amount of emails (properties no email misses are left out)
+		"""
+		names = {PROPERTY_COLUMNS[name]: name for name in property_names}  # key: column, value: property name
+		columns = list(names)
+		if len(columns) == 0:
+			return {}
+		first_missing = " ".join(f"WHEN {column} IS NULL THEN '{column}'" for column in columns)
+		missing = " OR ".join(f"{column} IS NULL" for column in columns)
+		rows = self.connection.execute(
+			f"SELECT CASE {first_missing} END, COUNT(*) FROM emails WHERE mailbox = ? AND folder = ? AND ({missing}) "
+			f"GROUP BY 1", (mailbox, folder_path)).fetchall()
+		return {names[column]: amount for column, amount in rows}
+
+	def make_membership_clause(self, column: str, targets: list, parameters: list) -> str:
+		"""
+		Returns the clause checking that a column is one of the targets. Up to
+		MAX_QUERY_PARAMETERS targets are given as query parameters, more targets
+		are checked against a hashed set.
+		Helper method to query
+		:return: (str) the clause
+		"""
+		keys = [target.lower() for target in targets]
+		if len(keys) <= MAX_QUERY_PARAMETERS:
+			parameters.extend(keys)
+			return f"{column} IN ({', '.join('?' * len(keys))})"
+		key_set = frozenset(keys)
+		function_name = f"is_target_{column}"
+		self.connection.create_function(function_name, 1, lambda value: value in key_set)
+		return f"{function_name}({column})"
+
+	def query(self, mailbox: str, folder_path: str, sender_emails: list = None, sender_names: list = None,
+			  subject_phrases: list = None, sent_on_range: tuple = None, domain_rules: list = None) -> metadata_table:
+		"""
+		Returns the emails of a folder matching all the given conditions, newest
+		emails first. Conditions left as None are not checked. Emails missing a
+		checked property never match.
+		:param sender_emails: (list) the sender email address must be one of these (case insensitive)
+		:param sender_names: (list) the sender name must be one of these (case insensitive)
+		:param subject_phrases: (list) the subject must contain one of these (case insensitive)
+		:param sent_on_range: (tuple) (start datetime, end datetime) SentOn must be within (inclusive)
+		:param domain_rules: (list) the sender email address must match one of these rules
+		(see domain_suffix_trie)
+		:return: (metadata_table) the matching emails with the SNAPSHOT_COLUMNS
+		"""
+		clauses = ["mailbox = ?", "folder = ?"]
+		parameters = [mailbox, folder_path]
+		if sender_emails is not None:
+			clauses.append(self.make_membership_clause("sender_email_key", sender_emails, parameters))
+		if sender_names is not None:
+			clauses.append(self.make_membership_clause("sender_name_key", sender_names, parameters))
+		if sent_on_range is not None:
+			clauses.append("sent_on BETWEEN ? AND ?")
+			parameters.extend(to_timestamp(date) for date in sent_on_range)
+		if subject_phrases is not None:
+			if len(subject_phrases) == 1:
+				clauses.append("instr(subject_key, ?) > 0")
+				parameters.append(subject_phrases[0].lower())
+			else:
+				automaton = aho_corasick_automaton(subject_phrases)
+				self.connection.create_function(
+					"subject_matches", 1,
+					lambda subject: subject is not None and automaton.find_first(subject) is not None)
+				clauses.append("subject_matches(subject_key)")
+		if domain_rules is not None:
+			trie = domain_suffix_trie(domain_rules)
+			self.connection.create_function(
+				"domain_matches", 1, lambda address: address is not None and trie.match(address) is not None)
+			clauses.append("domain_matches(sender_email_key)")
+
+		selected = ", ".join(PROPERTY_COLUMNS[name] for name in SNAPSHOT_COLUMNS)
+		cursor = self.connection.execute(
+			f"SELECT {selected} FROM emails WHERE {' AND '.join(clauses)} ORDER BY received_time DESC", parameters)
+
+		date_positions = [SNAPSHOT_COLUMNS.index(name) for name in DATE_PROPERTIES if name in SNAPSHOT_COLUMNS]
+		table = metadata_table(SNAPSHOT_COLUMNS)
+		for row in cursor:
+			row = list(row)
+			for position in date_positions:
+				if row[position] is not None:
+					row[position] = datetime.fromtimestamp(row[position], timezone.utc)
+			table.add_row(row)
+		return table
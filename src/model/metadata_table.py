@@ -0,0 +1,89 @@
+from src.model.property_probe import ABSENT, normalize_empty_value, register_property_reader
+
+"""
+This file contains the column oriented snapshot of the emails of a folder.
+A snapshot is fetched in bulk by the mailbox backend (Outlook Folder.GetTable)
+so the deletion conditions can be checked against local data instead of reading
+every property of every email over COM.
+"""
+
+# columns fetched for every email when taking a snapshot of a folder
+SNAPSHOT_COLUMNS = ('EntryID', 'Subject', 'SenderEmailAddress', 'SenderName', 'SentOn', 'ReceivedTime', 'Size')
+
+
+class table_row():
+	"""
+	Read only view of one row of a metadata_table. It exposes the columns as
+	properties just like an email item does, so the matching functions of the
+	cleanup_model work on it unchanged. Like on an email item, reading a column
+	the email does not have a value for raises an AttributeError.
+	"""
+	__slots__ = ('_table', '_index')
+
+	def __init__(self, table, index: int):
+		self._table = table
+		self._index = index
+
+	def __getattr__(self, name: str):
+		try:
+			column = self._table.columns[name]
+		except KeyError:
+			raise AttributeError(f"{name} is not a column of the table")
+		value = column[self._index]
+		if value is None:
+			raise AttributeError(f"Email has no {name} value")
+		return value
+
+
+class metadata_table():
+	"""
+	Column oriented table of email properties. Each column is a list holding
+	one value per email, None meaning the email does not have that property.
+	The empty date placeholder of Outlook (see property_probe) is stored as None.
+	"""
+
+	def __init__(self, column_names: tuple = SNAPSHOT_COLUMNS):
+		self.columns = {name: [] for name in column_names}
+
+	@property
+	def Count(self) -> int:
+		return len(self.columns['EntryID'])
+
+	def add_row(self, values) -> None:
+		"""
+		Appends one email to the table.
+		:param values: values of the email, in the order of the columns
+		:return: None
+		"""
+		for column, value in zip(self.columns.values(), values):
+			column.append(normalize_empty_value(value))
+
+	def row(self, index: int) -> table_row:
+		"""
+		Returns a view of the row at the 0-based index.
+		:param index: (int) 0-based index of the row
+		:return: (table_row) the row
+		"""
+		return table_row(self, index)
+
+	def __iter__(self):
+		for index in range(self.Count):
+			yield table_row(self, index)
+
+
+def read_row_property(row: table_row, property_name: str):
+	"""
+	Property reader of table_row, see register_property_reader.
+	:param row: (table_row) the row
+	:param property_name: (str) name of the property
+	:return: the value of the column, or ABSENT if the table has no such column or the
+	email has no value for it
+	"""
+	column = row._table.columns.get(property_name)
+	if column is None:
+		return ABSENT
+	value = column[row._index]
+	return ABSENT if value is None else value
+
+
+register_property_reader(table_row, read_row_property)
@@ -0,0 +1,166 @@
+from src.model.mailbox_backend_interface import mailbox_backend_interface
+from src.model.cleanup_custom_exceptions import OutlookNotOpenError
+from src.model.metadata_table import metadata_table
+from src.model.folder_traversal import open_folder_path, iter_folder_paths
+from src.model.property_probe import ABSENT, register_property_reader
+
+# amount of rows read from an Outlook Table per GetArray call
+TABLE_FETCH_SIZE = 1000
+
+# Folder.DefaultItemType of folders holding emails (OlItemType.olMailItem)
+OL_MAIL_ITEM = 0
+
+# OlDefaultFolders.olFolderDeletedItems
+OL_FOLDER_DELETED_ITEMS = 3
+
+# SMTP address of an address entry, read when it is neither an Exchange user nor a distribution list
+PR_SMTP_ADDRESS = "http://schemas.microsoft.com/mapi/proptag/0x39FE001E"
+
+# key: Class of Outlook items (OlObjectClass), value: names of the properties items of that class have
+ITEM_CLASS_PROPERTIES = {}
+
+# pywin32 (pythoncom, pywintypes, win32com) takes a while to load and only exists on
+# windows, so it is imported by the methods talking to Outlook instead of with this file:
+# the backend can be created, and the program started, without loading it.
+
+def read_outlook_property(item, property_name: str):
+	"""
+	Property reader of Outlook items, see register_property_reader. Reports, meeting
+	requests etc. lack some properties of emails, reading one of those over COM raises.
+	The names of the properties of an item class are listed once from the ItemProperties
+	of its first item, after that a missing property is not read at all.
+	:param item: the Outlook item
+	:param property_name: (str) name of the property
+	:return: the value of the property, or ABSENT if items of its class do not have it
+	"""
+	item_class = item.Class
+	property_names = ITEM_CLASS_PROPERTIES.get(item_class)
+	if property_names is None:
+		property_names = frozenset(each_property.Name for each_property in item.ItemProperties)
+		ITEM_CLASS_PROPERTIES[item_class] = property_names
+	if property_name not in property_names:
+		return ABSENT
+	return getattr(item, property_name)
+
+
+class outlook_backend(mailbox_backend_interface):
+	"""
+	Mailbox backend talking to the Outlook Application over COM. Only
+	works on windows with pywin32 installed and Outlook open.
+	The mailbox_backend_interface provides method docs.
+	"""
+
+	def __init__(self):
+		self.com_obj = None  # stores COM
+		self.namespace = None  # stores MAPI namespace
+		self.deleted_items_folders = {}  # key: StoreID, value: Deleted Items folder of the store
+
+	def connect(self):
+		import win32com.client as client
+
+		# create an instance of COM object
+		# COM object allows us to interact with other programs
+		self.com_obj = client.Dispatch("Outlook.Application")
+		# items are late bound (CDispatch) or, once makepy ran, early bound wrappers
+		register_property_reader(client.CDispatch, read_outlook_property)
+		register_property_reader(client.DispatchBaseClass, read_outlook_property)
+
+		# need to make an object that can interact with folders in the outlook
+		# MAPI means Message Application Program Interface, this only works for windows
+		try:
+			self.namespace = self.com_obj.GetNameSpace('MAPI')
+		except AttributeError:
+			raise OutlookNotOpenError()
+		return self.namespace
+
+	def disconnect(self) -> None:
+		self.namespace = None
+		self.com_obj = None
+		self.deleted_items_folders = {}
+
+	def create_session(self):
+		return outlook_backend()
+
+	def initialize_thread(self) -> None:
+		import pythoncom
+
+		# every thread talking to Outlook needs its own COM apartment
+		pythoncom.CoInitialize()
+
+	def uninitialize_thread(self) -> None:
+		import pythoncom
+
+		pythoncom.CoUninitialize()
+
+	def list_mailboxes(self) -> list:
+		# mailboxes include email addresses, some folders, calendars etc.
+		return [mailbox.Name for mailbox in self.namespace.Folders]
+
+	def list_folders(self, mailbox: str) -> list:
+		# calendars, contacts, tasks etc. and their sub folders are skipped
+		return list(iter_folder_paths(self.namespace.Folders(mailbox),
+									  lambda folder: folder.DefaultItemType == OL_MAIL_ITEM))
+
+	def open_folder(self, mailbox: str, folder_name: str = 'Inbox'):
+		return open_folder_path(self.namespace.Folders(mailbox), folder_name)
+
+	def get_items(self, folder):
+		return folder.Items
+
+	def restrict_items(self, items, filter_str: str):
+		return items.Restrict(filter_str)
+
+	def get_table(self, folder, column_names: tuple, filter_str: str = None):
+		outlook_table = folder.GetTable(filter_str or "")
+		outlook_table.Columns.RemoveAll()
+		for name in column_names:
+			outlook_table.Columns.Add(name)
+
+		# rows are read in chunks, one cross process call per chunk instead of per property
+		table = metadata_table(column_names)
+		while not outlook_table.EndOfTable:
+			for row in outlook_table.GetArray(TABLE_FETCH_SIZE):
+				table.add_row(row)
+		return table
+
+	def get_item_by_entry_id(self, entry_id: str):
+		import pywintypes
+
+		try:
+			return self.namespace.GetItemFromID(entry_id)
+		except pywintypes.com_error:
+			raise KeyError(entry_id)
+
+	def resolve_sender_address(self, address: str) -> str:
+		import pywintypes
+
+		try:
+			recipient = self.namespace.CreateRecipient(address)
+			if not recipient.Resolve():
+				return None
+			entry = recipient.AddressEntry
+			exchange_entry = entry.GetExchangeUser()
+			if exchange_entry is None:
+				# distribution lists send as themselves, they are not Exchange users
+				exchange_entry = entry.GetExchangeDistributionList()
+			if exchange_entry is not None:
+				return exchange_entry.PrimarySmtpAddress or None
+			return entry.PropertyAccessor.GetProperty(PR_SMTP_ADDRESS) or None
+		except pywintypes.com_error:
+			return None
+
+	def delete_item(self, item) -> str:
+		store = item.Parent.Store
+		deleted_items = self.deleted_items_folders.get(store.StoreID)
+		if deleted_items is None:
+			deleted_items = store.GetDefaultFolder(OL_FOLDER_DELETED_ITEMS)
+			self.deleted_items_folders[store.StoreID] = deleted_items
+		if item.Parent.EntryID == deleted_items.EntryID:
+			# deleting from Deleted Items deletes for good
+			item.Delete()
+			return None
+		# same as Delete, but Move returns the moved item, whose EntryID may have changed
+		return item.Move(deleted_items).EntryID
+
+	def restore_item(self, item, folder) -> str:
+		return item.Move(folder).EntryID
@@ -0,0 +1,284 @@
+import time
+import queue
+from src.model.deletion_pipeline import iter_in_batches, delete_emails_by_entry_id
+from src.model.rule_batch import rule_pass, combine_restrict_filters
+
+"""
+This file cleans several mailboxes at the same time. Each mailbox is cleaned
+by its own worker thread, with its own backend session (for Outlook its own COM
+apartment and connection) and its own copy of the rules, so workers share no
+counters. Since the work of a worker is mostly waiting on Outlook (or on the
+disk), the run takes about as long as the largest mailbox instead of the sum
+of all of them.
+When a deletion_journal is given, every worker journals its batches with the
+mailbox and folder they were deleted from, so the run can be undone.
+When a sender_address_resolver is given, its cache is shared by the workers,
+each looking up the addresses it misses with its own session.
+The folders of a folder tree are cleaned the same way, except that they are put
+in a work queue taken from by a fixed amount of workers, each keeping its
+session open for all the folders it takes.
+"""
+
+# amount of workers cleaning the folders of a folder tree, unless told otherwise
+FOLDER_WORKERS = 4
+
+
+def run_rules_on_folder(session, folder, rules: list, use_restrict_filter: bool, deletion_batch_size: int,
+						journal=None, mailbox: str = None, folder_path: str = None, counts: dict = None) -> dict:
+	"""
+	Deletes the emails of a folder matching any of the rules, in a single pass.
+	:param session: (mailbox_backend_interface) connected backend the folder was opened with
+	:param folder: the folder, see open_folder
+	:param rules: (list) list of deletion_rule, only used for this folder
+	:param use_restrict_filter: (bool) if true, the backend only returns emails matching a rule's filter
+	:param deletion_batch_size: (int) amount of matching emails collected before they are deleted
+	:param journal: (deletion_journal) if given, every batch is journaled to the run it started
+	:param mailbox: (str) name of the mailbox, journaled with the batches
+	:param folder_path: (str) path of the folder, journaled with the batches
+	:param counts: (dict) if given, the counts are added to it batch by batch, so it still holds
+	the emails deleted before an error stopped the run
+	:return: (dict) dict with the keys matched, deleted, unprocessed and missing (key: property name, value:
+	amount of the unprocessed emails missing it), counts if given
+	"""
+	if counts is None:
+		counts = {'matched': 0, 'deleted': 0, 'unprocessed': 0, 'missing': {}}
+	all_emails = session.get_items(folder)
+	restrict_filter = combine_restrict_filters(rules) if use_restrict_filter else None
+	if restrict_filter is not None:
+		all_emails = session.restrict_items(all_emails, restrict_filter)
+
+	single_pass = rule_pass(rules)
+	try:
+		for batch in iter_in_batches(single_pass.iter_matching_entry_ids(all_emails), deletion_batch_size):
+			counts['matched'] += len(batch)
+			trash_entry_ids = {}
+			amt_batch_deleted = delete_emails_by_entry_id(session, batch, trash_entry_ids)
+			if journal is not None:
+				journal.record_batch(batch, amt_batch_deleted, trash_entry_ids=trash_entry_ids, mailbox=mailbox,
+									 folder=folder_path)
+			counts['deleted'] += amt_batch_deleted
+	finally:
+		counts['unprocessed'] += single_pass.emails_with_missing_attributes_count
+		add_missing_counts(counts['missing'], single_pass.missing_property_counts)
+	return counts
+
+
+def clean_mailbox(backend, mailbox: str, rules: list, use_restrict_filter: bool = True,
+				  deletion_batch_size: int = 100, journal=None, sender_resolver=None) -> dict:
+	"""
+	Deletes the emails of the Inbox of a mailbox matching any of the rules, in a
+	single pass. Meant to run in a worker thread.
+	:param backend: (mailbox_backend_interface) backend the session of the worker is created from
+	:param mailbox: (str) name of the mailbox
+	:param rules: (list) list of deletion_rule, only used by this worker
+	:param use_restrict_filter: (bool) if true, the backend only returns emails matching a rule's filter
+	:param deletion_batch_size: (int) amount of matching emails collected before they are deleted
+	:param journal: (deletion_journal) see run_rules_on_folder
+	:param sender_resolver: (sender_address_resolver) resolver used by the rules, if any
+	:return: (dict) dict with the keys mailbox, deleted, unprocessed, missing (see run_rules_on_folder), rules
+	(see deletion_rule.get_summary), seconds and error (None, or the message of the error that stopped the worker)
+	"""
+	result = {'mailbox': mailbox, 'deleted': 0, 'unprocessed': 0, 'missing': {}, 'rules': [], 'seconds': 0.0,
+			  'error': None}
+	# filled batch by batch, an error keeps the counts of the emails already deleted
+	counts = {'matched': 0, 'deleted': 0, 'unprocessed': 0, 'missing': {}}
+	start = time.perf_counter()
+	session = backend.create_session()
+	session.initialize_thread()
+	try:
+		session.connect()
+		if sender_resolver is not None:
+			sender_resolver.use_session(session)
+		try:
+			run_rules_on_folder(session, session.open_folder(mailbox, 'Inbox'), rules, use_restrict_filter,
+								deletion_batch_size, journal, mailbox, 'Inbox', counts)
+		finally:
+			if sender_resolver is not None:
+				sender_resolver.use_session(None)
+			session.disconnect()
+	except Exception as error:
+		# one mailbox failing must not stop the others
+		result['error'] = f"{type(error).__name__}: {error}"
+	finally:
+		session.uninitialize_thread()
+	result['deleted'] = counts['deleted']
+	result['unprocessed'] = counts['unprocessed']
+	result['missing'] = counts['missing']
+	result['rules'] = [rule.get_summary() for rule in rules]
+	result['seconds'] = time.perf_counter() - start
+	return result
+
+
+def clean_mailboxes_in_parallel(backend, mailboxes: list, rules: list, max_workers: int = None,
+								use_restrict_filter: bool = True, deletion_batch_size: int = 100,
+								journal=None, sender_resolver=None) -> list:
+	"""
+	Cleans several mailboxes at the same time, one worker thread per mailbox.
+	:param backend: (mailbox_backend_interface) backend the sessions of the workers are created from
+	:param mailboxes: (list) list of str mailbox names
+	:param rules: (list) list of deletion_rule, every worker gets its own copies
+	:param max_workers: (int) maximum amount of mailboxes cleaned at the same time, all of them if None
+	:param use_restrict_filter: (bool) see clean_mailbox
+	:param deletion_batch_size: (int) see clean_mailbox
+	:param journal: (deletion_journal) see clean_mailbox
+	:param sender_resolver: (sender_address_resolver) see clean_mailbox
+	:return: (list) the result of each mailbox (see clean_mailbox), in the order of mailboxes
+	"""
+	if len(mailboxes) == 0:
+		return []
+	# imported here, concurrent.futures is only needed by parallel runs
+	from concurrent.futures import ThreadPoolExecutor
+
+	with ThreadPoolExecutor(max_workers=max_workers or len(mailboxes)) as executor:
+		futures = [executor.submit(clean_mailbox, backend, mailbox, [rule.copy() for rule in rules],
+								   use_restrict_filter, deletion_batch_size, journal, sender_resolver)
+				   for mailbox in mailboxes]
+		return [future.result() for future in futures]
+
+
+def clean_folder_queue(backend, mailbox: str, folder_queue: queue.Queue, rules: list, use_restrict_filter: bool,
+					   deletion_batch_size: int, results: list, journal=None, sender_resolver=None) -> None:
+	"""
+	Takes folders from the work queue and deletes their emails matching any of the
+	rules until the queue is empty. Meant to run in a worker thread. Errors raised
+	while connecting are not caught, a worker that cannot connect takes no folder.
+	:param backend: (mailbox_backend_interface) backend the session of the worker is created from
+	:param mailbox: (str) name of the mailbox
+	:param folder_queue: (queue.Queue) queue of str folder paths, shared by the workers
+	:param rules: (list) list of deletion_rule, every folder gets its own copies
+	:param use_restrict_filter: (bool) see run_rules_on_folder
+	:param deletion_batch_size: (int) see run_rules_on_folder
+	:param results: (list) list shared by the workers, the result of each folder taken is appended
+	to it (see clean_folders_in_parallel)
+	:param journal: (deletion_journal) see run_rules_on_folder
+	:param sender_resolver: (sender_address_resolver) see clean_mailbox
+	:return: None
+	"""
+	session = backend.create_session()
+	session.initialize_thread()
+	try:
+		session.connect()
+		if sender_resolver is not None:
+			sender_resolver.use_session(session)
+		try:
+			while True:
+				try:
+					folder_path = folder_queue.get_nowait()
+				except queue.Empty:
+					return
+				result = {'mailbox': mailbox, 'folder': folder_path, 'matched': 0, 'deleted': 0, 'unprocessed': 0,
+						  'missing': {}, 'rules': [], 'seconds': 0.0, 'error': None}
+				start = time.perf_counter()
+				folder_rules = [rule.copy() for rule in rules]
+				try:
+					# the result is filled batch by batch, an error keeps the counts of the emails already deleted
+					run_rules_on_folder(session, session.open_folder(mailbox, folder_path), folder_rules,
+										use_restrict_filter, deletion_batch_size, journal, mailbox, folder_path, result)
+				except Exception as error:
+					# one folder failing must not stop the others
+					result['error'] = f"{type(error).__name__}: {error}"
+				result['rules'] = [rule.get_summary() for rule in folder_rules]
+				result['seconds'] = time.perf_counter() - start
+				results.append(result)
+		finally:
+			if sender_resolver is not None:
+				sender_resolver.use_session(None)
+			session.disconnect()
+	finally:
+		session.uninitialize_thread()
+
+
+def clean_folders_in_parallel(backend, mailbox: str, folder_paths: list, rules: list,
+							  max_workers: int = FOLDER_WORKERS, use_restrict_filter: bool = True,
+							  deletion_batch_size: int = 100, journal=None, sender_resolver=None) -> list:
+	"""
+	Cleans several folders of a mailbox at the same time. The folders are put in a work
+	queue taken from by a pool of workers, each with its own backend session.
+	:param backend: (mailbox_backend_interface) backend the sessions of the workers are created from
+	:param mailbox: (str) name of the mailbox
+	:param folder_paths: (list) paths of the folders to clean, see folder_traversal.select_folders
+	:param rules: (list) list of deletion_rule, every folder gets its own copies
+	:param max_workers: (int) amount of workers, FOLDER_WORKERS if None
+	:param use_restrict_filter: (bool) see run_rules_on_folder
+	:param deletion_batch_size: (int) see run_rules_on_folder
+	:param journal: (deletion_journal) see run_rules_on_folder
+	:param sender_resolver: (sender_address_resolver) see clean_mailbox
+	:return: (list) the result of each folder in the order of folder_paths, a dict with the keys
+	mailbox, folder, matched, deleted, unprocessed, missing (see run_rules_on_folder), rules (see
+	deletion_rule.get_summary), seconds and error (None, or the message of the error that stopped the folder
+	from being cleaned)
+	"""
+	if len(folder_paths) == 0:
+		return []
+	folder_queue = queue.Queue()
+	for folder_path in folder_paths:
+		folder_queue.put(folder_path)
+
+	results = []
+	worker_error = None
+	amt_workers = min(max_workers or FOLDER_WORKERS, len(folder_paths))
+	from concurrent.futures import ThreadPoolExecutor
+
+	with ThreadPoolExecutor(max_workers=amt_workers) as executor:
+		futures = [executor.submit(clean_folder_queue, backend, mailbox, folder_queue, rules, use_restrict_filter,
+								   deletion_batch_size, results, journal, sender_resolver)
+				   for _ in range(amt_workers)]
+		for future in futures:
+			if future.exception() is not None:
+				worker_error = f"{type(future.exception()).__name__}: {future.exception()}"
+
+	# folders are left in the queue only if no worker could connect
+	results_by_folder = {result['folder']: result for result in results}
+	return [results_by_folder.get(folder_path, {'mailbox': mailbox, 'folder': folder_path, 'matched': 0, 'deleted': 0,
+												'unprocessed': 0, 'missing': {}, 'rules': [], 'seconds': 0.0,
+												'error': worker_error})
+			for folder_path in folder_paths]
+
+
+def merge_mailbox_results(results: list) -> dict:
+	"""
+	Merges the results of several mailboxes, or of several folders, into one summary.
+	:param results: (list) results returned by clean_mailbox or clean_folders_in_parallel
+	:return: (dict) dict with the keys deleted, unprocessed, missing, rules (the rule summaries with
+	the counts of all mailboxes added up) and errors (list of "mailbox: error" or
+	"mailbox/folder: error" str)
+	"""
+	# every worker ran copies of the same rules, in the same order
+	merged_rules = []
+	missing = {}
+	for result in results:
+		add_missing_counts(missing, result['missing'])
+		for position, summary in enumerate(result['rules']):
+			if position == len(merged_rules):
+				merged_rules.append(dict(summary, deleted=0, unprocessed=0, missing={}))
+			merged_rules[position]['deleted'] += summary['deleted']
+			merged_rules[position]['unprocessed'] += summary['unprocessed']
+			add_missing_counts(merged_rules[position]['missing'], summary['missing'])
+	return {'deleted': sum(result['deleted'] for result in results),
+			'unprocessed': sum(result['unprocessed'] for result in results),
+			'missing': missing,
+			'rules': merged_rules,
+			'errors': [f"{get_result_location(result)}: {result['error']}" for result in results
+					   if result['error'] is not None]}
+
+
+def add_missing_counts(total: dict, counts: dict) -> None:
+	"""
+	Adds counts of emails per missing property to a total.
+	:param total: (dict) key: property name, value: amount of emails, changed in place
+	:param counts: (dict) counts in the same format
+	:return: None
+	"""
+	for property_name, amount in counts.items():
+		total[property_name] = total.get(property_name, 0) + amount
+
+
+def get_result_location(result: dict) -> str:
+	"""
+	Returns where the emails of a result were cleaned.
+	:param result: (dict) result returned by clean_mailbox or clean_folders_in_parallel
+	:return: (str) the mailbox, followed by the folder path for the result of a folder
+	"""
+	if 'folder' in result:
+		return f"{result['mailbox']}/{result['folder']}"
+	return result['mailbox']
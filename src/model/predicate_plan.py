@@ -0,0 +1,153 @@
+from src.model.property_probe import missing_value
+
+"""
+This file contains the compiled form of the deletion conditions of the
+cleanup_model. Each accepted condition is compiled once into a
+compiled_predicate holding its already normalized target, and the
+predicate_plan evaluates them cheapest and most selective first, reordering
+them as it observes how many emails each condition lets through.
+Checks read the properties of emails with probe_property, a check that cannot
+be done because the email is missing a property returns the missing_value of
+the property instead of True or False (see property_probe).
+Whether an email counts as missing a property does not depend on the order the
+predicates are evaluated in: a predicate that cannot be checked does not stop the
+evaluation, the email is only counted as missing a property if no other predicate
+rejects it. The per predicate counters (evaluations, hits) on the other hand do
+depend on the order, predicates after one rejecting an email are not evaluated.
+"""
+
+# relative cost of reading one property of an email (a cross process call for Outlook)
+PROPERTY_READ_COST = 10.0
+
+
+class compiled_predicate():
+	"""
+	One deletion condition compiled into a function taking an email and
+	returning a bool, or the missing_value of a property it could not read.
+	It counts how often it was evaluated and how often it matched.
+	"""
+
+	def __init__(self, name: str, condition_index: int, check, property_reads: int = 1, compute_cost: float = 1.0):
+		"""
+		:param name: (str) readable name of the condition
+		:param condition_index: (int) index of the condition in the model's all_matching_functions
+		:param check: function taking an email and returning True if the email matches, False or
+		a missing_value (see property_probe) otherwise
+		:param property_reads: (int) amount of email properties the check reads
+		:param compute_cost: (float) relative cost of the check once its properties are read
+		"""
+		self.name = name
+		self.condition_index = condition_index
+		self.check = check
+		self.cost = property_reads * PROPERTY_READ_COST + compute_cost
+		self.evaluations = 0
+		self.hits = 0
+
+	@property
+	def pass_rate(self) -> float:
+		"""
+		Observed share of emails matching this condition, smoothed so that
+		conditions that were never evaluated count as letting half through.
+		:return: (float) between 0 and 1
+		"""
+		return (self.hits + 1) / (self.evaluations + 2)
+
+	@property
+	def rank(self) -> float:
+		"""
+		Expected cost of this condition per email it rejects. Evaluating conditions
+		by increasing rank minimizes the cost of an AND of conditions.
+		:return: (float) the rank
+		"""
+		return self.cost / (1.0 - self.pass_rate)
+
+	def reset_counters(self) -> None:
+		self.evaluations = 0
+		self.hits = 0
+
+	def copy(self):
+		"""
+		Returns a predicate sharing this one's check, with its own counters.
+		:return: (compiled_predicate) the copy
+		"""
+		predicate = compiled_predicate(self.name, self.condition_index, self.check)
+		predicate.cost = self.cost
+		return predicate
+
+
+class predicate_plan():
+	"""
+	AND of compiled predicates, evaluated with short circuiting in the order
+	of their rank. The order is recomputed every reorder_interval emails.
+	"""
+
+	def __init__(self, predicates: list, reorder_interval: int = 256):
+		"""
+		:param predicates: (list) list of compiled_predicate
+		:param reorder_interval: (int) amount of emails between two reorderings
+		"""
+		self.predicates = list(predicates)
+		self.reorder_interval = reorder_interval
+		self.emails_evaluated = 0
+		self.reorder()
+
+	def reorder(self) -> None:
+		"""
+		Sorts the predicates by rank, cheapest and most selective first.
+		:return: None
+		"""
+		self.predicates.sort(key=lambda predicate: predicate.rank)
+
+	def matches(self, email_item):
+		"""
+		Checks an email against all predicates, stopping at the first one that
+		does not match. A predicate missing a property does not stop the others,
+		one of them may still reject the email.
+		:param email_item: an email item or a row of a metadata_table
+		:return: True if all predicates match, False if one does not, or the missing_value of
+		the property the predicate of the lowest condition_index could not read (false as well)
+		"""
+		self.emails_evaluated += 1
+		if self.emails_evaluated % self.reorder_interval == 0:
+			self.reorder()
+
+		missing = None
+		missing_index = None
+		for predicate in self.predicates:
+			predicate.evaluations += 1
+			result = predicate.check(email_item)
+			if result:
+				predicate.hits += 1
+			elif result.__class__ is not missing_value:
+				return result
+			elif missing is None or predicate.condition_index < missing_index:
+				missing = result
+				missing_index = predicate.condition_index
+		return True if missing is None else missing
+
+	def get_statistics(self) -> list:
+		"""
+		Returns the counters of every predicate, in the current evaluation order. A predicate
+		is only evaluated for the emails no predicate before it rejected, so the counters
+		depend on the evaluation order: they tell what the plan did, not how selective each
+		condition is on its own.
+		:return: (list) list of dicts with the keys name, evaluations, hits and pruned
+		"""
+		return [{"name": predicate.name,
+				 "evaluations": predicate.evaluations,
+				 "hits": predicate.hits,
+				 "pruned": predicate.evaluations - predicate.hits}
+				for predicate in self.predicates]
+
+	def reset_counters(self) -> None:
+		self.emails_evaluated = 0
+		for predicate in self.predicates:
+			predicate.reset_counters()
+
+	def copy(self):
+		"""
+		Returns a plan with copies of the predicates of this one, so it can be used by
+		another thread without sharing counters.
+		:return: (predicate_plan) the copy
+		"""
+		return predicate_plan([predicate.copy() for predicate in self.predicates], self.reorder_interval)
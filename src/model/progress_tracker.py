@@ -0,0 +1,108 @@
+import time
+
+"""
+This file reports the progress of a scan (emails scanned, matched and deleted,
+throughput and time left) to a callback, usually the view. Counting is done on
+every email, but the callback is only called once every min_interval seconds,
+so a slow console does not slow down the scan.
+"""
+
+# seconds between two progress reports
+PROGRESS_INTERVAL = 0.5
+
+
+class progress_tracker():
+	"""
+	Counts the emails of a scan and reports the progress to a callback, see the top of this file.
+	"""
+
+	def __init__(self, callback, total: int = None, min_interval: float = PROGRESS_INTERVAL, clock=time.monotonic):
+		"""
+		:param callback: function called with the progress dict, see get_progress
+		:param total: (int) amount of emails the scan reads, None if unknown (no time left is then estimated)
+		:param min_interval: (float) seconds between two reports
+		:param clock: function returning the current time in seconds
+		"""
+		self.callback = callback
+		self.total = total
+		self.min_interval = min_interval
+		self.clock = clock
+		self.scanned = 0
+		self.matched = 0
+		self.deleted = 0
+		self.start_time = clock()
+		self.last_report_time = self.start_time
+
+	def set_total(self, total: int) -> None:
+		"""
+		:param total: (int) amount of emails the scan reads, once it is known
+		:return: None
+		"""
+		self.total = total
+
+	def add_scanned(self, amount: int = 1) -> None:
+		"""
+		:param amount: (int) amount of emails read and checked against the conditions
+		:return: None
+		"""
+		self.scanned += amount
+		self.report()
+
+	def add_matched(self, amount: int = 1) -> None:
+		"""
+		:param amount: (int) amount of emails matching the conditions
+		:return: None
+		"""
+		self.matched += amount
+		self.report()
+
+	def add_deleted(self, amount: int) -> None:
+		"""
+		:param amount: (int) amount of emails deleted
+		:return: None
+		"""
+		self.deleted += amount
+		self.report()
+
+	def iter_scanned(self, emails):
+		"""
+		Yields the emails of an iterable, counting each one as scanned.
+		:param emails: iterable of items or rows
+		:return: generator of items or rows
+		"""
+		for email in emails:
+			self.add_scanned()
+			yield email
+
+	def get_progress(self, finished: bool = False) -> dict:
+		"""
+		:param finished: (bool) if true, the scan is over
+		:return: (dict) dict with the keys scanned, matched, deleted, total (None if unknown),
+		items_per_second, eta_seconds (None if unknown) and finished
+		"""
+		elapsed = self.clock() - self.start_time
+		items_per_second = self.scanned / elapsed if elapsed > 0 else 0.0
+		eta_seconds = None
+		if finished:
+			eta_seconds = 0.0
+		elif self.total is not None and items_per_second > 0:
+			eta_seconds = max(self.total - self.scanned, 0) / items_per_second
+		return {'scanned': self.scanned, 'matched': self.matched, 'deleted': self.deleted, 'total': self.total,
+				'items_per_second': items_per_second, 'eta_seconds': eta_seconds, 'finished': finished}
+
+	def report(self) -> None:
+		"""
+		Calls the callback if min_interval seconds went by since the last report.
+		:return: None
+		"""
+		now = self.clock()
+		if now - self.last_report_time >= self.min_interval:
+			self.last_report_time = now
+			self.callback(self.get_progress())
+
+	def finish(self) -> None:
+		"""
+		Reports the final counts, whatever the time since the last report.
+		:return: None
+		"""
+		self.callback(self.get_progress(finished=True))
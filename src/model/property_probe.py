@@ -0,0 +1,165 @@
+from datetime import datetime
+
+"""
+This file reads the properties of emails without raising for the emails missing
+them. Some emails do NOT have all properties:
+ 1.) SentOn (ex. reports about emails that failed to send, drafts)
+ 2.) SenderEmailAddress (ex. some but NOT all no reply emails, these have a sender
+     but Outlook does not see an address associated with it)
+Reading a missing property of an Outlook item raises an AttributeError, and
+Outlook gives empty dates as a placeholder instead (1/1/4501). probe_property
+turns both into the missing_value of the property, so the matching code checks
+for it instead of handling each case. Empty strings (ex. an empty Subject) are
+values like any other, they are NOT missing.
+Each kind of item tells which properties it has through its own property reader
+(see register_property_reader), so a missing property is never read and nothing
+is raised: Outlook items look up the properties of their item class, the stand-in
+items of the other backends look in their own storage. A property the item has
+is returned as it is, even when its value is None. Snapshots and the metadata
+index store missing values as None (see normalize_empty_value), so all search
+modes agree on what is missing.
+
+Missing values are false, so a check returning one (see compiled_predicate)
+behaves like a check that did not match, while telling the caller which property
+was missing.
+"""
+
+# Outlook gives 1/1/4501 as the value of an empty date property
+OUTLOOK_EMPTY_DATE_YEAR = 4501
+
+# properties the missing property condition can target, key: lower case name, value: property name
+MISSING_PROPERTY_TARGETS = {'senton': 'SentOn',
+							'senderemailaddress': 'SenderEmailAddress',
+							'sendername': 'SenderName',
+							'subject': 'Subject'}
+
+
+class missing_value():
+	"""
+	Value of a property an email does not have. There is one per property name,
+	see get_missing_value.
+	"""
+	__slots__ = ('property_name',)
+
+	def __init__(self, property_name: str):
+		self.property_name = property_name
+
+	def __bool__(self) -> bool:
+		return False
+
+	def __repr__(self) -> str:
+		return f"MISSING({self.property_name})"
+
+
+# key: property name, value: its missing_value
+MISSING_VALUES = {}
+
+# returned by property readers for the properties an item does not have
+ABSENT = object()
+
+# key: item class, value: function(item, property_name) returning the value or ABSENT
+PROPERTY_READERS = {}
+
+
+def get_missing_value(property_name: str) -> missing_value:
+	"""
+	:param property_name: (str) name of the property
+	:return: (missing_value) the missing value of the property, always the same object
+	"""
+	value = MISSING_VALUES.get(property_name)
+	if value is None:
+		value = MISSING_VALUES.setdefault(property_name, missing_value(property_name))
+	return value
+
+
+def is_missing(value) -> bool:
+	"""
+	:param value: a value returned by probe_property, or by a check
+	:return: (bool) True if the value is a missing_value
+	"""
+	return value.__class__ is missing_value
+
+
+def normalize_empty_value(value):
+	"""
+	:param value: value of a property as read from an email or fetched in a table
+	:return: None if the value is the empty date of Outlook, the value otherwise
+	"""
+	if isinstance(value, datetime) and value.year == OUTLOOK_EMPTY_DATE_YEAR:
+		return None
+	return value
+
+
+def register_property_reader(item_class, reader) -> None:
+	"""
+	Sets how probe_property reads the items of a class and of its subclasses.
+	:param item_class: (type) class of the items
+	:param reader: function(item, property_name) returning the value of the property,
+	or ABSENT if the item does not have it. It must not raise for a missing property.
+	:return: None
+	"""
+	PROPERTY_READERS[item_class] = reader
+	# subclasses looked up before the registration resolved to another reader
+	for each_class in list(PROPERTY_READERS):
+		if each_class is not item_class and issubclass(each_class, item_class):
+			del PROPERTY_READERS[each_class]
+
+
+def read_attribute(email_item, property_name: str):
+	"""
+	Property reader of the items of classes without a registered one.
+	:param email_item: the item
+	:param property_name: (str) name of the property
+	:return: the value of the property, or ABSENT
+	"""
+	return getattr(email_item, property_name, ABSENT)
+
+
+def get_property_reader(item_class):
+	"""
+	Helper method to find the property reader of a class, registered for it or for one of
+	its base classes, read_attribute otherwise
+	"""
+	reader = PROPERTY_READERS.get(item_class)
+	if reader is None:
+		reader = next((PROPERTY_READERS[base] for base in item_class.__mro__ if base in PROPERTY_READERS),
+					  read_attribute)
+		PROPERTY_READERS[item_class] = reader
+	return reader
+
+
+def read_property(email_item, property_name: str):
+	"""
+	Reads a property of an item through the property reader of its class.
+	:param email_item: an email item from the backend or a row of a metadata_table
+	:param property_name: (str) name of the property
+	:return: the value of the property, or ABSENT if the item does not have it
+	"""
+	return get_property_reader(email_item.__class__)(email_item, property_name)
+
+
+def probe_property(email_item, property_name: str):
+	"""
+	Reads a property of an email.
+	:param email_item: an email item from the backend or a row of a metadata_table
+	:param property_name: (str) name of the property
+	:return: the value of the property, or its missing_value if the email does not have it
+	"""
+	reader = PROPERTY_READERS.get(email_item.__class__)
+	value = (reader or get_property_reader(email_item.__class__))(email_item, property_name)
+	if value is ABSENT or (isinstance(value, datetime) and value.year == OUTLOOK_EMPTY_DATE_YEAR):
+		return get_missing_value(property_name)
+	return value
+
+
+def normalize_missing_property(property_name: str) -> str:
+	"""
+	Raises a ValueError if the property cannot be targeted by the missing property condition.
+	:param property_name: (str) name of the property, case insensitive
+	:return: (str) the name of the property, see MISSING_PROPERTY_TARGETS
+	"""
+	normalized = MISSING_PROPERTY_TARGETS.get(property_name.strip().lower())
+	if normalized is None:
+		raise ValueError(f"Unknown property {property_name}, expected one of: "
+						 f"{', '.join(MISSING_PROPERTY_TARGETS.values())}")
+	return normalized
@@ -0,0 +1,382 @@
+import re
+from datetime import datetime, timedelta, timezone
+from src.model.domain_suffix_trie import parse_domain_rule, ANY_LOCAL_PART
+from src.model.property_probe import normalize_empty_value
+
+"""
+This file compiles the deletion conditions of the cleanup_model into a DASL
+filter string for the Outlook Items.Restrict method, so Outlook only hands over
+candidate emails instead of every email of the folder. The filters produced
+here may match more emails than the conditions do (dates are rounded to the
+minute), the cleanup_model still checks every candidate with its own matching
+functions.
+
+Outlook leaves out of a restricted collection the items missing a property the
+filter compares, so the emails that cannot be checked would never be counted
+as such. include_missing_properties widens a filter so these emails are still
+handed over, and counted by the cleanup_model.
+
+It also contains a parser for the filters it produces, used by the in-memory
+backends to apply a filter the way Outlook would.
+"""
+
+# DASL property names used in filters
+SENDER_EMAIL_PROPERTY = "http://schemas.microsoft.com/mapi/proptag/0x0C1F001F"
+SENDER_NAME_PROPERTY = "http://schemas.microsoft.com/mapi/proptag/0x0C1A001F"
+SENDER_ADDRESS_TYPE_PROPERTY = "http://schemas.microsoft.com/mapi/proptag/0x0C1E001F"
+SUBJECT_PROPERTY = "urn:schemas:httpmail:subject"
+SENT_ON_PROPERTY = "urn:schemas:httpmail:date"
+LAST_MODIFICATION_PROPERTY = "DAV:getlastmodified"
+
+# maps the DASL property names to the item property they filter on
+DASL_PROPERTIES = {SENDER_EMAIL_PROPERTY: "SenderEmailAddress",
+				   SENDER_NAME_PROPERTY: "SenderName",
+				   SENDER_ADDRESS_TYPE_PROPERTY: "SenderEmailType",
+				   SUBJECT_PROPERTY: "Subject",
+				   SENT_ON_PROPERTY: "SentOn",
+				   LAST_MODIFICATION_PROPERTY: "LastModificationTime"}
+
+# maps the item properties to their DASL property names
+ITEM_PROPERTIES = {attribute: property_name for property_name, attribute in DASL_PROPERTIES.items()}
+
+# item properties compared as dates
+DATE_PROPERTIES = ("SentOn", "LastModificationTime")
+
+# conditions with more targets than this are left out of the filter to keep it short
+MAX_FILTER_ALTERNATIVES = 50
+
+# DASL dates are in UTC and only go down to the minute
+DASL_DATE_FORMAT = "%m/%d/%Y %I:%M %p"
+
+
+def quote_filter_value(value: str) -> str:
+	"""
+	Quotes a str value for a DASL filter, single quotes are escaped by doubling them.
+	:param value: (str) the value to quote
+	:return: (str) the quoted value
+	"""
+	return "'" + value.replace("'", "''") + "'"
+
+
+def format_filter_date(date: datetime, round_up: bool = False) -> str:
+	"""
+	Converts a datetime into a quoted DASL date in UTC. Since DASL dates do not
+	have seconds, the date is rounded down, or up if round_up is true, to the minute.
+	:param date: (datetime) a timezone aware datetime
+	:param round_up: (bool) round up to the next minute if true
+	:return: (str) the quoted date
+	"""
+	utc_date = date.astimezone(timezone.utc)
+	rounded = utc_date.replace(second=0, microsecond=0)
+	if round_up and rounded != utc_date:
+		rounded += timedelta(minutes=1)
+	return quote_filter_value(rounded.strftime(DASL_DATE_FORMAT))
+
+
+def as_list(targets) -> list:
+	"""
+	Returns the targets of a condition as a list.
+	:param targets: a str target or a collection of str targets
+	:return: (list) the targets
+	"""
+	return [targets] if isinstance(targets, str) else list(targets)
+
+
+def compile_alternatives(clauses: list):
+	"""
+	Joins the clauses of a condition with multiple targets by OR.
+	:param clauses: (list) clauses, one per target
+	:return: (str) the joined clauses, or None if there are more than MAX_FILTER_ALTERNATIVES
+	"""
+	if len(clauses) > MAX_FILTER_ALTERNATIVES:
+		return None
+	if len(clauses) == 1:
+		return clauses[0]
+	return " OR ".join(f"({clause})" for clause in clauses)
+
+
+def compile_domain_rule(rule: str) -> str:
+	"""
+	Compiles a sender domain rule into a clause on the sender email address.
+	:param rule: (str) the rule, see domain_suffix_trie
+	:return: (str) the clause
+	"""
+	local_part, domain, include_subdomains = parse_domain_rule(rule)
+	if local_part == ANY_LOCAL_PART:
+		local_part = "%"
+	if include_subdomains:
+		return f'"{SENDER_EMAIL_PROPERTY}" LIKE {quote_filter_value(local_part + "@%." + domain)}'
+	if local_part == "%":
+		return f'"{SENDER_EMAIL_PROPERTY}" LIKE {quote_filter_value("%@" + domain)}'
+	return f'"{SENDER_EMAIL_PROPERTY}" = {quote_filter_value(local_part + "@" + domain)}'
+
+
+def include_exchange_senders(clause: str):
+	"""
+	Widens a clause on the sender email address so it also passes the emails of Exchange
+	senders, whose address is only known once resolved (see sender_resolver).
+	:param clause: (str) the clause, or None
+	:return: (str) the widened clause, or None
+	"""
+	if clause is None:
+		return None
+	return f"({clause}) OR (\"{SENDER_ADDRESS_TYPE_PROPERTY}\" = 'EX')"
+
+
+def compile_restrict_filter(sender_email=None, sender_name=None, subject_keyphrase=None,
+							start_date: datetime = None, end_date: datetime = None, sender_domain=None,
+							exchange_senders: bool = False):
+	"""
+	Compiles deletion conditions into a DASL filter for Items.Restrict. Conditions
+	left as None are not part of the filter, neither are conditions with more than
+	MAX_FILTER_ALTERNATIVES targets.
+	:param sender_email: (str) sender email address condition, or a list of addresses
+	:param sender_name: (str) sender name condition, or a list of names
+	:param subject_keyphrase: (str) keyword/phrase the subject must contain, or a list
+	of keywords/phrases the subject must contain one of
+	:param start_date: (datetime) lower SentOn boundary (inclusive)
+	:param end_date: (datetime) upper SentOn boundary (inclusive)
+	:param sender_domain: (str) sender domain rule, or a list of rules (see domain_suffix_trie)
+	:param exchange_senders: (bool) if true, emails of Exchange senders pass the sender email
+	and sender domain clauses, see include_exchange_senders
+	:return: (str) the filter, or None if no condition was given
+	"""
+	clauses = []
+	if sender_email is not None:
+		clause = compile_alternatives(
+			[f'"{SENDER_EMAIL_PROPERTY}" = {quote_filter_value(address)}' for address in as_list(sender_email)])
+		clauses.append(include_exchange_senders(clause) if exchange_senders else clause)
+	if sender_name is not None:
+		clauses.append(compile_alternatives(
+			[f'"{SENDER_NAME_PROPERTY}" = {quote_filter_value(name)}' for name in as_list(sender_name)]))
+	if subject_keyphrase is not None:
+		clauses.append(compile_alternatives(
+			[f'"{SUBJECT_PROPERTY}" LIKE {quote_filter_value("%" + phrase + "%")}' for phrase in as_list(subject_keyphrase)]))
+	if sender_domain is not None:
+		clause = compile_alternatives([compile_domain_rule(rule) for rule in as_list(sender_domain)])
+		clauses.append(include_exchange_senders(clause) if exchange_senders else clause)
+	if start_date is not None:
+		clauses.append(f'"{SENT_ON_PROPERTY}" >= {format_filter_date(start_date)}')
+	if end_date is not None:
+		clauses.append(f'"{SENT_ON_PROPERTY}" <= {format_filter_date(end_date, round_up=True)}')
+
+	clauses = [clause for clause in clauses if clause is not None]
+	if len(clauses) == 0:
+		return None
+	return "@SQL=" + " AND ".join(f"({clause})" for clause in clauses)
+
+
+def include_missing_properties(restrict_filter: str, attributes) -> str:
+	"""
+	Widens a filter so it also passes the items missing one of the properties. The
+	placeholder Outlook gives for empty dates (1/1/4501) is NULL in a filter.
+	:param restrict_filter: (str) the filter, or None
+	:param attributes: iterable of str item properties, values of DASL_PROPERTIES
+	:return: (str) the widened filter, or None if restrict_filter is None
+	"""
+	if restrict_filter is None:
+		return None
+	clauses = [restrict_filter[len("@SQL="):]] + [f'"{ITEM_PROPERTIES[attribute]}" IS NULL' for attribute in attributes]
+	if len(clauses) == 1:
+		return restrict_filter
+	return "@SQL=" + " OR ".join(f"({clause})" for clause in clauses)
+
+
+def compile_modified_since_filter(watermark: datetime) -> str:
+	"""
+	Compiles a DASL filter for the items modified at or after a date. The date is
+	rounded down to the minute, so items modified in that minute are returned again.
+	:param watermark: (datetime) a timezone aware datetime
+	:return: (str) the filter
+	"""
+	return f'@SQL="{LAST_MODIFICATION_PROPERTY}" >= {format_filter_date(watermark)}'
+
+
+############################# Filter Parsing #############################
+
+TOKEN_PATTERN = re.compile(r"""\s*(?:(?P<property>"[^"]*")|(?P<value>'(?:[^']|'')*')|(?P<operator><=|>=|<>|=|<|>)"""
+						   r"""|(?P<paren>[()])|(?P<word>[A-Za-z_]+))""")
+
+
+def tokenize_filter(filter_str: str) -> list:
+	"""
+	Splits a DASL filter (without the @SQL= prefix) into tokens.
+	:param filter_str: (str) the filter
+	:return: (list) list of (kind, text) tuples
+	"""
+	tokens = []
+	position = 0
+	filter_str = filter_str.rstrip()
+	while position < len(filter_str):
+		match = TOKEN_PATTERN.match(filter_str, position)
+		if match is None:
+			raise ValueError(f"Cannot parse filter at: {filter_str[position:]}")
+		kind = match.lastgroup
+		text = match.group(kind)
+		if kind == "word":
+			text = text.upper()
+		tokens.append((kind, text))
+		position = match.end()
+	return tokens
+
+
+def like_to_regex(pattern: str):
+	"""
+	Converts a DASL LIKE pattern, where % matches anything, into a regex.
+	:param pattern: (str) the LIKE pattern
+	:return: compiled case insensitive regex
+	"""
+	return re.compile(".*".join(re.escape(part) for part in pattern.split("%")), re.IGNORECASE | re.DOTALL)
+
+
+def make_comparison(property_name: str, operator: str, value: str):
+	"""
+	Creates the function applying one comparison of a filter to an item.
+	Like in Outlook, an item missing the property never matches, neither does an
+	item with the empty date placeholder (see property_probe).
+	:return: function taking an item and returning a bool
+	"""
+	attribute = DASL_PROPERTIES.get(property_name)
+	if attribute is None:
+		raise ValueError(f"Unsupported filter property {property_name}")
+
+	comparisons = {"=": lambda a, b: a == b, "<>": lambda a, b: a != b,
+				   "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+				   ">": lambda a, b: a > b, ">=": lambda a, b: a >= b}
+
+	if operator == "LIKE":
+		regex = like_to_regex(value)
+		target = None
+		convert = lambda item_value: item_value
+		compare = lambda item_value, _: regex.fullmatch(item_value) is not None
+	elif operator in comparisons:
+		compare = comparisons[operator]
+		if attribute in DATE_PROPERTIES:
+			target = datetime.strptime(value, DASL_DATE_FORMAT).replace(tzinfo=timezone.utc)
+			convert = lambda item_value: item_value
+		else:
+			# string comparisons are case insensitive in Outlook
+			target = value.lower()
+			convert = lambda item_value: item_value.lower()
+	else:
+		raise ValueError(f"Unsupported filter operator {operator}")
+
+	def comparison(item) -> bool:
+		item_value = normalize_empty_value(getattr(item, attribute, None))
+		if item_value is None:
+			return False
+		return compare(convert(item_value), target)
+
+	return comparison
+
+
+def make_null_check(property_name: str):
+	"""
+	Creates the function applying an IS NULL comparison of a filter to an item. Like
+	in Outlook, the empty date placeholder (see property_probe) is NULL.
+	:return: function taking an item and returning a bool
+	"""
+	attribute = DASL_PROPERTIES.get(property_name)
+	if attribute is None:
+		raise ValueError(f"Unsupported filter property {property_name}")
+	return lambda item: normalize_empty_value(getattr(item, attribute, None)) is None
+
+
+class restrict_filter_parser():
+	"""
+	Recursive descent parser for the DASL filters produced by compile_restrict_filter.
+	Supports comparisons, LIKE, IS NULL, AND, OR, NOT and parentheses. AND binds tighter than OR.
+	"""
+
+	def __init__(self, filter_str: str):
+		if not filter_str.startswith("@SQL="):
+			raise ValueError("Only DASL filters starting with @SQL= are supported")
+		self.tokens = tokenize_filter(filter_str[len("@SQL="):])
+		self.position = 0
+
+	def parse(self):
+		"""
+		Parses the whole filter.
+		:return: function taking an item and returning True if the item passes the filter
+		"""
+		predicate = self.parse_or()
+		if self.position != len(self.tokens):
+			raise ValueError(f"Unexpected token {self.tokens[self.position][1]} in filter")
+		return predicate
+
+	def peek(self):
+		if self.position < len(self.tokens):
+			return self.tokens[self.position]
+		return (None, None)
+
+	def take(self, kind: str, text: str = None) -> str:
+		token_kind, token_text = self.peek()
+		if token_kind != kind or (text is not None and token_text != text):
+			raise ValueError(f"Expected {text or kind} in filter but got {token_text}")
+		self.position += 1
+		return token_text
+
+	def parse_or(self):
+		predicates = [self.parse_and()]
+		while self.peek() == ("word", "OR"):
+			self.position += 1
+			predicates.append(self.parse_and())
+		if len(predicates) == 1:
+			return predicates[0]
+
+		def passes_any(item) -> bool:
+			for predicate in predicates:
+				if predicate(item):
+					return True
+			return False
+		return passes_any
+
+	def parse_and(self):
+		predicates = [self.parse_not()]
+		while self.peek() == ("word", "AND"):
+			self.position += 1
+			predicates.append(self.parse_not())
+		if len(predicates) == 1:
+			return predicates[0]
+
+		def passes_all(item) -> bool:
+			for predicate in predicates:
+				if not predicate(item):
+					return False
+			return True
+		return passes_all
+
+	def parse_not(self):
+		if self.peek() == ("word", "NOT"):
+			self.position += 1
+			predicate = self.parse_not()
+			return lambda item: not predicate(item)
+		if self.peek() == ("paren", "("):
+			self.position += 1
+			predicate = self.parse_or()
+			self.take("paren", ")")
+			return predicate
+		return self.parse_comparison()
+
+	def parse_comparison(self):
+		property_name = self.take("property")[1:-1]
+		if self.peek() == ("word", "IS"):
+			self.position += 1
+			self.take("word", "NULL")
+			return make_null_check(property_name)
+		kind, operator = self.peek()
+		if kind == "operator" or operator == "LIKE":
+			self.position += 1
+		else:
+			raise ValueError(f"Expected an operator in filter but got {operator}")
+		value = self.take("value")[1:-1].replace("''", "'")
+		return make_comparison(property_name, operator, value)
+
+
+def parse_restrict_filter(filter_str: str):
+	"""
+	Parses a DASL filter into a function applying it to an item.
+	:param filter_str: (str) the filter, must start with @SQL=
+	:return: function taking an item and returning True if the item passes the filter
+	"""
+	return restrict_filter_parser(filter_str).parse()
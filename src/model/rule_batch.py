@@ -0,0 +1,206 @@
+import json
+import os
+from src.model.deletion_pipeline import iter_items_reversed
+from src.model.property_probe import is_missing
+
+"""
+This file contains the rules of a batch run. A rules file (JSON or TOML) holds
+many independent sets of deletion conditions, each one is compiled by the
+cleanup_model into a deletion_rule and all of them are checked during a single
+pass over the folder.
+
+Example of a JSON rules file:
+	{
+		"mailbox": "me@example.com",
+		"rules": [
+			{"name": "shop deals", "sender_email": ["deals@shop.com", "news@shop.com"]},
+			{"name": "old newsletters", "sender_domain": "*.news.com",
+			 "start_date": "1/1/2020", "end_date": "12/31/2022"},
+			{"name": "webinars", "subject_keyphrase": ["webinar", "register now"]},
+			{"name": "shop but invoices", "expression": "domain:shop.com AND NOT subject:invoice"},
+			{"name": "failed deliveries", "missing_property": "SentOn"}
+		]
+	}
+
+"mailbox" can also be a list of mailboxes, they are then cleaned at the same
+time (see parallel_cleanup).
+
+The same file in TOML (python 3.11 or later):
+	mailbox = "me@example.com"
+
+	[[rules]]
+	name = "shop deals"
+	sender_email = ["deals@shop.com", "news@shop.com"]
+"""
+
+# deletion conditions a rule can have, in the order they are set on the cleanup_model
+RULE_CONDITION_KEYS = ('sender_email', 'sender_name', 'sender_domain', 'start_date', 'end_date', 'subject_keyphrase',
+					   'expression', 'missing_property')
+
+
+def load_rules_file(file_path: str) -> dict:
+	"""
+	Reads and checks a rules file. Files ending in .toml are read as TOML, others as JSON.
+	Raises a ValueError if the file is not a valid rules file.
+	:param file_path: (str) path of the rules file
+	:return: (dict) dict with the keys mailboxes (list of str, empty if the file names no mailbox)
+	and rules (list of dicts, each with a name and some of the RULE_CONDITION_KEYS)
+	"""
+	if os.path.splitext(file_path)[1].lower() == '.toml':
+		# imported here, most runs never read a TOML file
+		try:
+			import tomllib
+		except ImportError:  # python < 3.11, only JSON rules files can be read
+			raise ValueError("TOML rules files need python 3.11 or later, please use a JSON rules file")
+		with open(file_path, 'rb') as rules_file:
+			try:
+				content = tomllib.load(rules_file)
+			except tomllib.TOMLDecodeError as error:
+				raise ValueError(f"Rules file {file_path} is not valid TOML: {error}")
+	else:
+		with open(file_path, 'r', encoding='utf-8') as rules_file:
+			try:
+				content = json.load(rules_file)
+			except json.JSONDecodeError as error:
+				raise ValueError(f"Rules file {file_path} is not valid JSON: {error}")
+
+	if not isinstance(content, dict) or not isinstance(content.get('rules'), list) or len(content['rules']) == 0:
+		raise ValueError(f"Rules file {file_path} must contain a non empty list of rules")
+
+	mailboxes = content.get('mailbox', [])
+	if isinstance(mailboxes, str):
+		mailboxes = [mailboxes]
+	if not isinstance(mailboxes, list) or not all(isinstance(mailbox, str) for mailbox in mailboxes):
+		raise ValueError(f"The mailbox of {file_path} must be an email address or a list of email addresses")
+
+	rules = []
+	for position, rule in enumerate(content['rules'], start=1):
+		if not isinstance(rule, dict):
+			raise ValueError(f"Rule {position} of {file_path} must be a table/object of conditions")
+		unknown_keys = set(rule) - set(RULE_CONDITION_KEYS) - {'name'}
+		if len(unknown_keys) > 0:
+			raise ValueError(f"Rule {position} of {file_path} has unknown conditions: {', '.join(sorted(unknown_keys))}")
+		rule = dict(rule)
+		rule['name'] = str(rule.get('name', f"rule {position}"))
+		rules.append(rule)
+	return {'mailboxes': mailboxes, 'rules': rules}
+
+
+class deletion_rule():
+	"""
+	One rule of a batch run, the deletion conditions of the rule compiled by the
+	cleanup_model (see cleanup_model.compile_rules) and the counters of the run.
+	"""
+
+	def __init__(self, name: str, predicate_plan, restrict_filter: str, confirmation_str: str):
+		"""
+		:param name: (str) name of the rule
+		:param predicate_plan: (predicate_plan) the compiled conditions of the rule
+		:param restrict_filter: (str) DASL filter of the conditions, or None
+		:param confirmation_str: (str) readable description of the conditions
+		"""
+		self.name = name
+		self.predicate_plan = predicate_plan
+		self.restrict_filter = restrict_filter
+		self.confirmation_str = confirmation_str
+		self.matched_count = 0  # emails matched by this rule and not by a rule before it
+		self.missing_attributes_count = 0  # emails this rule could not check
+		self.missing_property_counts = {}  # key: property name, value: emails this rule could not check for missing it
+
+	def matches(self, email_item):
+		"""
+		Checks an email against the conditions of the rule. Emails missing a property
+		needed by the rule do not match and are counted.
+		:param email_item: an email item from the backend
+		:return: True if the email matches, False if it does not, or the missing_value of the
+		property the rule could not read (see property_probe)
+		"""
+		result = self.predicate_plan.matches(email_item)
+		if is_missing(result):
+			self.missing_attributes_count += 1
+			name = result.property_name
+			self.missing_property_counts[name] = self.missing_property_counts.get(name, 0) + 1
+		return result
+
+	def copy(self):
+		"""
+		Returns a rule with the same conditions and its own counters, so it can be used
+		by another thread.
+		:return: (deletion_rule) the copy
+		"""
+		return deletion_rule(self.name, self.predicate_plan.copy(), self.restrict_filter, self.confirmation_str)
+
+	def get_summary(self) -> dict:
+		"""
+		:return: (dict) dict with the keys name, conditions, deleted, unprocessed and missing (key:
+		property name, value: amount of the unprocessed emails missing it)
+		"""
+		return {'name': self.name,
+				'conditions': self.confirmation_str,
+				'deleted': self.matched_count,
+				'unprocessed': self.missing_attributes_count,
+				'missing': dict(self.missing_property_counts)}
+
+
+def combine_restrict_filters(rules: list):
+	"""
+	Joins the filters of all rules by OR, so the backend only returns emails
+	matching at least one rule.
+	:param rules: (list) list of deletion_rule
+	:return: (str) the filter, or None if a rule has no filter
+	"""
+	filters = [rule.restrict_filter for rule in rules]
+	if len(filters) == 0 or any(each_filter is None for each_filter in filters):
+		return None
+	if len(filters) == 1:
+		return filters[0]
+	return "@SQL=" + " OR ".join(f"({each_filter[len('@SQL='):]})" for each_filter in filters)
+
+
+class rule_pass():
+	"""
+	A single pass of a list of rules over the emails of a folder.
+	"""
+
+	def __init__(self, rules: list):
+		"""
+		:param rules: (list) list of deletion_rule, an email is credited to the first rule it matches
+		"""
+		self.rules = rules
+		self.emails_with_missing_attributes_count = 0  # emails no rule matched because of a missing property
+		# key: property name, value: emails counted in emails_with_missing_attributes_count, by the first
+		# property a rule could not read
+		self.missing_property_counts = {}
+
+	def iter_matching_entry_ids(self, all_emails, progress=None):
+		"""
+		Checks every email against all rules and yields the EntryID of each matching
+		email once. Emails are visited from the last index to the first, so yielded
+		emails can be deleted while iterating.
+		:param all_emails: item collection from the backend
+		:param progress: (progress_tracker) if given, the scanned and matched emails are counted in it
+		:return: generator of str EntryIDs
+		"""
+		rules = self.rules
+		all_emails.Sort("[ReceivedTime]", False)
+		emails = iter_items_reversed(all_emails)
+		if progress is not None:
+			progress.set_total(all_emails.Count)
+			emails = progress.iter_scanned(emails)
+		for each_email in emails:
+			missing_value = None
+			for rule in rules:
+				result = rule.matches(each_email)
+				if result:
+					rule.matched_count += 1
+					if progress is not None:
+						progress.add_matched()
+					yield each_email.EntryID
+					break
+				if missing_value is None and is_missing(result):
+					missing_value = result
+			else:
+				if missing_value is not None:
+					self.emails_with_missing_attributes_count += 1
+					name = missing_value.property_name
+					self.missing_property_counts[name] = self.missing_property_counts.get(name, 0) + 1
@@ -0,0 +1,401 @@
+import re
+from src.model.aho_corasick import aho_corasick_automaton
+from src.model.date_handler import date_handler
+from src.model.domain_suffix_trie import domain_suffix_trie
+from src.model.predicate_plan import PROPERTY_READ_COST
+from src.model.property_probe import probe_property, is_missing, normalize_missing_property
+from src.model.restrict_filter import compile_restrict_filter
+from src.model.sender_resolver import read_sender_address
+
+"""
+This file contains the rule expression language, used to combine the deletion
+conditions with AND, OR, NOT and parentheses. An expression is parsed once
+into a tree of nodes evaluated with short circuiting, the children of AND and
+OR nodes being sorted so the cheapest ones run first.
+
+Conditions are written field:value, values with spaces or parentheses must be
+quoted with double quotes (a double quote inside a value is written twice):
+ - sender:someone@x.com       sender email address (case insensitive)
+ - name:"Some Shop"           sender name (case insensitive)
+ - domain:*.x.com             sender domain rule, see domain_suffix_trie
+ - subject:invoice            keyword/keyphrase the subject contains (case insensitive)
+ - date:1/1/2023..1/31/2023   SentOn date range (inclusive), dates as month/day/year
+ - missing:SentOn             the email does not have the property, see property_probe
+
+Example: (sender:a@x.com OR sender:b@x.com) AND NOT subject:"invoice"
+
+Like for the other conditions, an email missing a property read by the
+expression (other than by a missing condition) is not processed: evaluating
+it gives the missing_value of the property, whatever the nodes above it are,
+unless another branch of an OR matches it. Whatever the order of the branches,
+an OR is true if one of them matches, and missing if none does but one is missing.
+When parsed with a sender_address_resolver, sender and domain conditions check
+the SMTP address of Exchange senders.
+"""
+
+# text shown for each field in the confirmation string
+FIELD_DESCRIPTIONS = {"sender": "sender email:",
+					  "name": "sender name:",
+					  "domain": "sender domain:",
+					  "subject": "has the keyword/keyphrase in the subject:",
+					  "date": "was sent between the dates (inclusive):",
+					  "missing": "is missing the property:"}
+
+# fields whose conditions joined by OR are merged into a single condition (hashed set, trie or automaton)
+MERGEABLE_FIELDS = ("sender", "name", "domain", "subject", "missing")
+
+TOKEN_PATTERN = re.compile(r'\s*(?:(?P<paren>[()])|(?P<condition>(?P<field>[A-Za-z]+):'
+						   r'(?P<value>"(?:[^"]|"")*"|[^\s()"]+))|(?P<word>[A-Za-z]+))')
+
+
+def check_property(email_item, property_name: str, check):
+	"""
+	Reads a property of an email and checks its value.
+	:param email_item: an email item or a row of a metadata_table
+	:param property_name: (str) name of the property
+	:param check: function taking the value and returning a bool
+	:return: the result of check, or the missing_value of the property if the email does not have it
+	"""
+	value = probe_property(email_item, property_name)
+	if is_missing(value):
+		return value
+	return check(value)
+
+
+class condition_node():
+	"""
+	Leaf of an expression tree, one condition on one email property. It can hold
+	several values of the same field, the email then has to match any of them.
+	"""
+
+	def __init__(self, field: str, values: list, sender_resolver=None):
+		"""
+		Raises a ValueError if the field is unknown or a value is invalid.
+		:param field: (str) one of the keys of FIELD_DESCRIPTIONS
+		:param values: (list) list of str values, a date condition has a single "start..end" value
+		:param sender_resolver: (sender_address_resolver) if given, Exchange sender addresses are resolved
+		"""
+		if field not in FIELD_DESCRIPTIONS:
+			raise ValueError(f"Unknown condition field {field}, expected one of: {', '.join(FIELD_DESCRIPTIONS)}")
+		self.field = field
+		self.values = list(dict.fromkeys(values))
+		self.sender_resolver = sender_resolver
+		self.check = self.compile_check()
+
+	def compile_check(self):
+		"""
+		Compiles the condition into a function taking an email and returning a bool
+		(or the missing_value of the property it reads) and sets the cost of the condition.
+		:return: the function
+		"""
+		if self.field == "missing":
+			self.values = list(dict.fromkeys(normalize_missing_property(value) for value in self.values))
+			property_names = tuple(self.values)
+			self.cost = PROPERTY_READ_COST * len(property_names)
+			return lambda email_item: any(is_missing(probe_property(email_item, name)) for name in property_names)
+
+		read_address = read_sender_address if self.sender_resolver is None else self.sender_resolver.read_sender_address
+		if self.field == "sender":
+			targets = frozenset(value.lower() for value in self.values)
+			self.cost = PROPERTY_READ_COST + 1.0
+
+			def check_sender(email_item):
+				address = read_address(email_item)
+				return address if is_missing(address) else address.lower() in targets
+
+			return check_sender
+
+		if self.field == "name":
+			targets = frozenset(value.lower() for value in self.values)
+			self.cost = PROPERTY_READ_COST + 1.0
+			return lambda email_item: check_property(email_item, "SenderName", lambda value: value.lower() in targets)
+
+		if self.field == "domain":
+			trie = domain_suffix_trie(self.values)
+			self.cost = PROPERTY_READ_COST + 2.0
+
+			def check_domain(email_item):
+				address = read_address(email_item)
+				return address if is_missing(address) else trie.match(address) is not None
+
+			return check_domain
+
+		if self.field == "subject":
+			if len(self.values) == 1:
+				phrase = self.values[0].lower()
+				self.cost = PROPERTY_READ_COST + 1.0
+				return lambda email_item: check_property(email_item, "Subject", lambda value: phrase in value.lower())
+			automaton = aho_corasick_automaton(self.values)
+			self.cost = PROPERTY_READ_COST + 2.0
+			return lambda email_item: check_property(email_item, "Subject",
+													 lambda value: automaton.find_first(value) is not None)
+
+		if len(self.values) != 1 or self.values[0].count("..") != 1:
+			raise ValueError(f"A date condition must look like date:1/1/2023..1/31/2023, got {self.values}")
+		start, end = self.values[0].split("..")
+		utility = date_handler()
+		self.start_date = utility.convert_list_into_datetime(utility.process_str_date(start))
+		self.end_date = utility.convert_list_into_datetime(utility.process_str_date(end), endtime=True)
+		if self.end_date < self.start_date:
+			raise ValueError(f"The date range {self.values[0]} ends before it starts")
+		lower_timestamp, upper_timestamp = utility.get_timestamp_bounds(self.start_date, self.end_date)
+		self.cost = PROPERTY_READ_COST + 1.0
+		return lambda email_item: check_property(email_item, "SentOn",
+												 lambda value: lower_timestamp <= value.timestamp() <= upper_timestamp)
+
+	def evaluate(self, email_item):
+		return self.check(email_item)
+
+	def describe(self) -> str:
+		"""
+		:return: (str) readable description of the condition
+		"""
+		if self.field == "date":
+			return f"{FIELD_DESCRIPTIONS['date']} {self.start_date.strftime('%m/%d/%Y')} to " \
+				   f"{self.end_date.strftime('%m/%d/%Y')}"
+		return f"{FIELD_DESCRIPTIONS[self.field]} {' OR '.join(self.values)}"
+
+	def restrict_clause(self):
+		"""
+		:return: (str) DASL clause (without @SQL=) passing at least the matching emails, or None
+		"""
+		if self.field == "missing":
+			# like a negation, see not_node.restrict_clause
+			return None
+		if self.field == "date":
+			restrict_filter = compile_restrict_filter(start_date=self.start_date, end_date=self.end_date)
+		else:
+			argument = {"sender": "sender_email", "name": "sender_name", "domain": "sender_domain",
+						"subject": "subject_keyphrase"}[self.field]
+			restrict_filter = compile_restrict_filter(**{argument: self.values},
+													  exchange_senders=self.sender_resolver is not None)
+		return None if restrict_filter is None else restrict_filter[len("@SQL="):]
+
+
+class not_node():
+	"""
+	Negation of a node of an expression tree.
+	"""
+
+	def __init__(self, child):
+		self.child = child
+		self.cost = child.cost
+
+	def evaluate(self, email_item):
+		result = self.child.evaluate(email_item)
+		return result if is_missing(result) else not result
+
+	def describe(self) -> str:
+		return f"NOT ({self.child.describe()})"
+
+	def restrict_clause(self):
+		# a missing property makes a DASL comparison false, so its negation could drop
+		# emails the expression matches (or not process), negations are left to the model
+		return None
+
+
+class and_node():
+	"""
+	Node matching if all of its children match, the cheapest children are evaluated first.
+	"""
+	joiner = " AND "
+
+	def __init__(self, children: list):
+		self.written_children = list(children)  # order of the expression, used to describe it
+		self.children = sorted(children, key=lambda child: child.cost)
+		self.cost = sum(child.cost for child in self.children)
+
+	def evaluate(self, email_item):
+		for child in self.children:
+			result = child.evaluate(email_item)
+			if not result:
+				return result
+		return True
+
+	def describe(self) -> str:
+		return self.joiner.join(describe_child(child) for child in self.written_children)
+
+	def restrict_clause(self):
+		# leaving out a clause only widens the filter
+		clauses = [clause for clause in (child.restrict_clause() for child in self.children) if clause is not None]
+		if len(clauses) == 0:
+			return None
+		return self.joiner.join(f"({clause})" for clause in clauses)
+
+
+class or_node(and_node):
+	"""
+	Node matching if any of its children matches, the cheapest children are evaluated first.
+	"""
+	joiner = " OR "
+
+	def evaluate(self, email_item):
+		# a child missing a property does not stop the others, one of them may still match
+		missing = None
+		for child in self.children:
+			result = child.evaluate(email_item)
+			if result:
+				return True
+			if missing is None and is_missing(result):
+				missing = result
+		return False if missing is None else missing
+
+	def restrict_clause(self):
+		clauses = [child.restrict_clause() for child in self.children]
+		if any(clause is None for clause in clauses):
+			return None
+		return self.joiner.join(f"({clause})" for clause in clauses)
+
+
+def describe_child(child) -> str:
+	"""
+	Describes a child of an AND/OR node, in parentheses if it is itself an AND/OR node
+	or a condition with several values.
+	:return: (str) the description
+	"""
+	if isinstance(child, and_node) or (isinstance(child, condition_node) and len(child.values) > 1):
+		return f"({child.describe()})"
+	return child.describe()
+
+
+def make_and_node(children: list):
+	"""
+	Creates an AND node, nested AND nodes are flattened into it.
+	:param children: (list) the nodes to join
+	:return: the node, or the only child
+	"""
+	flattened = []
+	for child in children:
+		if type(child) is and_node:
+			flattened.extend(child.written_children)
+		else:
+			flattened.append(child)
+	return flattened[0] if len(flattened) == 1 else and_node(flattened)
+
+
+def make_or_node(children: list, sender_resolver=None):
+	"""
+	Creates an OR node, nested OR nodes are flattened into it and the conditions
+	on the same MERGEABLE_FIELDS are merged into one condition.
+	:param children: (list) the nodes to join
+	:param sender_resolver: (sender_address_resolver) passed on to the merged conditions, see condition_node
+	:return: the node, or the only child
+	"""
+	flattened = []
+	merged_values = {}
+	for child in children:
+		grandchildren = child.written_children if type(child) is or_node else [child]
+		for each in grandchildren:
+			if isinstance(each, condition_node) and each.field in MERGEABLE_FIELDS:
+				if each.field not in merged_values:
+					merged_values[each.field] = []
+					flattened.append(each.field)
+				merged_values[each.field].extend(each.values)
+			else:
+				flattened.append(each)
+	nodes = [condition_node(each, merged_values[each], sender_resolver) if isinstance(each, str) else each
+			 for each in flattened]
+	return nodes[0] if len(nodes) == 1 else or_node(nodes)
+
+
+def tokenize_expression(expression: str) -> list:
+	"""
+	Splits a rule expression into tokens.
+	:param expression: (str) the expression
+	:return: (list) list of (kind, text) tuples, conditions are ("condition", (field, value))
+	"""
+	tokens = []
+	position = 0
+	expression = expression.rstrip()
+	while position < len(expression):
+		match = TOKEN_PATTERN.match(expression, position)
+		if match is None:
+			raise ValueError(f"Cannot parse rule expression at: {expression[position:]}")
+		if match.group("paren") is not None:
+			tokens.append(("paren", match.group("paren")))
+		elif match.group("condition") is not None:
+			value = match.group("value")
+			if value.startswith('"'):
+				value = value[1:-1].replace('""', '"')
+			if value == "":
+				raise ValueError(f"Empty value for condition {match.group('field')}")
+			tokens.append(("condition", (match.group("field").lower(), value)))
+		else:
+			tokens.append(("word", match.group("word").upper()))
+		position = match.end()
+	return tokens
+
+
+class rule_expression_parser():
+	"""
+	Recursive descent parser of rule expressions. NOT binds tighter than AND,
+	which binds tighter than OR.
+	"""
+
+	def __init__(self, expression: str, sender_resolver=None):
+		self.tokens = tokenize_expression(expression)
+		self.position = 0
+		self.sender_resolver = sender_resolver
+
+	def parse(self):
+		"""
+		Parses the whole expression.
+		:return: root node of the expression tree
+		"""
+		if len(self.tokens) == 0:
+			raise ValueError("The rule expression is empty")
+		node = self.parse_or()
+		if self.position != len(self.tokens):
+			raise ValueError(f"Unexpected {self.tokens[self.position][1]} in rule expression")
+		return node
+
+	def peek(self):
+		if self.position < len(self.tokens):
+			return self.tokens[self.position]
+		return (None, None)
+
+	def parse_or(self):
+		children = [self.parse_and()]
+		while self.peek() == ("word", "OR"):
+			self.position += 1
+			children.append(self.parse_and())
+		return make_or_node(children, self.sender_resolver)
+
+	def parse_and(self):
+		children = [self.parse_not()]
+		while self.peek() == ("word", "AND"):
+			self.position += 1
+			children.append(self.parse_not())
+		return make_and_node(children)
+
+	def parse_not(self):
+		kind, text = self.peek()
+		if (kind, text) == ("word", "NOT"):
+			self.position += 1
+			child = self.parse_not()
+			# double negations cancel out
+			return child.child if isinstance(child, not_node) else not_node(child)
+		if (kind, text) == ("paren", "("):
+			self.position += 1
+			node = self.parse_or()
+			if self.peek() != ("paren", ")"):
+				raise ValueError("Missing ) in rule expression")
+			self.position += 1
+			return node
+		if kind == "condition":
+			self.position += 1
+			return condition_node(text[0], [text[1]], self.sender_resolver)
+		raise ValueError(f"Expected a condition in rule expression but got {text or 'the end of it'}")
+
+
+def parse_rule_expression(expression: str, sender_resolver=None):
+	"""
+	Parses a rule expression into an expression tree. Raises a ValueError if the
+	expression is invalid.
+	:param expression: (str) the expression, see the top of this file
+	:param sender_resolver: (sender_address_resolver) if given, sender and domain conditions
+	check the SMTP address of Exchange senders
+	:return: root node of the tree, it has the methods evaluate(email_item), describe()
+	and restrict_clause() and a cost attribute
+	"""
+	return rule_expression_parser(expression, sender_resolver).parse()
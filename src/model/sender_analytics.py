@@ -0,0 +1,194 @@
+from src.model.property_probe import is_missing
+from src.model.sender_resolver import read_sender_address
+
+"""
+This file aggregates the emails of a folder per sender address, sender name and
+sender domain in a single streaming pass, to find out who sends the most emails.
+
+Memory use is bounded: each aggregation keeps at most `capacity` senders, using
+the Space-Saving algorithm (Metwally et al., "Efficient Computation of Frequent
+and Top-k Elements in Data Streams"). When a sender that is not kept shows up
+and the aggregation is full, it takes the place of the sender with the lowest
+count and inherits that count. A sender's count is thus never under its real
+count and over it by at most its error, and any sender sending more than
+1/capacity of the emails is guaranteed to be kept. Until the aggregation is
+full, all counts are exact. The size and date span of a sender only cover the
+emails counted since it was last kept.
+"""
+
+# senders kept per aggregation, unless told otherwise
+DEFAULT_CAPACITY = 1000
+
+
+class sender_aggregate():
+	"""
+	Counts, total size and date span of the emails of a sender.
+	"""
+	__slots__ = ('key', 'count', 'error', 'size', 'first_sent', 'last_sent')
+
+	def __init__(self, key: str, count: int = 0, error: int = 0):
+		self.key = key
+		self.count = count
+		self.error = error
+		self.size = 0
+		self.first_sent = None
+		self.last_sent = None
+
+	def add_email(self, size: int, sent_on) -> None:
+		"""
+		Adds the size and date of an email. The count is kept by the heavy_hitters.
+		:param size: (int) size of the email in bytes
+		:param sent_on: (datetime) date the email was sent, None if unknown
+		:return: None
+		"""
+		self.size += size
+		if sent_on is None:
+			return
+		if self.first_sent is None or sent_on < self.first_sent:
+			self.first_sent = sent_on
+		if self.last_sent is None or sent_on > self.last_sent:
+			self.last_sent = sent_on
+
+	def get_summary(self) -> dict:
+		"""
+		:return: (dict) dict with the keys key, count, error (the count may be over the real
+		count by at most this much), size, first_sent and last_sent
+		"""
+		return {'key': self.key, 'count': self.count, 'error': self.error, 'size': self.size,
+				'first_sent': self.first_sent, 'last_sent': self.last_sent}
+
+
+class heavy_hitters():
+	"""
+	Space-Saving aggregation keeping at most capacity keys. Keys are grouped in
+	buckets by count (the "stream summary"), so adding an email and evicting the
+	key with the lowest count both take constant time.
+	"""
+
+	def __init__(self, capacity: int = DEFAULT_CAPACITY):
+		"""
+		:param capacity: (int) maximum amount of keys kept, must be at least 1
+		"""
+		if capacity < 1:
+			raise ValueError("The capacity of a heavy hitters aggregation must be at least 1")
+		self.capacity = capacity
+		self.aggregates = {}
+		self.buckets = {}  # count -> dict of the aggregates with that count, used as an ordered set
+		self.min_count = 0
+		self.amt_evictions = 0
+
+	def _move_to_bucket(self, aggregate: sender_aggregate, count: int) -> None:
+		old_bucket = self.buckets.get(aggregate.count)
+		if old_bucket is not None:
+			del old_bucket[aggregate.key]
+			if len(old_bucket) == 0:
+				del self.buckets[aggregate.count]
+				if self.min_count == aggregate.count:
+					# counts only go up by 1, so the next lowest count is this one plus 1
+					self.min_count = count
+		aggregate.count = count
+		self.buckets.setdefault(count, {})[aggregate.key] = aggregate
+
+	def add(self, key: str, size: int = 0, sent_on=None) -> None:
+		"""
+		Counts an email of a key.
+		:param key: (str) the key, ex. a sender address
+		:param size: (int) size of the email in bytes
+		:param sent_on: (datetime) date the email was sent, None if unknown
+		:return: None
+		"""
+		aggregate = self.aggregates.get(key)
+		if aggregate is not None:
+			self._move_to_bucket(aggregate, aggregate.count + 1)
+		elif len(self.aggregates) < self.capacity:
+			aggregate = sender_aggregate(key)
+			self.aggregates[key] = aggregate
+			self._move_to_bucket(aggregate, 1)
+			self.min_count = 1
+		else:
+			# the new key takes the place (and the count) of a key with the lowest count
+			min_bucket = self.buckets[self.min_count]
+			evicted = min_bucket.pop(next(iter(min_bucket)))
+			del self.aggregates[evicted.key]
+			aggregate = sender_aggregate(key, count=self.min_count, error=self.min_count)
+			self.aggregates[key] = aggregate
+			min_bucket[key] = aggregate
+			self._move_to_bucket(aggregate, aggregate.count + 1)
+			self.amt_evictions += 1
+		aggregate.add_email(size, sent_on)
+
+	def get_top(self, top_n: int) -> list:
+		"""
+		Returns the keys with the highest counts.
+		:param top_n: (int) amount of keys returned
+		:return: (list) summaries of the keys (see sender_aggregate.get_summary), highest count first
+		"""
+		top = sorted(self.aggregates.values(), key=lambda aggregate: (-aggregate.count, aggregate.key))[:top_n]
+		return [aggregate.get_summary() for aggregate in top]
+
+
+class sender_statistics():
+	"""
+	Aggregates emails per sender address, sender name and sender domain.
+	"""
+
+	def __init__(self, capacity: int = DEFAULT_CAPACITY, sender_resolver=None):
+		"""
+		:param capacity: (int) maximum amount of senders kept per aggregation, see heavy_hitters
+		:param sender_resolver: (sender_address_resolver) if given, Exchange senders are counted
+		under their SMTP address and domain
+		"""
+		self.read_sender_address = read_sender_address if sender_resolver is None \
+			else sender_resolver.read_sender_address
+		self.addresses = heavy_hitters(capacity)
+		self.names = heavy_hitters(capacity)
+		self.domains = heavy_hitters(capacity)
+		self.amt_emails = 0
+		self.emails_with_missing_attributes_count = 0
+
+	def add_email(self, email_item) -> None:
+		"""
+		Counts an email. Emails without a sender address are only counted in
+		emails_with_missing_attributes_count.
+		:param email_item: an item, or a snapshot row, with the SenderEmailAddress, SenderName,
+		Size and SentOn properties
+		:return: None
+		"""
+		address = self.read_sender_address(email_item)
+		if is_missing(address):
+			self.emails_with_missing_attributes_count += 1
+			return
+		address = address.lower()
+		size = getattr(email_item, 'Size', None) or 0
+		sent_on = getattr(email_item, 'SentOn', None)
+		name = getattr(email_item, 'SenderName', None) or address
+
+		self.amt_emails += 1
+		self.addresses.add(address, size, sent_on)
+		self.names.add(name, size, sent_on)
+		# Exchange addresses (/O=EXCHANGELABS/...) that were not resolved have no domain
+		if '@' in address:
+			self.domains.add(address.rsplit('@', 1)[1], size, sent_on)
+
+	def add_emails(self, emails) -> None:
+		"""
+		Counts every email of an iterable, reading each email once.
+		:param emails: iterable of items or snapshot rows
+		:return: None
+		"""
+		for each_email in emails:
+			self.add_email(each_email)
+
+	def get_report(self, top_n: int) -> dict:
+		"""
+		:param top_n: (int) amount of senders listed per aggregation
+		:return: (dict) dict with the keys emails (amount counted), unprocessed (amount without
+		a sender address), exact (False if some counts are estimates) and addresses, names and
+		domains (see heavy_hitters.get_top)
+		"""
+		return {'emails': self.amt_emails,
+				'unprocessed': self.emails_with_missing_attributes_count,
+				'exact': all(aggregation.amt_evictions == 0 for aggregation in (self.addresses, self.names, self.domains)),
+				'addresses': self.addresses.get_top(top_n),
+				'names': self.names.get_top(top_n),
+				'domains': self.domains.get_top(top_n)}
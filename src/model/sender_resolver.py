@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from src.model.property_probe import probe_property, is_missing
+
+"""
+This file resolves the sender addresses of Exchange senders to SMTP addresses.
+For senders of the same Exchange organization, SenderEmailAddress is an X.500
+address (ex. /O=EXCHANGELABS/OU=EXCHANGE ADMINISTRATIVE GROUP/CN=RECIPIENTS/CN=JDOE)
+instead of jdoe@x.com, so sender email and sender domain conditions never match
+them. Looking up the SMTP address takes several calls to Outlook (and often to
+the Exchange server), so every address is resolved once per run: results are
+kept in a bounded LRU cache keyed by the raw sender address, which can be saved
+to a JSON file and loaded by the next run.
+
+Addresses that could not be resolved are cached too, so they are not looked up
+again for every email of the same sender. They are not saved, the lookup may
+succeed in a later run.
+"""
+
+# amount of sender addresses kept in the cache, unless told otherwise
+DEFAULT_CACHE_CAPACITY = 10000
+
+# SenderEmailType of Exchange senders (SMTP senders have "SMTP")
+EXCHANGE_ADDRESS_TYPE = "EX"
+
+
+def is_exchange_address(address: str) -> bool:
+	"""
+	:param address: (str) a sender email address
+	:return: (bool) True if the address is an Exchange (X.500) address instead of an SMTP address
+	"""
+	return address.startswith("/") or "@" not in address
+
+
+def read_sender_address(email_item):
+	"""
+	Reads the sender address of an email as it is, see probe_property.
+	:param email_item: an email item from the backend or a row of a metadata_table
+	:return: (str) the address, or the missing_value of SenderEmailAddress
+	"""
+	return probe_property(email_item, 'SenderEmailAddress')
+
+
+class sender_address_resolver():
+	"""
+	Resolves Exchange sender addresses to SMTP addresses with a bounded LRU cache,
+	see the top of this file. The cache is shared by the worker threads of a
+	parallel run, each looking up addresses with its own backend session (see
+	use_session).
+	"""
+
+	def __init__(self, backend, capacity: int = DEFAULT_CACHE_CAPACITY, cache_path: str = None):
+		"""
+		Raises a ValueError if the cache file cannot be read.
+		:param backend: (mailbox_backend_interface) backend looking up the addresses not in the cache
+		:param capacity: (int) maximum amount of addresses kept, the least recently used are evicted
+		:param cache_path: (str) JSON file the cache is loaded from if it exists, and saved to by save
+		"""
+		if capacity < 1:
+			raise ValueError(f"The capacity of the sender address cache must be at least 1, got {capacity}")
+		self.backend = backend
+		self.capacity = capacity
+		self.cache_path = cache_path
+		self.cache = OrderedDict()  # key: raw sender address, value: SMTP address, None if it could not be resolved
+		self.lock = threading.Lock()
+		self.sessions = threading.local()  # session of each worker thread, see use_session
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.loaded = 0  # amount of addresses loaded from the cache file
+		if cache_path is not None and os.path.exists(cache_path):
+			self.load(cache_path)
+
+	def use_session(self, session) -> None:
+		"""
+		Makes the calling thread look up addresses with its own backend session, since
+		Outlook objects cannot be shared across threads.
+		:param session: (mailbox_backend_interface) connected session of the thread, None to use the backend
+		:return: None
+		"""
+		self.sessions.backend = session
+
+	def resolve(self, address: str) -> str:
+		"""
+		:param address: (str) a sender email address
+		:return: (str) the SMTP address of the sender, the address itself if it is not an
+		Exchange address or could not be resolved
+		"""
+		if not is_exchange_address(address):
+			return address
+		with self.lock:
+			if address in self.cache:
+				self.hits += 1
+				self.cache.move_to_end(address)
+				return self.cache[address] or address
+			self.misses += 1
+		# looked up outside the lock, workers may each look up the same new address once
+		backend = getattr(self.sessions, 'backend', None) or self.backend
+		smtp_address = backend.resolve_sender_address(address)
+		self.store(address, smtp_address)
+		return smtp_address or address
+
+	def read_sender_address(self, email_item):
+		"""
+		Reads the sender address of an email, Exchange addresses are resolved.
+		:param email_item: an email item from the backend or a row of a metadata_table
+		:return: (str) the address, or the missing_value of SenderEmailAddress
+		"""
+		address = probe_property(email_item, 'SenderEmailAddress')
+		if is_missing(address):
+			return address
+		return self.resolve(address)
+
+	def store(self, address: str, smtp_address: str) -> None:
+		"""
+		Adds an address to the cache, evicting the least recently used ones above the capacity.
+		:param address: (str) the raw sender address
+		:param smtp_address: (str) its SMTP address, None if it could not be resolved
+		:return: None
+		"""
+		with self.lock:
+			self.cache[address] = smtp_address
+			self.cache.move_to_end(address)
+			while len(self.cache) > self.capacity:
+				self.cache.popitem(last=False)
+				self.evictions += 1
+
+	def load(self, path: str) -> None:
+		"""
+		Adds the addresses of a cache file to the cache. Raises a ValueError if the
+		file is not a cache file.
+		:param path: (str) path of the JSON file, see save
+		:return: None
+		"""
+		try:
+			with open(path, 'r', encoding='utf-8') as cache_file:
+				addresses = json.load(cache_file)
+		except (OSError, json.JSONDecodeError) as error:
+			raise ValueError(f"Could not read the sender address cache {path}: {error}")
+		if not isinstance(addresses, dict):
+			raise ValueError(f"The sender address cache {path} must be a JSON object")
+		for address, smtp_address in addresses.items():
+			if isinstance(smtp_address, str):
+				self.store(address, smtp_address)
+				self.loaded += 1
+
+	def save(self, path: str = None) -> None:
+		"""
+		Writes the resolved addresses of the cache to a JSON file, least recently used
+		first so loading it keeps the order.
+		:param path: (str) path of the file, overwritten if it exists, the cache_path if None
+		:return: None
+		"""
+		path = path or self.cache_path
+		if path is None:
+			raise RuntimeError('a path must be given to save a sender address cache without a cache_path')
+		with self.lock:
+			addresses = {address: smtp_address for address, smtp_address in self.cache.items()
+						 if smtp_address is not None}
+		with open(path, 'w', encoding='utf-8') as cache_file:
+			json.dump(addresses, cache_file, indent=2)
+
+	def get_stats(self) -> dict:
+		"""
+		:return: (dict) dict with the keys hits, misses (Exchange addresses looked up by the
+		backend), hit_rate (hits over hits and misses, None if no Exchange address was read),
+		unresolved (cached addresses that could not be resolved), evictions, loaded, size and capacity
+		"""
+		with self.lock:
+			lookups = self.hits + self.misses
+			return {'hits': self.hits, 'misses': self.misses,
+					'hit_rate': None if lookups == 0 else self.hits / lookups,
+					'unresolved': sum(1 for smtp_address in self.cache.values() if smtp_address is None),
+					'evictions': self.evictions, 'loaded': self.loaded, 'size': len(self.cache),
+					'capacity': self.capacity}
@@ -46,6 +46,22 @@ class cleanup_view_interface():
 		"""
 		raise NotImplementedError()
 
+	def get_target_sender_domain(self) -> str:
+		"""
+		Prompts the user and gets the target sender domain rule from the user.
+		:return: (str) domain rule used for matching condition for the model
+					ex. x.com or *@*.x.com
+		"""
+		raise NotImplementedError()
+
+	def get_target_rule_expression(self) -> str:
+		"""
+		Prompts the user and gets a rule expression combining conditions with AND/OR/NOT.
+		:return: (str) rule expression used for matching condition for the model
+					ex. (sender:a@x.com OR sender:b@x.com) AND NOT subject:invoice
+		"""
+		raise NotImplementedError()
+
 	def get_target_start_date(self) -> str:
 		"""
 		Prompts the user and gets the target_start_date input from the user.
@@ -70,6 +86,15 @@ class cleanup_view_interface():
 		"""
 		raise NotImplementedError()
 
+	def get_target_missing_property(self) -> str:
+		"""
+		Prompts the user and gets the property (or properties, separated by commas) the
+		targeted emails do not have.
+		:return: (str) property names used for matching condition for the model
+					ex. SentOn or SentOn, SenderEmailAddress
+		"""
+		raise NotImplementedError()
+
 	def confirm_deletion_parameters(self, confirmation_str: str, selected_email) -> bool:
 		"""
 		Asks the user if they want to delete emails that match the conditions as described
@@ -81,16 +106,112 @@ class cleanup_view_interface():
 		"""
 		raise NotImplementedError()
 
-	def display_deletion_summary(self, amt_deleted: int, amt_unprocessed: int) -> None:
+	def display_deletion_summary(self, amt_deleted: int, amt_unprocessed: int, missing_properties: dict = None) -> None:
 		"""
 
 		:param amt_deleted: (int) The amount of emails that were deleted by the model
 		:param amt_unprocessed: (int) The amount of emails that could not be preocessed
 									by the model.
+		:param missing_properties: (dict) key: property name, value: amount of the unprocessed
+									emails missing it (missing_property_counts attribute of the model)
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_progress(self, progress: dict) -> None:
+		"""
+		Displays the progress of a deletion, called again and again while the folder is scanned.
+		:param progress: (dict) dict with the keys scanned, matched, deleted, total (None if unknown),
+						items_per_second, eta_seconds (None if unknown) and finished (True for the
+						last call of the deletion), see progress_tracker.get_progress
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_rule_summary(self, rule_summaries: list) -> None:
+		"""
+		Displays the result of each rule of a batch run.
+		:param rule_summaries: (list) list of dicts with the keys name, conditions, deleted
+								and unprocessed, in the order of the rules
 		:return: None
 		"""
 		raise NotImplementedError()
 
+	def display_mailbox_summary(self, mailbox_summaries: list) -> None:
+		"""
+		Displays the result of each mailbox cleaned at the same time as others.
+		:param mailbox_summaries: (list) list of dicts with the keys mailbox, deleted, unprocessed,
+								seconds and error (None if the mailbox was cleaned)
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_folder_summary(self, folder_summaries: list) -> None:
+		"""
+		Displays the result of each folder of a cleaned folder tree.
+		:param folder_summaries: (list) list of dicts with the keys folder, matched, deleted,
+								unprocessed, seconds and error (None if the folder was cleaned)
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_sender_report(self, report: dict) -> None:
+		"""
+		Displays the senders sending the most emails.
+		:param report: (dict) dict with the keys emails, unprocessed, exact and addresses, names
+						and domains (lists of dicts with the keys key, count, error, size,
+						first_sent and last_sent), see sender_statistics.get_report
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_statistics(self, stats: dict) -> None:
+		"""
+		Displays what the run spent its time on.
+		:param stats: (dict) dict with the keys counters (amount of calls by name), timers (seconds
+					by stage) and optionally profile, memory and predicates (emails checked and
+					pruned by each deletion condition, in evaluation order, which the counts depend on),
+					see run_statistics.get_stats
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_sender_resolution(self, stats: dict) -> None:
+		"""
+		Displays how the addresses of Exchange senders were resolved.
+		:param stats: (dict) dict with the keys hits, misses, hit_rate (None if no Exchange address
+					was read), unresolved, evictions, loaded, size and capacity, see sender_address_resolver.get_stats
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def display_restore_summary(self, summary: dict) -> None:
+		"""
+		Displays the result of undoing a run.
+		:param summary: (dict) dict with the keys run_id, restored (amount of emails moved back)
+						and missing (amount of emails that could not be moved back)
+		:return: None
+		"""
+		raise NotImplementedError()
+
+	def ask_dry_run(self) -> bool:
+		"""
+		Asks the user if the matching emails should be counted and previewed before being deleted.
+		:return: (bool) True if the user wants a preview
+		"""
+		raise NotImplementedError()
+
+	def display_match_preview(self, page: list, page_number: int) -> bool:
+		"""
+		Displays a page of the emails matching the deletion conditions, then asks the user
+		if the next page should be displayed.
+		:param page: (list) list of dicts with the keys subject, sender_email, sender_name and
+					sent_on (None if the email does not have the property)
+		:param page_number: (int) number of the page, starting at 1
+		:return: (bool) True if the user wants to see the next page
+		"""
+		raise NotImplementedError()
+
 	def ask_delete_more(self) -> bool:
 		"""
 		Asks the user if they would like to delete more emails using new conditions.
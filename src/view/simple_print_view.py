@@ -10,6 +10,7 @@ class simple_print_view(cleanup_view_interface):
 	"""
 	def __init__(self):
 		self.date_processor = date_handler()
+		self.progress_line_length = 0  # length of the progress line last printed, see display_progress
 
 	def display_welcome(self):
 		print("//////////// Welcome to Ramzi's Outlook Email Cleanup Program ////////////")
@@ -41,6 +42,12 @@ class simple_print_view(cleanup_view_interface):
 	def get_target_sender_name(self) -> str:
 		return input("Sender Name: ")
 
+	def get_target_sender_domain(self) -> str:
+		return input("Sender Domain (ex. x.com, or *.x.com for all of its sub domains): ")
+
+	def get_target_rule_expression(self) -> str:
+		return input("Rule Expression (ex. (sender:a@x.com OR sender:b@x.com) AND NOT subject:invoice): ")
+
 	def get_target_start_date(self):
 		date_chosen = input("Lower Date Boundary (inclusive) in the format of mm/dd/yyyy, for ex. 12/16/2022 is Dec 16, 2022:\n")
 		return date_chosen
@@ -53,6 +60,9 @@ class simple_print_view(cleanup_view_interface):
 	def get_target_subject_keyword(self):
 		return input("Subject key word or Phrase: ")
 
+	def get_target_missing_property(self) -> str:
+		return input("Missing Property, to target emails without it (SentOn, SenderEmailAddress, SenderName or Subject): ")
+
 	def confirm_deletion_parameters(self, confirmation_str: str, selected_email) -> bool:
 		print(f"This action will delete all emails from {selected_email}'s Inbox matching the following condition(s):")
 		print(confirmation_str)
@@ -62,6 +72,20 @@ class simple_print_view(cleanup_view_interface):
 		else:
 			return False
 
+	def ask_dry_run(self) -> bool:
+		print("Do you wish to count and preview the matching emails before deleting them?")
+		user_choice = input("Enter y/yes to confirm: ")
+		return user_choice.lower() in ("y", "yes")
+
+	def display_match_preview(self, page: list, page_number: int) -> bool:
+		print(f"\nPage {page_number} : Sent on : Sender : Subject")
+		for email in page:
+			sent_on = "-" if email['sent_on'] is None else email['sent_on'].strftime("%m/%d/%Y")
+			sender = email['sender_email'] or email['sender_name'] or "-"
+			print(f"{sent_on} : {sender} : {email['subject']}")
+		user_choice = input("Enter y/yes to see the next page: ")
+		return user_choice.lower() in ("y", "yes")
+
 	def ask_delete_more(self) -> bool:
 		print("Do you wish to continue deleting more emails?")
 		user_choice = input("Enter y/yes to confirm: ")
@@ -70,10 +94,100 @@ class simple_print_view(cleanup_view_interface):
 		else:
 			return False
 
-	def display_deletion_summary(self, amt_deleted: int, amt_unprocessed: int):
+	def display_deletion_summary(self, amt_deleted: int, amt_unprocessed: int, missing_properties: dict = None):
 		print(f"{amt_deleted} emails have been moved to the TRASH folder")
 		if amt_unprocessed > 0:
 			print(f"{amt_unprocessed} could NOT be processed (missing date or sender address property)")
+			for property_name, amount in (missing_properties or {}).items():
+				print(f"    {amount} missing {property_name}")
+
+	def display_progress(self, progress: dict) -> None:
+		if progress['total'] is None:
+			scanned = f"Scanned {progress['scanned']} emails"
+		else:
+			percent = 100 * progress['scanned'] // progress['total'] if progress['total'] > 0 else 100
+			scanned = f"Scanned {progress['scanned']}/{progress['total']} emails ({percent}%)"
+		line = f"{scanned} : {progress['matched']} matched : {progress['deleted']} deleted : " \
+			   f"{progress['items_per_second']:.0f} emails/s"
+		if not progress['finished'] and progress['eta_seconds'] is not None:
+			minutes, seconds = divmod(int(progress['eta_seconds']), 60)
+			line += f" : about {minutes}m {seconds:02d}s left"
+		# the line is printed over the last one, so it is padded to hide what is left of a longer line
+		print("\r" + line.ljust(self.progress_line_length), end="", flush=True)
+		self.progress_line_length = len(line)
+		if progress['finished']:
+			print()
+			self.progress_line_length = 0
+
+	def display_rule_summary(self, rule_summaries: list) -> None:
+		print("Rule : Deleted : Could NOT be processed : Conditions")
+		for summary in rule_summaries:
+			print(f"{summary['name']} : {summary['deleted']} : {summary['unprocessed']} : {summary['conditions']}")
+
+	def display_mailbox_summary(self, mailbox_summaries: list) -> None:
+		print("Mailbox : Deleted : Could NOT be processed : Seconds")
+		for summary in mailbox_summaries:
+			if summary['error'] is not None:
+				print(f"{summary['mailbox']} : FAILED : {summary['error']}")
+			else:
+				print(f"{summary['mailbox']} : {summary['deleted']} : {summary['unprocessed']} : {summary['seconds']:.1f}")
+
+	def display_folder_summary(self, folder_summaries: list) -> None:
+		print("Folder : Matched : Deleted : Could NOT be processed : Seconds")
+		for summary in folder_summaries:
+			if summary['error'] is not None:
+				print(f"{summary['folder']} : FAILED : {summary['error']}")
+			else:
+				print(f"{summary['folder']} : {summary['matched']} : {summary['deleted']} : {summary['unprocessed']} : "
+					  f"{summary['seconds']:.1f}")
+
+	def display_sender_report(self, report: dict) -> None:
+		print(f"{report['emails']} emails were counted")
+		if report['unprocessed'] > 0:
+			print(f"{report['unprocessed']} could NOT be counted (missing sender address property)")
+		if not report['exact']:
+			print("There are too many senders to count them all, counts marked with + may be over by the amount shown")
+		for title, key in (("Sender email", 'addresses'), ("Sender name", 'names'), ("Sender domain", 'domains')):
+			print(f"\n{title} : Emails : Size (KB) : First sent : Last sent")
+			for sender in report[key]:
+				count = f"{sender['count']}" if sender['error'] == 0 else f"{sender['count']} (+{sender['error']})"
+				first_sent = "-" if sender['first_sent'] is None else sender['first_sent'].strftime("%m/%d/%Y")
+				last_sent = "-" if sender['last_sent'] is None else sender['last_sent'].strftime("%m/%d/%Y")
+				print(f"{sender['key']} : {count} : {sender['size'] // 1024} : {first_sent} : {last_sent}")
+
+	def display_statistics(self, stats: dict) -> None:
+		print("Stage : Seconds")
+		for stage, seconds in stats['timers'].items():
+			print(f"{stage} : {seconds:.3f}")
+		print("Call : Amount")
+		for name, amount in stats['counters'].items():
+			print(f"{name} : {amount}")
+		if 'profile' in stats:
+			print("Function : Calls : Cumulative seconds")
+			for row in stats['profile']:
+				print(f"{row['function']} : {row['calls']} : {row['cumulative_seconds']:.3f}")
+		if 'memory' in stats:
+			print(f"Peak traced memory: {stats['memory']['peak_bytes'] // 1024} KB")
+		for name, predicates in stats.get('predicates', {}).items():
+			print(f"Condition ({name}) : Checked : Matched : Pruned")
+			for predicate in predicates:
+				print(f"{predicate['name']} : {predicate['evaluations']} : {predicate['hits']} : {predicate['pruned']}")
+
+	def display_sender_resolution(self, stats: dict) -> None:
+		if stats['hit_rate'] is None:
+			print("No Exchange sender address was read")
+			return
+		print(f"Exchange sender addresses: {stats['misses']} looked up, {stats['hits']} found in the cache "
+			  f"({stats['hit_rate']:.1%} hit rate)")
+		if stats['unresolved'] > 0:
+			print(f"{stats['unresolved']} could NOT be resolved to an SMTP address")
+		if stats['evictions'] > 0:
+			print(f"{stats['evictions']} were evicted from the cache, it holds {stats['capacity']} addresses")
+
+	def display_restore_summary(self, summary: dict) -> None:
+		print(f"{summary['restored']} emails of run {summary['run_id']} have been moved back from the TRASH folder")
+		if summary['missing'] > 0:
+			print(f"{summary['missing']} could NOT be moved back (deleted for good, or no longer in the TRASH folder)")
 
 	def print_hash_divider(self):
 		print("\n############################################################")
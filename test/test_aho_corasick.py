@@ -0,0 +1,88 @@
+import os
+import random
+import tempfile
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.aho_corasick import aho_corasick_automaton
+from src.model.restrict_filter import compile_restrict_filter, MAX_FILTER_ALTERNATIVES
+from test_memory_backend import make_test_backend
+
+"""
+This file tests the Aho-Corasick automaton and matching multiple subject phrases.
+"""
+
+class test_aho_corasick(unittest.TestCase):
+
+	def test_overlapping_phrases(self):
+		"""
+		Classic example with phrases that overlap and are suffixes of each other
+		:return: None
+		"""
+		automaton = aho_corasick_automaton(["he", "she", "his", "hers", ""])
+		self.assertEqual({"he", "she", "hers"}, automaton.find_all("uSHErs"))
+		self.assertEqual("she", automaton.find_first("ushers"))
+		self.assertIsNone(automaton.find_first("nothing to see"))
+
+	def test_same_results_as_substring_search(self):
+		"""
+		Comparing the automaton with a plain substring search on random text
+		:return: None
+		"""
+		generator = random.Random(7)
+		phrases = ["".join(generator.choice("abc") for _ in range(generator.randint(1, 4))) for _ in range(30)]
+		automaton = aho_corasick_automaton(phrases)
+		for _ in range(200):
+			text = "".join(generator.choice("abcd") for _ in range(generator.randint(0, 20)))
+			expected = {phrase for phrase in phrases if phrase in text}
+			self.assertEqual(expected, automaton.find_all(text))
+
+	def test_model_multiple_phrases(self):
+		"""
+		One pass matches all phrases and reports which phrase each email matched
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.set_target_subject_keyphrase(["Undeliverable", " hello 3", "", "deals 5"])
+		self.assertEqual(["Undeliverable", "hello 3", "deals 5"], model.target_subject_keyphrase)
+		model.verify_deletion_conditions()
+		self.assertEqual("has the keyword/keyphrase in the subject: Undeliverable OR hello 3 OR deals 5",
+						 model.deletion_confirmation_str)
+
+		matching = model.get_emails_matching_search_conditions()
+		by_subject = {email.Subject: email for email in matching}
+		self.assertEqual({"Weekly deals 5", "Hello 3", "Undeliverable: deals"}, set(by_subject))
+		self.assertEqual("hello 3", model.matched_subject_phrases[by_subject["Hello 3"].EntryID])
+		self.assertEqual({"undeliverable": 1, "hello 3": 1, "deals 5": 1}, model.subject_phrase_hit_counts)
+
+	def test_model_phrases_from_file(self):
+		"""
+		Testing loading phrases from a file, one per line
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		with tempfile.TemporaryDirectory() as temp_dir:
+			file_path = os.path.join(temp_dir, "phrases.txt")
+			with open(file_path, "w", encoding="utf-8") as file:
+				file.write("\n".join(f"phrase {number}" for number in range(8)))
+			model.set_target_subject_keyphrases_from_file(file_path)
+		self.assertEqual(8, len(model.target_subject_keyphrase))
+		self.assertEqual("phrase 0 OR phrase 1 OR phrase 2 OR phrase 3 OR phrase 4 OR ... (3 more)",
+						 model.verification_add_on[2])
+
+	def test_restrict_filter_alternatives(self):
+		"""
+		Multiple phrases are joined by OR, too many are left out of the filter
+		:return: None
+		"""
+		self.assertIn(" OR ", compile_restrict_filter(subject_keyphrase=["a", "b"]))
+		too_many = [str(number) for number in range(MAX_FILTER_ALTERNATIVES + 1)]
+		self.assertIsNone(compile_restrict_filter(subject_keyphrase=too_many))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from src.controller.cleanup_controller import cleanup_controller
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_backend
+from src.view.simple_print_view import simple_print_view
+
+"""
+This file tests the entry points of the cleanup_controller run without prompting
+the user, when the backend cannot connect.
+"""
+
+
+class unreachable_backend(memory_backend):
+	"""
+	Backend failing to connect, like Outlook when it is closed.
+	"""
+
+	def connect(self):
+		raise OSError("The server is unavailable")
+
+
+class recording_view(simple_print_view):
+	"""
+	View keeping the errors it displays instead of printing them.
+	"""
+
+	def __init__(self):
+		self.errors = []
+
+	def display_error(self, error_msg: str):
+		self.errors.append(error_msg)
+
+
+class test_cleanup_controller(unittest.TestCase):
+
+	def test_entry_points_report_connection_errors(self):
+		"""
+		The batch, analysis, resume and undo entry points display an error and fail when the backend cannot connect
+		:return: None
+		"""
+		with tempfile.TemporaryDirectory() as directory:
+			rules_path = os.path.join(directory, "rules.json")
+			with open(rules_path, 'w', encoding='utf-8') as rules_file:
+				json.dump({"rules": [{"name": "deals", "sender_domain": "shop.com"}]}, rules_file)
+			journal_path = os.path.join(directory, "journal.jsonl")
+
+			entry_points = {'batch': lambda controller: controller.run_batch(rules_path),
+							'analysis': lambda controller: controller.run_analysis(),
+							'resume': lambda controller: controller.run_resume(journal_path),
+							'undo': lambda controller: controller.run_undo(journal_path)}
+			for name, run in entry_points.items():
+				view = recording_view()
+				controller = cleanup_controller(cleanup_model(unreachable_backend()), view)
+				self.assertFalse(run(controller), name)
+				self.assertEqual(["Could not connect to outlook, make sure Outlook is Open"], view.errors, name)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -1,6 +1,12 @@
 import unittest
 from src.model.date_handler import date_handler, LOCAL_TIMEZONE
-from datetime import datetime
+from datetime import datetime, timezone
+
+try:
+	import numpy
+except ImportError:  # numpy is optional
+	numpy = None
+
 """
 This file tests the methods of the date_handler class.
 """
@@ -121,6 +127,53 @@ class test_date_handler(unittest.TestCase):
 
 		self.assertEqual(datetime(2001,2,28,23,59,59, tzinfo=LOCAL_TIMEZONE), dt2)
 
+	def test_timestamp_bounds_match_datetime_comparison(self):
+		'''
+		Comparing timestamps against the precomputed bounds gives the same result as
+		comparing datetimes, including emails sent in another timezone
+		:return: None
+		'''
+		handler = date_handler()
+		lower = handler.convert_list_into_datetime([2, 1, 2001])
+		upper = handler.convert_list_into_datetime([2, 28, 2001], endtime=True)
+		lower_timestamp, upper_timestamp = handler.get_timestamp_bounds(lower, upper)
+
+		dates = [datetime(2001, 1, 31, 23, 59, 59, tzinfo=LOCAL_TIMEZONE),
+				 lower,
+				 datetime(2001, 2, 14, 12, 0, 0, tzinfo=timezone.utc),
+				 upper,
+				 datetime(2001, 3, 1, 0, 0, 0, tzinfo=LOCAL_TIMEZONE)]
+		for each_date in dates:
+			self.assertEqual(handler.is_between_dates(lower, upper, each_date),
+							 lower_timestamp <= each_date.timestamp() <= upper_timestamp)
+
+	def test_check_timestamps_between(self):
+		'''
+		Batch check of timestamps, missing dates stay None
+		:return: None
+		'''
+		handler = date_handler()
+		lower = datetime(2001, 2, 1, tzinfo=timezone.utc)
+		upper = datetime(2001, 2, 28, tzinfo=timezone.utc)
+		lower_timestamp, upper_timestamp = handler.get_timestamp_bounds(lower, upper)
+		timestamps = handler.convert_dates_to_timestamps(
+			[datetime(2001, 1, 1, tzinfo=timezone.utc), None, lower, upper, datetime(2001, 3, 1, tzinfo=timezone.utc)])
+
+		self.assertEqual([False, None, True, True, False],
+						 handler.check_timestamps_between(lower_timestamp, upper_timestamp, timestamps))
+		self.assertEqual([], handler.check_timestamps_between(lower_timestamp, upper_timestamp, []))
+
+	@unittest.skipIf(numpy is None, "numpy is not installed")
+	def test_check_timestamps_between_numpy(self):
+		'''
+		Batch check of a numpy array, NaN (missing dates) are not in range
+		:return: None
+		'''
+		handler = date_handler()
+		timestamps = numpy.array([10.0, numpy.nan, 20.0, 30.0, 40.0])
+		in_range = handler.check_timestamps_between(20.0, 30.0, timestamps)
+		self.assertEqual([False, False, True, True, False], in_range.tolist())
+
 def main():
 	unittest.main(verbosity=3)
 
@@ -0,0 +1,165 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_backend
+from src.model.deletion_journal import deletion_journal, read_journal, find_unfinished_run
+
+"""
+This file tests journaling deletions and resuming an interrupted deletion.
+"""
+
+MAILBOX = "tester@example.com"
+
+
+class failing_memory_backend(memory_backend):
+	"""
+	Memory backend failing like a hanging Outlook once a given amount of emails were deleted.
+	"""
+
+	def __init__(self):
+		super().__init__()
+		self.deletions_before_failure = None
+
+	def delete_item(self, item) -> str:
+		if self.deletions_before_failure is not None:
+			if self.deletions_before_failure == 0:
+				raise RuntimeError("The remote procedure call failed")
+			self.deletions_before_failure -= 1
+		return super().delete_item(item)
+
+
+def make_backend() -> failing_memory_backend:
+	"""
+	Creates a backend with 300 deals and 300 other emails, one received every hour.
+	:return: (failing_memory_backend) the backend
+	"""
+	backend = failing_memory_backend()
+	backend.add_mailbox(MAILBOX)
+	base = datetime(2023, 1, 1, tzinfo=timezone.utc)
+	for number in range(300):
+		received = base + timedelta(hours=2 * number)
+		backend.add_email(MAILBOX, Subject=f"Deals {number}", SenderEmailAddress="deals@shop.com",
+						  SentOn=received, ReceivedTime=received)
+		received += timedelta(hours=1)
+		backend.add_email(MAILBOX, Subject=f"Hello {number}", SenderEmailAddress="friend@mail.com",
+						  SentOn=received, ReceivedTime=received)
+	return backend
+
+
+class test_deletion_journal(unittest.TestCase):
+
+	def setUp(self) -> None:
+		self.temp_dir = tempfile.TemporaryDirectory()
+		self.journal_path = os.path.join(self.temp_dir.name, "journal.jsonl")
+
+	def tearDown(self) -> None:
+		self.temp_dir.cleanup()
+
+	def test_journal_records(self):
+		"""
+		Batches are journaled with checkpoints, a line cut short is ignored
+		:return: None
+		"""
+		journal = deletion_journal(self.journal_path, checkpoint_interval=2)
+		journal.start_run(MAILBOX, "Inbox", {'sender_email': "deals@shop.com"}, "ReceivedTime")
+		base = datetime(2023, 1, 1, tzinfo=timezone.utc)
+		for number in range(3):
+			journal.record_batch([f"ID{number}a", f"ID{number}b"], 2, base - timedelta(days=number))
+		journal.close()
+		with open(self.journal_path, 'a', encoding='utf-8') as journal_file:
+			journal_file.write('{"type": "batch", "run_')
+
+		records = read_journal(self.journal_path)
+		self.assertEqual(['run', 'batch', 'batch', 'checkpoint', 'batch'], [record['type'] for record in records])
+		unfinished_run = find_unfinished_run(self.journal_path)
+		self.assertEqual(6, unfinished_run['deleted'])
+		self.assertEqual(6, len(unfinished_run['processed_entry_ids']))
+		self.assertEqual(base - timedelta(days=1), unfinished_run['position'])
+		self.assertEqual({'sender_email': "deals@shop.com"}, unfinished_run['conditions'])
+
+		journal = deletion_journal(self.journal_path)
+		journal.resume_run(unfinished_run)
+		journal.finish_run(6)
+		journal.close()
+		self.assertIsNone(find_unfinished_run(self.journal_path))
+
+	def test_resume_interrupted_deletion(self):
+		"""
+		A resumed deletion continues from the last checkpoint instead of searching the whole folder
+		:return: None
+		"""
+		backend = make_backend()
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.select_target_mailbox_by_address(MAILBOX)
+		model.deletion_batch_size = 10
+		model.open_deletion_journal(self.journal_path)
+		model.set_target_sender_email("deals@shop.com")
+		model.set_target_start_date("1/1/2023")
+		model.set_target_end_date("12/31/2023")
+		model.verify_deletion_conditions()
+
+		backend.deletions_before_failure = 149
+		self.assertRaises(RuntimeError, model.delete_emails_with_matching_conditions)
+		model.close_deletion_journal()
+		unfinished_run = find_unfinished_run(self.journal_path)
+		self.assertEqual(140, unfinished_run['deleted'])
+		self.assertEqual("SentOn", unfinished_run['sort_property'])
+
+		# sent after the checkpoint, so not searched again by the resumed deletion
+		backend.deletions_before_failure = None
+		late_sent_on = datetime(2023, 1, 25, 23, tzinfo=timezone.utc)
+		backend.add_email(MAILBOX, Subject="Late deals", SenderEmailAddress="deals@shop.com", SentOn=late_sent_on,
+						  ReceivedTime=late_sent_on)
+
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.deletion_batch_size = 10
+		model.resume_from_journal(self.journal_path)
+		self.assertEqual(unfinished_run['position'], model.resume_position)
+		self.assertEqual("sender email: deals@shop.com AND was sent between the dates (inclusive): "
+						 "01/01/2023 to 12/31/2023", model.deletion_confirmation_str)
+		model.delete_emails_with_matching_conditions()
+		model.close_deletion_journal()
+
+		self.assertEqual(151, model.delete_counter)
+		self.assertIsNone(model.resume_position)
+		self.assertIsNone(find_unfinished_run(self.journal_path))
+		self.assertEqual(291, read_journal(self.journal_path)[-1]['deleted'])
+		remaining = [item.Subject for item in backend.get_items(backend.open_folder(MAILBOX))
+					 if item.Subject.startswith(("Deals", "Late"))]
+		self.assertEqual(["Late deals"], remaining)
+		self.assertRaises(ValueError, model.resume_from_journal, self.journal_path)
+
+	def test_emails_missing_the_sort_property(self):
+		"""
+		Emails without a ReceivedTime are deleted and journaled without a position
+		:return: None
+		"""
+		backend = make_backend()
+		for number in range(3):
+			backend.add_email(MAILBOX, Subject=f"Draft deals {number}", SenderEmailAddress="deals@shop.com")
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.select_target_mailbox_by_address(MAILBOX)
+		model.use_restrict_filter = False
+		model.deletion_batch_size = 1
+		model.open_deletion_journal(self.journal_path)
+		model.set_target_subject_keyphrase("draft")
+		model.verify_deletion_conditions()
+		model.delete_emails_with_matching_conditions()
+		model.close_deletion_journal()
+
+		self.assertEqual(3, model.delete_counter)
+		batches = [record for record in read_journal(self.journal_path) if record['type'] == 'batch']
+		self.assertEqual([None, None, None], [batch['position'] for batch in batches])
+		self.assertIsNone(find_unfinished_run(self.journal_path))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,180 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_backend
+from src.model.deletion_pipeline import iter_items_reversed, iter_in_batches, delete_emails_by_entry_id, \
+	find_sorted_range
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests the streaming match and delete pipeline.
+"""
+
+class counting_items():
+	"""
+	Wraps an item collection to count how many items are read.
+	"""
+
+	def __init__(self, items):
+		self.items = items
+		self.reads = 0
+
+	@property
+	def Count(self) -> int:
+		return self.items.Count
+
+	def Item(self, index: int):
+		self.reads += 1
+		return self.items.Item(index)
+
+	def Sort(self, property_name: str, descending: bool = False) -> None:
+		self.items.Sort(property_name, descending)
+
+
+def make_multi_year_backend() -> memory_backend:
+	"""
+	Creates a memory backend with an email every 6 hours over 4 years, plus emails without SentOn.
+	:return: (memory_backend) the backend
+	"""
+	backend = memory_backend()
+	start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+	for number in range(4 * 365 * 4):
+		sent_on = start + timedelta(hours=6 * number)
+		backend.add_email(MAILBOX, Subject=f"Email {number}", SentOn=sent_on, ReceivedTime=sent_on)
+	for number in range(5):
+		backend.add_email(MAILBOX, Subject=f"Undeliverable {number}")
+	return backend
+
+
+class test_deletion_pipeline(unittest.TestCase):
+
+	def test_iter_in_batches(self):
+		"""
+		Testing batching of a stream of values
+		:return: None
+		"""
+		self.assertEqual([[0, 1, 2], [3, 4, 5], [6]], list(iter_in_batches(range(7), 3)))
+		self.assertEqual([], list(iter_in_batches([], 3)))
+		self.assertRaises(ValueError, lambda: list(iter_in_batches(range(7), 0)))
+
+	def test_reversed_iteration_is_safe_to_delete(self):
+		"""
+		Deleting every visited item must not skip any item, unlike forward iteration
+		:return: None
+		"""
+		backend = memory_backend()
+		for number in range(10):
+			backend.add_email(MAILBOX, Subject=str(number))
+		items = backend.get_items(backend.open_folder(MAILBOX))
+
+		forward_visited = 0
+		for item in items:
+			forward_visited += 1
+			backend.delete_item(item)
+		# forward iteration skips every other item, like it does in Outlook
+		self.assertEqual(5, forward_visited)
+
+		visited = []
+		for item in iter_items_reversed(items):
+			visited.append(item.Subject)
+			backend.delete_item(item)
+		self.assertEqual(5, len(visited))
+		self.assertEqual(0, items.Count)
+
+	def test_delete_by_entry_id_skips_missing(self):
+		"""
+		EntryIDs of emails that are already gone are skipped
+		:return: None
+		"""
+		backend = make_test_backend()
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		entry_ids = [items.Item(1).EntryID, items.Item(2).EntryID, "UNKNOWN"]
+		self.assertEqual(2, delete_emails_by_entry_id(backend, entry_ids))
+		self.assertEqual(0, delete_emails_by_entry_id(backend, entry_ids))
+
+	def test_model_deletes_in_batches(self):
+		"""
+		All matching emails are deleted whatever the batch size
+		:return: None
+		"""
+		for use_snapshot in (False, True):
+			model = cleanup_model(make_test_backend())
+			model.call_startup_methods()
+			model.select_target_mailbox(1)
+			model.deletion_batch_size = 3
+			model.use_snapshot = use_snapshot
+			model.set_target_sender_name("shop")
+			model.verify_deletion_conditions()
+
+			matching = model.get_emails_matching_search_conditions()
+			self.assertEqual(11, len(matching))
+			if not use_snapshot:
+				# newest emails first
+				self.assertEqual("Weekly deals 9", matching[0].Subject)
+
+			model.delete_emails_with_matching_conditions()
+			self.assertEqual(11, model.delete_counter)
+			remaining = list(model.get_all_emails_from_directory())
+			self.assertEqual(11, len(remaining))
+			self.assertTrue(all(email.SenderName != "Shop" for email in remaining))
+
+
+	def test_find_sorted_range(self):
+		"""
+		The range is found reading only a logarithmic amount of items
+		:return: None
+		"""
+		backend = make_multi_year_backend()
+		items = counting_items(backend.get_items(backend.open_folder(MAILBOX)))
+		items.Sort("[SentOn]", False)
+		lower = datetime(2022, 3, 1, tzinfo=timezone.utc)
+		upper = datetime(2022, 3, 7, 23, 59, 59, tzinfo=timezone.utc)
+		first_index, last_index, amt_missing = find_sorted_range(items, "SentOn", lower, upper)
+
+		self.assertEqual(5, amt_missing)
+		self.assertEqual(28, last_index - first_index + 1)
+		self.assertLess(items.reads, 60)
+		self.assertEqual(lower, items.Item(first_index).SentOn)
+		self.assertLess(items.Item(first_index - 1).SentOn, lower)
+		self.assertGreater(items.Item(last_index + 1).SentOn, upper)
+
+		# no item in range
+		first_index, last_index, _ = find_sorted_range(items, "SentOn", datetime(2030, 1, 1, tzinfo=timezone.utc),
+													   datetime(2030, 2, 1, tzinfo=timezone.utc))
+		self.assertLess(last_index, first_index)
+
+	def test_model_date_bounded_scan(self):
+		"""
+		A narrow date range only reads the emails in the range, and finds the same emails
+		:return: None
+		"""
+		model = cleanup_model(make_multi_year_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.use_restrict_filter = False
+		model.set_target_start_date("3/1/2022")
+		model.set_target_end_date("3/7/2022")
+		model.set_target_subject_keyphrase("email")
+		model.verify_deletion_conditions()
+
+		bounded = model.get_emails_matching_search_conditions()
+		self.assertEqual(5, model.emails_with_missing_attributes_count)
+		evaluations = sum(each["evaluations"] for each in model.predicate_plan.get_statistics())
+		self.assertLess(evaluations, 100)
+
+		model.use_date_bounded_scan = False
+		full_scan = model.get_emails_matching_search_conditions()
+		self.assertEqual(28, len(bounded))
+		self.assertEqual(sorted(email.EntryID for email in full_scan), sorted(email.EntryID for email in bounded))
+
+		model.use_date_bounded_scan = True
+		model.deletion_batch_size = 4
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(28, model.delete_counter)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
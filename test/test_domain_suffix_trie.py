@@ -0,0 +1,83 @@
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.domain_suffix_trie import domain_suffix_trie, parse_domain_rule
+from src.model.memory_backend import memory_backend
+from test_memory_backend import MAILBOX
+
+"""
+This file tests the sender domain rules and their suffix trie.
+"""
+
+class test_domain_suffix_trie(unittest.TestCase):
+
+	def test_parse_rules(self):
+		"""
+		Testing the supported rule formats
+		:return: None
+		"""
+		self.assertEqual(("*", "x.com", False), parse_domain_rule("X.com"))
+		self.assertEqual(("*", "x.com", False), parse_domain_rule("@x.com"))
+		self.assertEqual(("*", "x.com", True), parse_domain_rule("*@*.x.com"))
+		self.assertEqual(("news", "x.com", True), parse_domain_rule("news@*.x.com"))
+		self.assertRaises(ValueError, parse_domain_rule, "*.*.com")
+		self.assertRaises(ValueError, parse_domain_rule, "ne*s@x.com")
+
+	def test_match(self):
+		"""
+		Exact domains, sub domains and local parts
+		:return: None
+		"""
+		trie = domain_suffix_trie(["x.com", "*.y.com", "info@z.org", "*@*.deep.net"])
+		self.assertEqual("x.com", trie.match("Anyone@X.com"))
+		self.assertIsNone(trie.match("anyone@news.x.com"))
+		self.assertEqual("*.y.com", trie.match("anyone@news.y.com"))
+		self.assertEqual("*.y.com", trie.match("anyone@mail.news.y.com"))
+		self.assertIsNone(trie.match("anyone@y.com"))
+		self.assertIsNone(trie.match("anyone@notx.com"))
+		self.assertEqual("info@z.org", trie.match("info@z.org"))
+		self.assertIsNone(trie.match("sales@z.org"))
+		self.assertEqual("*@*.deep.net", trie.match("a@b.deep.net"))
+		self.assertIsNone(trie.match("not an address"))
+
+	def test_many_rules(self):
+		"""
+		Thousands of rules in one trie
+		:return: None
+		"""
+		trie = domain_suffix_trie([f"*.brand{number}.com" for number in range(5000)])
+		self.assertEqual("*.brand4321.com", trie.match("deals@mail.brand4321.com"))
+		self.assertIsNone(trie.match("deals@mail.brand5000.com"))
+
+	def test_model_sender_domain_condition(self):
+		"""
+		The domain condition plugs into verification, the restrict filter and matching
+		:return: None
+		"""
+		backend = memory_backend()
+		for address in ("a@news.x.com", "b@mail.x.com", "c@x.com", "d@y.com", "e@notx.com"):
+			backend.add_email(MAILBOX, Subject="Offer", SenderEmailAddress=address)
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+
+		model.set_target_sender_domain(["*@*.x.com", "y.com"])
+		model.set_target_subject_keyphrase("offer")
+		model.verify_deletion_conditions()
+		self.assertEqual("has the keyword/keyphrase in the subject: offer AND sender domain: *@*.x.com OR y.com",
+						 model.deletion_confirmation_str)
+
+		matching = model.get_emails_matching_search_conditions()
+		self.assertEqual({"a@news.x.com", "b@mail.x.com", "d@y.com"},
+						 {email.SenderEmailAddress for email in matching})
+		self.assertEqual({"*@*.x.com": 2, "y.com": 1}, model.matched_sender_domain_rules)
+
+		model.use_restrict_filter = False
+		self.assertEqual(3, len(model.get_emails_matching_search_conditions()))
+		self.assertRaises(ValueError, model.set_target_sender_domain, "*.*")
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
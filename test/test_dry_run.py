@@ -0,0 +1,84 @@
+import unittest
+from src.model.cleanup_model import cleanup_model
+from test_memory_backend import make_test_backend
+
+"""
+This file tests counting and previewing matching emails without deleting them.
+"""
+
+
+def make_model() -> cleanup_model:
+	"""
+	Creates a model on the test backend with its mailbox selected.
+	:return: (cleanup_model) the model
+	"""
+	model = cleanup_model(make_test_backend())
+	model.call_startup_methods()
+	model.select_target_mailbox(1)
+	return model
+
+
+class test_dry_run(unittest.TestCase):
+
+	def test_count_with_exact_restrict_filter(self):
+		"""
+		Sender conditions are counted by the backend, nothing is deleted
+		:return: None
+		"""
+		model = make_model()
+		model.set_target_sender_email(["DEALS@shop.com", "friend@mail.com"])
+		model.verify_deletion_conditions()
+		self.assertTrue(model.can_count_with_restrict_filter())
+		self.assertEqual({'matched': 20, 'unprocessed': None, 'missing': None}, model.count_emails_matching_search_conditions())
+		self.assertEqual(22, model.get_all_emails_from_directory().Count)
+
+		model.use_restrict_filter = False
+		self.assertFalse(model.can_count_with_restrict_filter())
+		self.assertEqual({'matched': 20, 'unprocessed': 2, 'missing': {'SenderEmailAddress': 2}}, model.count_emails_matching_search_conditions())
+
+	def test_count_matches_deletion(self):
+		"""
+		The count is the amount of emails a deletion would delete
+		:return: None
+		"""
+		model = make_model()
+		model.set_target_subject_keyphrase("deals")
+		model.set_target_start_date("1/10/2023")
+		model.set_target_end_date("1/14/2023")
+		model.verify_deletion_conditions()
+		self.assertFalse(model.can_count_with_restrict_filter())
+
+		# the email without a SentOn date passes the restrict filter to be counted
+		counts = model.count_emails_matching_search_conditions()
+		self.assertEqual({'matched': 6, 'unprocessed': 1, 'missing': {'SentOn': 1}}, counts)
+		self.assertEqual(0, model.emails_with_missing_attributes_count)
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(counts['matched'], model.delete_counter)
+		self.assertEqual(counts['missing'], model.missing_property_counts)
+
+	def test_preview_pages(self):
+		"""
+		Pages are only searched for when asked for, newest emails first
+		:return: None
+		"""
+		model = make_model()
+		model.set_target_sender_email("deals@shop.com")
+		model.verify_deletion_conditions()
+
+		pages = model.iter_match_preview_pages(page_size=4)
+		first_page = next(pages)
+		self.assertEqual(["Weekly deals 9", "Weekly deals 8", "Weekly deals 7", "Weekly deals 6"],
+						 [email['subject'] for email in first_page])
+		self.assertEqual("Shop", first_page[0]['sender_name'])
+		self.assertEqual(19, first_page[0]['sent_on'].day)
+		pages.close()
+
+		self.assertEqual([4, 4, 2], [len(page) for page in model.iter_match_preview_pages(page_size=4)])
+		self.assertEqual(22, model.get_all_emails_from_directory().Count)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
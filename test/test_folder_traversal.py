@@ -0,0 +1,167 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_backend
+from src.model.folder_traversal import select_folders, matches_folder_pattern
+from src.model.parallel_cleanup import clean_folders_in_parallel
+
+"""
+This file tests cleaning every folder of a folder tree.
+"""
+
+MAILBOX = "tester@example.com"
+
+# amount of deals emails put in each folder
+FOLDER_SIZES = {"Inbox": 5, "Inbox/Promotions": 20, "Inbox/Promotions/Old": 7, "Archive": 3, "Archive/2022": 11,
+				"Deleted Items": 4}
+
+
+class threaded_memory_backend(memory_backend):
+	"""
+	Memory backend whose workers wait for each other when they start, so the test
+	fails if the folders are not cleaned by several workers at the same time.
+	"""
+
+	def __init__(self, amt_workers: int):
+		super().__init__()
+		self.barrier = threading.Barrier(amt_workers, timeout=5)
+		self.worker_threads = set()
+
+	def initialize_thread(self) -> None:
+		self.worker_threads.add(threading.get_ident())
+		self.barrier.wait()
+
+
+class failing_delete_backend(threaded_memory_backend):
+	"""
+	Memory backend failing to delete any email after a given amount of deletions,
+	like Outlook losing its connection in the middle of a run.
+	"""
+
+	def __init__(self, amt_workers: int, amt_deletions: int):
+		super().__init__(amt_workers)
+		self.amt_deletions = amt_deletions
+
+	def delete_item(self, item) -> str:
+		if self.amt_deletions == 0:
+			raise OSError("The connection to the server was lost")
+		self.amt_deletions -= 1
+		return super().delete_item(item)
+
+
+def make_backend(amt_workers: int, backend: threaded_memory_backend = None) -> threaded_memory_backend:
+	"""
+	Creates a backend with a mailbox holding nested folders, each with deals and other emails.
+	:param backend: (threaded_memory_backend) empty backend the mailbox is added to, a new one if None
+	:return: (threaded_memory_backend) the backend
+	"""
+	if backend is None:
+		backend = threaded_memory_backend(amt_workers)
+	backend.add_mailbox(MAILBOX)
+	base = datetime(2023, 1, 10, tzinfo=timezone.utc)
+	for folder_path, size in FOLDER_SIZES.items():
+		for number in range(size):
+			sent_on = base + timedelta(hours=number)
+			backend.add_email(MAILBOX, folder_path, Subject=f"Deals {number}", SenderEmailAddress="deals@shop.com",
+							  SentOn=sent_on, ReceivedTime=sent_on)
+			backend.add_email(MAILBOX, folder_path, Subject=f"Hello {number}", SenderEmailAddress="friend@mail.com",
+							  SentOn=sent_on, ReceivedTime=sent_on)
+	backend.add_email(MAILBOX, "Archive", Subject="Undeliverable: deals")
+	return backend
+
+
+class test_folder_traversal(unittest.TestCase):
+
+	def test_list_and_open_folders(self):
+		"""
+		Folders are listed by path, each folder before its sub folders
+		:return: None
+		"""
+		backend = make_backend(1)
+		self.assertEqual(["Inbox", "Inbox/Promotions", "Inbox/Promotions/Old", "Deleted Items", "Archive",
+						  "Archive/2022"], backend.list_folders(MAILBOX))
+		self.assertEqual(14, backend.get_items(backend.open_folder(MAILBOX, "Inbox/Promotions/Old")).Count)
+		self.assertRaises(KeyError, backend.open_folder, MAILBOX, "Inbox/Missing")
+
+	def test_select_folders(self):
+		"""
+		Patterns match a folder along with its sub folders, Deleted Items is always excluded
+		:return: None
+		"""
+		folder_paths = make_backend(1).list_folders(MAILBOX)
+		self.assertEqual(["Inbox", "Inbox/Promotions", "Inbox/Promotions/Old", "Archive", "Archive/2022"],
+						 select_folders(folder_paths))
+		self.assertEqual(["Inbox/Promotions", "Inbox/Promotions/Old"], select_folders(folder_paths, "inbox/promotions/"))
+		self.assertEqual(["Inbox", "Archive", "Archive/2022"],
+						 select_folders(folder_paths, exclude_patterns=["Inbox/Promo*"]))
+		self.assertEqual(["Inbox/Promotions/Old", "Archive/2022"],
+						 select_folders(folder_paths, include_patterns=["*/old", "*/20??"]))
+		self.assertEqual([], select_folders(folder_paths, "Deleted Items"))
+		self.assertTrue(matches_folder_pattern("Inbox/A/B", ["INBOX"]))
+		self.assertFalse(matches_folder_pattern("Inbox", ["Inbox/*"]))
+
+	def test_delete_in_folder_tree(self):
+		"""
+		Every selected folder is taken from the queue by one of the workers, counts are reported per folder
+		:return: None
+		"""
+		backend = make_backend(2)
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.select_target_mailbox_by_address(MAILBOX)
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"},
+									 {"name": "hello", "subject_keyphrase": "hello 1"}])
+		model.use_restrict_filter = False
+
+		summary = model.delete_emails_in_folder_tree(exclude_patterns=["Inbox/Promotions/Old"], rules=rules,
+													 max_workers=2)
+		self.assertEqual([], summary['errors'])
+		self.assertEqual(2, len(backend.worker_threads))
+		self.assertEqual(["Inbox", "Inbox/Promotions", "Archive", "Archive/2022"],
+						 [result['folder'] for result in summary['folders']])
+		# Hello 1, and Hello 10 to Hello 19 in the folders with more than 10 emails
+		self.assertEqual([6, 31, 4, 13], [result['matched'] for result in summary['folders']])
+		self.assertEqual([6, 31, 4, 13], [result['deleted'] for result in summary['folders']])
+		self.assertEqual([0, 0, 1, 0], [result['unprocessed'] for result in summary['folders']])
+		self.assertEqual([39, 15], [rule_summary['deleted'] for rule_summary in summary['rules']])
+		self.assertEqual(54, model.delete_counter)
+		self.assertEqual(14, backend.get_items(backend.open_folder(MAILBOX, "Inbox/Promotions/Old")).Count)
+		# Deleted Items is not cleaned, the deleted emails were moved to it
+		self.assertEqual(8 + 54, backend.get_items(backend.open_folder(MAILBOX, "Deleted Items")).Count)
+
+	def test_failing_folder_does_not_stop_others(self):
+		"""
+		A folder failing is reported in its result, the other folders are still cleaned
+		:return: None
+		"""
+		backend = make_backend(2)
+		model = cleanup_model(backend)
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"}])
+
+		results = clean_folders_in_parallel(backend, MAILBOX, ["Inbox", "Missing", "Archive"], rules, max_workers=2)
+		self.assertEqual([5, 0, 3], [result['deleted'] for result in results])
+		self.assertIsNone(results[0]['error'])
+		self.assertTrue(results[1]['error'].startswith("KeyError"))
+
+	def test_failing_folder_keeps_its_deletions(self):
+		"""
+		A folder failing after some batches were deleted still reports the emails deleted from it
+		:return: None
+		"""
+		# the third batch of Inbox/Promotions fails, after the first two were deleted and journaled
+		backend = make_backend(1, failing_delete_backend(1, amt_deletions=10))
+		model = cleanup_model(backend)
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"}])
+
+		results = clean_folders_in_parallel(backend, MAILBOX, ["Inbox/Promotions"], rules, max_workers=1,
+											deletion_batch_size=5)
+		self.assertTrue(results[0]['error'].startswith("OSError"))
+		self.assertEqual((15, 10), (results[0]['matched'], results[0]['deleted']))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
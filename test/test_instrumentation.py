@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.date_handler import date_handler
+from src.model.instrumentation import run_statistics, instrumented_backend
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests measuring the calls, stages and profile of a run.
+"""
+
+
+class test_instrumentation(unittest.TestCase):
+
+	def test_backend_calls_are_counted(self):
+		"""
+		Calls to the backend, to its collections and reads of each property are counted
+		:return: None
+		"""
+		statistics = run_statistics()
+		backend = instrumented_backend(make_test_backend(), statistics)
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		items.Sort("[ReceivedTime]", True)
+		first_item = items.Item(1)
+		self.assertEqual("Weekly deals 9", first_item.Subject)
+		self.assertRaises(AttributeError, getattr, items.Item(items.Count), "SentOn")
+		self.assertIsNotNone(backend.delete_item(first_item))
+
+		stats = statistics.get_stats()
+		self.assertEqual(2, stats['counters']['items.Item'])
+		self.assertEqual(1, stats['counters']['property.Subject'])
+		self.assertEqual(1, stats['counters']['property.SentOn'])
+		self.assertEqual(1, stats['counters']['backend.delete_item'])
+		self.assertEqual({'delete', 'enumerate', 'sort'}, set(stats['timers']))
+		self.assertEqual(21, backend.get_items(backend.open_folder(MAILBOX)).Count)
+
+	def test_model_statistics(self):
+		"""
+		A deletion is measured per stage, the measured backend and methods are given back afterwards
+		:return: None
+		"""
+		backend = make_test_backend()
+		model = cleanup_model(backend)
+		model.enable_instrumentation(profile=True)
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.use_restrict_filter = False
+		model.set_target_sender_email("deals@shop.com")
+		model.verify_deletion_conditions()
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(10, model.delete_counter)
+
+		with tempfile.TemporaryDirectory() as temp_dir:
+			stats_path = os.path.join(temp_dir, "stats.json")
+			model.write_run_statistics(stats_path)
+			with open(stats_path, 'r', encoding='utf-8') as stats_file:
+				written_stats = json.load(stats_file)
+		self.assertEqual(22, written_stats['counters']['cleanup_model.is_email_matching_conditions'])
+		self.assertEqual(10, written_stats['counters']['backend.delete_item'])
+		# every email is asked for its sender address, including the emails missing it
+		self.assertEqual(22, written_stats['counters']['property.SenderEmailAddress'])
+		self.assertTrue({'connect', 'enumerate', 'sort', 'match', 'delete'} <= set(written_stats['timers']))
+		self.assertGreater(len(written_stats['profile']), 0)
+		self.assertEqual({'conditions': [{'name': "sender email", 'evaluations': 22, 'hits': 10, 'pruned': 12}]},
+						 written_stats['predicates'])
+
+		stats = model.disable_instrumentation()
+		self.assertEqual(written_stats['counters'], stats['counters'])
+		self.assertIs(backend, model.backend)
+		self.assertNotIn('is_email_matching_conditions', model.__dict__)
+		self.assertNotIn('convert_sent_on_datetime', date_handler().__dict__)
+		self.assertIsNone(model.get_run_statistics())
+
+	def test_rule_statistics(self):
+		"""
+		The emails checked and pruned by the conditions of each rule are kept per rule
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.enable_instrumentation()
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.use_restrict_filter = False
+		rules = model.compile_rules([{"name": "hello", "subject_keyphrase": "hello"},
+									 {"name": "shop", "sender_email": "deals@shop.com"}])
+		model.delete_emails_matching_rules(rules)
+		stats = model.disable_instrumentation()
+		self.assertEqual({'hello': [{'name': "subject keyphrase", 'evaluations': 22, 'hits': 10, 'pruned': 12}],
+						  'shop': [{'name': "sender email", 'evaluations': 12, 'hits': 10, 'pruned': 2}]},
+						 stats['predicates'])
+
+	def test_trace_memory(self):
+		"""
+		The tracemalloc report is kept once tracing stopped
+		:return: None
+		"""
+		statistics = run_statistics()
+		statistics.start_profiling(trace_memory=True)
+		allocated = [str(number) for number in range(1000)]
+		statistics.stop_profiling()
+		memory = statistics.get_stats()['memory']
+		self.assertGreater(memory['peak_bytes'], 0)
+		self.assertGreater(len(memory['top']), 0)
+		self.assertEqual(1000, len(allocated))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
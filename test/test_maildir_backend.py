@@ -0,0 +1,134 @@
+import os
+import mailbox
+import tempfile
+import unittest
+from email.message import EmailMessage
+from src.model.maildir_backend import maildir_backend
+
+"""
+This file tests the maildir_backend with both Maildir and mbox folders.
+"""
+
+MAILBOX = "tester@example.com"
+
+
+def make_message(subject: str, sender: str = None, date: str = None) -> EmailMessage:
+	"""
+	Helper creating a simple email message.
+	:return: (EmailMessage) the message
+	"""
+	message = EmailMessage()
+	message['Subject'] = subject
+	if sender is not None:
+		message['From'] = sender
+	if date is not None:
+		message['Date'] = date
+	message.set_content("body")
+	return message
+
+
+class test_maildir_backend(unittest.TestCase):
+
+	def setUp(self) -> None:
+		self.temp_dir = tempfile.TemporaryDirectory()
+		self.root = self.temp_dir.name
+
+	def tearDown(self) -> None:
+		self.temp_dir.cleanup()
+
+	def fill_store(self, store):
+		store.add(make_message("Sale now on", "Shop <deals@shop.com>", "Tue, 17 Jan 2023 10:00:00 +0000"))
+		store.add(make_message("Hello", "Friend <friend@mail.com>", "Wed, 18 Jan 2023 10:00:00 +0000"))
+		store.add(make_message("Undeliverable"))
+
+	def test_maildir_properties_and_delete(self):
+		"""
+		Testing reading properties and deleting from a Maildir
+		:return: None
+		"""
+		store = mailbox.Maildir(os.path.join(self.root, MAILBOX))
+		self.fill_store(store)
+
+		backend = maildir_backend(self.root)
+		backend.connect()
+		self.assertEqual([MAILBOX], backend.list_mailboxes())
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		self.assertEqual(3, items.Count)
+
+		by_subject = {item.Subject: item for item in items}
+		sale = by_subject["Sale now on"]
+		self.assertEqual("deals@shop.com", sale.SenderEmailAddress)
+		self.assertEqual("Shop", sale.SenderName)
+		self.assertEqual(2023, sale.SentOn.year)
+		self.assertRaises(AttributeError, lambda: by_subject["Undeliverable"].SentOn)
+		self.assertRaises(AttributeError, lambda: by_subject["Undeliverable"].SenderEmailAddress)
+
+		backend.delete_item(sale)
+		backend.disconnect()
+		self.assertEqual(2, len(mailbox.Maildir(os.path.join(self.root, MAILBOX), create=False)))
+
+	def test_mbox_delete_is_flushed_on_disconnect(self):
+		"""
+		Testing deleting from an mbox file
+		:return: None
+		"""
+		os.mkdir(os.path.join(self.root, MAILBOX))
+		mbox_path = os.path.join(self.root, MAILBOX, "Inbox.mbox")
+		store = mailbox.mbox(mbox_path)
+		self.fill_store(store)
+		store.flush()
+		store.close()
+
+		backend = maildir_backend(self.root, mailbox_format='mbox')
+		backend.connect()
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		by_subject = {item.Subject: item for item in items}
+		# mbox emails are received when they were sent
+		self.assertEqual(by_subject["Sale now on"].SentOn, by_subject["Sale now on"].ReceivedTime)
+		self.assertEqual(by_subject["Hello"].SentOn, by_subject["Hello"].LastModificationTime)
+		self.assertRaises(AttributeError, lambda: by_subject["Undeliverable"].ReceivedTime)
+		for item in list(items):
+			if item.Subject == "Hello":
+				backend.delete_item(item)
+		self.assertEqual(2, items.Count)
+		backend.disconnect()
+		self.assertEqual(["Sale now on", "Undeliverable"], sorted(m['Subject'] for m in mailbox.mbox(mbox_path)))
+
+	def test_sub_folders(self):
+		"""
+		Testing listing and opening nested folders in both formats
+		:return: None
+		"""
+		store = mailbox.Maildir(os.path.join(self.root, MAILBOX))
+		self.fill_store(store)
+		# Maildir++ keeps nested folders next to each other, named by their dotted path
+		self.fill_store(store.add_folder("Archive.2023"))
+		store.add_folder("Archive")
+
+		backend = maildir_backend(self.root)
+		backend.connect()
+		self.assertEqual(["Inbox", "Archive", "Archive/2023"], backend.list_folders(MAILBOX))
+		self.assertEqual(3, backend.get_items(backend.open_folder(MAILBOX, "Archive/2023")).Count)
+		self.assertEqual(0, backend.get_items(backend.open_folder(MAILBOX, "Archive")).Count)
+		backend.disconnect()
+
+		mbox_root = os.path.join(self.root, "mbox")
+		os.makedirs(os.path.join(mbox_root, MAILBOX, "Archive"))
+		for folder_path in ("Inbox.mbox", os.path.join("Archive", "2023.mbox")):
+			mbox_store = mailbox.mbox(os.path.join(mbox_root, MAILBOX, folder_path))
+			self.fill_store(mbox_store)
+			mbox_store.flush()
+			mbox_store.close()
+
+		backend = maildir_backend(mbox_root, mailbox_format='mbox')
+		backend.connect()
+		self.assertEqual(["Inbox", "Archive/2023"], backend.list_folders(MAILBOX))
+		self.assertEqual(3, backend.get_items(backend.open_folder(MAILBOX, "Archive/2023")).Count)
+		backend.disconnect()
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,132 @@
+import unittest
+from datetime import datetime, timedelta
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_backend
+from src.model.date_handler import LOCAL_TIMEZONE
+from src.model.cleanup_custom_exceptions import *
+
+"""
+This file tests the memory_backend and the cleanup_model running on top of it.
+"""
+
+MAILBOX = "tester@example.com"
+
+
+def make_test_backend() -> memory_backend:
+	"""
+	Creates a memory backend with a small inbox used by the tests below.
+	:return: (memory_backend) the backend
+	"""
+	backend = memory_backend()
+	backend.add_mailbox(MAILBOX)
+	backend.add_mailbox("Public Folders")
+	base = datetime(2023, 1, 10, 12, 0, 0, tzinfo=LOCAL_TIMEZONE)
+	for day in range(10):
+		sent_on = base + timedelta(days=day)
+		backend.add_email(MAILBOX, Subject=f"Weekly deals {day}", SenderEmailAddress="deals@shop.com",
+						  SenderName="Shop", SentOn=sent_on, ReceivedTime=sent_on)
+		backend.add_email(MAILBOX, Subject=f"Hello {day}", SenderEmailAddress="friend@mail.com",
+						  SenderName="Friend", SentOn=sent_on, ReceivedTime=sent_on)
+	# emails missing a SentOn or a sender address property
+	backend.add_email(MAILBOX, Subject="Undeliverable: deals", SenderName="System")
+	backend.add_email(MAILBOX, Subject="No reply deals", SenderName="Shop", SentOn=base, ReceivedTime=base)
+	return backend
+
+
+class test_memory_backend(unittest.TestCase):
+
+	def test_items_collection(self):
+		"""
+		Testing Count, Item, Sort and iteration of the items collection
+		:return: None
+		"""
+		backend = make_test_backend()
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		self.assertEqual(22, items.Count)
+		self.assertEqual(22, len(list(items)))
+
+		items.Sort("[ReceivedTime]", True)
+		self.assertEqual("Weekly deals 9", items.Item(1).Subject)
+		# items missing the property are placed at the end
+		self.assertEqual("Undeliverable: deals", items.Item(items.Count).Subject)
+		self.assertRaises(IndexError, items.Item, 0)
+
+	def test_missing_property_raises_attribute_error(self):
+		"""
+		Missing properties must act like on an Outlook item
+		:return: None
+		"""
+		backend = memory_backend()
+		item = backend.add_email(MAILBOX, Subject="Undeliverable")
+		self.assertRaises(AttributeError, lambda: item.SentOn)
+		self.assertRaises(AttributeError, lambda: item.SenderEmailAddress)
+
+	def test_delete_shifts_indexes(self):
+		"""
+		Deleting an item shifts the indexes of the following items like in Outlook
+		:return: None
+		"""
+		backend = make_test_backend()
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		second = items.Item(2)
+		backend.delete_item(items.Item(1))
+		self.assertEqual(21, items.Count)
+		self.assertIs(second, items.Item(1))
+
+	def test_model_startup_and_selection(self):
+		"""
+		Testing the startup methods of the model on the memory backend
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		# mailboxes without an '@' are not emails
+		self.assertEqual({1: MAILBOX}, model.mailbox_options)
+		model.select_target_mailbox(1)
+		self.assertEqual(MAILBOX, model.selected_email)
+		self.assertEqual(22, model.get_all_emails_from_directory().Count)
+
+	def test_model_match_and_delete(self):
+		"""
+		Testing matching and deletion on the memory backend
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+
+		model.set_target_sender_email("DEALS@shop.com")
+		model.set_target_start_date("1/12/2023")
+		model.set_target_end_date("1/15/2023")
+		model.verify_deletion_conditions()
+		self.assertEqual(4, len(model.get_emails_matching_search_conditions()))
+
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(4, model.delete_counter)
+		self.assertEqual(18, model.get_all_emails_from_directory().Count)
+
+	def test_model_counts_missing_attributes(self):
+		"""
+		Emails missing properties are skipped and counted, with or without the restrict filter.
+		Unless told otherwise, the filter passes them to be counted.
+		:return: None
+		"""
+		for use_restrict_filter, count_missing, expected_missing in ((False, True, 2), (True, True, 2),
+																	 (True, False, 0)):
+			model = cleanup_model(make_test_backend())
+			model.call_startup_methods()
+			model.select_target_mailbox(1)
+			model.use_restrict_filter = use_restrict_filter
+			model.count_missing_with_restrict_filter = count_missing
+
+			model.set_target_sender_email("deals@shop.com")
+			model.verify_deletion_conditions()
+			self.assertEqual(10, len(model.get_emails_matching_search_conditions()))
+			self.assertEqual(expected_missing, model.emails_with_missing_attributes_count)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,171 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.metadata_index import metadata_index
+from src.model.date_handler import LOCAL_TIMEZONE
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests the SQLite metadata_index and searching emails through it.
+"""
+
+LAST_SYNC = datetime(2023, 2, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def make_synced_backend():
+	"""
+	Creates the test backend with every email last modified at LAST_SYNC.
+	:return: (tuple) (backend, inbox folder)
+	"""
+	backend = make_test_backend()
+	folder = backend.open_folder(MAILBOX)
+	for item in backend.get_items(folder):
+		item.LastModificationTime = LAST_SYNC
+	return backend, folder
+
+
+class test_metadata_index(unittest.TestCase):
+
+	def test_incremental_sync(self):
+		"""
+		Only emails modified since the last sync are fetched again
+		:return: None
+		"""
+		backend, folder = make_synced_backend()
+		index = metadata_index()
+		self.assertEqual(22, index.sync(backend, MAILBOX, folder, "Inbox"))
+		self.assertEqual(22, index.count(MAILBOX, "Inbox"))
+		self.assertEqual(LAST_SYNC.timestamp(), index.get_watermark(MAILBOX, "Inbox"))
+
+		backend.add_email(MAILBOX, Subject="New deals", SenderEmailAddress="deals@shop.com", SenderName="Shop",
+						  SentOn=LAST_SYNC, ReceivedTime=LAST_SYNC, LastModificationTime=LAST_SYNC + timedelta(days=1))
+		# the watermark minute is fetched again, so the 22 emails of that minute come back with the new one
+		self.assertEqual(23, index.sync(backend, MAILBOX, folder, "Inbox"))
+		self.assertEqual(1, index.sync(backend, MAILBOX, folder, "Inbox"))
+		self.assertEqual(23, index.count(MAILBOX, "Inbox"))
+		self.assertEqual(0, index.entry_id_syncs)
+
+	def test_sync_finds_removed_emails(self):
+		"""
+		Emails removed by another program are dropped by listing the EntryIDs of the folder,
+		without fetching the other emails again
+		:return: None
+		"""
+		backend, folder = make_synced_backend()
+		index = metadata_index()
+		index.sync(backend, MAILBOX, folder, "Inbox")
+		removed = backend.get_items(folder).Item(1)
+		backend.delete_item(removed)
+
+		index.sync(backend, MAILBOX, folder, "Inbox")
+		self.assertEqual(1, index.entry_id_syncs)
+		# the 21 emails left are only fetched again because they are in the watermark minute
+		self.assertEqual(21, index.rows_fetched)
+		self.assertEqual(21, index.count(MAILBOX, "Inbox"))
+		self.assertNotIn(removed.EntryID, [row[0] for row in index.connection.execute("SELECT entry_id FROM emails")])
+
+	def test_folders_with_the_same_name(self):
+		"""
+		Folders with the same name in different parents are kept apart by their path
+		:return: None
+		"""
+		backend, _ = make_synced_backend()
+		for folder_path, amount in (("Inbox/Archive", 3), ("Projects/Archive", 5)):
+			for index in range(amount):
+				backend.add_email(MAILBOX, folder_path, Subject=f"Report {index}", SenderEmailAddress="boss@corp.com",
+								  SentOn=LAST_SYNC, ReceivedTime=LAST_SYNC,
+								  LastModificationTime=LAST_SYNC + timedelta(minutes=amount))
+
+		index = metadata_index()
+		for _ in range(2):
+			for folder_path in ("Inbox/Archive", "Projects/Archive"):
+				index.sync(backend, MAILBOX, backend.open_folder(MAILBOX, folder_path), folder_path)
+		self.assertEqual(0, index.entry_id_syncs)
+		self.assertEqual(3, index.query(MAILBOX, "Inbox/Archive", sender_emails=["boss@corp.com"]).Count)
+		self.assertEqual(5, index.count(MAILBOX, "Projects/Archive"))
+		self.assertEqual((LAST_SYNC + timedelta(minutes=3)).timestamp(), index.get_watermark(MAILBOX, "Inbox/Archive"))
+		self.assertIsNone(index.get_watermark(MAILBOX, "Archive"))
+
+	def test_index_is_kept_on_disk(self):
+		"""
+		The index and its watermark are kept between runs
+		:return: None
+		"""
+		backend, folder = make_synced_backend()
+		with tempfile.TemporaryDirectory() as directory:
+			database_path = os.path.join(directory, "index.sqlite")
+			index = metadata_index(database_path)
+			index.sync(backend, MAILBOX, folder, "Inbox")
+			index.close()
+
+			index = metadata_index(database_path)
+			self.assertEqual(22, index.count(MAILBOX, "Inbox"))
+			self.assertEqual(LAST_SYNC.timestamp(), index.get_watermark(MAILBOX, "Inbox"))
+			index.close()
+
+	def test_query(self):
+		"""
+		Testing the conditions of a query, all are case insensitive
+		:return: None
+		"""
+		backend, folder = make_synced_backend()
+		index = metadata_index()
+		index.sync(backend, MAILBOX, folder, "Inbox")
+
+		table = index.query(MAILBOX, "Inbox", sender_emails=["DEALS@shop.com"])
+		self.assertEqual(10, table.Count)
+		self.assertEqual("Weekly deals 9", table.columns['Subject'][0])
+
+		start = datetime(2023, 1, 12, tzinfo=LOCAL_TIMEZONE)
+		end = datetime(2023, 1, 14, 23, 59, 59, tzinfo=LOCAL_TIMEZONE)
+		self.assertEqual(6, index.query(MAILBOX, "Inbox", sent_on_range=(start, end)).Count)
+		self.assertEqual(12, index.query(MAILBOX, "Inbox", subject_phrases=["DEALS"]).Count)
+		self.assertEqual(13, index.query(MAILBOX, "Inbox", subject_phrases=["deals", "hello 3"]).Count)
+		self.assertEqual(1, index.query(MAILBOX, "Inbox", sender_names=["system", "nobody"]).Count)
+		self.assertEqual(10, index.query(MAILBOX, "Inbox", domain_rules=["*.shop.com", "shop.com"]).Count)
+		self.assertEqual(3, index.query(MAILBOX, "Inbox", sender_emails=["deals@shop.com"],
+										sent_on_range=(start, end)).Count)
+		self.assertEqual(2, index.count_missing(MAILBOX, "Inbox", ["SenderEmailAddress"]))
+		# the email missing both properties is counted for the first one
+		self.assertEqual({'SentOn': 1, 'SenderEmailAddress': 1},
+						 index.count_missing_per_property(MAILBOX, "Inbox", ["SentOn", "SenderEmailAddress"]))
+
+	def test_model_search_through_index(self):
+		"""
+		Searching through the index finds the same emails as reading the items
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.use_restrict_filter = False
+		model.set_target_sender_email(["deals@shop.com", "friend@mail.com"])
+		model.set_target_start_date("1/12/2023")
+		model.set_target_end_date("1/15/2023")
+		model.verify_deletion_conditions()
+
+		from_items = model.get_emails_matching_search_conditions()
+		model.emails_with_missing_attributes_count = 0
+		model.open_metadata_index()
+		from_index = model.get_emails_matching_search_conditions()
+		self.assertEqual(8, len(from_index))
+		self.assertEqual(sorted(email.EntryID for email in from_items),
+						 sorted(email.EntryID for email in from_index))
+		# every email missing a property of a condition is counted, whatever the order conditions run in
+		self.assertEqual(2, model.emails_with_missing_attributes_count)
+
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(8, model.delete_counter)
+		self.assertEqual(14, model.metadata_index.count(MAILBOX, "Inbox"))
+		self.assertEqual(0, len(model.get_emails_matching_search_conditions()))
+		model.close_metadata_index()
+		self.assertIsNone(model.metadata_index)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
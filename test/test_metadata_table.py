@@ -0,0 +1,68 @@
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.metadata_table import metadata_table, SNAPSHOT_COLUMNS
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests the metadata_table snapshot and matching emails against it.
+"""
+
+class test_metadata_table(unittest.TestCase):
+
+	def test_rows_act_like_items(self):
+		"""
+		Rows expose the columns as properties, missing values raise AttributeError
+		:return: None
+		"""
+		table = metadata_table(('EntryID', 'Subject', 'SentOn'))
+		table.add_row(("A1", "Hello", None))
+		self.assertEqual(1, table.Count)
+		row = table.row(0)
+		self.assertEqual("Hello", row.Subject)
+		self.assertRaises(AttributeError, lambda: row.SentOn)
+		self.assertRaises(AttributeError, lambda: row.SenderName)
+
+	def test_backend_table_is_column_oriented(self):
+		"""
+		Testing a table fetched from the memory backend
+		:return: None
+		"""
+		backend = make_test_backend()
+		table = backend.get_table(backend.open_folder(MAILBOX), SNAPSHOT_COLUMNS)
+		self.assertEqual(22, table.Count)
+		self.assertEqual(22, len(table.columns['Subject']))
+		self.assertEqual(2, table.columns['SenderEmailAddress'].count(None))
+
+		entry_id = table.columns['EntryID'][0]
+		self.assertEqual(table.columns['Subject'][0], backend.get_item_by_entry_id(entry_id).Subject)
+
+	def test_snapshot_matches_same_emails(self):
+		"""
+		Snapshot matching must find the same emails as reading the items
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.set_target_subject_keyphrase("deals")
+		model.set_target_start_date("1/10/2023")
+		model.set_target_end_date("1/14/2023")
+		model.verify_deletion_conditions()
+
+		from_items = model.get_emails_matching_search_conditions()
+		model.use_snapshot = True
+		from_snapshot = model.get_emails_matching_search_conditions()
+		self.assertEqual(6, len(from_snapshot))
+		self.assertEqual(sorted(email.EntryID for email in from_items),
+						 sorted(email.EntryID for email in from_snapshot))
+
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(6, model.delete_counter)
+		self.assertEqual(16, model.get_all_emails_from_directory().Count)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from src.model.cleanup_model import cleanup_model
+from test_memory_backend import make_test_backend
+
+"""
+This file tests targeting multiple sender email addresses and sender names at once.
+"""
+
+class test_multiple_targets(unittest.TestCase):
+
+	def setUp(self) -> None:
+		self.model = cleanup_model(make_test_backend())
+		self.model.call_startup_methods()
+		self.model.select_target_mailbox(1)
+
+	def test_large_sender_email_collection(self):
+		"""
+		Tens of thousands of blocklisted addresses are matched in one pass
+		:return: None
+		"""
+		model = self.model
+		blocklist = [f"spammer{number}@junk.com" for number in range(20000)]
+		blocklist += ["DEALS@shop.com", "friend@mail.com", "friend@mail.com", "  "]
+		model.set_target_sender_email(blocklist)
+		self.assertEqual(20002, len(model.target_sender_email))
+		model.verify_deletion_conditions()
+		self.assertTrue(model.deletion_confirmation_str.startswith("sender email: spammer0@junk.com OR "))
+		self.assertTrue(model.deletion_confirmation_str.endswith("(19997 more)"))
+		# too many targets for the restrict filter
+		self.assertIsNone(model.build_restrict_filter())
+
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(20, model.delete_counter)
+
+	def test_sender_names(self):
+		"""
+		Multiple sender names, also passed to the restrict filter
+		:return: None
+		"""
+		model = self.model
+		model.set_target_sender_name({"shop", "System"})
+		model.verify_deletion_conditions()
+		self.assertIn(" OR ", model.build_restrict_filter())
+		self.assertEqual(12, len(model.get_emails_matching_search_conditions()))
+
+	def test_single_target_collection_acts_like_str(self):
+		"""
+		A collection holding a single target is the same as passing the str
+		:return: None
+		"""
+		model = self.model
+		model.set_target_sender_email(["deals@shop.com", ""])
+		self.assertEqual("deals@shop.com", model.target_sender_email)
+		model.set_target_sender_name([])
+		self.assertIsNone(model.target_sender_name)
+
+	def test_targets_from_file(self):
+		"""
+		Testing loading sender addresses and names from files
+		:return: None
+		"""
+		model = self.model
+		with tempfile.TemporaryDirectory() as temp_dir:
+			file_path = os.path.join(temp_dir, "senders.txt")
+			with open(file_path, "w", encoding="utf-8") as file:
+				file.write("deals@shop.com\n\nfriend@mail.com\n")
+			model.set_target_sender_emails_from_file(file_path)
+			model.set_target_sender_names_from_file(file_path)
+		self.assertEqual(["deals@shop.com", "friend@mail.com"], model.target_sender_email)
+		self.assertEqual(["deals@shop.com", "friend@mail.com"], model.target_sender_name)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
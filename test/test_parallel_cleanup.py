@@ -0,0 +1,148 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_backend
+from src.model.parallel_cleanup import clean_mailboxes_in_parallel, merge_mailbox_results
+
+"""
+This file tests cleaning several mailboxes at the same time.
+"""
+
+MAILBOXES = ("first@example.com", "second@example.com", "third@example.com")
+
+
+class threaded_memory_backend(memory_backend):
+	"""
+	Memory backend whose workers wait for each other when they start, so the test
+	fails if the mailboxes are not cleaned at the same time.
+	"""
+
+	def __init__(self, amt_workers: int):
+		super().__init__()
+		self.barrier = threading.Barrier(amt_workers, timeout=5)
+		self.worker_threads = set()
+
+	def initialize_thread(self) -> None:
+		self.worker_threads.add(threading.get_ident())
+		self.barrier.wait()
+
+
+class failing_delete_backend(threaded_memory_backend):
+	"""
+	Memory backend failing to delete any email after a given amount of deletions,
+	like Outlook losing its connection in the middle of a run.
+	"""
+
+	def __init__(self, amt_workers: int, amt_deletions: int):
+		super().__init__(amt_workers)
+		self.amt_deletions = amt_deletions
+
+	def delete_item(self, item) -> str:
+		if self.amt_deletions == 0:
+			raise OSError("The connection to the server was lost")
+		self.amt_deletions -= 1
+		return super().delete_item(item)
+
+
+def make_backend(amt_workers: int = len(MAILBOXES), backend: threaded_memory_backend = None) -> threaded_memory_backend:
+	"""
+	Creates a backend with mailboxes of different sizes, each with deals and other emails.
+	:param backend: (threaded_memory_backend) empty backend the mailboxes are added to, a new one if None
+	:return: (threaded_memory_backend) the backend
+	"""
+	if backend is None:
+		backend = threaded_memory_backend(amt_workers)
+	base = datetime(2023, 1, 10, tzinfo=timezone.utc)
+	for size, mailbox in enumerate(MAILBOXES, start=1):
+		backend.add_mailbox(mailbox)
+		for number in range(size * 10):
+			sent_on = base + timedelta(hours=number)
+			backend.add_email(mailbox, Subject=f"Deals {number}", SenderEmailAddress="deals@shop.com",
+							  SentOn=sent_on, ReceivedTime=sent_on)
+			backend.add_email(mailbox, Subject=f"Hello {number}", SenderEmailAddress="friend@mail.com",
+							  SentOn=sent_on, ReceivedTime=sent_on)
+		backend.add_email(mailbox, Subject="Undeliverable: deals")
+	return backend
+
+
+class test_parallel_cleanup(unittest.TestCase):
+
+	def test_delete_in_all_mailboxes(self):
+		"""
+		Every mailbox is cleaned by its own worker and the results are merged
+		:return: None
+		"""
+		backend = make_backend()
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"},
+									 {"name": "hello", "subject_keyphrase": "hello 1"}])
+		model.use_restrict_filter = False
+
+		summary = model.delete_emails_in_mailboxes(rules=rules)
+		self.assertEqual([], summary['errors'])
+		self.assertEqual(3, len(backend.worker_threads))
+		# Hello 1, and Hello 10 to Hello 19 in the larger mailboxes
+		self.assertEqual([11, 31, 41], [result['deleted'] for result in summary['mailboxes']])
+		self.assertEqual([60, 23], [rule_summary['deleted'] for rule_summary in summary['rules']])
+		self.assertEqual(60 + 23, summary['deleted'])
+		self.assertEqual(83, model.delete_counter)
+		self.assertEqual(3, model.emails_with_missing_attributes_count)
+		# the compiled rules were copied, their own counters are untouched
+		self.assertEqual(0, rules[0].matched_count)
+
+	def test_delete_conditions_in_some_mailboxes(self):
+		"""
+		Verified deletion conditions are run on the given mailboxes
+		:return: None
+		"""
+		backend = make_backend(amt_workers=2)
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.set_target_sender_email("deals@shop.com")
+		model.verify_deletion_conditions()
+
+		summary = model.delete_emails_in_mailboxes(["FIRST@example.com", "third@example.com"])
+		self.assertEqual(["first@example.com", "third@example.com"],
+						 [result['mailbox'] for result in summary['mailboxes']])
+		self.assertEqual(40, summary['deleted'])
+		self.assertEqual(41, backend.get_items(backend.open_folder("second@example.com")).Count)
+		self.assertRaises(ValueError, model.delete_emails_in_mailboxes, ["nobody@example.com"])
+
+	def test_failing_mailbox_does_not_stop_others(self):
+		"""
+		A worker failing is reported in the merged summary, the others still run
+		:return: None
+		"""
+		backend = make_backend(amt_workers=2)
+		model = cleanup_model(backend)
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"}])
+
+		results = clean_mailboxes_in_parallel(backend, ["first@example.com", "missing@example.com"], rules)
+		summary = merge_mailbox_results(results)
+		self.assertEqual(10, summary['deleted'])
+		self.assertEqual(1, len(summary['errors']))
+		self.assertTrue(summary['errors'][0].startswith("missing@example.com: KeyError"))
+
+	def test_failing_mailbox_keeps_its_deletions(self):
+		"""
+		A worker failing after some batches were deleted still reports the emails it deleted
+		:return: None
+		"""
+		# the third batch fails, after the first two were deleted and journaled
+		backend = make_backend(backend=failing_delete_backend(1, amt_deletions=10))
+		model = cleanup_model(backend)
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"}])
+
+		results = clean_mailboxes_in_parallel(backend, ["second@example.com"], rules, deletion_batch_size=5)
+		self.assertTrue(results[0]['error'].startswith("OSError"))
+		self.assertEqual(10, results[0]['deleted'])
+		self.assertEqual(10, merge_mailbox_results(results)['deleted'])
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,86 @@
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.predicate_plan import compiled_predicate, predicate_plan
+from src.model.property_probe import get_missing_value
+from test_memory_backend import make_test_backend
+
+"""
+This file tests the compiled predicate plan.
+"""
+
+class test_predicate_plan(unittest.TestCase):
+
+	def test_reorders_by_selectivity(self):
+		"""
+		A condition rejecting most emails should end up evaluated first
+		:return: None
+		"""
+		rarely_true = compiled_predicate("rare", 0, lambda number: number % 10 == 0)
+		always_true = compiled_predicate("always", 1, lambda number: True)
+		plan = predicate_plan([always_true, rarely_true], reorder_interval=10)
+
+		matches = [number for number in range(100) if plan.matches(number)]
+		self.assertEqual(10, len(matches))
+		self.assertEqual(["rare", "always"], [predicate.name for predicate in plan.predicates])
+
+		statistics = {each["name"]: each for each in plan.get_statistics()}
+		self.assertEqual(100, statistics["rare"]["evaluations"])
+		self.assertEqual(90, statistics["rare"]["pruned"])
+		# once reordered, "always" only sees the emails "rare" lets through
+		self.assertLess(statistics["always"]["evaluations"], 100)
+
+	def test_cheaper_condition_first(self):
+		"""
+		With no observations yet, cheaper conditions come first
+		:return: None
+		"""
+		expensive = compiled_predicate("expensive", 0, lambda email: True, property_reads=2)
+		cheap = compiled_predicate("cheap", 1, lambda email: True, property_reads=1)
+		plan = predicate_plan([expensive, cheap])
+		self.assertEqual(["cheap", "expensive"], [predicate.name for predicate in plan.predicates])
+
+	def test_missing_independent_of_order(self):
+		"""
+		An email is only missing a property if no predicate rejects it, whatever the evaluation order
+		:return: None
+		"""
+		def make_predicates() -> list:
+			no_sent_on = compiled_predicate("dates", 1, lambda email: get_missing_value("SentOn") if email < 2 else True)
+			no_address = compiled_predicate("sender", 0, lambda email: get_missing_value("SenderEmailAddress")
+											if email == 0 else email % 2 == 0)
+			return [no_sent_on, no_address]
+
+		for predicates in (make_predicates(), make_predicates()[::-1]):
+			plan = predicate_plan(predicates)
+			plan.predicates = predicates
+			# email 0 misses both properties, 1 misses SentOn but is rejected by its sender
+			self.assertEqual([get_missing_value("SenderEmailAddress"), False, True, False],
+							 [plan.matches(email) for email in range(4)])
+
+	def test_model_compiles_plan(self):
+		"""
+		verify_deletion_conditions compiles the plan used for matching
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.set_target_subject_keyphrase("DEALS")
+		model.set_target_sender_email("deals@shop.com")
+		model.verify_deletion_conditions()
+		self.assertEqual({0, 2}, {predicate.condition_index for predicate in model.predicate_plan.predicates})
+
+		model.use_restrict_filter = False
+		self.assertEqual(10, len(model.get_emails_matching_search_conditions()))
+		evaluations = sum(each["evaluations"] for each in model.predicate_plan.get_statistics())
+		self.assertGreaterEqual(evaluations, 22)
+
+		model.clear_deleting_conditions()
+		self.assertIsNone(model.predicate_plan)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
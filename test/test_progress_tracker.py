@@ -0,0 +1,87 @@
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.progress_tracker import progress_tracker
+from test_memory_backend import make_test_backend
+
+"""
+This file tests reporting the progress of deletions.
+"""
+
+
+class fake_clock():
+	"""
+	Clock only moving forward when told to.
+	"""
+
+	def __init__(self):
+		self.now = 100.0
+
+	def __call__(self) -> float:
+		return self.now
+
+
+class test_progress_tracker(unittest.TestCase):
+
+	def test_reports_are_throttled(self):
+		"""
+		The callback is called once per interval, with the throughput and the time left
+		:return: None
+		"""
+		clock = fake_clock()
+		reports = []
+		progress = progress_tracker(reports.append, total=100, min_interval=1.0, clock=clock)
+		for _ in range(10):
+			progress.add_scanned()
+		self.assertEqual([], reports)
+
+		clock.now += 2.0
+		progress.add_scanned(10)
+		progress.add_matched(5)
+		self.assertEqual(1, len(reports))
+		self.assertEqual(20, reports[0]['scanned'])
+		self.assertEqual(10.0, reports[0]['items_per_second'])
+		self.assertEqual(8.0, reports[0]['eta_seconds'])
+		self.assertFalse(reports[0]['finished'])
+
+		progress.add_deleted(5)
+		progress.finish()
+		self.assertEqual(2, len(reports))
+		self.assertEqual({'scanned': 20, 'matched': 5, 'deleted': 5, 'total': 100, 'items_per_second': 10.0,
+						  'eta_seconds': 0.0, 'finished': True}, reports[-1])
+		self.assertIsNone(progress_tracker(reports.append).get_progress()['eta_seconds'])
+
+	def test_model_reports_deletion_progress(self):
+		"""
+		Deletions report their final counts, the total is the amount of emails the scan reads
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		reports = []
+		model.progress_callback = reports.append
+
+		model.set_target_subject_keyphrase("deals")
+		model.set_target_start_date("1/10/2023")
+		model.set_target_end_date("1/14/2023")
+		model.verify_deletion_conditions()
+		model.delete_emails_with_matching_conditions()
+		# only the emails sent within the range and passing the restrict filter are read
+		self.assertEqual({'scanned': 6, 'matched': 6, 'deleted': 6, 'total': 6, 'finished': True},
+						 {key: reports[-1][key] for key in ('scanned', 'matched', 'deleted', 'total', 'finished')})
+		self.assertIsNone(model.progress)
+
+		reports.clear()
+		model.use_restrict_filter = False
+		rules = model.compile_rules([{"name": "hello", "subject_keyphrase": "hello"}])
+		model.delete_emails_matching_rules(rules)
+		self.assertEqual(1, len(reports))
+		self.assertEqual((16, 10, 10, 16), (reports[0]['scanned'], reports[0]['matched'], reports[0]['deleted'],
+											reports[0]['total']))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
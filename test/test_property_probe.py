@@ -0,0 +1,195 @@
+import unittest
+from datetime import datetime
+from src.model.cleanup_model import cleanup_model
+from src.model.date_handler import LOCAL_TIMEZONE
+from src.model.memory_backend import memory_mail_item
+from src.model.outlook_backend import read_outlook_property, ITEM_CLASS_PROPERTIES
+from src.model.property_probe import probe_property, is_missing, get_missing_value, normalize_missing_property, \
+	register_property_reader
+from src.model.rule_expression import parse_rule_expression
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests reading missing email properties, and targeting the emails
+missing a property.
+"""
+
+
+class fake_item_property():
+	"""
+	Stands for an ItemProperty of an Outlook item
+	"""
+
+	def __init__(self, name: str):
+		self.Name = name
+
+
+class fake_report_item():
+	"""
+	Stands for an Outlook report item, which has no SenderEmailAddress. Reading a
+	property it does not have raises like a COM call does, and is counted.
+	"""
+
+	def __init__(self):
+		self.Class = 46
+		self.Subject = "Undeliverable: hello"
+		self.ItemProperties = [fake_item_property("Class"), fake_item_property("Subject")]
+		self.failed_reads = 0
+
+	def __getattr__(self, name: str):
+		self.failed_reads += 1
+		raise AttributeError(name)
+
+
+def make_model() -> cleanup_model:
+	model = cleanup_model(make_test_backend())
+	model.call_startup_methods()
+	model.select_target_mailbox(1)
+	model.use_restrict_filter = False
+	return model
+
+
+class test_property_probe(unittest.TestCase):
+
+	def test_probe_property(self):
+		"""
+		Missing properties and the empty date of Outlook give the missing value of the property,
+		empty strings and None values of properties the email has are values
+		:return: None
+		"""
+		sent_on = datetime(2023, 1, 10, tzinfo=LOCAL_TIMEZONE)
+		email = memory_mail_item(Subject="", SenderEmailAddress="", SentOn=sent_on,
+								 ReceivedTime=datetime(4501, 1, 1, tzinfo=LOCAL_TIMEZONE))
+		self.assertEqual("", probe_property(email, "Subject"))
+		self.assertEqual("", probe_property(email, "SenderEmailAddress"))
+		self.assertEqual(sent_on, probe_property(email, "SentOn"))
+		self.assertIs(get_missing_value("Size"), probe_property(email, "Size"))
+		self.assertTrue(is_missing(probe_property(email, "ReceivedTime")))
+		email.Size = None
+		self.assertIsNone(probe_property(email, "Size"))
+		missing_name = probe_property(email, "SenderName")
+		self.assertFalse(missing_name)
+		self.assertEqual("SenderName", missing_name.property_name)
+
+		self.assertEqual("SentOn", normalize_missing_property(" senton"))
+		self.assertRaises(ValueError, normalize_missing_property, "Size")
+
+	def test_probe_outlook_item(self):
+		"""
+		Properties an Outlook item class does not have are not read, the others are
+		:return: None
+		"""
+		register_property_reader(fake_report_item, read_outlook_property)
+		report = fake_report_item()
+		self.assertEqual("Undeliverable: hello", probe_property(report, "Subject"))
+		self.assertTrue(is_missing(probe_property(report, "SenderEmailAddress")))
+		self.assertTrue(is_missing(probe_property(report, "SentOn")))
+		self.assertEqual(0, report.failed_reads)
+		self.assertEqual(frozenset(("Class", "Subject")), ITEM_CLASS_PROPERTIES.pop(46))
+
+	def test_expression_with_missing_properties(self):
+		"""
+		An expression reading a missing property is not processed, whatever the nodes above it
+		:return: None
+		"""
+		no_address = memory_mail_item(Subject="Undeliverable: hello", SenderName="System")
+		self.assertTrue(parse_rule_expression("missing:senderemailaddress AND subject:undeliverable").evaluate(no_address))
+		self.assertFalse(parse_rule_expression("missing:Subject OR missing:SenderName").evaluate(no_address))
+		self.assertEqual("SenderEmailAddress",
+						 parse_rule_expression("NOT sender:a@x.com").evaluate(no_address).property_name)
+		self.assertTrue(parse_rule_expression("sender:a@x.com OR subject:hello").evaluate(no_address))
+		self.assertTrue(is_missing(parse_rule_expression("sender:a@x.com OR subject:sale").evaluate(no_address)))
+		self.assertRaises(ValueError, parse_rule_expression, "missing:Size")
+
+	def test_missing_property_counts(self):
+		"""
+		Emails that cannot be checked are counted per missing property
+		:return: None
+		"""
+		model = make_model()
+		model.use_date_bounded_scan = False
+		model.set_target_sender_email("deals@shop.com")
+		model.set_target_start_date("1/1/2023")
+		model.set_target_end_date("12/31/2023")
+		model.verify_deletion_conditions()
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(10, model.delete_counter)
+		# each email is counted for the first property missing, in the order the conditions are checked
+		self.assertEqual(2, model.emails_with_missing_attributes_count)
+		self.assertEqual(2, sum(model.missing_property_counts.values()))
+
+		model.clear_deleting_conditions()
+		model.set_target_subject_keyphrase("deals")
+		model.set_target_start_date("1/1/2023")
+		model.set_target_end_date("12/31/2023")
+		model.verify_deletion_conditions()
+		self.assertEqual({'matched': 1, 'unprocessed': 1, 'missing': {'SentOn': 1}},
+						 model.count_emails_matching_search_conditions())
+
+	def test_delete_emails_missing_a_property(self):
+		"""
+		The missing property condition targets the emails that do not have the property
+		:return: None
+		"""
+		model = make_model()
+		model.set_target_missing_property(["SenderEmailAddress"])
+		model.set_target_subject_keyphrase("deals")
+		model.verify_deletion_conditions()
+		self.assertEqual("has the keyword/keyphrase in the subject: deals AND is missing the property: SenderEmailAddress",
+						 model.deletion_confirmation_str)
+		self.assertEqual(["No reply deals", "Undeliverable: deals"],
+						 sorted(email.Subject for email in model.get_emails_matching_search_conditions()))
+		self.assertEqual(0, model.emails_with_missing_attributes_count)
+
+		rules = model.compile_rules([{"name": "reports", "missing_property": "sentOn"},
+									 {"name": "shop", "sender_email": "deals@shop.com"}])
+		self.assertEqual("is missing the property: SentOn", rules[0].confirmation_str)
+		summaries = model.delete_emails_matching_rules(rules)
+		self.assertEqual([1, 10], [summary['deleted'] for summary in summaries])
+		# the email without a sender address but with a SentOn date is only checked by the shop rule
+		self.assertEqual({'SenderEmailAddress': 1}, summaries[1]['missing'])
+		self.assertEqual({'SenderEmailAddress': 1}, model.missing_property_counts)
+
+	def test_search_modes_agree_on_missing_properties(self):
+		"""
+		Reading the items, a snapshot or the metadata index counts the same emails as missing a
+		property, the empty date included and empty addresses excluded
+		:return: None
+		"""
+		def search(mode: str, conditions) -> tuple:
+			backend = make_test_backend()
+			backend.add_email(MAILBOX, Subject="Draft deals", SenderEmailAddress="", SenderName="Me",
+							  SentOn=datetime(4501, 1, 1, tzinfo=LOCAL_TIMEZONE),
+							  ReceivedTime=datetime(2023, 1, 5, tzinfo=LOCAL_TIMEZONE))
+			model = cleanup_model(backend)
+			model.call_startup_methods()
+			model.select_target_mailbox_by_address(MAILBOX)
+			model.use_restrict_filter = False
+			model.use_date_bounded_scan = False
+			model.use_snapshot = mode == "snapshot"
+			if mode == "index":
+				model.open_metadata_index()
+			conditions(model)
+			model.verify_deletion_conditions()
+			result = (len(model.get_emails_matching_search_conditions()), dict(model.missing_property_counts))
+			model.close_metadata_index()
+			return result
+
+		def by_date(model):
+			model.set_target_subject_keyphrase("deals")
+			model.set_target_start_date("1/1/2023")
+			model.set_target_end_date("12/31/2023")
+
+		def by_sender(model):
+			model.set_target_sender_domain("shop.com")
+
+		for conditions, expected in ((by_date, (11, {'SentOn': 2})), (by_sender, (10, {'SenderEmailAddress': 2}))):
+			self.assertEqual({"items": expected, "snapshot": expected, "index": expected},
+							 {mode: search(mode, conditions) for mode in ("items", "snapshot", "index")})
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,120 @@
+import unittest
+from datetime import datetime, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.restrict_filter import compile_restrict_filter, parse_restrict_filter, include_missing_properties, \
+	SENDER_EMAIL_PROPERTY, SUBJECT_PROPERTY, SENT_ON_PROPERTY
+from src.model.memory_backend import memory_backend
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests compiling deletion conditions into DASL filters and
+applying those filters with the memory_backend.
+"""
+
+class test_restrict_filter(unittest.TestCase):
+
+	def test_compile_filter(self):
+		"""
+		Testing the filter string produced for a set of conditions
+		:return: None
+		"""
+		self.assertIsNone(compile_restrict_filter())
+
+		start = datetime(2023, 1, 15, 0, 0, 0, tzinfo=timezone.utc)
+		end = datetime(2023, 1, 19, 23, 59, 59, tzinfo=timezone.utc)
+		restrict_filter = compile_restrict_filter(sender_email="o'neil@shop.com", subject_keyphrase="sale",
+												  start_date=start, end_date=end)
+		expected = f"@SQL=(\"{SENDER_EMAIL_PROPERTY}\" = 'o''neil@shop.com') AND " \
+				   f"(\"{SUBJECT_PROPERTY}\" LIKE '%sale%') AND " \
+				   f"(\"{SENT_ON_PROPERTY}\" >= '01/15/2023 12:00 AM') AND " \
+				   f"(\"{SENT_ON_PROPERTY}\" <= '01/20/2023 12:00 AM')"
+		self.assertEqual(expected, restrict_filter)
+
+	def test_parse_and_apply_filter(self):
+		"""
+		Testing the parser used by the fake Items.Restrict
+		:return: None
+		"""
+		backend = memory_backend()
+		sent_on = datetime(2023, 1, 16, 8, 30, tzinfo=timezone.utc)
+		match = backend.add_email(MAILBOX, Subject="Big SALE today", SenderEmailAddress="O'Neil@shop.com",
+								  SentOn=sent_on)
+		backend.add_email(MAILBOX, Subject="Big SALE today", SenderEmailAddress="other@shop.com", SentOn=sent_on)
+		backend.add_email(MAILBOX, Subject="Hello", SenderEmailAddress="o'neil@shop.com", SentOn=sent_on)
+		backend.add_email(MAILBOX, Subject="sale", SenderEmailAddress="o'neil@shop.com")
+
+		restrict_filter = compile_restrict_filter(sender_email="o'neil@shop.com", subject_keyphrase="sale",
+												  start_date=datetime(2023, 1, 15, tzinfo=timezone.utc),
+												  end_date=datetime(2023, 1, 19, 23, 59, 59, tzinfo=timezone.utc))
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		restricted = backend.restrict_items(items, restrict_filter)
+		self.assertEqual([match], list(restricted))
+
+		passes = parse_restrict_filter(f"@SQL=NOT (\"{SUBJECT_PROPERTY}\" = 'hello') OR (\"{SUBJECT_PROPERTY}\" LIKE 'h%')")
+		self.assertEqual(4, len([item for item in items if passes(item)]))
+		self.assertRaises(ValueError, parse_restrict_filter, "[Subject] = 'sale'")
+
+	def test_filter_passes_missing_properties(self):
+		"""
+		A widened filter also passes the items missing a property, empty values of Outlook included
+		:return: None
+		"""
+		restrict_filter = compile_restrict_filter(sender_email="deals@shop.com",
+												  start_date=datetime(2023, 1, 1, tzinfo=timezone.utc))
+		widened = include_missing_properties(restrict_filter, ["SenderEmailAddress", "SentOn"])
+		self.assertEqual(f"@SQL=({restrict_filter[len('@SQL='):]}) OR "
+						 f"(\"{SENDER_EMAIL_PROPERTY}\" IS NULL) OR "
+						 f"(\"{SENT_ON_PROPERTY}\" IS NULL)", widened)
+		self.assertIsNone(include_missing_properties(None, ["SentOn"]))
+
+		backend = memory_backend()
+		sent_on = datetime(2023, 1, 16, tzinfo=timezone.utc)
+		match = backend.add_email(MAILBOX, Subject="Sale", SenderEmailAddress="deals@shop.com", SentOn=sent_on)
+		no_address = backend.add_email(MAILBOX, Subject="Undeliverable", SentOn=sent_on)
+		empty_address = backend.add_email(MAILBOX, Subject="No reply", SenderEmailAddress="", SentOn=sent_on)
+		draft = backend.add_email(MAILBOX, Subject="Draft", SenderEmailAddress="deals@shop.com",
+								  SentOn=datetime(4501, 1, 1, tzinfo=timezone.utc))
+		backend.add_email(MAILBOX, Subject="Hello", SenderEmailAddress="friend@mail.com", SentOn=sent_on)
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		self.assertEqual([match], list(backend.restrict_items(items, restrict_filter)))
+		# an empty address is a value, only missing properties and the empty date are NULL
+		self.assertEqual([match, no_address, draft], list(backend.restrict_items(items, widened)))
+
+	def test_restricted_items_drop_deleted(self):
+		"""
+		Deleted items disappear from a restricted collection
+		:return: None
+		"""
+		backend = make_test_backend()
+		items = backend.get_items(backend.open_folder(MAILBOX))
+		restricted = backend.restrict_items(items, compile_restrict_filter(sender_name="shop"))
+		self.assertEqual(11, restricted.Count)
+		backend.delete_item(restricted.Item(1))
+		self.assertEqual(10, restricted.Count)
+
+	def test_model_same_matches_with_and_without_filter(self):
+		"""
+		The restrict filter must not change which emails match
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.set_target_sender_name("Shop")
+		model.set_target_subject_keyphrase("deals")
+		model.set_target_start_date("1/12/2023")
+		model.set_target_end_date("1/16/2023")
+		model.verify_deletion_conditions()
+
+		with_filter = model.get_emails_matching_search_conditions()
+		model.use_restrict_filter = False
+		without_filter = model.get_emails_matching_search_conditions()
+		self.assertEqual(5, len(with_filter))
+		self.assertEqual(without_filter, with_filter)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.rule_batch import load_rules_file, combine_restrict_filters
+from test_memory_backend import make_test_backend, MAILBOX
+
+try:
+	import tomllib
+except ImportError:
+	tomllib = None
+
+"""
+This file tests loading rules files and running many rules in a single pass.
+"""
+
+RULES = {"mailbox": MAILBOX,
+		 "rules": [{"name": "shop", "sender_email": "deals@shop.com", "start_date": "1/12/2023",
+					"end_date": "1/15/2023"},
+				   {"name": "deals", "subject_keyphrase": ["deals"]},
+				   {"name": "friends", "sender_domain": "mail.com", "subject_keyphrase": "hello 1"}]}
+
+
+def write_rules_file(directory: str, content, file_name: str = "rules.json") -> str:
+	"""
+	Writes a rules file into a directory.
+	:return: (str) path of the file
+	"""
+	file_path = os.path.join(directory, file_name)
+	with open(file_path, 'w', encoding='utf-8') as rules_file:
+		rules_file.write(content if isinstance(content, str) else json.dumps(content))
+	return file_path
+
+
+class test_rule_batch(unittest.TestCase):
+
+	def test_load_rules_file(self):
+		"""
+		Testing reading a JSON rules file and rejecting invalid ones
+		:return: None
+		"""
+		with tempfile.TemporaryDirectory() as directory:
+			rules_file = load_rules_file(write_rules_file(directory, RULES))
+			self.assertEqual([MAILBOX], rules_file['mailboxes'])
+			self.assertEqual(["shop", "deals", "friends"], [rule['name'] for rule in rules_file['rules']])
+
+			rules_file = load_rules_file(write_rules_file(directory, {"rules": [{"sender_name": "Shop"}]}))
+			self.assertEqual([], rules_file['mailboxes'])
+			self.assertEqual("rule 1", rules_file['rules'][0]['name'])
+
+			self.assertRaises(ValueError, load_rules_file, write_rules_file(directory, "{not json"))
+			self.assertRaises(ValueError, load_rules_file, write_rules_file(directory, {"rules": []}))
+			self.assertRaises(ValueError, load_rules_file,
+							  write_rules_file(directory, {"rules": [{"sender": "deals@shop.com"}]}))
+
+	@unittest.skipIf(tomllib is None, "tomllib needs python 3.11 or later")
+	def test_load_toml_rules_file(self):
+		"""
+		Testing reading a TOML rules file
+		:return: None
+		"""
+		content = 'mailbox = "tester@example.com"\n\n[[rules]]\nname = "shop"\nsender_email = ["deals@shop.com"]\n'
+		with tempfile.TemporaryDirectory() as directory:
+			rules_file = load_rules_file(write_rules_file(directory, content, "rules.toml"))
+		self.assertEqual([{"name": "shop", "sender_email": ["deals@shop.com"]}], rules_file['rules'])
+
+	def test_compile_rules(self):
+		"""
+		Each rule is compiled on its own, an invalid rule is reported by name
+		:return: None
+		"""
+		model = cleanup_model(make_test_backend())
+		rules = model.compile_rules(RULES['rules'])
+		self.assertEqual(3, len(rules))
+		self.assertEqual([0, 1], sorted(predicate.condition_index for predicate in rules[0].predicate_plan.predicates))
+		self.assertIn("deals", rules[1].confirmation_str)
+		self.assertIsNone(model.target_sender_email)
+		self.assertTrue(combine_restrict_filters(rules).startswith("@SQL=("))
+
+		with self.assertRaises(ValueError) as context:
+			model.compile_rules([{"name": "bad dates", "start_date": "13/40/2023", "end_date": "1/1/2024"}])
+		self.assertIn("bad dates", str(context.exception))
+		self.assertRaises(ValueError, model.compile_rules, [{"name": "empty"}])
+
+	def test_delete_emails_matching_rules(self):
+		"""
+		All rules run in one pass, an email matching several rules is deleted once
+		and credited to the first rule it matches
+		:return: None
+		"""
+		for use_restrict_filter in (True, False):
+			model = cleanup_model(make_test_backend())
+			model.call_startup_methods()
+			model.select_target_mailbox_by_address(MAILBOX.upper())
+			model.use_restrict_filter = use_restrict_filter
+			rules = model.compile_rules(RULES['rules'])
+
+			summaries = model.delete_emails_matching_rules(rules)
+			self.assertEqual([4, 8, 1], [summary['deleted'] for summary in summaries])
+			self.assertEqual(13, model.delete_counter)
+			self.assertEqual(9, model.get_all_emails_from_directory().Count)
+
+		self.assertRaises(ValueError, model.select_target_mailbox_by_address, "nobody@example.com")
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,132 @@
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_mail_item
+from src.model.restrict_filter import parse_restrict_filter
+from src.model.rule_expression import parse_rule_expression, condition_node, and_node, or_node, not_node
+from test_memory_backend import make_test_backend
+
+"""
+This file tests parsing and evaluating rule expressions.
+"""
+
+
+class test_rule_expression(unittest.TestCase):
+
+	def test_precedence(self):
+		"""
+		NOT binds tighter than AND, which binds tighter than OR
+		:return: None
+		"""
+		tree = parse_rule_expression("subject:a OR subject:b AND NOT sender:x@y.com")
+		self.assertIsInstance(tree, or_node)
+		self.assertIsInstance(tree.written_children[1], and_node)
+		self.assertIsInstance(tree.written_children[1].written_children[1], not_node)
+
+		email = memory_mail_item(Subject="b", SenderEmailAddress="x@y.com")
+		self.assertFalse(tree.evaluate(email))
+		self.assertTrue(tree.evaluate(memory_mail_item(Subject="A", SenderEmailAddress="x@y.com")))
+		self.assertTrue(parse_rule_expression("NOT NOT subject:b").evaluate(email))
+
+	def test_or_of_same_field_is_merged(self):
+		"""
+		Conditions on the same field joined by OR become a single condition
+		:return: None
+		"""
+		tree = parse_rule_expression('(sender:a@x.com OR sender:B@x.com OR sender:c@x.com) AND NOT subject:"big invoice"')
+		merged = tree.written_children[0]
+		self.assertIsInstance(merged, condition_node)
+		self.assertEqual(["a@x.com", "B@x.com", "c@x.com"], merged.values)
+
+		self.assertTrue(tree.evaluate(memory_mail_item(SenderEmailAddress="b@X.com", Subject="Hello")))
+		self.assertFalse(tree.evaluate(memory_mail_item(SenderEmailAddress="b@x.com", Subject="Your BIG invoice")))
+		self.assertFalse(tree.evaluate(memory_mail_item(SenderEmailAddress="d@x.com", Subject="Hello")))
+
+	def test_cheaper_branches_first(self):
+		"""
+		Children are evaluated by increasing cost, so a cheap branch short circuits expensive ones
+		:return: None
+		"""
+		tree = parse_rule_expression("(subject:a AND name:b) OR sender:x@y.com")
+		self.assertIsInstance(tree.children[0], condition_node)
+		self.assertEqual("sender", tree.children[0].field)
+		# the subject and name are never read when the sender matches
+		self.assertTrue(tree.evaluate(memory_mail_item(SenderEmailAddress="x@y.com")))
+		# otherwise the missing subject is read, and the email is not processed
+		self.assertEqual("Subject", tree.evaluate(memory_mail_item(SenderEmailAddress="z@y.com")).property_name)
+
+	def test_or_does_not_depend_on_the_order(self):
+		"""
+		A branch missing a property does not stop the others, whatever the order of the branches
+		:return: None
+		"""
+		no_address = memory_mail_item(Subject="Big sale", SenderName="Shop")
+		for expression in ("sender:a@x.com OR subject:sale", "subject:sale OR sender:a@x.com"):
+			self.assertIs(True, parse_rule_expression(expression).evaluate(no_address), expression)
+		for expression in ("sender:a@x.com OR subject:hello", "subject:hello OR sender:a@x.com"):
+			self.assertEqual("SenderEmailAddress", parse_rule_expression(expression).evaluate(no_address).property_name,
+							 expression)
+		self.assertIs(False, parse_rule_expression("subject:hello OR name:bank").evaluate(no_address))
+
+	def test_describe(self):
+		"""
+		The description follows the order the expression was written in
+		:return: None
+		"""
+		tree = parse_rule_expression('(sender:a@x.com OR domain:*.y.com) AND NOT subject:"invoice" '
+									 'AND date:1/1/2023..1/31/2023')
+		self.assertEqual("(sender email: a@x.com OR sender domain: *.y.com) AND "
+						 "NOT (has the keyword/keyphrase in the subject: invoice) AND "
+						 "was sent between the dates (inclusive): 01/01/2023 to 01/31/2023", tree.describe())
+
+	def test_restrict_clause(self):
+		"""
+		The DASL clause of an expression never drops an email the expression matches
+		:return: None
+		"""
+		tree = parse_rule_expression("sender:a@x.com AND NOT subject:invoice")
+		restrict_filter = parse_restrict_filter("@SQL=" + tree.restrict_clause())
+		self.assertTrue(restrict_filter(memory_mail_item(SenderEmailAddress="a@x.com", Subject="invoice")))
+		self.assertFalse(restrict_filter(memory_mail_item(SenderEmailAddress="b@x.com", Subject="hi")))
+		self.assertIsNone(parse_rule_expression("sender:a@x.com OR NOT subject:invoice").restrict_clause())
+
+	def test_invalid_expressions(self):
+		"""
+		Invalid expressions raise a ValueError
+		:return: None
+		"""
+		for expression in ("", "sender:a@x.com AND", "(sender:a@x.com", "sender:a@x.com)", "color:red",
+						   "date:1/1/2023", "date:2/1/2023..1/1/2023", "domain:x.*.com", "sender:\"\"",
+						   "sender:a@x.com subject:b"):
+			self.assertRaises(ValueError, parse_rule_expression, expression)
+
+	def test_model_rule_expression(self):
+		"""
+		Testing the rule expression condition of the model
+		:return: None
+		"""
+		for use_restrict_filter in (True, False):
+			model = cleanup_model(make_test_backend())
+			model.call_startup_methods()
+			model.select_target_mailbox(1)
+			model.use_restrict_filter = use_restrict_filter
+			model.set_target_rule_expression('(sender:deals@shop.com OR sender:friend@mail.com) AND NOT subject:"hello 1"')
+			model.set_target_start_date("1/10/2023")
+			model.set_target_end_date("1/14/2023")
+			model.verify_deletion_conditions()
+
+			self.assertEqual("was sent between the dates (inclusive): 01/10/2023 to 01/14/2023 AND matches the rule: "
+							 "((sender email: deals@shop.com OR friend@mail.com) AND "
+							 "NOT (has the keyword/keyphrase in the subject: hello 1))", model.deletion_confirmation_str)
+			self.assertEqual(9, len(model.get_emails_matching_search_conditions()))
+
+		self.assertRaises(ValueError, model.set_target_rule_expression, "sender:")
+		model.set_target_rule_expression(" ")
+		model.clear_deleting_conditions()
+		self.assertIsNone(model.target_rule_expression)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,113 @@
+import random
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from src.model.cleanup_model import cleanup_model
+from src.model.memory_backend import memory_mail_item
+from src.model.sender_analytics import heavy_hitters, sender_statistics
+from test_memory_backend import make_test_backend
+
+"""
+This file tests counting emails per sender.
+"""
+
+
+class test_sender_analytics(unittest.TestCase):
+
+	def test_exact_until_full(self):
+		"""
+		Counts, sizes and date spans are exact while every key fits
+		:return: None
+		"""
+		aggregation = heavy_hitters(capacity=3)
+		base = datetime(2023, 1, 10, tzinfo=timezone.utc)
+		for number, key in enumerate(["a", "b", "a", "c", "a", "b"]):
+			aggregation.add(key, size=100, sent_on=base + timedelta(days=number))
+
+		top = aggregation.get_top(2)
+		self.assertEqual(["a", "b"], [summary['key'] for summary in top])
+		self.assertEqual([3, 2], [summary['count'] for summary in top])
+		self.assertEqual([0, 0], [summary['error'] for summary in top])
+		self.assertEqual(300, top[0]['size'])
+		self.assertEqual(base, top[0]['first_sent'])
+		self.assertEqual(base + timedelta(days=4), top[0]['last_sent'])
+		self.assertEqual(0, aggregation.amt_evictions)
+		self.assertRaises(ValueError, heavy_hitters, 0)
+
+	def test_heavy_hitters_are_kept(self):
+		"""
+		With more keys than the capacity, frequent keys are kept and counts stay within their error
+		:return: None
+		"""
+		generator = random.Random(7)
+		stream = [f"heavy{number}" for number in range(5) for _ in range(300)]
+		stream += [f"rare{generator.randrange(2000)}" for _ in range(3000)]
+		generator.shuffle(stream)
+		real_counts = Counter(stream)
+
+		aggregation = heavy_hitters(capacity=50)
+		for key in stream:
+			aggregation.add(key)
+		self.assertEqual(50, len(aggregation.aggregates))
+		self.assertGreater(aggregation.amt_evictions, 0)
+
+		top = aggregation.get_top(5)
+		self.assertEqual({f"heavy{number}" for number in range(5)}, {summary['key'] for summary in top})
+		for summary in aggregation.get_top(50):
+			self.assertGreaterEqual(summary['count'], real_counts[summary['key']])
+			self.assertLessEqual(summary['count'] - summary['error'], real_counts[summary['key']])
+		# the counts add up to the amount of emails
+		self.assertEqual(len(stream), sum(summary['count'] for summary in aggregation.get_top(50)))
+
+	def test_sender_statistics(self):
+		"""
+		Emails are counted per address, name and domain, emails without an address are not counted
+		:return: None
+		"""
+		statistics = sender_statistics()
+		statistics.add_emails([memory_mail_item(SenderEmailAddress="Deals@Shop.com", SenderName="Shop", Size=2048),
+							   memory_mail_item(SenderEmailAddress="news@shop.com", SenderName="Shop", Size=1024),
+							   memory_mail_item(SenderEmailAddress="/O=EXCHANGELABS/CN=BOB"),
+							   memory_mail_item(SenderName="System")])
+		report = statistics.get_report(top_n=5)
+		self.assertEqual(3, report['emails'])
+		self.assertEqual(1, report['unprocessed'])
+		self.assertTrue(report['exact'])
+		self.assertEqual([("shop.com", 2, 3072)],
+						 [(sender['key'], sender['count'], sender['size']) for sender in report['domains']])
+		self.assertEqual([("Shop", 2), ("/o=exchangelabs/cn=bob", 1)],
+						 [(sender['key'], sender['count']) for sender in report['names']])
+		# senders with the same count are listed by key
+		self.assertEqual(["/o=exchangelabs/cn=bob", "deals@shop.com", "news@shop.com"],
+						 [sender['key'] for sender in report['addresses']])
+
+	def test_model_analyze_senders(self):
+		"""
+		Testing the analysis of the selected folder, with and without deletion conditions
+		:return: None
+		"""
+		for use_snapshot in (False, True):
+			model = cleanup_model(make_test_backend())
+			model.call_startup_methods()
+			model.select_target_mailbox(1)
+			model.use_snapshot = use_snapshot
+
+			report = model.analyze_senders(top_n=1)
+			self.assertEqual(20, report['emails'])
+			self.assertEqual(2, report['unprocessed'])
+			self.assertEqual(1, len(report['addresses']))
+			self.assertEqual(10, report['domains'][0]['count'])
+
+			model.set_target_sender_domain("shop.com")
+			model.verify_deletion_conditions()
+			report = model.analyze_senders()
+			self.assertEqual(["deals@shop.com"], [sender['key'] for sender in report['addresses']])
+			self.assertEqual(10, report['addresses'][0]['count'])
+			self.assertEqual(0, model.emails_with_missing_attributes_count)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,197 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from src.model.cleanup_model import cleanup_model
+from src.model.date_handler import LOCAL_TIMEZONE
+from src.model.memory_backend import memory_backend, memory_mail_item
+from src.model.restrict_filter import compile_restrict_filter, parse_restrict_filter
+from src.model.sender_resolver import sender_address_resolver, is_exchange_address
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests resolving the addresses of Exchange senders to SMTP addresses,
+and the cache keeping each sender from being looked up more than once.
+"""
+
+ALICE = "/O=EXCHANGELABS/OU=EXCHANGE ADMINISTRATIVE GROUP/CN=RECIPIENTS/CN=ALICE"
+BOB = "/O=EXCHANGELABS/OU=EXCHANGE ADMINISTRATIVE GROUP/CN=RECIPIENTS/CN=BOB"
+FORMER_EMPLOYEE = "/O=EXCHANGELABS/OU=EXCHANGE ADMINISTRATIVE GROUP/CN=RECIPIENTS/CN=GONE"
+
+
+def make_exchange_backend() -> memory_backend:
+	"""
+	Creates the test backend with emails of Exchange senders added to its inbox: 5 from
+	alice@corp.com, 3 from bob@corp.com and 2 from a sender no longer in the directory.
+	:return: (memory_backend) the backend
+	"""
+	backend = make_test_backend()
+	backend.add_exchange_user(ALICE, "alice@corp.com")
+	backend.add_exchange_user(BOB, "bob@corp.com")
+	base = datetime(2023, 2, 1, 9, 0, 0, tzinfo=LOCAL_TIMEZONE)
+	for address, name, amount in ((ALICE, "Alice", 5), (BOB, "Bob", 3), (FORMER_EMPLOYEE, "Gone", 2)):
+		for index in range(amount):
+			sent_on = base + timedelta(hours=index)
+			backend.add_email(MAILBOX, Subject=f"Status {index}", SenderEmailAddress=address, SenderName=name,
+							  SenderEmailType="EX", SentOn=sent_on, ReceivedTime=sent_on)
+	return backend
+
+
+def make_model(backend: memory_backend, resolve: bool = True) -> cleanup_model:
+	model = cleanup_model(backend)
+	if resolve:
+		model.enable_sender_resolution()
+	model.call_startup_methods()
+	model.select_target_mailbox_by_address(MAILBOX)
+	return model
+
+
+class test_sender_resolver(unittest.TestCase):
+
+	def test_each_address_is_looked_up_once(self):
+		"""
+		SMTP addresses are not looked up, Exchange addresses are looked up on their first read only
+		:return: None
+		"""
+		resolver = sender_address_resolver(make_exchange_backend())
+		self.assertFalse(is_exchange_address("deals@shop.com"))
+		self.assertTrue(is_exchange_address(ALICE))
+		self.assertEqual("deals@shop.com", resolver.resolve("deals@shop.com"))
+		for _ in range(3):
+			self.assertEqual("alice@corp.com", resolver.resolve(ALICE))
+			# addresses that cannot be resolved are given back as they are
+			self.assertEqual(FORMER_EMPLOYEE, resolver.resolve(FORMER_EMPLOYEE))
+		self.assertEqual({'hits': 4, 'misses': 2, 'hit_rate': 4 / 6, 'unresolved': 1, 'evictions': 0, 'loaded': 0,
+						  'size': 2, 'capacity': 10000}, resolver.get_stats())
+
+		missing_address = resolver.read_sender_address(memory_mail_item(Subject="Undeliverable"))
+		self.assertEqual("SenderEmailAddress", missing_address.property_name)
+		self.assertRaises(ValueError, sender_address_resolver, make_exchange_backend(), 0)
+
+	def test_least_recently_used_addresses_are_evicted(self):
+		"""
+		Above its capacity, the cache evicts the address read the longest time ago
+		:return: None
+		"""
+		resolver = sender_address_resolver(make_exchange_backend(), capacity=2)
+		resolver.resolve(ALICE)
+		resolver.resolve(BOB)
+		resolver.resolve(ALICE)
+		resolver.resolve(FORMER_EMPLOYEE)
+		self.assertEqual([ALICE, FORMER_EMPLOYEE], list(resolver.cache))
+		resolver.resolve(BOB)
+		stats = resolver.get_stats()
+		self.assertEqual((1, 4, 2), (stats['hits'], stats['misses'], stats['evictions']))
+
+	def test_cache_file(self):
+		"""
+		Resolved addresses are saved and loaded by the next run, unresolved ones are looked up again
+		:return: None
+		"""
+		with tempfile.TemporaryDirectory() as directory:
+			cache_path = os.path.join(directory, "senders.json")
+			resolver = sender_address_resolver(make_exchange_backend(), cache_path=cache_path)
+			resolver.resolve(ALICE)
+			resolver.resolve(FORMER_EMPLOYEE)
+			resolver.save()
+
+			next_run = sender_address_resolver(memory_backend(), cache_path=cache_path)
+			self.assertEqual("alice@corp.com", next_run.resolve(ALICE))
+			self.assertEqual(FORMER_EMPLOYEE, next_run.resolve(FORMER_EMPLOYEE))
+			stats = next_run.get_stats()
+			self.assertEqual((1, 1, 1), (stats['loaded'], stats['hits'], stats['misses']))
+
+			with open(cache_path, 'w', encoding='utf-8') as cache_file:
+				cache_file.write("[1, 2")
+			self.assertRaises(ValueError, sender_address_resolver, memory_backend(), cache_path=cache_path)
+
+	def test_filter_passes_exchange_senders(self):
+		"""
+		With exchange_senders, the sender clauses of a filter also pass the emails of Exchange senders
+		:return: None
+		"""
+		exchange_email = memory_mail_item(SenderEmailAddress=ALICE, SenderEmailType="EX", Subject="Status")
+		smtp_email = memory_mail_item(SenderEmailAddress="friend@mail.com", SenderEmailType="SMTP", Subject="Status")
+		for conditions in ({'sender_email': "alice@corp.com"}, {'sender_domain': "corp.com"}):
+			self.assertFalse(parse_restrict_filter(compile_restrict_filter(**conditions))(exchange_email))
+			passes = parse_restrict_filter(compile_restrict_filter(**conditions, exchange_senders=True))
+			self.assertTrue(passes(exchange_email))
+			self.assertFalse(passes(smtp_email))
+
+	def test_conditions_match_resolved_addresses(self):
+		"""
+		Sender email, sender domain and rule expression conditions match Exchange senders by their SMTP address
+		:return: None
+		"""
+		model = make_model(make_exchange_backend(), resolve=False)
+		model.set_target_sender_domain("corp.com")
+		model.verify_deletion_conditions()
+		self.assertEqual(0, len(model.get_emails_matching_search_conditions()))
+
+		model = make_model(make_exchange_backend())
+		model.set_target_sender_domain("corp.com")
+		model.verify_deletion_conditions()
+		self.assertEqual(8, len(model.get_emails_matching_search_conditions()))
+		self.assertEqual({'corp.com': 8}, model.matched_sender_domain_rules)
+
+		model.clear_deleting_conditions()
+		model.set_target_rule_expression("sender:alice@corp.com OR sender:deals@shop.com")
+		model.verify_deletion_conditions()
+		self.assertEqual(15, model.count_emails_matching_search_conditions()['matched'])
+
+		model.clear_deleting_conditions()
+		model.set_target_sender_email("bob@corp.com")
+		model.verify_deletion_conditions()
+		# the filter passes every Exchange sender, the emails are counted by reading them
+		self.assertFalse(model.can_count_with_restrict_filter())
+		model.delete_emails_with_matching_conditions()
+		self.assertEqual(3, model.delete_counter)
+
+		# 3 Exchange senders, each looked up once however many emails and searches read them
+		stats = model.disable_sender_resolution()
+		self.assertEqual(3, stats['misses'])
+		self.assertEqual(1, stats['unresolved'])
+		# the 10 Exchange emails are read by each of the 3 searches
+		self.assertEqual(3 * 10 - 3, stats['hits'])
+
+	def test_parallel_runs_share_the_cache(self):
+		"""
+		Workers cleaning mailboxes at the same time look up each sender once, and the analysis
+		counts Exchange senders under their SMTP domain
+		:return: None
+		"""
+		backend = make_exchange_backend()
+		backend.add_mailbox("second@example.com")
+		for index in range(4):
+			backend.add_email("second@example.com", Subject=f"Status {index}", SenderEmailAddress=ALICE,
+							  SenderEmailType="EX", SentOn=datetime(2023, 3, 1, tzinfo=LOCAL_TIMEZONE))
+		model = make_model(backend)
+		self.assertEqual({'corp.com': 8},
+						 {sender['key']: sender['count'] for sender in model.analyze_senders()['domains']
+						  if sender['key'] == 'corp.com'})
+
+		rules = model.compile_rules([{"name": "alice", "sender_email": "alice@corp.com"}])
+		summary = model.delete_emails_in_mailboxes([MAILBOX, "second@example.com"], rules)
+		self.assertEqual(9, summary['deleted'])
+		self.assertEqual(3, model.get_sender_resolution_stats()['misses'])
+
+	def test_metadata_index_counts_missing_senders_once(self):
+		"""
+		With the metadata index, emails without a sender address are counted once whether addresses are resolved or not
+		:return: None
+		"""
+		for resolve in (False, True):
+			model = make_model(make_exchange_backend(), resolve)
+			model.open_metadata_index()
+			model.set_target_sender_domain(["shop.com", "corp.com"])
+			model.verify_deletion_conditions()
+			self.assertEqual(18 if resolve else 10, len(model.get_emails_matching_search_conditions()))
+			self.assertEqual({'SenderEmailAddress': 2}, model.missing_property_counts)
+			model.close_metadata_index()
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
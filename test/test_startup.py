@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+import unittest
+
+"""
+This file tests that starting the program does not import the modules only
+some commands need (pywin32, sqlite, TOML, thread pools, profilers, numpy).
+"""
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFERRED_MODULES = ("win32com", "pythoncom", "pywintypes", "sqlite3", "tomllib", "concurrent.futures", "cProfile",
+					"pstats", "tracemalloc", "numpy")
+
+
+def get_loaded_deferred_modules(snippet: str) -> list:
+	"""
+	Runs python code in a new interpreter.
+	:param snippet: (str) the code
+	:return: (list) sorted names of the DEFERRED_MODULES imported once the code ran
+	"""
+	code = f"import sys\n{snippet}\nprint(','.join(sorted(set(sys.modules) & set({DEFERRED_MODULES!r}))))"
+	completed = subprocess.run([sys.executable, "-c", code], cwd=REPOSITORY_ROOT, capture_output=True, text=True,
+							   check=True)
+	return [name for name in completed.stdout.strip().split(",") if name]
+
+
+class test_startup(unittest.TestCase):
+
+	def test_program_imports_are_deferred(self):
+		"""
+		Importing the program, and creating the model on its default Outlook backend, loads no deferred module
+		:return: None
+		"""
+		self.assertEqual([], get_loaded_deferred_modules("import email_cleanup"))
+		self.assertEqual([], get_loaded_deferred_modules(
+			"from src.controller.cleanup_controller import cleanup_controller\n"
+			"from src.model.cleanup_model import cleanup_model\n"
+			"cleanup_model()"))
+
+	def test_rules_are_checked_without_connecting(self):
+		"""
+		Rules compile without a connection and without loading the deferred modules
+		:return: None
+		"""
+		loaded = get_loaded_deferred_modules(
+			"from src.model.cleanup_model import cleanup_model\n"
+			"model = cleanup_model()\n"
+			"rules = model.compile_rules([{'name': 'deals', 'sender_domain': 'shop.com'}])\n"
+			"assert model.backend.com_obj is None and len(rules) == 1")
+		self.assertEqual([], loaded)
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,63 @@
+import unittest
+from benchmarks.synthetic_mailbox import make_synthetic_backend, MAILBOX
+from benchmarks.bench_cleanup_engine import compare_with_baselines
+
+"""
+This file tests the synthetic mailboxes of the benchmarks and the comparison against baselines.
+"""
+
+
+def get_emails(backend) -> list:
+	"""
+	:return: (list) the emails of the Inbox of the synthetic mailbox
+	"""
+	return list(backend.get_items(backend.open_folder(MAILBOX)))
+
+
+class test_synthetic_mailbox(unittest.TestCase):
+
+	def test_reproducible(self):
+		"""
+		The same seed gives the same emails, another seed other emails
+		:return: None
+		"""
+		first = [(email.Subject, getattr(email, 'SentOn', None)) for email in get_emails(make_synthetic_backend(500))]
+		second = [(email.Subject, getattr(email, 'SentOn', None)) for email in get_emails(make_synthetic_backend(500))]
+		other = [(email.Subject, getattr(email, 'SentOn', None))
+				 for email in get_emails(make_synthetic_backend(500, seed=1))]
+		self.assertEqual(first, second)
+		self.assertNotEqual(first, other)
+
+	def test_distributions(self):
+		"""
+		A few senders send most emails, and some emails miss their SentOn or sender address
+		:return: None
+		"""
+		emails = get_emails(make_synthetic_backend(5000))
+		self.assertEqual(5000, len(emails))
+		missing_sent_on = sum(1 for email in emails if not hasattr(email, 'SentOn'))
+		missing_address = sum(1 for email in emails if not hasattr(email, 'SenderEmailAddress'))
+		self.assertTrue(10 < missing_sent_on < 100)
+		self.assertTrue(40 < missing_address < 160)
+
+		counts = {}
+		for email in emails:
+			counts[email.SenderName] = counts.get(email.SenderName, 0) + 1
+		top_ten = sorted(counts.values(), reverse=True)[:10]
+		self.assertGreater(sum(top_ten), len(emails) // 4)
+
+	def test_compare_with_baselines(self):
+		"""
+		Only benchmarks slower than their baseline by more than the tolerance are regressions
+		:return: None
+		"""
+		results = {"match/a@10": 1.0, "match/b@10": 2.0, "match/c@10": 3.0}
+		baselines = {"match/a@10": 1.0, "match/b@10": 1.0}
+		self.assertEqual(["match/b@10"], compare_with_baselines(results, baselines, tolerance=1.25))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()
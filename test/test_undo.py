@@ -0,0 +1,96 @@
+import os
+import tempfile
+import unittest
+from src.model.cleanup_model import cleanup_model
+from src.model.deletion_journal import read_journal, find_unfinished_run, find_run_to_undo
+from test_memory_backend import make_test_backend, MAILBOX
+
+"""
+This file tests undoing a journaled run by moving its emails back from the trash folder.
+"""
+
+
+def get_subjects(backend, folder_path: str) -> list:
+	"""
+	:return: (list) sorted subjects of the emails of a folder of the test mailbox
+	"""
+	return sorted(item.Subject for item in backend.get_items(backend.open_folder(MAILBOX, folder_path)))
+
+
+class test_undo(unittest.TestCase):
+
+	def setUp(self) -> None:
+		self.temp_dir = tempfile.TemporaryDirectory()
+		self.journal_path = os.path.join(self.temp_dir.name, "journal.jsonl")
+
+	def tearDown(self) -> None:
+		self.temp_dir.cleanup()
+
+	def test_undo_run(self):
+		"""
+		The emails of a run are moved back to their folder, once
+		:return: None
+		"""
+		backend = make_test_backend()
+		inbox_subjects = get_subjects(backend, "Inbox")
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.deletion_batch_size = 3
+		model.open_deletion_journal(self.journal_path)
+		model.set_target_sender_email("deals@shop.com")
+		model.verify_deletion_conditions()
+		model.delete_emails_with_matching_conditions()
+		model.close_deletion_journal()
+		self.assertEqual(10, model.delete_counter)
+		self.assertEqual(10, len(get_subjects(backend, "Deleted Items")))
+
+		# an email deleted for good from the trash folder cannot be moved back
+		deleted_items = backend.get_items(backend.open_folder(MAILBOX, "Deleted Items"))
+		backend.delete_item(deleted_items.Item(1))
+
+		summary = model.undo_run(self.journal_path, model.last_run_id[:6])
+		self.assertEqual({'run_id': model.last_run_id, 'restored': 9, 'missing': 1}, summary)
+		self.assertEqual(21, len(get_subjects(backend, "Inbox")))
+		self.assertEqual([], get_subjects(backend, "Deleted Items"))
+		self.assertEqual(inbox_subjects, sorted(get_subjects(backend, "Inbox") + ["Weekly deals 9"]))
+		self.assertEqual(['restore'] * 3, [record['type'] for record in read_journal(self.journal_path)][-3:])
+
+		# already restored emails are not moved again
+		self.assertEqual({'run_id': model.last_run_id, 'restored': 0, 'missing': 1},
+						 model.undo_run(self.journal_path))
+		self.assertRaises(ValueError, model.undo_run, self.journal_path, "unknown")
+
+	def test_undo_rules_run(self):
+		"""
+		Runs of rules journal the folder of each batch, so they can be undone but not resumed
+		:return: None
+		"""
+		backend = make_test_backend()
+		model = cleanup_model(backend)
+		model.call_startup_methods()
+		model.select_target_mailbox(1)
+		model.use_restrict_filter = False
+		model.open_deletion_journal(self.journal_path)
+		rules = model.compile_rules([{"name": "hello", "subject_keyphrase": "hello"}])
+		self.assertEqual(10, model.delete_emails_in_mailboxes([MAILBOX], rules)['deleted'])
+		first_run_id = model.last_run_id
+		rules = model.compile_rules([{"name": "shop", "sender_email": "deals@shop.com"}])
+		self.assertEqual(10, model.delete_emails_matching_rules(rules)[0]['deleted'])
+		model.close_deletion_journal()
+		self.assertNotEqual(first_run_id, model.last_run_id)
+		self.assertIsNone(find_unfinished_run(self.journal_path))
+		self.assertEqual({(MAILBOX, "Inbox")}, {(item['mailbox'], item['folder'])
+												for item in find_run_to_undo(self.journal_path, first_run_id)['items']})
+
+		summary = model.undo_run(self.journal_path, first_run_id)
+		self.assertEqual(10, summary['restored'])
+		self.assertEqual(12, len(get_subjects(backend, "Inbox")))
+		self.assertEqual(10, len(get_subjects(backend, "Deleted Items")))
+
+
+def main():
+	unittest.main(verbosity=3)
+
+if __name__ == '__main__':
+	main()